@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+
+from web3 import Web3
+
+from blockchain import networks
+from blockchain.async_web3.backfill import ReserveBackfill
+from blockchain.async_web3.client import AsyncClient
+from blockchain.networks import binance
+
+
+async def backfill(args):
+    client = AsyncClient(
+        public_key=binance.BURN,
+        private_key="",
+        network=networks.get_network_by_name(args.network),
+    )
+    engine = ReserveBackfill(client, output=args.output, concurrency=args.concurrency, retries=args.retries)
+    end_block = args.end
+    if end_block is None:
+        end_block = await client.w3.eth.block_number
+    rows = await engine.backfill(
+        [Web3.toChecksumAddress(x) for x in args.pair],
+        start_block=args.start,
+        end_block=end_block,
+        step=args.step,
+    )
+    for pair, count in zip(args.pair, rows):
+        print(f"{pair} {count} blocks stored")
+
+
+def main():
+    parser = argparse.ArgumentParser("Backfill historical LP reserves")
+    parser.add_argument("--network", required=True, choices=networks.NETWORKS.keys(), help="Network to operate on")
+    parser.add_argument("--output", required=True, help="Output directory, one subdirectory per pair")
+    parser.add_argument("--start", required=True, type=int, help="First block")
+    parser.add_argument("--end", default=None, type=int, help="Last block, default is latest block")
+    parser.add_argument("--step", default=1, type=int, help="Block step")
+    parser.add_argument("--concurrency", default=50, type=int, help="Max concurrent requests")
+    parser.add_argument("--retries", default=5, type=int, help="Retries per failed request")
+    parser.add_argument("pair", nargs="+", help="LP pair address")
+
+    args = parser.parse_args()
+
+    asyncio.run(backfill(args))
+
+
+if __name__ == '__main__':
+    main()
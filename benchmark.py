@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from web3 import Web3
+
+from blockchain import json_codec
+from blockchain.async_web3.rpc import PooledAsyncHTTPProvider
+from blockchain.contract import LPContract, Token, get_abi
+
+
+def measure(create, count):
+    """
+    Create count objects, returns (bytes per object, microseconds per object)
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = [create(x) for x in range(count)]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size / count, elapsed * 10**6 / count
+
+
+def make_address(x):
+    return Web3.toChecksumAddress(f"0x{x + 1:040x}")
+
+
+def handles(args):
+    # Web3 without provider, nothing is sent to network
+    w3 = Web3()
+    token_abi = get_abi("token")
+    lp_abi = get_abi("PancakeLP")
+    addresses = [make_address(x) for x in range(args.count)]
+    token_factory = w3.eth.contract(abi=token_abi)
+    lp_factory = w3.eth.contract(abi=lp_abi)
+
+    cases = [
+        ("token web3 contract", lambda x: token_factory(address=addresses[x])),
+        ("token handle", lambda x: Token(w3, addresses[x])),
+        ("lp web3 contract", lambda x: lp_factory(address=addresses[x])),
+        ("lp handle", lambda x: LPContract(w3, addresses[x])),
+    ]
+    print(f"{'case':<24}{'bytes/object':>14}{'us/object':>12}")
+    for name, create in cases:
+        size, duration = measure(create, args.count)
+        print(f"{name:<24}{size:>14.0f}{duration:>12.1f}")
+
+
+def sample_logs_response(count):
+    """
+    eth_getLogs response with count Sync events
+    """
+    logs = []
+    for x in range(count):
+        logs.append({
+            "address": make_address(x % 500),
+            "topics": ["0x1c411e9a96e071241c2f21f7726b17ae89e3cab4c78be50e062b03a9fffbbad1"],
+            "data": "0x" + f"{x * 10**18:064x}" + f"{x * 3 * 10**18:064x}",
+            "blockNumber": hex(20000000 + x // 100),
+            "transactionHash": "0x" + f"{x:064x}",
+            "transactionIndex": hex(x % 100),
+            "blockHash": "0x" + f"{x // 100:064x}",
+            "logIndex": hex(x % 100),
+            "removed": False,
+        })
+    return json_codec.JSONCodec().dumps({"jsonrpc": "2.0", "id": 1, "result": logs})
+
+
+def read_payloads(filenames):
+    """
+    Read recorded responses, files can contain one JSON document or JSON lines
+    """
+    payloads = []
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            content = f.read()
+        try:
+            json_codec.JSONCodec().loads(content)
+            payloads.append(content)
+        except ValueError:
+            payloads.extend(x for x in content.splitlines() if x.strip())
+    return payloads
+
+
+def codecs(args):
+    if args.payload:
+        payloads = read_payloads(args.payload)
+    else:
+        payloads = [sample_logs_response(args.logs)]
+    total_size = sum(len(x) for x in payloads)
+    print(f"{len(payloads)} payloads, {total_size / 1024 / 1024:.2f} MiB")
+    print(f"{'codec':<12}{'decode MiB/s':>14}{'encode MiB/s':>14}")
+    for name in json_codec.CODECS:
+        codec = json_codec.get_codec(name)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            decoded = [codec.loads(x) for x in payloads]
+        decode_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for x in decoded:
+                codec.dumps(x)
+        encode_time = time.perf_counter() - start
+        mib = total_size * args.rounds / 1024 / 1024
+        print(f"{name:<12}{mib / decode_time:>14.1f}{mib / encode_time:>14.1f}")
+
+
+async def rpc_load(args):
+    provider = PooledAsyncHTTPProvider(args.url)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def request():
+        async with semaphore:
+            if args.batch > 1:
+                await provider.make_batch_request([(args.method, [])] * args.batch)
+            else:
+                await provider.make_request(args.method, [])
+
+    try:
+        await provider.warm_up(args.concurrency)
+        start = time.perf_counter()
+        await asyncio.gather(*[request() for _ in range(args.requests)])
+        elapsed = time.perf_counter() - start
+    finally:
+        await provider.close()
+    total = args.requests * max(args.batch, 1)
+    print(f"{total} requests in {elapsed:.2f} s, {total / elapsed:.0f} requests/s")
+
+
+def rpc(args):
+    asyncio.run(rpc_load(args))
+
+
+def main():
+    parser = argparse.ArgumentParser("Micro benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    handles_parser = subparsers.add_parser("handles", help="Memory footprint of contract handles")
+    handles_parser.add_argument("--count", default=2000, type=int, help="Number of objects to create")
+    handles_parser.set_defaults(func=handles)
+
+    json_parser = subparsers.add_parser("json", help="JSON codec throughput on RPC responses")
+    json_parser.add_argument("--logs", default=10000, type=int, help="Logs in generated eth_getLogs response")
+    json_parser.add_argument("--rounds", default=5, type=int, help="Number of rounds")
+    json_parser.add_argument("payload", nargs="*", help="Recorded JSON-RPC responses, JSON or JSON lines")
+    json_parser.set_defaults(func=codecs)
+
+    rpc_parser = subparsers.add_parser("rpc", help="JSON-RPC request throughput of node, e.g. ./simulator.py")
+    rpc_parser.add_argument("--url", default="http://127.0.0.1:8545/", help="Node URL")
+    rpc_parser.add_argument("--method", default="eth_blockNumber", help="Method without parameters")
+    rpc_parser.add_argument("--requests", default=10000, type=int, help="Number of HTTP requests")
+    rpc_parser.add_argument("--batch", default=1, type=int, help="JSON-RPC requests per HTTP request")
+    rpc_parser.add_argument("--concurrency", default=64, type=int, help="Concurrent HTTP requests")
+    rpc_parser.set_defaults(func=rpc)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
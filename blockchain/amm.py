@@ -0,0 +1,36 @@
+"""
+Local constant product AMM math, same integer arithmetic as UniswapV2/PancakeSwap routers
+"""
+
+# Router fee is expressed as amount_in multiplier in parts per million, PancakeSwap V2 9975/10000 is 997500
+FEE_DENOMINATOR = 10**6
+
+# Router getAmountOut is called with these to find out router fee, see fee_from_calibration
+CALIBRATION_AMOUNT_IN = FEE_DENOMINATOR
+CALIBRATION_RESERVE = 10**60
+
+
+def get_amount_out(amount_in: int, reserve_in: int, reserve_out: int, fee: int) -> int:
+    if amount_in <= 0:
+        raise ValueError("Insufficient input amount")
+    if reserve_in <= 0 or reserve_out <= 0:
+        raise ValueError("Insufficient liquidity")
+    amount_in_with_fee = amount_in * fee
+    return (amount_in_with_fee * reserve_out) // (reserve_in * FEE_DENOMINATOR + amount_in_with_fee)
+
+
+def get_amount_in(amount_out: int, reserve_in: int, reserve_out: int, fee: int) -> int:
+    if amount_out <= 0:
+        raise ValueError("Insufficient output amount")
+    if reserve_in <= 0 or reserve_out <= amount_out:
+        raise ValueError("Insufficient liquidity")
+    return (reserve_in * amount_out * FEE_DENOMINATOR) // ((reserve_out - amount_out) * fee) + 1
+
+
+def fee_from_calibration(amount_out: int) -> int:
+    """
+    Router fee from getAmountOut(CALIBRATION_AMOUNT_IN, CALIBRATION_RESERVE, CALIBRATION_RESERVE) result
+
+    With huge reserves the result is one less than amount_in * fee / FEE_DENOMINATOR.
+    """
+    return amount_out + 1
@@ -0,0 +1,132 @@
+"""
+Integer fixed-point token amounts
+
+Amount keeps raw uint256 value and token decimals, arithmetic and comparisons are plain integer operations.
+Convert to Decimal only for display and I/O.
+"""
+
+from decimal import Decimal
+from functools import total_ordering
+from typing import Iterable, List, Union
+
+# Minimum decimals of fixed-point prices returned by price()
+PRICE_DECIMALS = 18
+# Significant digits of prices returned by price(), same as default Decimal context
+PRICE_PRECISION = 28
+
+_SCALES = [10 ** x for x in range(78)]
+
+
+def scale(decimals: int) -> int:
+    """
+    10 ** decimals, cached for all valid uint256 decimals
+    """
+    if 0 <= decimals < len(_SCALES):
+        return _SCALES[decimals]
+    return 10 ** decimals
+
+
+def to_decimal(raw: int, decimals: int) -> Decimal:
+    return Decimal(raw).scaleb(-decimals)
+
+
+def from_decimal(value: Union[Decimal, int, str], decimals: int) -> int:
+    return int(Decimal(value).scaleb(decimals))
+
+
+def to_decimals(raws: Iterable[int], decimals: int) -> List[Decimal]:
+    """
+    Convert many raw amounts of the same token
+    """
+    exponent = -decimals
+    return [Decimal(x).scaleb(exponent) for x in raws]
+
+
+def from_decimals(values: Iterable[Union[Decimal, int, str]], decimals: int) -> List[int]:
+    return [int(Decimal(x).scaleb(decimals)) for x in values]
+
+
+@total_ordering
+class Amount(object):
+    __slots__ = ("raw", "decimals")
+
+    def __init__(self, raw: int, decimals: int):
+        self.raw = raw
+        self.decimals = decimals
+
+    @classmethod
+    def from_decimal(cls, value: Union[Decimal, int, str], decimals: int) -> "Amount":
+        return cls(from_decimal(value, decimals), decimals)
+
+    def to_decimal(self) -> Decimal:
+        return to_decimal(self.raw, self.decimals)
+
+    def rescale(self, decimals: int) -> "Amount":
+        """
+        Same amount with other decimals, extra digits are truncated
+        """
+        if decimals >= self.decimals:
+            return Amount(self.raw * scale(decimals - self.decimals), decimals)
+        return Amount(self.raw // scale(self.decimals - decimals), decimals)
+
+    def _other_raw(self, other: "Amount") -> int:
+        if other.decimals == self.decimals:
+            return other.raw
+        return other.rescale(self.decimals).raw
+
+    def __eq__(self, other):
+        if not isinstance(other, Amount):
+            return NotImplemented
+        if other.decimals == self.decimals:
+            return self.raw == other.raw
+        # Compare exactly without truncation
+        return self.raw * scale(other.decimals) == other.raw * scale(self.decimals)
+
+    def __lt__(self, other):
+        if not isinstance(other, Amount):
+            return NotImplemented
+        if other.decimals == self.decimals:
+            return self.raw < other.raw
+        return self.raw * scale(other.decimals) < other.raw * scale(self.decimals)
+
+    def __hash__(self):
+        return hash(self.to_decimal())
+
+    def __add__(self, other: "Amount") -> "Amount":
+        return Amount(self.raw + self._other_raw(other), self.decimals)
+
+    def __sub__(self, other: "Amount") -> "Amount":
+        return Amount(self.raw - self._other_raw(other), self.decimals)
+
+    def __mul__(self, other: int) -> "Amount":
+        return Amount(self.raw * other, self.decimals)
+
+    def __floordiv__(self, other: int) -> "Amount":
+        return Amount(self.raw // other, self.decimals)
+
+    def __bool__(self):
+        return self.raw != 0
+
+    def __str__(self):
+        return str(self.to_decimal())
+
+    def __repr__(self):
+        return f"<Amount {self.raw} decimals={self.decimals}>"
+
+
+def price(amount_in: Amount, amount_out: Amount, decimals: int = None) -> Amount:
+    """
+    amount_out per one amount_in as fixed-point Amount, truncated to decimals
+
+    Default decimals keep at least PRICE_PRECISION significant digits also for tiny prices, but never less than
+    PRICE_DECIMALS decimals.
+    """
+    if amount_in.raw == 0:
+        raise ZeroDivisionError("Price of zero amount")
+    # int() keeps integer math exact also for amounts given as floats
+    numerator = int(amount_out.raw) * scale(amount_in.decimals)
+    denominator = int(amount_in.raw) * scale(amount_out.decimals)
+    if decimals is None:
+        magnitude = len(str(numerator)) - len(str(denominator))
+        decimals = max(PRICE_DECIMALS, PRICE_PRECISION - magnitude)
+    return Amount(numerator * scale(decimals) // denominator, decimals)
@@ -0,0 +1,173 @@
+"""
+Historical LP reserve backfill
+
+Reserves are read with AsyncLPContract.get_reserves(block_id=...) and appended to columnar binary files, one
+directory per pair:
+
+    block       uint64 little-endian
+    timestamp   uint32 little-endian, getReserves blockTimestampLast
+    reserve0    uint128 little-endian (reserves are uint112)
+    reserve1    uint128 little-endian
+
+Columns can be read with read_columns or e.g. numpy.fromfile(path, dtype="<u8") for block column.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiologger
+from web3.exceptions import BadFunctionCallOutput
+
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.contract import AsyncLPContract
+
+
+logger = aiologger.Logger.with_default_handlers(name=__name__, level=logging.INFO)
+
+COLUMNS = {
+    "block": 8,
+    "timestamp": 4,
+    "reserve0": 16,
+    "reserve1": 16,
+}
+
+
+class ReserveColumns(object):
+    """
+    Append-only column files of single pair
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.rows = self._repair()
+
+    def _column_path(self, column: str) -> str:
+        return os.path.join(self.path, column)
+
+    def _repair(self) -> int:
+        """
+        Truncate columns to the number of complete rows, crashed run might have written only some columns
+        """
+        rows = None
+        for column, width in COLUMNS.items():
+            column_path = self._column_path(column)
+            size = os.path.getsize(column_path) if os.path.exists(column_path) else 0
+            column_rows = size // width
+            if rows is None or column_rows < rows:
+                rows = column_rows
+        for column, width in COLUMNS.items():
+            with open(self._column_path(column), 'ab') as f:
+                f.truncate(rows * width)
+        return rows
+
+    def last_block(self) -> Optional[int]:
+        if not self.rows:
+            return None
+        with open(self._column_path("block"), 'rb') as f:
+            f.seek((self.rows - 1) * COLUMNS["block"])
+            return int.from_bytes(f.read(COLUMNS["block"]), 'little')
+
+    def append(self, rows: Iterable[Tuple[int, int, int, int]]):
+        """
+        Append (block, reserve0, reserve1, timestamp) rows
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        data = {column: bytearray() for column in COLUMNS}
+        for block, reserve0, reserve1, timestamp in rows:
+            data["block"] += block.to_bytes(COLUMNS["block"], 'little')
+            data["timestamp"] += timestamp.to_bytes(COLUMNS["timestamp"], 'little')
+            data["reserve0"] += reserve0.to_bytes(COLUMNS["reserve0"], 'little')
+            data["reserve1"] += reserve1.to_bytes(COLUMNS["reserve1"], 'little')
+        for column, value in data.items():
+            with open(self._column_path(column), 'ab') as f:
+                f.write(value)
+        self.rows += len(rows)
+
+
+def read_columns(path: str) -> Dict[str, List[int]]:
+    """
+    Read pair columns written by ReserveBackfill
+    """
+    columns = ReserveColumns(path)
+    result = {}
+    for column, width in COLUMNS.items():
+        with open(columns._column_path(column), 'rb') as f:
+            data = f.read(columns.rows * width)
+        if column == "block":
+            values = array('Q')
+            values.frombytes(data)
+        elif column == "timestamp":
+            values = array('I')
+            values.frombytes(data)
+        else:
+            values = [int.from_bytes(data[i:i + width], 'little') for i in range(0, len(data), width)]
+        if isinstance(values, array) and sys.byteorder != 'little':
+            values.byteswap()
+        result[column] = values
+    return result
+
+
+class ReserveBackfill(object):
+
+    def __init__(
+            self,
+            client: AsyncClient,
+            output: str,
+            concurrency: int = 50,
+            retries: int = 5,
+            retry_delay: float = 0.5,
+            chunk_size: int = 1000,
+    ):
+        self.client = client
+        self.output = output
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.chunk_size = chunk_size
+        self._query_sem = asyncio.Semaphore(concurrency)
+
+    async def _get_reserves(self, lp: AsyncLPContract, block: int) -> Optional[Tuple[int, int, int, int]]:
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._query_sem:
+                    reserve0, reserve1, timestamp = await lp.get_reserves(block_id=block)
+                return block, reserve0, reserve1, timestamp
+            except BadFunctionCallOutput:
+                # Pair not deployed yet at this block
+                return None
+            except Exception as exc:
+                if attempt >= self.retries:
+                    raise
+                await logger.warning(f"Failed to get {lp.address} reserves at {block}, retrying: {exc}")
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+    async def backfill_pair(self, address: str, start_block: int, end_block: int, step: int = 1):
+        """
+        Fetch reserves of the pair for blocks start_block..end_block (inclusive), continue after last stored block
+        """
+        columns = ReserveColumns(os.path.join(self.output, address))
+        last_block = columns.last_block()
+        if last_block is not None and last_block >= start_block:
+            start_block = last_block + step
+        lp = await self.client.get_lp_contract(address)
+        blocks = range(start_block, end_block + 1, step)
+        await logger.info(f"Backfilling {address} {len(blocks)} blocks from {start_block}")
+
+        # Chunks are written in order so that stored blocks are always contiguous prefix of the range
+        for start in range(0, len(blocks), self.chunk_size):
+            chunk = blocks[start:start + self.chunk_size]
+            rows = await asyncio.gather(*[self._get_reserves(lp, block) for block in chunk])
+            columns.append(x for x in rows if x is not None)
+        return columns.rows
+
+    async def backfill(self, addresses: List[str], start_block: int, end_block: int, step: int = 1):
+        return await asyncio.gather(*[
+            self.backfill_pair(address, start_block=start_block, end_block=end_block, step=step)
+            for address in addresses
+        ])
@@ -0,0 +1,64 @@
+"""
+Async cassette provider, see blockchain.cassette
+"""
+
+import asyncio
+import time
+from typing import Any, List, Tuple
+
+from web3.providers.async_base import AsyncBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from blockchain.cassette import CassetteProviderMixin, get_cassette, get_latency
+
+
+class AsyncCassetteProvider(CassetteProviderMixin, AsyncBaseProvider):
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if self.recording:
+            start = time.perf_counter()
+            response = await self.provider.make_request(method, params)
+            self.cassette.record(method, params, response, time.perf_counter() - start)
+            return response
+        response, duration = self.cassette.replay(method, params)
+        delay = self.replay_delay(duration)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return response
+
+    async def make_batch_request(self, requests: List[Tuple[RPCEndpoint, Any]]) -> List[RPCResponse]:
+        """
+        Batch requests are recorded as separate exchanges, every one with duration of whole batch
+        """
+        if self.recording:
+            start = time.perf_counter()
+            responses = await self.provider.make_batch_request(requests)
+            duration = time.perf_counter() - start
+            for (method, params), response in zip(requests, responses):
+                self.cassette.record(method, params, response, duration)
+            return responses
+        replayed = [self.cassette.replay(method, params) for method, params in requests]
+        delay = max((self.replay_delay(duration) for _, duration in replayed), default=0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return [response for response, _ in replayed]
+
+    async def warm_up(self, connections: int = 4) -> int:
+        if self.recording and hasattr(self.provider, "warm_up"):
+            return await self.provider.warm_up(connections)
+        return connections
+
+    async def close(self):
+        if hasattr(self.provider, "close"):
+            await self.provider.close()
+
+
+def wrap_async_provider(provider: AsyncBaseProvider) -> AsyncBaseProvider:
+    """
+    Wrap provider with AsyncCassetteProvider if BLOCKCHAIN_CASSETTE is set
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return provider
+    latency, latency_scale = get_latency()
+    return AsyncCassetteProvider(cassette, provider, latency=latency, latency_scale=latency_scale)
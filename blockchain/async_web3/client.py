@@ -1,7 +1,8 @@
 import asyncio
 import concurrent.futures
 import logging
-from typing import Callable, Union
+import time
+from typing import Callable, Union, Optional, List, Tuple, Dict
 
 from eth_account import Account
 from eth_account.datastructures import SignedTransaction
@@ -17,11 +18,14 @@ from web3.net import AsyncNet
 from web3.providers import BaseProvider
 from web3.types import TxReceipt, _Hash32
 
-from blockchain import networks
-from blockchain.async_web3.contract import AsyncToken, AsyncLPContract
+from blockchain import networks, utils
+from blockchain.client import Preflight, is_already_known_error
+from blockchain.async_web3.cassette import wrap_async_provider
+from blockchain.async_web3.contract import AsyncToken, AsyncLPContract, call_contract_function
 from blockchain.async_web3.middleware import async_geth_poa_middleware
 from blockchain.async_web3.rpc import PooledAsyncHTTPProvider
 from blockchain.exceptions import BlockchainException
+from blockchain.signing import SigningExecutor
 
 import aiologger
 
@@ -77,6 +81,16 @@ class CustomAsyncEth(AsyncEth):
         mungers=[default_root_munger]
     )
 
+    new_pending_transaction_filter: Method[Callable[[], HexStr]] = Method(
+        RPC.eth_newPendingTransactionFilter,
+        mungers=None,
+    )
+
+    get_filter_changes: Method[Callable[[HexStr], List[HexBytes]]] = Method(
+        RPC.eth_getFilterChanges,
+        mungers=[default_root_munger]
+    )
+
 
 def get_provider(address: str) -> Web3:
     if address.startswith("http"):
@@ -85,7 +99,7 @@ def get_provider(address: str) -> Web3:
                 request_kwargs={'timeout': 60}
             )
         return Web3(
-            connector,
+            wrap_async_provider(connector),
             modules={
                 'eth': (CustomAsyncEth,),
                 'net': (AsyncNet,),
@@ -105,7 +119,13 @@ class AsyncClient(object):
             test_mode: bool = True,
             thread_limit: int = 20,
             default_gas: int = 1,
+            broadcast_providers: List[str] = None,
+            signing_processes: int = None,
+            connections: int = 4,
     ):
+        """
+        :param connections: number of connections opened to each endpoint by warm_up()
+        """
         if not network:
             network = networks.get_network_by_name(networks.BINANCE)
         self.network = network
@@ -115,11 +135,21 @@ class AsyncClient(object):
         self.private_key = private_key
         self.test_mode = test_mode
         self._nonce = None
+        self._token_cache = utils.Cache(max_size=512)
         # For blocking calls
         self._sync_pool = concurrent.futures.ThreadPoolExecutor(max_workers=thread_limit)
         self._query_limit_sem = asyncio.Semaphore(thread_limit)
         self._nonce_lock = asyncio.Lock()
         self.default_gas = default_gas
+        if broadcast_providers is None:
+            broadcast_providers = network.broadcast_providers
+        self.broadcast_providers = broadcast_providers
+        self._broadcast_w3 = None
+        # Keep references to broadcasts still running after first acknowledgement
+        self._broadcast_tasks = set()
+        self.signing_processes = signing_processes
+        self._signing_executor: Optional[SigningExecutor] = None
+        self.connections = connections
 
     async def call_async(self, function, *args):
         async with self._query_limit_sem:
@@ -166,6 +196,7 @@ class AsyncClient(object):
             gas_estimate: int = None,
             gas_price: int = None,
             nonce: int = None,
+            value: int = None,
     ) -> SignedTransaction:
         """
         Sign transaction
@@ -190,27 +221,128 @@ class AsyncClient(object):
             'gasPrice': gas_price,
             'nonce': nonce,
         })
+        if value is not None:
+            tx_to_sign["value"] = value
         if self.chain_id is None:
             del tx_to_sign["chainId"]
         await logger.debug(f"Transaction to sign {tx_to_sign}")
         signed = Account().sign_transaction(tx_to_sign, self.private_key)
         return signed
 
-    async def sign_raw_transaction(
+    async def _reserve_nonce(self, nonce: int) -> int:
+        """
+        Reserve nonce fetched earlier, atomically with get_and_update_nonce
+        """
+        async with self._nonce_lock:
+            if self._nonce is None or nonce > self._nonce:
+                self._nonce = nonce
+            nonce = self._nonce
+            self._update_nonce()
+        return nonce
+
+    async def preflight(
             self,
-            value,
-            gas_estimate,
-            data=None,
-            to=None,
-            gas_price=5,
+            tx,
+            gas_estimate: int = None,
+            gas_price: int = None,
             nonce: int = None,
-    ):
+            token: AsyncToken = None,
+            spender=None,
+            amount: int = None,
+            value: int = None,
+            spends_allowance: bool = True,
+    ) -> Preflight:
         """
-        Sign raw transaction
+        Run eth_call, gas estimation, gas price, nonce and optional token balance and allowance
+        lookups concurrently. See blockchain.client.Client.preflight
+
+        gas_price in gwei
+        """
+        call_params = {"from": self.public_key}
+        if value is not None:
+            call_params["value"] = value
+        coroutines = {"call_result": self.test_transaction(tx, value=value)}
+        if gas_estimate is None:
+            coroutines["gas_estimate"] = tx.estimateGas(dict(call_params))
+        if not gas_price:
+            coroutines["gas_price"] = self.get_gas_price()
+        else:
+            gas_price = self.w3.toWei(gas_price, 'gwei')
+        if nonce is None:
+            coroutines["nonce"] = self.get_nonce()
+        if token is not None:
+            coroutines["balance"] = token.balanceOf(self.public_key)
+            if spender is not None:
+                coroutines["allowance"] = token.allowance(self.public_key, spender.address)
+
+        gathered = await asyncio.gather(*coroutines.values(), return_exceptions=True)
+        results = {}
+        errors = {}
+        for key, result in zip(coroutines.keys(), gathered):
+            if isinstance(result, Exception):
+                errors[key] = result
+            else:
+                results[key] = result
+
+        preflight = Preflight(
+            tx=tx,
+            gas_estimate=results.get("gas_estimate", gas_estimate),
+            gas_price=results.get("gas_price", gas_price),
+            nonce=results.get("nonce", nonce),
+            call_result=results.get("call_result"),
+            balance=results.get("balance"),
+            allowance=results.get("allowance"),
+            amount=amount,
+            fixed_nonce=nonce is not None,
+        )
+
+        for key in ["gas_price", "nonce", "balance", "allowance", "call_result", "gas_estimate"]:
+            if key not in errors:
+                continue
+            if key in ["call_result", "gas_estimate"] and spends_allowance and preflight.needs_approval:
+                await logger.debug(f"Ignoring {key} failure, allowance not approved yet: {errors[key]}")
+                continue
+            if key in ["call_result", "gas_estimate"] and not preflight.has_balance:
+                # Caller reports missing balance, transaction reverts for the same reason
+                await logger.debug(f"Ignoring {key} failure, balance less than amount: {errors[key]}")
+                continue
+            raise errors[key]
+
+        if not preflight.gas_price:
+            raise BlockchainException("Failed to generate gas price")
+        return preflight
+
+    async def sign_preflight(self, preflight: Preflight, value: Optional[int] = None) -> SignedTransaction:
+        """
+        Sign transaction prepared by preflight, nonce is reserved only when signing
+        """
+        if preflight.gas_estimate is None:
+            raise BlockchainException("Preflight has no gas estimate, approve allowance first")
+        if preflight.gas_price > self.w3.toWei("10000", 'gwei'):
+            raise BlockchainException("Way too big gas_price")
+        nonce = preflight.nonce
+        if not preflight.fixed_nonce:
+            nonce = await self._reserve_nonce(nonce)
+        tx_to_sign = preflight.tx.buildTransaction({
+            'chainId': self.chain_id,
+            'gas': preflight.gas_estimate,
+            'gasPrice': preflight.gas_price,
+            'nonce': nonce,
+        })
+        if value is not None:
+            tx_to_sign["value"] = value
+        if self.chain_id is None:
+            del tx_to_sign["chainId"]
+        await logger.debug(f"Transaction to sign {tx_to_sign}")
+        signed = Account().sign_transaction(tx_to_sign, self.private_key)
+        return signed
+
+    def raw_transaction(self, value, gas_estimate, nonce, data=None, to=None, gas_price=5) -> Dict:
+        """
+        Build raw transaction dict ready to be signed
+
+        gas_price in gwei
         """
-        if not nonce:
-            # TODO: this will cause problems if we don't send transaction
-            nonce = await self.get_and_update_nonce()
         tx_to_sign = {
             'gas': gas_estimate,
             'gasPrice': self.w3.toWei(gas_price, 'gwei'),
@@ -223,10 +355,41 @@ class AsyncClient(object):
             tx_to_sign["to"] = to
         if self.chain_id is not None:
             tx_to_sign["chainId"] = self.chain_id
+        return tx_to_sign
+
+    async def sign_raw_transaction(
+            self,
+            value,
+            gas_estimate,
+            data=None,
+            to=None,
+            gas_price=5,
+            nonce: int = None,
+    ):
+        """
+        Sign raw transaction
+        """
+        if not nonce:
+            # TODO: this will cause problems if we don't send transaction
+            nonce = await self.get_and_update_nonce()
+        tx_to_sign = self.raw_transaction(
+            value=value, gas_estimate=gas_estimate, nonce=nonce, data=data, to=to, gas_price=gas_price
+        )
         await logger.debug(f"Transaction to sign {tx_to_sign}")
         signed = self.w3.eth.account.sign_transaction(tx_to_sign, self.private_key)
         return signed
 
+    def get_signing_executor(self) -> SigningExecutor:
+        if not self._signing_executor:
+            self._signing_executor = SigningExecutor(self.private_key, max_workers=self.signing_processes)
+        return self._signing_executor
+
+    async def sign_transactions(self, transactions: List[Dict]) -> List[SignedTransaction]:
+        """
+        Sign batch of transaction dicts in process pool without blocking event loop, see raw_transaction
+        """
+        return await self.get_signing_executor().async_sign_transactions(transactions)
+
     async def send_transaction(self, tx):
         """
         Send signed transaction
@@ -236,12 +399,98 @@ class AsyncClient(object):
         if self.test_mode:
             await logger.warning("Not actually sending transaction, disable test mode first")
             return
-        hash = await self.w3.eth.send_raw_transaction(tx)
+        if self.broadcast_providers:
+            hash = await self.broadcast_transaction(tx)
+        else:
+            hash = await self.w3.eth.send_raw_transaction(tx.rawTransaction)
         await logger.info("Transaction hash: {}".format(hash.hex()))
         return hash.hex()
 
-    async def test_transaction(self, tx):
-        return await tx.call({'from': self.public_key})
+    def _get_broadcast_w3(self) -> List[Tuple[str, Web3]]:
+        if self._broadcast_w3 is None:
+            self._broadcast_w3 = [(address, get_provider(address)) for address in self.broadcast_providers]
+        return self._broadcast_w3
+
+    def _get_providers(self) -> List[Tuple[str, PooledAsyncHTTPProvider]]:
+        providers = [(self.network.provider, self.w3.provider)]
+        providers.extend((address, w3.provider) for address, w3 in self._get_broadcast_w3())
+        return [(address, provider) for address, provider in providers if hasattr(provider, "warm_up")]
+
+    async def warm_up(self):
+        """
+        Open connections to provider and broadcast providers before first requests
+        """
+        providers = self._get_providers()
+        opened = await asyncio.gather(*[provider.warm_up(self.connections) for _, provider in providers])
+        for (address, _), count in zip(providers, opened):
+            await logger.info(f"Opened {count} connections to {address}")
+
+    async def close(self):
+        if self._signing_executor is not None:
+            self._signing_executor.close()
+            self._signing_executor = None
+        await asyncio.gather(*[provider.close() for _, provider in self._get_providers()])
+
+    async def _send_raw_transaction_to(self, endpoint: str, w3: Web3, raw_transaction: bytes, tx_hash: str):
+        start = time.monotonic()
+        try:
+            await w3.eth.send_raw_transaction(raw_transaction)
+        except Exception as exc:
+            latency = (time.monotonic() - start) * 1000
+            if is_already_known_error(exc):
+                await logger.info(f"Endpoint {endpoint} already knows transaction {tx_hash} ({latency:.1f} ms)")
+                return
+            await logger.warning(f"Endpoint {endpoint} rejected transaction {tx_hash} ({latency:.1f} ms): {exc}")
+            raise
+        latency = (time.monotonic() - start) * 1000
+        await logger.info(f"Endpoint {endpoint} accepted transaction {tx_hash} ({latency:.1f} ms)")
+
+    def _broadcast_done(self, task: asyncio.Future):
+        self._broadcast_tasks.discard(task)
+        if not task.cancelled():
+            # Failures are already logged, retrieve exception so it isn't reported as unhandled
+            task.exception()
+
+    async def broadcast_transaction(self, tx):
+        """
+        Send signed transaction to provider and all broadcast providers in parallel
+        :param tx: tx to send
+        :return: hash after first endpoint acknowledged the transaction
+        """
+        tx_hash = tx.hash.hex()
+        endpoints = [(self.network.provider, self.w3)] + self._get_broadcast_w3()
+        tasks = []
+        for endpoint, w3 in endpoints:
+            task = asyncio.ensure_future(self._send_raw_transaction_to(endpoint, w3, tx.rawTransaction, tx_hash))
+            self._broadcast_tasks.add(task)
+            task.add_done_callback(self._broadcast_done)
+            tasks.append(task)
+        error = None
+        # Rest of the endpoints keep sending in background, they only log the result
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                await next_done
+                return tx.hash
+            except Exception as exc:
+                if error is None:
+                    error = exc
+        raise error
+
+    async def test_transaction(self, tx, value: int = None):
+        transaction = {'from': self.public_key, 'to': tx.address}
+        if value is not None:
+            transaction['value'] = value
+        return await call_contract_function(
+            web3=self.w3,
+            address=tx.address,
+            normalizers=tuple(),
+            function_identifier=tx.function_identifier,
+            transaction=transaction,
+            contract_abi=tx.contract_abi,
+            fn_abi=tx.abi,
+            fn_args=tx.args,
+            fn_kwargs=tx.kwargs,
+        )
 
     async def wait_transaction_success(self, tx_hash, timeout=180):
         if self.test_mode:
@@ -268,7 +517,54 @@ class AsyncClient(object):
 
     async def get_token(self, token_address: str) -> AsyncToken:
         # TODO: Check token exists?
-        return await AsyncToken.create(self.w3, token_address)
+        return await self._token_cache.async_get_or_load(
+            token_address,
+            lambda: AsyncToken.create(self.w3, token_address),
+        )
 
     async def get_lp_contract(self, contract_address: str) -> AsyncLPContract:
         return await AsyncLPContract.create(self.w3, contract_address)
+
+    async def get_wrapped_native_token(self) -> AsyncToken:
+        return await AsyncToken.create(self.w3, self.network.wrapped_native_token, abi_file="wrapped_token")
+
+    async def approve_tx(
+            self,
+            token: AsyncToken,
+            spender,
+            amount: int,
+            approve_amount: int = None,
+    ):
+        allowance = await token.allowance(self.public_key, spender.address)
+        if allowance < amount:
+            if approve_amount is None or approve_amount < amount:
+                approve_amount = amount
+            return await token.approve(spender=spender.address, amount=approve_amount)
+        return None
+
+    async def approve(
+            self,
+            token: AsyncToken,
+            spender,
+            amount: int,
+            approve_amount: int = None,
+            gas_price: int = None,
+            gas_estimate: int = None,
+    ):
+        if approve_amount is None or approve_amount < amount:
+            approve_amount = amount
+        # Build approve speculatively so allowance is fetched together with the rest of preflight
+        tx = await token.approve(spender=spender.address, amount=approve_amount)
+        preflight = await self.preflight(
+            tx,
+            gas_price=gas_price,
+            gas_estimate=gas_estimate,
+            token=token,
+            spender=spender,
+            amount=amount,
+            spends_allowance=False,
+        )
+        if not preflight.needs_approval:
+            return None
+        signed_tx = await self.sign_preflight(preflight)
+        return await self.send_transaction(signed_tx)
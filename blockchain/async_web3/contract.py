@@ -5,12 +5,13 @@ Proof of concept asyncio contract support
 import itertools
 import json
 import os
-from decimal import Decimal
 from typing import Union, Tuple, Callable, Any, Optional
 
 import aiofiles
+import cachetools
 from eth_abi.exceptions import DecodingError
 from eth_typing import ChecksumAddress
+from eth_utils import to_canonical_address
 from web3 import Web3
 from web3._utils.abi import get_abi_output_types, map_abi_data
 from web3._utils.contracts import prepare_transaction, find_matching_fn_abi
@@ -19,6 +20,10 @@ from web3.contract import Contract, ContractFunction, ACCEPTABLE_EMPTY_STRINGS
 from web3.exceptions import BadFunctionCallOutput
 from web3.types import TxParams, FunctionIdentifier, BlockIdentifier, ABI, ABIFunction, CallOverrideParams
 
+from blockchain import amount as amount_utils
+from blockchain.contract import checksum_address
+from blockchain.snapshot import call_key, current_snapshot
+
 package_path = os.path.dirname(os.path.abspath(__file__))
 
 
@@ -28,9 +33,30 @@ async def async_read_abi_file(filename):
     return json.loads(content)
 
 
+_abi_cache = {}
+
+
 async def async_get_abi(name):
-    abi_file = os.path.join(package_path, f"../contracts/{name}.json")
-    return await async_read_abi_file(abi_file)
+    if name not in _abi_cache:
+        abi_file = os.path.join(package_path, f"../contracts/{name}.json")
+        _abi_cache[name] = await async_read_abi_file(abi_file)
+    return _abi_cache[name]
+
+
+_factory_cache = cachetools.LRUCache(maxsize=64)
+
+
+def get_contract_factory(w3, abi):
+    """
+    Contract factory shared by all contracts with same web3 instance and ABI
+    """
+    key = (id(w3), id(abi))
+    cached = _factory_cache.get(key)
+    if cached and cached[0] is w3 and cached[1] is abi:
+        return cached[2]
+    factory = Contract.factory(web3=w3, abi=abi)
+    _factory_cache[key] = (w3, abi, factory)
+    return factory
 
 
 async def call_contract_function(
@@ -104,29 +130,65 @@ async def call_contract_function(
 
 
 class AsyncContract(object):
+    """
+    Contract handle, see blockchain.contract.Contract
+    """
+    __slots__ = ("w3", "_address", "abi", "_name", "_contract_factory", "_contract")
 
     def __init__(self, w3, address, abi, name=None, contract_factory=None):
         self.w3 = w3
-        self.address = address
+        self._address = to_canonical_address(address)
         self.abi = abi
         self._name = name
 
         if not contract_factory:
-            self._contract_factory = Contract.factory(web3=self.w3, abi=abi)
+            self._contract_factory = get_contract_factory(w3, abi)
         else:
             self._contract_factory = contract_factory
-        self.contract = self._contract_factory(address=self.address)
+        self._contract = None
+
+    @property
+    def address(self) -> ChecksumAddress:
+        return checksum_address(self._address)
+
+    @property
+    def contract(self):
+        if self._contract is None:
+            self._contract = self._contract_factory(address=self.address)
+        return self._contract
+
+    def function(self, name, *args) -> ContractFunction:
+        """
+        Create contract function without creating whole contract
+        """
+        function = getattr(self._contract_factory.functions, name)(*args)
+        function.address = self.address
+        return function
 
     async def call_function(self, function: ContractFunction, tx_kwargs=None, block_id=None):
+        """
+        Call contract function, inside snapshot context call is pinned to snapshot block and memoized
+        """
+        snapshot = current_snapshot()
+        if snapshot is None or block_id is not None:
+            return await self._call_function(function, tx_kwargs=tx_kwargs, block_id=block_id)
+        key = call_key(self._address, function.fn_name, function.args, function.kwargs, tx_kwargs)
+        return await snapshot.async_call(
+            key,
+            lambda: self._call_function(function, tx_kwargs=tx_kwargs, block_id=snapshot.block_number),
+        )
+
+    async def _call_function(self, function: ContractFunction, tx_kwargs=None, block_id=None):
         tx: TxParams = {}
         if not tx_kwargs:
             tx_kwargs = {}
         tx.update(tx_kwargs)
         # tx["data"] = function._encode_transaction_data()
-        tx["to"] = self.address
+        address = self.address
+        tx["to"] = address
         return await call_contract_function(
             web3=self.w3,
-            address=self.address,
+            address=address,
             transaction=tx,
             normalizers=tuple(),
             function_identifier=function.function_identifier,
@@ -149,9 +211,10 @@ class AsyncContract(object):
 
 
 class AsyncLPContract(AsyncContract):
+    __slots__ = ("_token0", "_token1", "_factory")
+
     def __init__(self, w3, address, abi, contract_factory=None):
         super().__init__(w3, address, abi=abi, name=None, contract_factory=contract_factory)
-        self._name = None
         self._token0 = None
         self._token1 = None
         self._factory = None
@@ -163,26 +226,26 @@ class AsyncLPContract(AsyncContract):
 
     async def name(self, block_id=None):
         if not self._name:
-            self._name = await self.call_function(self.contract.functions.name(), block_id=block_id)
+            self._name = await self.call_function(self.function("name"), block_id=block_id)
         return self._name
 
     async def token0(self, block_id=None):
-        if not self._token0:
-            self._token0 = await self.call_function(self.contract.functions.token0(), block_id=block_id)
-        return self._token0
+        if self._token0 is None:
+            self._token0 = to_canonical_address(await self.call_function(self.function("token0"), block_id=block_id))
+        return checksum_address(self._token0)
 
     async def token1(self, block_id=None):
-        if not self._token1:
-            self._token1 = await self.call_function(self.contract.functions.token1(), block_id=block_id)
-        return self._token1
+        if self._token1 is None:
+            self._token1 = to_canonical_address(await self.call_function(self.function("token1"), block_id=block_id))
+        return checksum_address(self._token1)
 
     async def get_reserves(self, block_id=None):
-        return await self.call_function(self.contract.functions.getReserves(), block_id=block_id)
+        return await self.call_function(self.function("getReserves"), block_id=block_id)
 
     async def factory(self, block_id=None):
-        if not self._factory:
-            self._factory = await self.call_function(self.contract.functions.factory(), block_id=block_id)
-        return self._factory
+        if self._factory is None:
+            self._factory = to_canonical_address(await self.call_function(self.function("factory"), block_id=block_id))
+        return checksum_address(self._factory)
 
     def __str__(self):
         return f"<LPContract {self._name}>"
@@ -192,6 +255,8 @@ class AsyncLPContract(AsyncContract):
 
 
 class AsyncToken(AsyncContract):
+    __slots__ = ("_symbol", "_decimals")
+
     def __init__(self, w3, address, abi, contract_factory=None):
         super().__init__(w3, address, abi=abi, name=None, contract_factory=contract_factory)
         self._symbol = None
@@ -205,46 +270,50 @@ class AsyncToken(AsyncContract):
 
     async def symbol(self):
         if not self._symbol:
-            self._symbol = await self.call_function(self.contract.functions.symbol())
+            self._symbol = await self.call_function(self.function("symbol"))
         return self._symbol
 
     async def decimals(self) -> int:
         if self._decimals is None:
-            self._decimals = await self.call_function(self.contract.functions.decimals())
+            self._decimals = await self.call_function(self.function("decimals"))
         return self._decimals
 
     async def balanceOf(self, address, block_id=None):
-        return await self.call_function(self.contract.functions.balanceOf(address), block_id=block_id)
+        return await self.call_function(self.function("balanceOf", address), block_id=block_id)
 
     async def balanceOfDecimal(self, address, block_id=None):
-        divider = Decimal("10") ** await self.decimals()
         raw_balance = await self.balanceOf(address, block_id=block_id)
-        return Decimal(raw_balance) / divider
+        return await self.toDecimals(raw_balance)
 
     async def totalSupply(self):
-        divider = Decimal("10") ** await self.decimals()
-        return Decimal(await self.call_function(self.contract.functions.totalSupply())) / divider
+        return await self.toDecimals(await self.call_function(self.function("totalSupply")))
 
     async def approve(self, spender, amount=0xffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffff):
-        return self.contract.functions.approve(spender, amount)
+        return self.function("approve", spender, amount)
 
     async def allowance(self, owner, spender):
-        return await self.call_function(self.contract.functions.allowance(owner, spender))
+        return await self.call_function(self.function("allowance", owner, spender))
 
     async def toDecimals(self, amount):
         """
         Convert uint256 presentation to decimal number
         """
-        return Decimal(amount) / Decimal(10 ** await self.decimals())
+        decimals = self._decimals if self._decimals is not None else await self.decimals()
+        return amount_utils.to_decimal(amount, decimals)
 
     async def fromDecimals(self, amount):
         """
         Convert Decimal number to uint256
         """
-        return int(Decimal(amount) * Decimal(10 ** await self.decimals()))
+        decimals = self._decimals if self._decimals is not None else await self.decimals()
+        return amount_utils.from_decimal(amount, decimals)
+
+    async def amount(self, raw: int) -> amount_utils.Amount:
+        decimals = self._decimals if self._decimals is not None else await self.decimals()
+        return amount_utils.Amount(raw, decimals)
 
     async def withdraw(self, amount):
-        return self.contract.functions.withdraw(amount)
+        return self.function("withdraw", amount)
 
     def __str__(self):
         return f"<Contract {self._name}({self._symbol}) {self.address}>"
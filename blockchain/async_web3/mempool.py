@@ -0,0 +1,78 @@
+"""
+Pending router swap stream
+
+Pending transaction hashes are polled from eth_newPendingTransactionFilter, transactions are fetched concurrently
+and swap calls are decoded with SwapDecoder.
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional
+
+import aiohttp
+import aiologger
+from web3.exceptions import TransactionNotFound
+
+from blockchain.async_web3.client import AsyncClient
+from blockchain.swap_decoder import SwapDecoder, SwapIntent
+
+
+logger = aiologger.Logger.with_default_handlers(name=__name__, level=logging.INFO)
+
+
+class PendingSwapStream(object):
+
+    def __init__(
+            self,
+            client: AsyncClient,
+            decoder: SwapDecoder = None,
+            poll_interval: float = 0.2,
+            concurrency: int = 100,
+    ):
+        if decoder is None:
+            decoder = SwapDecoder(routers=client.network.routers.values())
+        self.client = client
+        self.decoder = decoder
+        self.poll_interval = poll_interval
+        self._query_sem = asyncio.Semaphore(concurrency)
+
+    async def _get_transaction(self, tx_hash) -> Optional[Dict]:
+        try:
+            async with self._query_sem:
+                return await self.client.w3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            # Already mined or dropped
+            return None
+
+    async def pending_transactions(self) -> AsyncIterator[List[Dict]]:
+        """
+        Yield batches of new pending transactions until cancelled
+        """
+        filter_id = await self.client.w3.eth.new_pending_transaction_filter()
+        while True:
+            try:
+                tx_hashes = await self.client.w3.eth.get_filter_changes(filter_id)
+            except (asyncio.TimeoutError, aiohttp.ClientError) as exc:
+                await logger.warning(f"Failed to get pending transactions: {exc}")
+                tx_hashes = []
+            if tx_hashes:
+                transactions = await asyncio.gather(
+                    *[self._get_transaction(x) for x in tx_hashes],
+                    return_exceptions=True,
+                )
+                yield [x for x in transactions if x is not None and not isinstance(x, BaseException)]
+            else:
+                await asyncio.sleep(self.poll_interval)
+
+    async def swaps(self, transactions: AsyncIterable[List[Dict]] = None) -> AsyncIterator[SwapIntent]:
+        """
+        Yield decoded swaps from batches of transactions, default is pending transactions of the node
+        """
+        if transactions is None:
+            transactions = self.pending_transactions()
+        decode_transaction = self.decoder.decode_transaction
+        async for batch in transactions:
+            for tx in batch:
+                intent = decode_transaction(tx)
+                if intent is not None:
+                    yield intent
@@ -0,0 +1,126 @@
+"""
+Factory pair discovery
+
+Enumerates allPairs of router factories with concurrent reads into PairDatabase and keeps it up to date
+from PairCreated events.
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+import aiologger
+from eth_utils import encode_hex, event_abi_to_log_topic
+
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.contract import AsyncLPContract
+from blockchain.async_web3.router_client import AsyncRouterClient, FactoryContract
+from blockchain.pair_index import PairDatabase
+
+
+logger = aiologger.Logger.with_default_handlers(name=__name__, level=logging.INFO)
+
+
+class PairIndexer(object):
+
+    def __init__(
+            self,
+            client: AsyncClient,
+            database: PairDatabase,
+            batch_size: int = 500,
+            concurrency: int = 50,
+            log_block_range: int = 5000,
+    ):
+        self.client = client
+        self.database = database
+        self.batch_size = batch_size
+        self.log_block_range = log_block_range
+        self._query_sem = asyncio.Semaphore(concurrency)
+
+    async def _call(self, contract, function):
+        async with self._query_sem:
+            return await contract.call_function(function)
+
+    async def _get_pair(self, factory: FactoryContract, index: int) -> Tuple[int, str, str, str]:
+        address = await self._call(factory, factory.contract.functions.allPairs(index))
+        lp = AsyncLPContract(self.client.w3, address, abi=factory.lp_abi, contract_factory=factory.lp_factory)
+        token0, token1 = await asyncio.gather(
+            self._call(lp, lp.contract.functions.token0()),
+            self._call(lp, lp.contract.functions.token1()),
+        )
+        return index, address, token0, token1
+
+    async def index_factory(self, factory: FactoryContract):
+        """
+        Enumerate all pairs of the factory, already indexed pairs are skipped
+        """
+        await factory.get_lp_factory()
+        # Events after this block are read by update_factory
+        block = await self.client.w3.eth.block_number
+        pairs_length = await self._call(factory, factory.contract.functions.allPairsLength())
+        indexed = self.database.indexed_pairs(factory.address)
+        missing = [x for x in range(pairs_length) if x not in indexed]
+        await logger.info(f"Factory {factory.address} has {pairs_length} pairs, {len(missing)} not indexed")
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            pairs = await asyncio.gather(*[self._get_pair(factory, index) for index in batch])
+            self.database.add_pairs(factory.address, pairs)
+            await logger.info(f"Factory {factory.address} indexed {start + len(batch)}/{len(missing)} pairs")
+
+        state = self.database.get_factory_state(factory.address)
+        if state is not None and state[1] > block:
+            block = state[1]
+        self.database.set_factory_state(factory.address, pairs_length=pairs_length, last_block=block)
+
+    async def update_factory(self, factory: FactoryContract, to_block: Optional[int] = None) -> int:
+        """
+        Add pairs from PairCreated events since last indexed block, return number of new pairs
+        """
+        state = self.database.get_factory_state(factory.address)
+        if state is None:
+            raise RuntimeError(f"Factory {factory.address} not indexed yet")
+        pairs_length, last_block = state
+        if to_block is None:
+            to_block = await self.client.w3.eth.block_number
+        event = factory.contract.events.PairCreated()
+        topic = encode_hex(event_abi_to_log_topic(event.abi))
+        new_pairs = 0
+        from_block = last_block + 1
+        while from_block <= to_block:
+            end_block = min(from_block + self.log_block_range - 1, to_block)
+            async with self._query_sem:
+                logs = await self.client.w3.eth.get_logs({
+                    "address": factory.address,
+                    "fromBlock": from_block,
+                    "toBlock": end_block,
+                    "topics": [topic],
+                })
+            pairs = []
+            for log in logs:
+                args = event.processLog(log)["args"]
+                # Unnamed last argument is allPairs length after the pair was created
+                pairs.append((args[""] - 1, args["pair"], args["token0"], args["token1"]))
+            if pairs:
+                self.database.add_pairs(factory.address, pairs)
+                pairs_length = max(pairs_length, max(x[0] for x in pairs) + 1)
+                new_pairs += len(pairs)
+            self.database.set_factory_state(factory.address, pairs_length=pairs_length, last_block=end_block)
+            from_block = end_block + 1
+        return new_pairs
+
+    async def index_routers(self, routers: List[AsyncRouterClient]):
+        factories = await asyncio.gather(*[router.get_factory() for router in routers])
+        await asyncio.gather(*[self.index_factory(factory) for factory in factories])
+
+    async def follow(self, routers: List[AsyncRouterClient], poll_interval: float = 3):
+        """
+        Keep database up to date with new pairs until cancelled
+        """
+        factories = await asyncio.gather(*[router.get_factory() for router in routers])
+        while True:
+            to_block = await self.client.w3.eth.block_number
+            counts = await asyncio.gather(*[self.update_factory(factory, to_block=to_block) for factory in factories])
+            if sum(counts):
+                await logger.info(f"Indexed {sum(counts)} new pairs up to block {to_block}")
+            await asyncio.sleep(poll_interval)
@@ -0,0 +1,164 @@
+"""
+Local price feed
+
+PriceFeedService computes prices of configured pairs once per new block and publishes them to any number of
+local subscribers over Unix socket. Each update is single JSON line:
+
+    {"block": 123, "prices": [["<router>", "<token0>", "<token1>", "<reference token>", "<price>"], ...]}
+
+Failed quotes have null price.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from decimal import Decimal
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiologger
+
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.router_client import AsyncRouterClient, get_async_router
+from blockchain.snapshot import async_snapshot
+
+
+logger = aiologger.Logger.with_default_handlers(name=__name__, level=logging.INFO)
+
+
+class PriceFeedPair(object):
+    def __init__(self, router: str, token0: str, token1: str, amount: Decimal = Decimal("1")):
+        self.router = router
+        self.token0 = token0
+        self.token1 = token1
+        self.amount = amount
+
+    def __str__(self):
+        return f"<PriceFeedPair {self.router} {self.token0} {self.token1}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class PriceFeedService(object):
+
+    def __init__(
+            self,
+            client: AsyncClient,
+            pairs: List[PriceFeedPair],
+            socket_path: str,
+            poll_interval: float = 0.5,
+            subscriber_queue_size: int = 16,
+    ):
+        self.client = client
+        self.pairs = pairs
+        self.socket_path = socket_path
+        self.poll_interval = poll_interval
+        self.subscriber_queue_size = subscriber_queue_size
+        self._routers: Dict[str, AsyncRouterClient] = {}
+        self._subscribers: List[asyncio.Queue] = []
+        self._last_update: Optional[bytes] = None
+        self._server = None
+
+    async def _get_router(self, address: str) -> AsyncRouterClient:
+        if address not in self._routers:
+            self._routers[address] = await get_async_router(
+                client=self.client,
+                contract_address=address,
+                abi_file="PancakeRouterV2"
+            )
+        return self._routers[address]
+
+    async def _get_price(self, pair: PriceFeedPair):
+        try:
+            router = await self._get_router(pair.router)
+            token0, token1 = await asyncio.gather(
+                self.client.get_token(pair.token0),
+                self.client.get_token(pair.token1),
+            )
+            reference_token = token0
+            if token1.address in self.client.network.tokens.values():
+                reference_token = token1
+            amount_in = await token0.fromDecimals(pair.amount)
+            price = await router.get_price(
+                token0=token0, token1=token1, reference_token=reference_token, amount_in=amount_in
+            )
+            return [pair.router, pair.token0, pair.token1, reference_token.address, str(price)]
+        except Exception as exc:
+            # Drained pool, bad contract or failed request of one pair doesn't suppress others
+            await logger.warning(f"Failed to get price of {pair}: {exc!r}")
+            return [pair.router, pair.token0, pair.token1, None, None]
+
+    async def update(self, block: int) -> bytes:
+        # Prices are read at block they are published with
+        async with async_snapshot(block_number=block):
+            prices = await asyncio.gather(*[self._get_price(pair) for pair in self.pairs])
+        message = json.dumps({"block": block, "prices": prices}, separators=(',', ':')).encode() + b"\n"
+        self._last_update = message
+        self.publish(message)
+        return message
+
+    def publish(self, message: bytes):
+        for queue in self._subscribers:
+            if queue.full():
+                # Slow subscriber, drop oldest update instead of blocking everyone else
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    async def _handle_subscriber(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        queue = asyncio.Queue(maxsize=self.subscriber_queue_size)
+        if self._last_update:
+            queue.put_nowait(self._last_update)
+        self._subscribers.append(queue)
+        try:
+            while True:
+                writer.write(await queue.get())
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._subscribers.remove(queue)
+            writer.close()
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_subscriber, path=self.socket_path)
+        await logger.info(f"Price feed listening on {self.socket_path}")
+
+    async def run(self):
+        """
+        Publish prices on every new block until cancelled
+        """
+        await self.start()
+        last_block = None
+        try:
+            while True:
+                try:
+                    block = await self.client.w3.eth.block_number
+                    if block != last_block:
+                        await self.update(block)
+                        last_block = block
+                except Exception as exc:
+                    await logger.warning(f"Failed to update prices: {exc!r}")
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            self._server.close()
+            await self._server.wait_closed()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+async def subscribe(socket_path: str) -> AsyncIterator[Dict]:
+    """
+    Yield price updates published by PriceFeedService
+    """
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            yield json.loads(line)
+    finally:
+        writer.close()
@@ -0,0 +1,209 @@
+"""
+Multi-process price monitor
+
+PriceMonitor runs one worker process per network or per shard of network pairs. Workers update reserves and
+prices of their pairs on every new block to shared memory PriceTable, consumers attach to the table by name and
+read rows without IPC.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+import aiologger
+
+from blockchain import networks
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.price_feed import PriceFeedPair
+from blockchain.async_web3.router_client import AsyncRouterClient, get_async_router
+from blockchain.exceptions import BlockchainException
+from blockchain.price_table import PriceKey, PriceTable
+from blockchain.snapshot import async_snapshot
+
+
+logger = aiologger.Logger.with_default_handlers(name=__name__, level=logging.INFO)
+# Supervisor runs outside event loop
+supervisor_logger = logging.getLogger(__name__)
+
+
+class PriceTableWriter(object):
+    """
+    Update table rows of pairs of one network on every new block
+    """
+
+    def __init__(
+            self,
+            client: AsyncClient,
+            table: PriceTable,
+            pairs: List[Tuple[int, PriceFeedPair]],
+            poll_interval: float = 0.5,
+    ):
+        self.client = client
+        self.table = table
+        self.pairs = pairs
+        self.poll_interval = poll_interval
+        self._routers: Dict[str, AsyncRouterClient] = {}
+
+    async def _get_router(self, address: str) -> AsyncRouterClient:
+        if address not in self._routers:
+            self._routers[address] = await get_async_router(
+                client=self.client,
+                contract_address=address,
+                abi_file="PancakeRouterV2"
+            )
+        return self._routers[address]
+
+    async def _update_pair(self, block: int, index: int, pair: PriceFeedPair):
+        try:
+            router = await self._get_router(pair.router)
+            token0, token1 = await asyncio.gather(
+                self.client.get_token(pair.token0),
+                self.client.get_token(pair.token1),
+            )
+            reference_token = token0
+            if token1.address in self.client.network.tokens.values():
+                reference_token = token1
+            amount_in = await token0.fromDecimals(pair.amount)
+            (reserve0, reserve1, _), price = await asyncio.gather(
+                router.get_reserves(token0, token1),
+                router.get_price(token0=token0, token1=token1, reference_token=reference_token, amount_in=amount_in),
+            )
+        except (BlockchainException, ValueError) as exc:
+            await logger.warning(f"Failed to get price of {pair}: {exc}")
+            return
+        self.table.write(index, block, reserve0, reserve1, float(price))
+
+    async def update(self, block: int):
+        # Reserves are read once per pair and block
+        async with async_snapshot(block_number=block):
+            await asyncio.gather(*[self._update_pair(block, index, pair) for index, pair in self.pairs])
+
+    async def run(self):
+        last_block = None
+        while True:
+            try:
+                block = await self.client.w3.eth.block_number
+                if block != last_block:
+                    await self.update(block)
+                    last_block = block
+            except (asyncio.TimeoutError, aiohttp.ClientError) as exc:
+                await logger.warning(f"Failed to update prices: {exc}")
+            await asyncio.sleep(self.poll_interval)
+
+
+async def _run_writer(network_name: str, table: PriceTable, pairs: List[Tuple[int, PriceFeedPair]],
+                      poll_interval: float):
+    client = AsyncClient(
+        public_key=networks.binance.BURN,
+        private_key="",
+        network=networks.get_network_by_name(network_name),
+    )
+    await client.warm_up()
+    try:
+        await PriceTableWriter(client, table, pairs, poll_interval=poll_interval).run()
+    finally:
+        await client.close()
+
+
+def run_worker(network_name: str, table_name: str, pairs: List[Tuple[int, PriceFeedPair]], poll_interval: float):
+    """
+    Worker process entry point
+    """
+    table = PriceTable.attach(table_name, rows=[x[0] for x in pairs])
+    try:
+        asyncio.run(_run_writer(network_name, table, pairs, poll_interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        table.close()
+
+
+class PriceMonitor(object):
+    """
+    Supervisor of price table worker processes
+    """
+
+    def __init__(
+            self,
+            pairs: Dict[str, List[PriceFeedPair]],
+            shards: int = 1,
+            poll_interval: float = 0.5,
+            table_name: Optional[str] = None,
+    ):
+        """
+        :param pairs: pairs by network name
+        :param shards: worker processes per network
+        """
+        self.poll_interval = poll_interval
+        self.table_name = table_name
+        # Worker arguments, (network, [(row index, pair)])
+        self.assignments: List[Tuple[str, List[Tuple[int, PriceFeedPair]]]] = []
+        self.keys: List[PriceKey] = []
+        for network_name, network_pairs in pairs.items():
+            rows = []
+            for pair in network_pairs:
+                rows.append((len(self.keys), pair))
+                self.keys.append(PriceKey(network_name, pair.router, pair.token0, pair.token1))
+            shard_count = max(1, min(shards, len(rows)))
+            for shard in range(shard_count):
+                self.assignments.append((network_name, rows[shard::shard_count]))
+        self.table: Optional[PriceTable] = None
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * len(self.assignments)
+
+    def _start_worker(self, index: int):
+        network_name, rows = self.assignments[index]
+        process = self._context.Process(
+            target=run_worker,
+            args=(network_name, self.table.name, rows, self.poll_interval),
+            name=f"price-monitor-{network_name}-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+
+    def start(self) -> PriceTable:
+        self.table = PriceTable.create(self.keys, name=self.table_name)
+        for index in range(len(self.assignments)):
+            self._start_worker(index)
+        return self.table
+
+    def check(self) -> int:
+        """
+        Restart exited workers, returns number of restarted workers
+        """
+        restarted = 0
+        for index, process in enumerate(self._processes):
+            if process is not None and not process.is_alive():
+                supervisor_logger.warning(f"Worker {process.name} exited with code {process.exitcode}, restarting")
+                self._start_worker(index)
+                restarted += 1
+        return restarted
+
+    def run(self, check_interval: float = 5):
+        """
+        Supervise workers until interrupted
+        """
+        if self.table is None:
+            self.start()
+        try:
+            while True:
+                time.sleep(check_interval)
+                self.check()
+        finally:
+            self.stop()
+
+    def stop(self):
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            if process is not None:
+                process.join()
+        self._processes = [None] * len(self.assignments)
+        if self.table is not None:
+            self.table.close()
+            self.table = None
@@ -1,24 +1,27 @@
 import asyncio
-import time
 from decimal import Decimal
 from typing import Dict, Optional, List
 
 from web3.contract import Contract
 
 from blockchain import utils
+from blockchain.amount import Amount, price
 from blockchain.async_web3.client import AsyncClient
 from blockchain.async_web3.contract import AsyncToken, async_get_abi, AsyncContract, AsyncLPContract
-from blockchain.exceptions import NotFoundException, ContractLogicError
+from blockchain.cassette import current_time
+from blockchain.exceptions import NotFoundException, ContractLogicError, BlockchainException
+from blockchain.pair_index import PairDatabase
 
 import web3.exceptions
 
 
 class FactoryContract(AsyncContract):
-    def __init__(self, client: AsyncClient, contract_address: str, abi: Dict):
+    def __init__(self, client: AsyncClient, contract_address: str, abi: Dict, pair_database: PairDatabase = None):
         super().__init__(w3=client.w3, address=contract_address, abi=abi)
         self.client = client
         self.lp_abi = None
         self.lp_factory = None
+        self.pair_database = pair_database
 
     async def get_lp_factory(self):
         if not self.lp_abi:
@@ -29,7 +32,15 @@ class FactoryContract(AsyncContract):
 
     async def get_lp(self, token0: AsyncToken, token1: AsyncToken) -> AsyncLPContract:
         await self.get_lp_factory()
-        address = await self.call_function(self.contract.functions.getPair(token0.address, token1.address))
+        address = None
+        indexed = self.pair_database is not None and self.pair_database.is_complete(self.address)
+        if indexed:
+            address = self.pair_database.get_pair(self.address, token0.address, token1.address)
+        if not address:
+            # Pairs created after last indexed block are not in database yet
+            address = await self.call_function(self.contract.functions.getPair(token0.address, token1.address))
+            if indexed and address and address != '0x0000000000000000000000000000000000000000':
+                self.pair_database.add_pair(self.address, address, token0.address, token1.address)
         if not address or address == '0x0000000000000000000000000000000000000000':
             raise NotFoundException(f"Pair not found for tokens {token0} {token1}")
         return await AsyncLPContract.create(w3=self.w3, address=address, contract_factory=self.lp_factory)
@@ -50,12 +61,20 @@ class AsyncRouterClient(AsyncContract):
     Add Router Swap functions
     """
 
-    def __init__(self, client: AsyncClient, contract_address: str, abi: Dict, max_cache_size: int = 100):
+    def __init__(
+            self,
+            client: AsyncClient,
+            contract_address: str,
+            abi: Dict,
+            max_cache_size: int = 100,
+            pair_database: PairDatabase = None,
+    ):
         super().__init__(w3=client.w3, address=contract_address, abi=abi)
         self.client = client
+        self.pair_database = pair_database
         self._factory: Optional[FactoryContract] = None
         if max_cache_size > 0:
-            self._lp_cache = utils.LRUDict(max_size=max_cache_size)
+            self._lp_cache = utils.Cache(max_size=max_cache_size)
         else:
             self._lp_cache = None
         self.max_cache_size = max_cache_size
@@ -66,20 +85,32 @@ class AsyncRouterClient(AsyncContract):
             self._factory = FactoryContract(
                 client=self.client,
                 contract_address=address,
-                abi=await async_get_abi("PancakeV2Factory")  # TODO: Get correct ABI
+                abi=await async_get_abi("PancakeV2Factory"),  # TODO: Get correct ABI
+                pair_database=self.pair_database,
             )
         return self._factory
 
+    async def _get_lp(self, token0: AsyncToken, token1: AsyncToken) -> AsyncLPContract:
+        contract_factory = await self.get_factory()
+        return await contract_factory.get_lp(token0=token0, token1=token1)
+
     async def get_lp(self, token0: AsyncToken, token1: AsyncToken) -> AsyncLPContract:
-        if self.max_cache_size == 0 or (token0.address, token1.address) not in self._lp_cache:
-            contract_factory = await self.get_factory()
-            lp = await contract_factory.get_lp(
-                token0=token0, token1=token1
-            )
-            if self.max_cache_size == 0:
-                return lp
-            self._lp_cache[(token0.address, token1.address)] = lp
-        return self._lp_cache[(token0.address, token1.address)]
+        if self._lp_cache is None:
+            return await self._get_lp(token0, token1)
+        return await self._lp_cache.async_get_or_load(
+            (token0.address, token1.address),
+            lambda: self._get_lp(token0, token1),
+        )
+
+    async def find_paths(self, token_from: AsyncToken, token_to: AsyncToken, max_hops: int = 3) -> List[List[str]]:
+        """
+        Find swap paths as token address lists from pair database
+        """
+        if not self.pair_database:
+            raise BlockchainException("Path finding requires pair database")
+        factory = await self.get_factory()
+        return self.pair_database.find_paths(factory.address, token_from.address, token_to.address,
+                                             max_hops=max_hops)
 
     async def get_amount_out(self, token0: AsyncToken, token1: AsyncToken, amount_in: int) -> int:
         lp = await self.get_lp(token0, token1)
@@ -114,6 +145,29 @@ class AsyncRouterClient(AsyncContract):
         else:
             return reserves[1], reserves[0], reserves[2]
 
+    async def get_price_amount(
+            self,
+            token0: AsyncToken,
+            token1: AsyncToken,
+            reference_token: AsyncToken,
+            amount_in: int
+    ) -> Amount:
+        """
+        Price in reference_token as fixed-point Amount, use this for comparisons
+        """
+        if reference_token != token0 and reference_token != token1:
+            raise ValueError("reference_token is neither token0 nor token1")
+        amount_out, token0_decimals, token1_decimals = await asyncio.gather(
+            self.get_amount_out(token0=token0, token1=token1, amount_in=amount_in),
+            token0.decimals(),
+            token1.decimals(),
+        )
+        token0_amount = Amount(amount_in, token0_decimals)
+        token1_amount = Amount(amount_out, token1_decimals)
+        if reference_token == token0:
+            return price(token1_amount, token0_amount)
+        return price(token0_amount, token1_amount)
+
     async def get_price(
             self,
             token0: AsyncToken,
@@ -121,17 +175,10 @@ class AsyncRouterClient(AsyncContract):
             reference_token: AsyncToken,
             amount_in: int
     ) -> Decimal:
-        amount_out = await self.get_amount_out(token0=token0, token1=token1, amount_in=amount_in)
-        token0_decimals, token1_decimals = await asyncio.gather(
-            token0.toDecimals(amount_in),
-            token1.toDecimals(amount_out)
+        amount = await self.get_price_amount(
+            token0=token0, token1=token1, reference_token=reference_token, amount_in=amount_in
         )
-        if reference_token == token0:
-            return token0_decimals / token1_decimals
-        elif reference_token == token1:
-            return token1_decimals / token0_decimals
-        else:
-            raise ValueError("reference_token is neither token0 nor token1")
+        return amount.to_decimal()
 
     def __str__(self):
         return f"<RouterContract {self._name} {self.address}>"
@@ -159,7 +206,7 @@ class AsyncRouterClient(AsyncContract):
             if len(token_pair) == 2:
                 lp = await self.get_lp(token_pair[0], token_pair[1])
                 lp_pairs.append(lp)
-        deadline = int(time.time() + timeout)
+        deadline = int(current_time(self.client.w3) + timeout)
         tx = self.contract.functions.swapExactTokensForTokensSupportingFeeOnTransferTokens(
             amount_in,
             amount_out_min,
@@ -184,16 +231,17 @@ class AsyncRouterClient(AsyncContract):
 
         await self.client.test_transaction(tx)
 
-        signed_tx = self.client.sign_transaction(tx, gas_price=gas_price, gas_estimate=gas_estimate)
+        signed_tx = await self.client.sign_transaction(tx, gas_price=gas_price, gas_estimate=gas_estimate)
 
         sent_tx = await self.client.send_transaction(signed_tx)
 
         return sent_tx
 
 
-async def get_async_router(client, contract_address, abi_file):
+async def get_async_router(client, contract_address, abi_file, pair_database: PairDatabase = None):
     return AsyncRouterClient(
         client=client,
         contract_address=contract_address,
         abi=await async_get_abi(abi_file),
+        pair_database=pair_database,
     )
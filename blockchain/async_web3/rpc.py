@@ -1,4 +1,5 @@
-from typing import Optional, Any, Dict
+import asyncio
+from typing import Optional, Any, Dict, List, Tuple
 
 import aiohttp
 from eth_typing import URI
@@ -6,33 +7,85 @@ from web3 import AsyncHTTPProvider
 from web3._utils.http import construct_user_agent
 from web3.types import RPCEndpoint, RPCResponse
 
+from blockchain.json_codec import JSONCodec, JSONCodecMixin
+
+# Connection pool defaults for long lived sessions
+DEFAULT_CONNECTION_LIMIT = 100
+DEFAULT_KEEPALIVE_TIMEOUT = 60
+DEFAULT_DNS_CACHE_TTL = 300
+
+# Cheap method supported by all nodes, used to open connections
+WARM_UP_METHOD = RPCEndpoint("web3_clientVersion")
+
 
 async def async_make_post_request(
-    endpoint_uri: URI, data: bytes, *args: Any, connector: aiohttp.TCPConnector,  **kwargs: Any
+    endpoint_uri: URI, data: bytes, *args: Any, session: aiohttp.ClientSession, **kwargs: Any
 ) -> bytes:
     kwargs.setdefault('timeout', aiohttp.ClientTimeout(10))
-    async with aiohttp.ClientSession(
-            connector=connector,
-            raise_for_status=True,
-            connector_owner=False
-    ) as session:
-        async with session.post(endpoint_uri,
-                                data=data,
-                                *args,
-                                **kwargs) as response:
-            return await response.read()
-
-
-class PooledAsyncHTTPProvider(AsyncHTTPProvider):
+    async with session.post(endpoint_uri,
+                            data=data,
+                            *args,
+                            **kwargs) as response:
+        return await response.read()
+
+
+class PooledAsyncHTTPProvider(JSONCodecMixin, AsyncHTTPProvider):
     """
     Pooled version of AsyncHTTPProvider
+
+    One session and connection pool is kept open for provider lifetime, use warm_up() to open connections before
+    first requests and close() to close them.
     """
 
-    def __init__(self, *args, connector_kwargs: Optional[Any] = None, **kwargs):
+    def __init__(
+            self,
+            *args,
+            connector_kwargs: Optional[Any] = None,
+            connection_limit: int = DEFAULT_CONNECTION_LIMIT,
+            keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+            dns_cache_ttl: Optional[int] = DEFAULT_DNS_CACHE_TTL,
+            json_codec: Optional[JSONCodec] = None,
+            **kwargs
+    ):
         super().__init__(*args, **kwargs)
-        if not connector_kwargs:
-            connector_kwargs = {}
+        self._json_codec = json_codec
+        connector_kwargs = dict(connector_kwargs or {})
+        connector_kwargs.setdefault("limit", connection_limit)
+        connector_kwargs.setdefault("keepalive_timeout", keepalive_timeout)
+        connector_kwargs.setdefault("ttl_dns_cache", dns_cache_ttl)
         self._connector = aiohttp.TCPConnector(**connector_kwargs)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=self._connector,
+                raise_for_status=True,
+                connector_owner=False,
+            )
+        return self._session
+
+    async def warm_up(self, connections: int = 4) -> int:
+        """
+        Open connections concurrently so that TLS handshakes are done before first real requests
+
+        Returns number of connections opened successfully, failures are only logged.
+        """
+        connections = min(connections, self._connector.limit or connections)
+        results = await asyncio.gather(
+            *[self.make_request(WARM_UP_METHOD, []) for _ in range(connections)],
+            return_exceptions=True,
+        )
+        failed = [x for x in results if isinstance(x, Exception)]
+        if failed:
+            self.logger.warning("Failed to open %s/%s connections to %s: %s",
+                                len(failed), connections, self.endpoint_uri, failed[0])
+        return connections - len(failed)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+        await self._connector.close()
 
     def get_request_headers(self) -> Dict[str, str]:
         return {
@@ -49,7 +102,7 @@ class PooledAsyncHTTPProvider(AsyncHTTPProvider):
         raw_response = await async_make_post_request(
             self.endpoint_uri,
             request_data,
-            connector=self._connector,
+            session=self.get_session(),
             **self.get_request_kwargs()
         )
         response = self.decode_rpc_response(raw_response)
@@ -58,6 +111,36 @@ class PooledAsyncHTTPProvider(AsyncHTTPProvider):
                           self.endpoint_uri, method, response)
         return response
 
+    async def make_batch_request(self, requests: List[Tuple[RPCEndpoint, Any]]) -> List[RPCResponse]:
+        """
+        Send requests as single JSON-RPC batch, responses are returned in request order
+
+        Responses are not processed by middlewares or result formatters.
+        """
+        request_ids = []
+        batch = []
+        for method, params in requests:
+            request = self.rpc_request(method, params)
+            request_ids.append(request["id"])
+            batch.append(request)
+        self.logger.debug("Making batch request HTTP. URI: %s, Requests: %s", self.endpoint_uri, len(batch))
+
+        raw_response = await async_make_post_request(
+            self.endpoint_uri,
+            self.json_codec.dumps(batch),
+            session=self.get_session(),
+            **self.get_request_kwargs()
+        )
+        responses = self.decode_rpc_response(raw_response)
+        if not isinstance(responses, list):
+            # Whole batch failed, e.g. batches are not supported
+            raise ValueError(responses.get("error", responses))
+        responses_by_id = {x.get("id"): x for x in responses}
+        return [
+            responses_by_id.get(x, {"id": x, "error": {"code": -32603, "message": "Missing batch response"}})
+            for x in request_ids
+        ]
+
     def __del__(self):
         if self._connector.closed is False:
             self._connector.close()
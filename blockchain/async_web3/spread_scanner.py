@@ -0,0 +1,241 @@
+"""
+Cross-router spread scanner
+
+Reserves of every scanned LP are loaded once and kept up to date from Sync events, all quotes are calculated
+locally with router fee found out once per router. Per block only one eth_getLogs call is needed.
+"""
+
+import asyncio
+import logging
+from decimal import Decimal
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import aiologger
+import web3.exceptions
+from eth_utils import encode_hex, keccak
+
+from blockchain import amm
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.contract import AsyncLPContract, AsyncToken
+from blockchain.async_web3.router_client import AsyncRouterClient
+from blockchain.exceptions import BlockchainException, NotFoundException
+
+
+logger = aiologger.Logger.with_default_handlers(name=__name__, level=logging.INFO)
+
+SYNC_TOPIC = encode_hex(keccak(text="Sync(uint112,uint112)"))
+
+
+class ReserveCache(object):
+    """
+    LP reserves kept up to date from Sync events
+    """
+
+    def __init__(self, client: AsyncClient, max_log_range: int = 100, concurrency: int = 50):
+        self.client = client
+        self.max_log_range = max_log_range
+        self.reserves: Dict[str, Tuple[int, int]] = {}
+        self.token0: Dict[str, str] = {}
+        self.block: Optional[int] = None
+        self._query_sem = asyncio.Semaphore(concurrency)
+
+    async def _load(self, lp: AsyncLPContract, block: int):
+        async with self._query_sem:
+            reserve0, reserve1, timestamp = await lp.get_reserves(block_id=block)
+            self.token0[lp.address] = await lp.token0()
+        self.reserves[lp.address] = (reserve0, reserve1)
+
+    async def load(self, lps: List[AsyncLPContract], block: int):
+        await asyncio.gather(*[self._load(lp, block) for lp in lps])
+        self.block = block
+
+    async def update(self, lps: List[AsyncLPContract], block: int):
+        """
+        Apply Sync events up to block, reload everything if too many blocks were missed
+        """
+        if self.block is None or block - self.block > self.max_log_range:
+            await self.load(lps, block)
+            return
+        if block <= self.block:
+            return
+        if not self.reserves:
+            # Empty address list is no filter at all for nodes
+            self.block = block
+            return
+        logs = await self.client.w3.eth.get_logs({
+            "fromBlock": self.block + 1,
+            "toBlock": block,
+            "address": list(self.reserves.keys()),
+            "topics": [SYNC_TOPIC],
+        })
+        for log in logs:
+            if log["address"] not in self.reserves:
+                continue
+            data = log["data"]
+            if isinstance(data, str):
+                data = bytes.fromhex(data[2:])
+            self.reserves[log["address"]] = (int.from_bytes(data[:32], 'big'), int.from_bytes(data[32:64], 'big'))
+        self.block = block
+
+    def get_reserves(self, lp_address: str, token_in: str) -> Tuple[int, int]:
+        """
+        Return (reserve_in, reserve_out) of LP for swap from token_in
+        """
+        reserve0, reserve1 = self.reserves[lp_address]
+        if self.token0[lp_address] == token_in:
+            return reserve0, reserve1
+        return reserve1, reserve0
+
+
+class SpreadOpportunity(object):
+    """
+    Buy token1 with amount_in of token0 in buy_router and sell it back to token0 in sell_router
+    """
+
+    def __init__(self, block: int, token0: str, token1: str, buy_router: str, sell_router: str, amount_in: int,
+                 amount_out: int):
+        self.block = block
+        self.token0 = token0
+        self.token1 = token1
+        self.buy_router = buy_router
+        self.sell_router = sell_router
+        self.amount_in = amount_in
+        self.amount_out = amount_out
+
+    @property
+    def spread(self) -> Decimal:
+        """
+        Round trip profit in percent
+        """
+        return Decimal(self.amount_out - self.amount_in) * 100 / Decimal(self.amount_in)
+
+    def __str__(self):
+        return f"<SpreadOpportunity {self.block} {self.token0}/{self.token1} buy {self.buy_router} " \
+               f"sell {self.sell_router} {self.spread:.4f}%>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class SpreadScanner(object):
+
+    def __init__(
+            self,
+            client: AsyncClient,
+            routers: Dict[str, AsyncRouterClient],
+            pairs: List[Tuple[str, str, int]],
+            threshold: Decimal = Decimal("0.5"),
+            poll_interval: float = 0.5,
+    ):
+        """
+        :param routers: name -> router
+        :param pairs: (token0, token1, raw amount of token0) to scan
+        :param threshold: minimum round trip profit in percent
+        """
+        self.client = client
+        self.routers = routers
+        self.pairs = pairs
+        self.threshold = threshold
+        # Threshold as parts per million of amount_in, so scan compares integers only
+        self._threshold_ppm = int(threshold * 10**4)
+        self.poll_interval = poll_interval
+        self.reserve_cache = ReserveCache(client)
+        self.fees: Dict[str, int] = {}
+        # (token0, token1) -> [(router name, lp address)]
+        self.pools: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+        self._lps: List[AsyncLPContract] = []
+
+    async def _get_fee(self, name: str, router: AsyncRouterClient):
+        try:
+            amount_out = await router.call_function(router.contract.functions.getAmountOut(
+                amm.CALIBRATION_AMOUNT_IN, amm.CALIBRATION_RESERVE, amm.CALIBRATION_RESERVE
+            ))
+        except (web3.exceptions.ContractLogicError, web3.exceptions.ValidationError, ValueError) as exc:
+            await logger.warning(f"Router {name} getAmountOut is not compatible, skipping: {exc}")
+            return
+        self.fees[name] = amm.fee_from_calibration(amount_out)
+
+    async def _get_lp(self, name: str, router: AsyncRouterClient, token0: AsyncToken, token1: AsyncToken):
+        try:
+            return name, await router.get_lp(token0, token1)
+        except (NotFoundException, BlockchainException):
+            return name, None
+
+    async def setup(self):
+        """
+        Find router fees and LP pairs of all scanned tokens
+        """
+        await asyncio.gather(*[self._get_fee(name, router) for name, router in self.routers.items()])
+        lps = {}
+        pairs = []
+        for token0_address, token1_address, amount in self.pairs:
+            token0, token1 = await asyncio.gather(
+                self.client.get_token(token0_address),
+                self.client.get_token(token1_address),
+            )
+            results = await asyncio.gather(*[
+                self._get_lp(name, self.routers[name], token0, token1) for name in self.fees.keys()
+            ])
+            self.pools[(token0.address, token1.address)] = [(name, lp.address) for name, lp in results if lp]
+            for name, lp in results:
+                if lp:
+                    lps[lp.address] = lp
+            pairs.append((token0.address, token1.address, amount))
+        # Checksum addresses to match LP token0 results
+        self.pairs = pairs
+        self._lps = list(lps.values())
+        await logger.info(f"Scanning {len(self.pairs)} pairs in {len(self._lps)} LPs of {len(self.fees)} routers")
+
+    def _quote(self, router_name: str, lp_address: str, token_in: str, amount_in: int) -> int:
+        reserve_in, reserve_out = self.reserve_cache.get_reserves(lp_address, token_in)
+        return amm.get_amount_out(amount_in, reserve_in, reserve_out, self.fees[router_name])
+
+    def scan(self, block: int) -> List[SpreadOpportunity]:
+        """
+        Find round trips over threshold from cached reserves
+        """
+        opportunities = []
+        for token0, token1, amount_in in self.pairs:
+            pools = self.pools.get((token0, token1), [])
+            if len(pools) < 2:
+                continue
+            bought = {}
+            for name, lp_address in pools:
+                try:
+                    bought[name] = self._quote(name, lp_address, token0, amount_in)
+                except ValueError:
+                    continue
+            best = None
+            for buy_name, amount_bought in bought.items():
+                if not amount_bought:
+                    continue
+                for sell_name, lp_address in pools:
+                    if sell_name == buy_name:
+                        continue
+                    try:
+                        amount_out = self._quote(sell_name, lp_address, token1, amount_bought)
+                    except ValueError:
+                        continue
+                    if best is None or amount_out > best.amount_out:
+                        best = SpreadOpportunity(block, token0, token1, buy_name, sell_name, amount_in, amount_out)
+            if best is not None and (best.amount_out - amount_in) * 10**6 >= amount_in * self._threshold_ppm:
+                opportunities.append(best)
+        return opportunities
+
+    async def scan_block(self, block: int) -> List[SpreadOpportunity]:
+        await self.reserve_cache.update(self._lps, block)
+        return self.scan(block)
+
+    async def run(self) -> AsyncIterator[SpreadOpportunity]:
+        """
+        Yield opportunities of every new block until cancelled
+        """
+        await self.setup()
+        last_block = None
+        while True:
+            block = await self.client.w3.eth.block_number
+            if block != last_block:
+                for opportunity in await self.scan_block(block):
+                    yield opportunity
+                last_block = block
+            await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,87 @@
+"""
+Contract storage dump
+
+Slots are read in JSON-RPC batches with several batches in flight, all at the same block.
+"""
+
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Iterable, List, Tuple, Union
+
+from eth_utils import keccak
+from hexbytes import HexBytes
+
+from blockchain.async_web3.client import AsyncClient
+
+
+def encode_key(key: Union[int, str, bytes]) -> bytes:
+    """
+    Encode mapping key to 32 bytes
+
+    Integers are uint256, hex strings and bytes are left padded, so addresses and bytes32 keys work as is.
+    """
+    if isinstance(key, str):
+        key = bytes.fromhex(key[2:]) if key.startswith("0x") else int(key)
+    if isinstance(key, int):
+        return key.to_bytes(32, 'big')
+    if len(key) > 32:
+        raise ValueError(f"Mapping key too long, {len(key)} bytes")
+    return key.rjust(32, b"\0")
+
+
+def mapping_slot(slot: int, key: Union[int, str, bytes]) -> int:
+    """
+    Storage slot of Solidity mapping value at slot for key
+    """
+    return int.from_bytes(keccak(encode_key(key) + slot.to_bytes(32, 'big')), 'big')
+
+
+class StorageReader(object):
+
+    def __init__(self, client: AsyncClient, batch_size: int = 100, concurrency: int = 10):
+        if batch_size <= 0:
+            raise ValueError("Invalid batch size")
+        self.client = client
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    async def _read_batch(self, address: str, slots: List[int], block: int) -> List[Tuple[int, HexBytes]]:
+        provider = self.client.w3.provider
+        if not hasattr(provider, "make_batch_request"):
+            values = await asyncio.gather(*[
+                self.client.w3.eth.get_storage_at(address, slot, block_identifier=block) for slot in slots
+            ])
+            return list(zip(slots, values))
+        responses = await provider.make_batch_request([
+            ("eth_getStorageAt", [address, hex(slot), hex(block)]) for slot in slots
+        ])
+        values = []
+        for slot, response in zip(slots, responses):
+            if "error" in response:
+                raise ValueError(response["error"])
+            values.append((slot, HexBytes(response["result"])))
+        return values
+
+    async def read_slots(self, address: str, slots: Iterable[int], block: int) -> AsyncIterator[Tuple[int, HexBytes]]:
+        """
+        Yield (slot, value) in slot order, only concurrency batches are in flight at a time
+        """
+        tasks = deque()
+        batch = []
+        try:
+            for slot in slots:
+                batch.append(slot)
+                if len(batch) >= self.batch_size:
+                    tasks.append(asyncio.ensure_future(self._read_batch(address, batch, block)))
+                    batch = []
+                    if len(tasks) >= self.concurrency:
+                        for value in await tasks.popleft():
+                            yield value
+            if batch:
+                tasks.append(asyncio.ensure_future(self._read_batch(address, batch, block)))
+            while tasks:
+                for value in await tasks.popleft():
+                    yield value
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,321 @@
+"""
+Token transfer history export
+
+Transfer (or other static argument) events of single contract are read with concurrent eth_getLogs queries over
+consecutive block ranges. Range size adapts to event density: it grows while responses are small and shrinks
+when they are large or the node refuses the query, refused ranges are split in half and retried. Ranges are
+written in block order as soon as all earlier ranges are done, at most concurrency ranges are kept in memory.
+
+Output formats:
+
+    ndjson  one JSON object per log: block, log_index, transaction and event arguments by name, integer
+            arguments as decimal strings because uint256 doesn't fit JSON number
+    binary  fixed size records: block uint64 little-endian, log_index uint32 little-endian, transaction hash
+            32 bytes, then every argument in ABI order, address as 20 bytes and other types as 32-byte ABI word.
+            Records can be read with read_binary.
+"""
+
+import abc
+import asyncio
+import logging
+import re
+import struct
+import time
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import aiologger
+from web3._utils.rpc_abi import RPC
+
+from blockchain.async_web3.client import AsyncClient
+from blockchain.event_decoder import EventDecoder
+from blockchain.json_codec import JSONCodec, default_codec
+
+
+logger = aiologger.Logger.with_default_handlers(name=__name__, level=logging.INFO)
+
+# -32005 is limit exceeded in EIP-1474, messages of nodes and hosted providers not using it
+LOG_LIMIT_CODE = -32005
+LOG_LIMIT_ERRORS = (
+    "more than",
+    "limit exceeded",
+    "too many",
+    "block range",
+    "range is too large",
+    "response size",
+    "query timeout",
+)
+
+BLOCK_RANGE_LIMIT_RE = re.compile(r"block range[^0-9]*(\d+)")
+RESULT_LIMIT_RE = re.compile(r"more than (\d+) results")
+
+HEADER = struct.Struct("<QI32s")
+
+
+def is_log_limit_error(error: Any) -> bool:
+    """
+    Check whether eth_getLogs error means the query returns too many logs or covers too many blocks
+    """
+    if isinstance(error, dict):
+        if error.get("code") == LOG_LIMIT_CODE:
+            return True
+        error = error.get("message", "")
+    message = str(error).lower()
+    return any(x in message for x in LOG_LIMIT_ERRORS)
+
+
+class BlockRangeChunker(object):
+    """
+    Adaptive eth_getLogs block range size
+    """
+
+    def __init__(self, size: int = 1000, min_size: int = 1, max_size: int = 100000, target_logs: int = 2000):
+        """
+        :param target_logs: wanted number of logs per response
+        """
+        self.size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_logs = target_logs
+
+    def success(self, blocks: int, logs: int):
+        if logs > self.target_logs:
+            self.size = max(self.min_size, min(self.size, blocks * self.target_logs // logs))
+        elif blocks >= self.size:
+            # At most double per response, so single empty range doesn't jump over dense history
+            self.size = max(self.size, min(self.max_size, self.size * 2, blocks * self.target_logs // max(logs, 1)))
+
+    def exceeded(self, blocks: int, message: str = ""):
+        """
+        Node refused query of blocks, message is used to find node's block range and result limits
+        """
+        match = BLOCK_RANGE_LIMIT_RE.search(message.lower())
+        if match is not None:
+            self.max_size = max(self.min_size, min(self.max_size, int(match.group(1))))
+        match = RESULT_LIMIT_RE.search(message.lower())
+        if match is not None:
+            # Leave room for denser ranges, otherwise growing would hit the limit again
+            self.target_logs = max(1, min(self.target_logs, int(match.group(1)) // 2))
+        self.size = max(self.min_size, min(self.size, self.max_size, blocks // 2))
+
+    def __str__(self):
+        return f"<BlockRangeChunker size={self.size} max_size={self.max_size} target_logs={self.target_logs}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class LogWriter(abc.ABC):
+    """
+    Base class of export formats, write is called with raw eth_getLogs result entries in block order
+    """
+
+    def __init__(self, f: BinaryIO, decoder: EventDecoder):
+        self.f = f
+        self.decoder = decoder
+
+    @abc.abstractmethod
+    def write(self, logs: List[Dict[str, Any]]) -> int:
+        """
+        Write logs matching the event, return number of written logs
+        """
+
+    def flush(self):
+        self.f.flush()
+
+
+class NDJSONWriter(LogWriter):
+
+    def __init__(self, f: BinaryIO, decoder: EventDecoder, json_codec: Optional[JSONCodec] = None):
+        super().__init__(f, decoder)
+        self.json_codec = json_codec or default_codec()
+
+    def write(self, logs: List[Dict[str, Any]]) -> int:
+        lines = []
+        for log in logs:
+            values = self.decoder.decode(log)
+            if values is None or log.get("removed"):
+                continue
+            record = {
+                "block": int(log["blockNumber"], 16),
+                "log_index": int(log["logIndex"], 16),
+                "transaction": log["transactionHash"],
+            }
+            for name, value in zip(self.decoder.names, values):
+                if isinstance(value, int) and not isinstance(value, bool):
+                    value = str(value)
+                elif isinstance(value, bytes):
+                    value = "0x" + value.hex()
+                record[name] = value
+            lines.append(self.json_codec.dumps(record))
+        if lines:
+            self.f.write(b"\n".join(lines) + b"\n")
+        return len(lines)
+
+
+def _argument_sizes(decoder: EventDecoder) -> List[int]:
+    return [20 if x == "address" else 32 for x in decoder.types]
+
+
+class BinaryWriter(LogWriter):
+
+    def __init__(self, f: BinaryIO, decoder: EventDecoder):
+        super().__init__(f, decoder)
+        self._sizes = _argument_sizes(decoder)
+
+    def write(self, logs: List[Dict[str, Any]]) -> int:
+        data = bytearray()
+        count = 0
+        for log in logs:
+            words = self.decoder.words(log)
+            if words is None or log.get("removed"):
+                continue
+            data += HEADER.pack(int(log["blockNumber"], 16), int(log["logIndex"], 16),
+                                bytes.fromhex(log["transactionHash"][2:]))
+            for word, size in zip(words, self._sizes):
+                data += bytes.fromhex(word[64 - size * 2:])
+            count += 1
+        self.f.write(data)
+        return count
+
+
+WRITERS = {
+    "ndjson": NDJSONWriter,
+    "binary": BinaryWriter,
+}
+
+
+def read_binary(f: BinaryIO, decoder: EventDecoder) -> Iterator[Tuple]:
+    """
+    Read records written by BinaryWriter, yields (block, log_index, transaction hash, *arguments)
+    """
+    sizes = _argument_sizes(decoder)
+    record_size = HEADER.size + sum(sizes)
+    while True:
+        record = f.read(record_size)
+        if len(record) < record_size:
+            return
+        block, log_index, tx_hash = HEADER.unpack_from(record)
+        words = []
+        offset = HEADER.size
+        for size in sizes:
+            words.append(record[offset:offset + size].rjust(32, b"\0").hex())
+            offset += size
+        yield (block, log_index, "0x" + tx_hash.hex(), *decoder.decode_words(words))
+
+
+class TransferExporter(object):
+
+    def __init__(
+            self,
+            client: AsyncClient,
+            writer: LogWriter,
+            concurrency: int = 8,
+            chunker: Optional[BlockRangeChunker] = None,
+            retries: int = 5,
+            retry_delay: float = 0.5,
+            progress_interval: float = 10,
+    ):
+        self.client = client
+        self.writer = writer
+        self.concurrency = concurrency
+        self.chunker = chunker or BlockRangeChunker()
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.progress_interval = progress_interval
+        self.requests = 0
+        self._query_sem = asyncio.Semaphore(concurrency)
+
+    async def _request_logs(self, address: str, from_block: int, to_block: int) -> List[Dict[str, Any]]:
+        """
+        Raw eth_getLogs result, web3 result formatters would cost more than the export itself
+        """
+        async with self._query_sem:
+            self.requests += 1
+            return await self.client.w3.manager.coro_request(RPC.eth_getLogs, [{
+                "address": address,
+                "fromBlock": hex(from_block),
+                "toBlock": hex(to_block),
+                "topics": [self.writer.decoder.topic],
+            }])
+
+    async def _get_logs(self, address: str, from_block: int, to_block: int) -> List[Dict[str, Any]]:
+        blocks = to_block - from_block + 1
+        for attempt in range(self.retries + 1):
+            try:
+                logs = await self._request_logs(address, from_block, to_block)
+            except ValueError as exc:
+                error = exc.args[0] if exc.args else exc
+                if is_log_limit_error(error) and blocks > 1:
+                    message = error.get("message", "") if isinstance(error, dict) else str(error)
+                    self.chunker.exceeded(blocks, message)
+                    middle = from_block + blocks // 2 - 1
+                    first, second = await asyncio.gather(
+                        self._get_logs(address, from_block, middle),
+                        self._get_logs(address, middle + 1, to_block),
+                    )
+                    return first + second
+                if attempt >= self.retries:
+                    raise
+                await logger.warning(f"Failed to get logs of blocks {from_block}-{to_block}, retrying: {error}")
+            except Exception as exc:
+                if attempt >= self.retries:
+                    raise
+                await logger.warning(f"Failed to get logs of blocks {from_block}-{to_block}, retrying: {exc}")
+            else:
+                self.chunker.success(blocks, len(logs))
+                return logs
+            await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+    async def _schedule(self, address: str, start_block: int, end_block: int, queue: asyncio.Queue,
+                        slots: asyncio.Semaphore):
+        """
+        Start range queries in block order, slot is released when range is written
+        """
+        block = start_block
+        while block <= end_block:
+            await slots.acquire()
+            to_block = min(block + self.chunker.size - 1, end_block)
+            # Range size is decided here, so it follows responses of ranges scheduled earlier
+            queue.put_nowait((to_block, asyncio.ensure_future(self._get_logs(address, block, to_block))))
+            block = to_block + 1
+        queue.put_nowait(None)
+
+    async def export(self, address: str, start_block: int, end_block: int) -> int:
+        """
+        Export logs of blocks start_block..end_block (inclusive), return number of written logs
+        """
+        await logger.info(f"Exporting {self.writer.decoder.name} logs of {address} blocks {start_block}-{end_block}")
+        queue: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(self.concurrency)
+        scheduler = asyncio.ensure_future(self._schedule(address, start_block, end_block, queue, slots))
+        count = 0
+        progress_time = time.monotonic()
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                to_block, task = item
+                count += self.writer.write(await task)
+                slots.release()
+                if time.monotonic() - progress_time >= self.progress_interval:
+                    progress_time = time.monotonic()
+                    self.writer.flush()
+                    await logger.info(f"Exported {count} logs up to block {to_block}, "
+                                      f"{self.requests} requests, range {self.chunker.size} blocks")
+            await scheduler
+        finally:
+            scheduler.cancel()
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is not None:
+                    item[1].cancel()
+            self.writer.flush()
+        await logger.info(f"Exported {count} logs with {self.requests} requests")
+        return count
+
+    def __str__(self):
+        return f"<TransferExporter {self.writer.decoder.name} concurrency={self.concurrency} {self.chunker}>"
+
+    def __repr__(self):
+        return self.__str__()
@@ -0,0 +1,232 @@
+"""
+Record and replay JSON-RPC exchanges
+
+In record mode CassetteProvider passes requests to real provider and stores responses and response times to
+cassette file. In replay mode responses are served from cassette without network, optionally with simulated
+latency, so real call patterns can be benchmarked and tested offline.
+
+Set BLOCKCHAIN_CASSETTE to cassette path to use cassette with all providers created by get_provider,
+BLOCKCHAIN_CASSETTE_MODE is record or replay (default).
+
+Cassette is gzip compressed NDJSON, one exchange per line. Same request can be recorded many times, e.g.
+eth_blockNumber, responses are replayed in recorded order and the last one is repeated after that.
+
+Wall clock readings that end up in requests, like swap deadlines, are taken with current_time, which records
+them as cassette_time exchanges and replays them, so replayed transactions are identical to recorded ones.
+"""
+
+import atexit
+import gzip
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from web3._utils.encoding import Web3JsonEncoder
+from web3.providers import BaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from blockchain import configuration
+from blockchain.exceptions import NotFoundException
+from blockchain.json_codec import JSONCodec, default_codec
+
+RECORD = "record"
+REPLAY = "replay"
+MODES = [RECORD, REPLAY]
+
+VERSION = 1
+
+TIME_METHOD = "cassette_time"
+
+
+def request_key(method: RPCEndpoint, params: Any) -> str:
+    return json.dumps([method, params or []], cls=Web3JsonEncoder, sort_keys=True, separators=(",", ":"))
+
+
+class Cassette(object):
+    """
+    Recorded exchanges of one or more providers, thread safe
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY, json_codec: Optional[JSONCodec] = None):
+        if mode not in MODES:
+            raise ValueError(f"Invalid cassette mode {mode}, expected one of {', '.join(MODES)}")
+        self.path = path
+        self.mode = mode
+        self.json_codec = json_codec or default_codec()
+        # (request key, response, duration in seconds) in recorded order
+        self.exchanges: List[Tuple[str, RPCResponse, float]] = []
+        self._by_key: Dict[str, List[Tuple[RPCResponse, float]]] = {}
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.saved = False
+        if mode == REPLAY:
+            self.load()
+
+    def record(self, method: RPCEndpoint, params: Any, response: RPCResponse, duration: float):
+        key = request_key(method, params)
+        with self._lock:
+            self.exchanges.append((key, response, duration))
+            self._by_key.setdefault(key, []).append((response, duration))
+            self.saved = False
+
+    def replay(self, method: RPCEndpoint, params: Any) -> Tuple[RPCResponse, float]:
+        """
+        Next recorded response and its duration, raises NotFoundException if request was not recorded
+        """
+        key = request_key(method, params)
+        with self._lock:
+            responses = self._by_key.get(key)
+            if not responses:
+                raise NotFoundException(f"Request {key} is not recorded in cassette {self.path}")
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            return responses[min(position, len(responses) - 1)]
+
+    def time(self) -> float:
+        """
+        Wall clock time in record mode, next recorded time in replay mode
+        """
+        if self.mode == RECORD:
+            now = time.time()
+            self.record(TIME_METHOD, [], {"result": now}, 0)
+            return now
+        response, _ = self.replay(TIME_METHOD, [])
+        return response["result"]
+
+    def rewind(self):
+        with self._lock:
+            self._positions = {}
+
+    def load(self):
+        with gzip.open(self.path, "rb") as f:
+            header = self.json_codec.loads(f.readline())
+            if header.get("version") != VERSION:
+                raise ValueError(f"Unsupported cassette version {header.get('version')} in {self.path}")
+            for line in f:
+                key, response, duration = self.json_codec.loads(line)
+                self.exchanges.append((key, response, duration))
+                self._by_key.setdefault(key, []).append((response, duration))
+        self.saved = True
+
+    def save(self):
+        with self._lock:
+            with gzip.open(self.path, "wb") as f:
+                f.write(self.json_codec.dumps({"version": VERSION}) + b"\n")
+                for exchange in self.exchanges:
+                    f.write(self.json_codec.dumps(exchange) + b"\n")
+            self.saved = True
+
+    def __len__(self):
+        return len(self.exchanges)
+
+    def __str__(self):
+        return f"<Cassette {self.path} mode={self.mode} exchanges={len(self.exchanges)}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class CassetteProviderMixin(object):
+    """
+    Common parts of sync and async cassette providers
+    """
+
+    def __init__(self, cassette: Cassette, provider: Any = None, latency: float = 0, latency_scale: float = 0):
+        """
+        :param provider: real provider used in record mode
+        :param latency: simulated latency of replayed responses in seconds
+        :param latency_scale: add recorded response time multiplied by latency_scale to simulated latency
+        """
+        super().__init__()
+        if cassette.mode == RECORD and provider is None:
+            raise ValueError("Cassette provider needs real provider in record mode")
+        self.cassette = cassette
+        self.provider = provider
+        self.latency = latency
+        self.latency_scale = latency_scale
+
+    @property
+    def recording(self) -> bool:
+        return self.cassette.mode == RECORD
+
+    def replay_delay(self, duration: float) -> float:
+        return self.latency + duration * self.latency_scale
+
+    def __str__(self):
+        return f"<{self.__class__.__name__} {self.cassette.path} mode={self.cassette.mode}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class CassetteProvider(CassetteProviderMixin, BaseProvider):
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if self.recording:
+            start = time.perf_counter()
+            response = self.provider.make_request(method, params)
+            self.cassette.record(method, params, response, time.perf_counter() - start)
+            return response
+        response, duration = self.cassette.replay(method, params)
+        delay = self.replay_delay(duration)
+        if delay > 0:
+            time.sleep(delay)
+        return response
+
+
+def current_time(w3) -> float:
+    """
+    time.time() for values sent in requests, recorded and replayed when w3 uses cassette provider
+    """
+    if isinstance(w3.provider, CassetteProviderMixin):
+        return w3.provider.cassette.time()
+    return time.time()
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def _save_cassettes():
+    for cassette in _cassettes.values():
+        if cassette.mode == RECORD and not cassette.saved:
+            cassette.save()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    Cassette set with BLOCKCHAIN_CASSETTE, shared by all providers of process
+
+    Recorded cassette is saved at exit.
+    """
+    path = configuration.get_variable("cassette", None)
+    if not path:
+        return None
+    with _cassettes_lock:
+        if path not in _cassettes:
+            if not _cassettes:
+                atexit.register(_save_cassettes)
+            _cassettes[path] = Cassette(path, mode=configuration.get_variable("cassette_mode", REPLAY))
+        return _cassettes[path]
+
+
+def get_latency() -> Tuple[float, float]:
+    """
+    Simulated latency and latency scale from BLOCKCHAIN_CASSETTE_LATENCY and BLOCKCHAIN_CASSETTE_LATENCY_SCALE
+    """
+    return (
+        float(configuration.get_variable("cassette_latency", 0)),
+        float(configuration.get_variable("cassette_latency_scale", 0)),
+    )
+
+
+def wrap_provider(provider: BaseProvider) -> BaseProvider:
+    """
+    Wrap provider with CassetteProvider if BLOCKCHAIN_CASSETTE is set
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return provider
+    latency, latency_scale = get_latency()
+    return CassetteProvider(cassette, provider, latency=latency, latency_scale=latency_scale)
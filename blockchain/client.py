@@ -1,8 +1,8 @@
+import concurrent.futures
 import logging
 import os
 import time
-from typing import Any, Dict
-from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 
 
@@ -11,41 +11,110 @@ import requests.adapters
 
 from eth_account.datastructures import SignedTransaction
 from web3 import Web3
-from web3.exceptions import TransactionNotFound
+from web3.exceptions import TimeExhausted, TransactionNotFound
 from web3.middleware import geth_poa_middleware
 
-from . import contract, configuration
+from . import cassette, contract, configuration, utils
 from .networks import get_network_by_name, Network, BINANCE
 from .contract import Token
-from .exceptions import BlockchainException, NoBalanceException
+from .engine import AsyncEngine
+from .exceptions import BlockchainException, NoBalanceException, TransactionFailedException
+from .providers import CodecHTTPProvider, CodecIPCProvider, CodecWebsocketProvider
+from .signing import SigningExecutor
 
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_NETWORK = configuration.get_variable("default_network", BINANCE)
 
+# Gas limit of transaction sent right after approval, it can't be estimated before approval is mined
+PIPELINED_GAS_LIMIT = 400000
+# Replacement transaction gas price in percent of original, nodes require at least 10% bump
+REPLACEMENT_GAS_PRICE_PERCENT = 125
+
 
 def get_provider(address: str, query_limit: int = 50) -> Web3:
     if address.startswith("ws"):
-        return Web3(
-            Web3.WebsocketProvider(
-                address,
-                websocket_timeout=60,
-                websocket_kwargs={"max_size": 30000000, "ping_timeout": 180}
-            ),
-            middlewares=[geth_poa_middleware]
+        provider = CodecWebsocketProvider(
+            address,
+            websocket_timeout=60,
+            websocket_kwargs={"max_size": 30000000, "ping_timeout": 180}
         )
     elif address.startswith("/"):
-        return Web3(Web3.IPCProvider(address, timeout=60),
-                    middlewares=[geth_poa_middleware])
+        provider = CodecIPCProvider(address, timeout=60)
     else:
         adapter = requests.adapters.HTTPAdapter(pool_connections=query_limit*2,
                                                 pool_maxsize=query_limit*2)
         session = requests.Session()
         session.mount('http://', adapter)
         session.mount('https://', adapter)
-        return Web3(Web3.HTTPProvider(address, session=session, request_kwargs={'timeout': 60}),
-                    middlewares=[geth_poa_middleware])
+        provider = CodecHTTPProvider(address, session=session, request_kwargs={'timeout': 60})
+    return Web3(cassette.wrap_provider(provider), middlewares=[geth_poa_middleware])
+
+
+ALREADY_KNOWN_ERRORS = [
+    "already known",
+    "known transaction",
+    "already exists",
+    "already imported",
+]
+
+
+def is_already_known_error(exc: Exception) -> bool:
+    """
+    Check is eth_sendRawTransaction error caused by node already having the transaction
+    """
+    message = str(exc).lower()
+    return any(x in message for x in ALREADY_KNOWN_ERRORS)
+
+
+class Preflight(object):
+    """
+    Everything needed to sign a transaction, fetched concurrently by Client.preflight
+
+    gas_price is in wei
+    """
+
+    def __init__(
+            self,
+            tx,
+            gas_estimate: Optional[int],
+            gas_price: int,
+            nonce: int,
+            call_result: Any = None,
+            balance: Optional[int] = None,
+            allowance: Optional[int] = None,
+            amount: Optional[int] = None,
+            fixed_nonce: bool = False,
+    ):
+        self.tx = tx
+        self.gas_estimate = gas_estimate
+        self.gas_price = gas_price
+        self.nonce = nonce
+        self.call_result = call_result
+        self.balance = balance
+        self.allowance = allowance
+        self.amount = amount
+        # Nonce was given by caller instead of fetched from network
+        self.fixed_nonce = fixed_nonce
+
+    @property
+    def has_balance(self) -> bool:
+        if self.balance is None or self.amount is None:
+            return True
+        return self.balance >= self.amount
+
+    @property
+    def needs_approval(self) -> bool:
+        if self.allowance is None or self.amount is None:
+            return False
+        return self.allowance < self.amount
+
+    def __str__(self):
+        return f"<Preflight nonce={self.nonce} gas={self.gas_estimate} gas_price={self.gas_price}>"
+
+    def __repr__(self):
+        return self.__str__()
 
 
 class Client(object):
@@ -56,8 +125,16 @@ class Client(object):
             network: Network = None,
             test_mode: bool = True,
             w3: Web3 = None,
-            default_gas: int = 1
+            default_gas: int = 1,
+            thread_limit: int = 10,
+            broadcast_providers: List[str] = None,
+            signing_processes: int = None,
+            async_engine: bool = False,
     ):
+        """
+        :param async_engine: run RPC requests with AsyncClient in background event loop thread,
+                             batch methods and router quotes are then sent concurrently
+        """
         if not network:
             network = get_network_by_name(DEFAULT_NETWORK)
         self.network = network
@@ -70,13 +147,86 @@ class Client(object):
         self.test_mode = test_mode
         self.default_gas = default_gas
         self._token_factory = None
+        self._token_cache = utils.Cache(max_size=512)
         self._nonce = None
+        self.thread_limit = thread_limit
+        self._pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        if broadcast_providers is None:
+            broadcast_providers = network.broadcast_providers
+        self.broadcast_providers = broadcast_providers
+        self._broadcast_w3 = None
+        self.signing_processes = signing_processes
+        self._signing_executor: Optional[SigningExecutor] = None
+        self._engine: Optional[AsyncEngine] = AsyncEngine() if async_engine else None
+        self._async_client = None
+
+    @property
+    def engine(self) -> Optional[AsyncEngine]:
+        return self._engine
+
+    def run_async(self, coroutine):
+        """
+        Run coroutine in async engine and wait for result
+        """
+        if self._engine is None:
+            raise BlockchainException("Async engine is not enabled")
+        return self._engine.run(coroutine)
+
+    async def get_async_client(self):
+        """
+        AsyncClient with same account and network, call inside async engine
+        """
+        if self._async_client is None:
+            # async_web3.client imports this module
+            from .async_web3.client import AsyncClient
+            self._async_client = AsyncClient(
+                public_key=self.public_key,
+                private_key=self.private_key,
+                network=self.network,
+                test_mode=self.test_mode,
+                thread_limit=self.thread_limit,
+                default_gas=self.default_gas,
+                broadcast_providers=self.broadcast_providers,
+                signing_processes=self.signing_processes,
+            )
+        return self._async_client
+
+    async def _warm_up(self):
+        await (await self.get_async_client()).warm_up()
+
+    def warm_up(self):
+        """
+        Open async engine connections before first requests
+        """
+        self.run_async(self._warm_up())
+
+    def close(self):
+        if self._signing_executor is not None:
+            self._signing_executor.close()
+            self._signing_executor = None
+        if self._engine is None:
+            return
+        if self._async_client is not None:
+            self.run_async(self._async_client.close())
+            self._async_client = None
+        self._engine.stop()
+
+    def _get_pool(self) -> concurrent.futures.ThreadPoolExecutor:
+        if not self._pool:
+            self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.thread_limit)
+        return self._pool
+
+    async def _async_transaction_count(self, *args) -> int:
+        return await (await self.get_async_client()).w3.eth.get_transaction_count(self.public_key, *args)
 
     def get_nonce(self, tag=None):
         args = []
         if tag:
             args.append(tag)
-        network_tx_count = self.w3.eth.get_transaction_count(self.public_key, *args)
+        if self._engine is not None:
+            network_tx_count = self.run_async(self._async_transaction_count(*args))
+        else:
+            network_tx_count = self.w3.eth.get_transaction_count(self.public_key, *args)
         if not self._nonce or network_tx_count > self._nonce:
             self._nonce = network_tx_count
         return self._nonce
@@ -99,11 +249,19 @@ class Client(object):
         else:
             gas_price = self.w3.toWei(gas_price, 'gwei')
 
+        if nonce is None:
+            nonce = self.get_nonce()
+        return self._sign_contract_transaction(
+            tx, gas_estimate=gas_estimate, gas_price=gas_price, nonce=nonce, value=value
+        )
+
+    def _sign_contract_transaction(self, tx, gas_estimate: int, gas_price: int, nonce: int, value=None):
+        """
+        Build and sign contract transaction, gas_price in wei
+        """
         if gas_price > self.w3.toWei("10000", 'gwei'):
             raise BlockchainException("Way too big gas_price")
 
-        if nonce is None:
-            nonce = self.get_nonce()
         tx_to_sign = tx.buildTransaction({
             'chainId': self.chain_id,
             'gas': gas_estimate,
@@ -119,11 +277,101 @@ class Client(object):
         signed = self.w3.eth.account.sign_transaction(tx_to_sign, self.private_key)
         return signed
 
-    def sign_raw_transaction(self, value, gas_estimate, data=None, to=None, gas_price=5):
+    def preflight(
+            self,
+            tx,
+            gas_estimate: int = None,
+            gas_price: int = None,
+            nonce: int = None,
+            token: Token = None,
+            spender: contract.Contract = None,
+            amount: int = None,
+            value: int = None,
+            spends_allowance: bool = True,
+    ) -> Preflight:
         """
-        Sign raw transaction
+        Run eth_call, gas estimation, gas price, nonce and optional token balance and allowance
+        lookups concurrently.
+
+        gas_price in gwei like in sign_transaction. If tx spends allowance which is not yet approved or token
+        balance is less than amount, failing eth_call and gas estimation are expected and left empty in the result.
+        """
+        call_params = {"from": self.public_key}
+        if value is not None:
+            call_params["value"] = value
+        pool = self._get_pool()
+        futures = {"call_result": pool.submit(tx.call, dict(call_params))}
+        if gas_estimate is None:
+            futures["gas_estimate"] = pool.submit(tx.estimateGas, dict(call_params))
+        if not gas_price:
+            futures["gas_price"] = pool.submit(self.get_gas_price)
+        else:
+            gas_price = self.w3.toWei(gas_price, 'gwei')
+        if nonce is None:
+            futures["nonce"] = pool.submit(self.get_nonce)
+        if token is not None:
+            futures["balance"] = pool.submit(token.balanceOf, self.public_key)
+            if spender is not None:
+                futures["allowance"] = pool.submit(token.allowance, self.public_key, spender.address)
+
+        # Wait everything before raising so no request is left running in background
+        concurrent.futures.wait(futures.values())
+        results = {}
+        errors = {}
+        for key, future in futures.items():
+            if future.exception() is not None:
+                errors[key] = future.exception()
+            else:
+                results[key] = future.result()
+
+        preflight = Preflight(
+            tx=tx,
+            gas_estimate=results.get("gas_estimate", gas_estimate),
+            gas_price=results.get("gas_price", gas_price),
+            nonce=results.get("nonce", nonce),
+            call_result=results.get("call_result"),
+            balance=results.get("balance"),
+            allowance=results.get("allowance"),
+            amount=amount,
+            fixed_nonce=nonce is not None,
+        )
+
+        for key in ["gas_price", "nonce", "balance", "allowance", "call_result", "gas_estimate"]:
+            if key not in errors:
+                continue
+            if key in ["call_result", "gas_estimate"] and spends_allowance and preflight.needs_approval:
+                logger.debug(f"Ignoring {key} failure, allowance not approved yet: {errors[key]}")
+                continue
+            if key in ["call_result", "gas_estimate"] and not preflight.has_balance:
+                # Caller reports missing balance, transaction reverts for the same reason
+                logger.debug(f"Ignoring {key} failure, balance less than amount: {errors[key]}")
+                continue
+            raise errors[key]
+
+        if preflight.gas_price is None:
+            raise BlockchainException("Failed to generate gas price")
+        return preflight
+
+    def sign_preflight(self, preflight: Preflight, value=None) -> SignedTransaction:
+        """
+        Sign transaction prepared by preflight
+        """
+        if preflight.gas_estimate is None:
+            raise BlockchainException("Preflight has no gas estimate, approve allowance first")
+        return self._sign_contract_transaction(
+            preflight.tx,
+            gas_estimate=preflight.gas_estimate,
+            gas_price=preflight.gas_price,
+            nonce=preflight.nonce,
+            value=value,
+        )
+
+    def raw_transaction(self, value, gas_estimate, nonce, data=None, to=None, gas_price=5) -> Dict:
+        """
+        Build raw transaction dict ready to be signed
+
+        gas_price in gwei
         """
-        nonce = self.get_nonce()
         tx_to_sign = {
             'gas': gas_estimate,
             'gasPrice': self.w3.toWei(gas_price, 'gwei'),
@@ -136,10 +384,34 @@ class Client(object):
             tx_to_sign["to"] = to
         if self.chain_id is not None:
             tx_to_sign["chainId"] = self.chain_id
+        return tx_to_sign
+
+    def sign_raw_transaction(self, value, gas_estimate, data=None, to=None, gas_price=5):
+        """
+        Sign raw transaction
+        """
+        nonce = self.get_nonce()
+        tx_to_sign = self.raw_transaction(
+            value=value, gas_estimate=gas_estimate, nonce=nonce, data=data, to=to, gas_price=gas_price
+        )
         logger.debug(f"Transaction to sign {tx_to_sign}")
         signed = self.w3.eth.account.sign_transaction(tx_to_sign, self.private_key)
         return signed
 
+    def get_signing_executor(self) -> SigningExecutor:
+        if not self._signing_executor:
+            self._signing_executor = SigningExecutor(self.private_key, max_workers=self.signing_processes)
+        return self._signing_executor
+
+    def sign_transactions(self, transactions: List[Dict]) -> List[SignedTransaction]:
+        """
+        Sign batch of transaction dicts in process pool, see raw_transaction
+        """
+        return self.get_signing_executor().sign_transactions(transactions)
+
+    async def _async_send_raw_transaction(self, raw_transaction: bytes):
+        return await (await self.get_async_client()).w3.eth.send_raw_transaction(raw_transaction)
+
     def send_transaction(self, tx):
         """
         Send signed transaction
@@ -149,13 +421,64 @@ class Client(object):
         if self.test_mode:
             logger.warning("Not actually sending transaction, disable test mode first")
             return
-        hash = self.w3.eth.send_raw_transaction(tx.rawTransaction)
+        if self.broadcast_providers:
+            hash = self.broadcast_transaction(tx)
+        elif self._engine is not None:
+            hash = self.run_async(self._async_send_raw_transaction(tx.rawTransaction))
+        else:
+            hash = self.w3.eth.send_raw_transaction(tx.rawTransaction)
         logger.info("Transaction hash: {}".format(hash.hex()))
         # Update nonce
         if self._nonce is not None:
             self._nonce += 1
         return hash.hex()
 
+    def _get_broadcast_w3(self) -> List[Tuple[str, Web3]]:
+        if self._broadcast_w3 is None:
+            self._broadcast_w3 = [(address, get_provider(address)) for address in self.broadcast_providers]
+        return self._broadcast_w3
+
+    def _send_raw_transaction_to(self, endpoint: str, w3: Web3, raw_transaction: bytes, tx_hash: str):
+        start = time.monotonic()
+        try:
+            w3.eth.send_raw_transaction(raw_transaction)
+        except Exception as exc:
+            latency = (time.monotonic() - start) * 1000
+            if is_already_known_error(exc):
+                logger.info(f"Endpoint {endpoint} already knows transaction {tx_hash} ({latency:.1f} ms)")
+                return
+            logger.warning(f"Endpoint {endpoint} rejected transaction {tx_hash} ({latency:.1f} ms): {exc}")
+            raise
+        latency = (time.monotonic() - start) * 1000
+        logger.info(f"Endpoint {endpoint} accepted transaction {tx_hash} ({latency:.1f} ms)")
+
+    async def _async_broadcast_transaction(self, tx):
+        return await (await self.get_async_client()).broadcast_transaction(tx)
+
+    def broadcast_transaction(self, tx):
+        """
+        Send signed transaction to provider and all broadcast providers in parallel
+        :param tx: tx to send
+        :return: hash after first endpoint acknowledged the transaction
+        """
+        if self._engine is not None:
+            return self.run_async(self._async_broadcast_transaction(tx))
+        tx_hash = tx.hash.hex()
+        endpoints = [(self.network.provider, self.w3)] + self._get_broadcast_w3()
+        pool = self._get_pool()
+        futures = [
+            pool.submit(self._send_raw_transaction_to, endpoint, w3, tx.rawTransaction, tx_hash)
+            for endpoint, w3 in endpoints
+        ]
+        error = None
+        # Rest of the endpoints keep sending in background, they only log the result
+        for future in concurrent.futures.as_completed(futures):
+            if future.exception() is None:
+                return tx.hash
+            if error is None:
+                error = future.exception()
+        raise error
+
     def test_transaction(self, tx):
         return tx.call({'from': self.public_key})
 
@@ -179,7 +502,12 @@ class Client(object):
             timeout -= 1
         raise Exception(f"Transaction {tx_hash} not found")
 
+    async def _async_gas_price(self) -> int:
+        return await (await self.get_async_client()).get_gas_price()
+
     def get_gas_price(self):
+        if self._engine is not None:
+            return self.run_async(self._async_gas_price())
 
         gas_price = self.w3.eth.generate_gas_price()
         if not gas_price:
@@ -225,7 +553,7 @@ class Client(object):
             amount_decimal = token.toDecimals(amount)
             raise NoBalanceException(f"Account balance ({balance_decimal:.5f}) less than amount ({amount_decimal:.5f})")
 
-        tx = token.contract.functions.transfer(self.w3.toChecksumAddress(to_address), amount)
+        tx = token.function("transfer", self.w3.toChecksumAddress(to_address), amount)
 
         return tx
 
@@ -241,16 +569,43 @@ class Client(object):
 
     def _get_token_factory(self):
         if not self._token_factory:
-            self._token_factory = self.w3.eth.contract(abi=contract.get_abi("token"))
+            self._token_factory = contract.get_contract_factory(self.w3, contract.get_abi("token"))
         return self._token_factory
 
-    @lru_cache(maxsize=512)
     def get_token(self, token_address: str) -> Token:
         # TODO: Check token exists?
-        return Token(self.w3, token_address, contract_factory=self._get_token_factory())
+        return self._token_cache.get_or_load(
+            token_address,
+            lambda: Token(self.w3, token_address, contract_factory=self._get_token_factory()),
+        )
+
+    async def _async_balance(self, token_address: str, address: str) -> int:
+        token = await (await self.get_async_client()).get_token(token_address)
+        return await token.balanceOf(address)
+
+    def get_balances(self, token_addresses: List[str], address: str = None) -> List[int]:
+        """
+        Raw balances of many tokens concurrently, default address is own account
+        """
+        if address is None:
+            address = self.public_key
+        if self._engine is not None:
+            return self._engine.map(lambda x: self._async_balance(x, address), token_addresses)
+        return list(self._get_pool().map(lambda x: self.get_token(x).balanceOf(address), token_addresses))
+
+    async def _async_native_balance(self, address: str) -> int:
+        return await (await self.get_async_client()).w3.eth.get_balance(address)
+
+    def get_native_balances(self, addresses: List[str]) -> List[int]:
+        """
+        Native token balances of many addresses concurrently
+        """
+        if self._engine is not None:
+            return self._engine.map(self._async_native_balance, addresses)
+        return list(self._get_pool().map(self.w3.eth.get_balance, addresses))
 
     def get_wrapped_native_token(self):
-        contract_factory = self.w3.eth.contract(abi=contract.get_abi("wrapped_token"))
+        contract_factory = contract.get_contract_factory(self.w3, contract.get_abi("wrapped_token"))
         return Token(self.w3, self.network.wrapped_native_token, contract_factory=contract_factory)
 
     def approve_tx(
@@ -277,9 +632,102 @@ class Client(object):
         gas_price: int = None,
         gas_estimate: int = None,
     ):
-        tx = self.approve_tx(token=token, spender=spender, amount=amount, approve_amount=approve_amount)
-        if tx:
-            self.test_transaction(tx)
-            signed_tx = self.sign_transaction(tx, gas_price=gas_price, gas_estimate=gas_estimate)
-            tx_hash = self.send_transaction(signed_tx)
-            return tx_hash
+        if approve_amount is None or approve_amount < amount:
+            approve_amount = amount
+        # Build approve speculatively so allowance is fetched together with the rest of preflight
+        tx = token.approve(spender=spender.address, amount=approve_amount)
+        preflight = self.preflight(
+            tx,
+            gas_price=gas_price,
+            gas_estimate=gas_estimate,
+            token=token,
+            spender=spender,
+            amount=amount,
+            spends_allowance=False,
+        )
+        if not preflight.needs_approval:
+            return None
+        signed_tx = self.sign_preflight(preflight)
+        tx_hash = self.send_transaction(signed_tx)
+        return tx_hash
+
+    def send_with_approval(
+            self,
+            preflight: Preflight,
+            token: Token,
+            spender: contract.Contract,
+            approve_amount: int = None,
+            gas_estimate: int = PIPELINED_GAS_LIMIT,
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Sign approval and preflight transaction with consecutive nonces and send both back to back without waiting
+        approval to be mined. Confirm with wait_with_approval.
+
+        preflight.tx can't be estimated before approval, gas_estimate is used as its gas limit instead.
+        :return: approval and transaction hashes
+        """
+        amount = preflight.amount
+        if approve_amount is None or approve_amount < amount:
+            approve_amount = amount
+        approve_tx = token.approve(spender=spender.address, amount=approve_amount)
+        approve_gas = approve_tx.estimateGas({"from": self.public_key})
+        signed_approve = self._sign_contract_transaction(
+            approve_tx, gas_estimate=approve_gas, gas_price=preflight.gas_price, nonce=preflight.nonce
+        )
+        signed_tx = self._sign_contract_transaction(
+            preflight.tx,
+            gas_estimate=preflight.gas_estimate or gas_estimate,
+            gas_price=preflight.gas_price,
+            nonce=preflight.nonce + 1,
+        )
+        approve_hash = self.send_transaction(signed_approve)
+        tx_hash = self.send_transaction(signed_tx)
+        return approve_hash, tx_hash
+
+    def _get_receipt(self, tx_hash: str, timeout: int):
+        try:
+            return self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+        except TimeExhausted:
+            return None
+
+    def cancel_transaction(self, nonce: int, gas_price: int) -> str:
+        """
+        Replace pending transaction by zero value transfer to self, gas_price in wei of the replaced transaction
+        """
+        tx_to_sign = self.raw_transaction(value=0, gas_estimate=21000, nonce=nonce, to=self.public_key)
+        tx_to_sign["gasPrice"] = gas_price * REPLACEMENT_GAS_PRICE_PERCENT // 100
+        signed = self.w3.eth.account.sign_transaction(tx_to_sign, self.private_key)
+        # Not through send_transaction, replacement must not advance local nonce
+        tx_hash = self.w3.eth.send_raw_transaction(signed.rawTransaction).hex()
+        logger.info(f"Sent cancel transaction {tx_hash} for nonce {nonce}")
+        return tx_hash
+
+    def wait_with_approval(self, approve_hash: str, tx_hash: str, timeout: int = 180):
+        """
+        Confirm transactions sent by send_with_approval. If approval fails, the pending transaction is cancelled.
+        :return: transaction receipt
+        """
+        if self.test_mode:
+            logger.warning("Transactions aren't sent anywhere in test mode")
+            return None
+        # Transaction can't be mined before approval, so approval receipt is always waited first
+        approve_receipt = self._get_receipt(approve_hash, timeout)
+        if approve_receipt is None or approve_receipt["status"] != 1:
+            try:
+                self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                try:
+                    tx = self.w3.eth.get_transaction(tx_hash)
+                    cancel_hash = self.cancel_transaction(tx["nonce"], tx["gasPrice"])
+                except TransactionNotFound:
+                    logger.warning(f"Transaction {tx_hash} was dropped")
+                except ValueError as exc:
+                    # Transaction was mined meanwhile
+                    logger.warning(f"Failed to cancel transaction {tx_hash}: {exc}")
+                else:
+                    self._get_receipt(cancel_hash, timeout)
+            raise TransactionFailedException(f"Approval {approve_hash} failed, transaction {tx_hash} not executed")
+        receipt = self._get_receipt(tx_hash, timeout)
+        if receipt is None or receipt["status"] != 1:
+            raise TransactionFailedException(f"Transaction {tx_hash} failed")
+        return receipt
@@ -1,10 +1,13 @@
 import json
 import os
-from decimal import Decimal
 from functools import lru_cache
 from typing import Union
 
 import cachetools
+from eth_utils import to_canonical_address, to_checksum_address
+
+from blockchain import amount as amount_utils
+from blockchain.snapshot import current_snapshot
 
 
 package_path = os.path.dirname(os.path.abspath(__file__))
@@ -21,16 +24,76 @@ def get_abi(name):
     return read_abi_file(abi_file)
 
 
+@lru_cache(maxsize=4096)
+def checksum_address(address: bytes) -> str:
+    return to_checksum_address(address)
+
+
+_factory_cache = cachetools.LRUCache(maxsize=64)
+
+
+def get_contract_factory(w3, abi):
+    """
+    Contract factory shared by all contracts with same web3 instance and ABI
+    """
+    key = (id(w3), id(abi))
+    cached = _factory_cache.get(key)
+    # Keep references to w3 and abi in cache so that ids are not reused
+    if cached and cached[0] is w3 and cached[1] is abi:
+        return cached[2]
+    factory = w3.eth.contract(abi=abi)
+    _factory_cache[key] = (w3, abi, factory)
+    return factory
+
+
 class Contract(object):
+    """
+    Contract handle
+
+    Address is stored as bytes and web3 contract object is created only when needed,
+    use function() to create single contract function from shared factory.
+    """
+    __slots__ = ("w3", "_address", "abi", "_name", "_contract_factory", "_contract")
+
     def __init__(self, w3, address, abi, name=None, contract_factory=None):
         self.w3 = w3
         self._name = name
-        self.address = address
+        self._address = to_canonical_address(address)
         self.abi = abi
-        if contract_factory:
-            self.contract = contract_factory(address=address)
-        else:
-            self.contract = self.w3.eth.contract(address=address, abi=self.abi)
+        if not contract_factory:
+            contract_factory = get_contract_factory(w3, abi)
+        self._contract_factory = contract_factory
+        self._contract = None
+
+    @property
+    def address(self) -> str:
+        return checksum_address(self._address)
+
+    @property
+    def contract(self):
+        if self._contract is None:
+            self._contract = self._contract_factory(address=self.address)
+        return self._contract
+
+    def function(self, name, *args):
+        """
+        Create contract function without creating whole contract
+        """
+        functions = getattr(self._contract_factory, "functions", None)
+        if functions is None:
+            return getattr(self.contract.functions, name)(*args)
+        function = getattr(functions, name)(*args)
+        function.address = self.address
+        return function
+
+    def call_function(self, function, **kwargs):
+        """
+        Call contract function, inside snapshot context call is pinned to snapshot block and memoized
+        """
+        snapshot = current_snapshot()
+        if snapshot is None or "block_identifier" in kwargs:
+            return function.call(**kwargs)
+        return snapshot.call(function, **kwargs)
 
     @property
     def name(self):
@@ -48,37 +111,42 @@ class Contract(object):
 
 
 class LPContract(Contract):
+    __slots__ = ("_token0", "_token1")
+
     def __init__(self, w3, address, abi=None, contract_factory=None):
         if not abi:
             abi = get_abi("PancakeLP")
         super().__init__(w3, address, abi=abi, name=None, contract_factory=contract_factory)
-        self._name = None
+        self._token0 = None
+        self._token1 = None
 
     @property
     def name(self):
         if not self._name:
-            self._name = self.contract.functions.name().call()
+            self._name = self.call_function(self.function("name"))
         return self._name
 
-    @lru_cache()
     def token0(self):
-        return self.contract.functions.token0().call()
+        if self._token0 is None:
+            self._token0 = to_canonical_address(self.call_function(self.function("token0")))
+        return checksum_address(self._token0)
 
-    @lru_cache()
     def token1(self):
-        return self.contract.functions.token1().call()
+        if self._token1 is None:
+            self._token1 = to_canonical_address(self.call_function(self.function("token1")))
+        return checksum_address(self._token1)
 
     def get_reserves(self) -> (int, int, int):
         """
         GET LP pair reserves
         """
-        return self.contract.functions.getReserves().call()
+        return self.call_function(self.function("getReserves"))
 
     def total_supply(self) -> int:
         """
         Get LP token total supply
         """
-        return self.contract.functions.totalSupply().call()
+        return self.call_function(self.function("totalSupply"))
 
     def __str__(self):
         return f"<LPContract {self.name}>"
@@ -88,6 +156,8 @@ class LPContract(Contract):
 
 
 class Token(Contract):
+    __slots__ = ("_symbol", "_decimals")
+
     def __init__(self, w3, address, abi=None, contract_factory=None):
         if not abi:
             abi = get_abi("token")
@@ -98,51 +168,53 @@ class Token(Contract):
     @property
     def name(self):
         if not self._name:
-            self._name = self.contract.functions.name().call()
+            self._name = self.call_function(self.function("name"))
         return self._name
 
     @property
     def symbol(self):
         if not self._symbol:
-            self._symbol = self.contract.functions.symbol().call()
+            self._symbol = self.call_function(self.function("symbol"))
         return self._symbol
 
     def decimals(self) -> int:
         if self._decimals is None:
-            self._decimals = self.contract.functions.decimals().call()
+            self._decimals = self.call_function(self.function("decimals"))
         return self._decimals
 
     def balanceOf(self, address, **kwargs):
-        return self.contract.functions.balanceOf(address).call(**kwargs)
+        return self.call_function(self.function("balanceOf", address), **kwargs)
 
     def balanceOfDecimal(self, address):
         raw_balance = self.balanceOf(address)
         return self.toDecimals(raw_balance)
 
     def totalSupply(self):
-        divider = Decimal("10") ** self.decimals()
-        return Decimal(self.contract.functions.totalSupply().call()) / divider
+        return self.toDecimals(self.call_function(self.function("totalSupply")))
 
     def approve(self, spender, amount=0xffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffff):
-        return self.contract.functions.approve(spender, amount)
+        return self.function("approve", spender, amount)
 
     def allowance(self, owner, spender):
-        return self.contract.functions.allowance(owner, spender).call()
+        return self.call_function(self.function("allowance", owner, spender))
 
     def toDecimals(self, amount):
         """
         Convert uint256 presentation to decimal number
         """
-        return Decimal(amount) / Decimal(10**self.decimals())
+        return amount_utils.to_decimal(amount, self.decimals())
 
     def fromDecimals(self, amount):
         """
         Convert Decimal number to uint256
         """
-        return int(Decimal(amount) * Decimal(10 ** self.decimals()))
+        return amount_utils.from_decimal(amount, self.decimals())
+
+    def amount(self, raw: int) -> amount_utils.Amount:
+        return amount_utils.Amount(raw, self.decimals())
 
     def withdraw(self, amount):
-        return self.contract.functions.withdraw(amount)
+        return self.function("withdraw", amount)
 
     def __str__(self):
         return f"<Contract {self.name}({self.symbol}) {self.address}>"
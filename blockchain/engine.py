@@ -0,0 +1,111 @@
+"""
+Background event loop for sync code
+
+Sync Client and RouterClient use AsyncEngine to run AsyncClient requests concurrently without sync callers
+being async.
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class AsyncEngine(object):
+    """
+    Event loop running in daemon thread, coroutines are submitted from other threads
+    """
+
+    def __init__(self, name: str = "async-engine"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            started = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(started,), name=self.name, daemon=True)
+            self._thread.start()
+            started.wait()
+
+    def _run(self, started: threading.Event):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        started.set()
+        try:
+            loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+            self._loop = None
+
+    @staticmethod
+    async def _in_context(coroutine: Awaitable[T], context: contextvars.Context) -> T:
+        # Context variables of calling thread, e.g. current snapshot
+        for variable, value in context.items():
+            variable.set(value)
+        return await coroutine
+
+    def submit(self, coroutine: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("AsyncEngine can't wait for itself, await coroutine directly")
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._in_context(coroutine, contextvars.copy_context()), self._loop)
+
+    def run(self, coroutine: Awaitable[T], timeout: float = None) -> T:
+        """
+        Run coroutine in engine loop and wait for result
+        """
+        return self.submit(coroutine).result(timeout)
+
+    def map(self, function: Callable[[Any], Awaitable[T]], items: Iterable[Any], concurrency: int = 50,
+            timeout: float = None) -> List[T]:
+        """
+        Run function(item) concurrently for all items, results are in item order
+        """
+        async def run_all():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def run_one(item):
+                async with semaphore:
+                    return await function(item)
+
+            return await asyncio.gather(*[run_one(x) for x in items])
+
+        return self.run(run_all(), timeout=timeout)
+
+    def stop(self):
+        with self._lock:
+            if not self.running:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __str__(self):
+        return f"<AsyncEngine {self.name} running={self.running}>"
+
+    def __repr__(self):
+        return self.__str__()
@@ -0,0 +1,117 @@
+"""
+Event log decoder
+
+Event ABI is compiled once to topic and data word positions of the arguments, so decoding raw eth_getLogs result
+is a few hex slices per argument instead of web3 log formatting and ABI decoding. Only static argument types
+are supported, which covers ERC-20 Transfer and Approval events.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from eth_utils import encode_hex, event_abi_to_log_topic, to_checksum_address
+
+from blockchain.contract import get_abi
+
+
+WORD = 64  # hex characters
+
+STATIC_TYPE_RE = re.compile(r"^(address|bool|u?int(\d*)|bytes(\d+))$")
+
+
+@lru_cache(maxsize=65536)
+def _to_address(word: str) -> str:
+    return to_checksum_address("0x" + word[24:])
+
+
+def _to_int(word: str) -> int:
+    value = int(word, 16)
+    return value - (1 << 256) if value >> 255 else value
+
+
+def _converter(abi_type: str) -> Callable[[str], Any]:
+    match = STATIC_TYPE_RE.match(abi_type)
+    if match is None:
+        raise ValueError(f"Unsupported event argument type {abi_type}")
+    if abi_type == "address":
+        return _to_address
+    if abi_type == "bool":
+        return lambda word: int(word, 16) != 0
+    if abi_type.startswith("uint"):
+        return lambda word: int(word, 16)
+    if abi_type.startswith("int"):
+        return _to_int
+    size = int(match.group(3)) * 2
+    return lambda word: bytes.fromhex(word[:size])
+
+
+class EventDecoder(object):
+
+    def __init__(self, abi: Dict):
+        """
+        :param abi: event ABI entry
+        """
+        self.name = abi["name"]
+        self.topic = encode_hex(event_abi_to_log_topic(abi))
+        self.names = [x["name"] for x in abi["inputs"]]
+        self.types = [x["type"] for x in abi["inputs"]]
+        self.topics = 1 + sum(1 for x in abi["inputs"] if x["indexed"])
+        self.data_size = 2 + WORD * sum(1 for x in abi["inputs"] if not x["indexed"])
+        # (in topics, topic index or data offset, converter) per argument in ABI order
+        self._fields: List[Tuple[bool, int, Callable[[str], Any]]] = []
+        topic = 1
+        offset = 2
+        for argument in abi["inputs"]:
+            if argument["indexed"]:
+                self._fields.append((True, topic, _converter(argument["type"])))
+                topic += 1
+            else:
+                self._fields.append((False, offset, _converter(argument["type"])))
+                offset += WORD
+
+    @classmethod
+    def from_abi(cls, abi_name: str, event: str) -> "EventDecoder":
+        for entry in get_abi(abi_name):
+            if entry.get("type") == "event" and entry["name"] == event:
+                return cls(entry)
+        raise ValueError(f"Event {event} not found from {abi_name} ABI")
+
+    def words(self, log: Dict[str, Any]) -> Optional[List[str]]:
+        """
+        Raw 32-byte argument words of eth_getLogs result entry as hex without 0x prefix, None if log doesn't
+        match the event layout (e.g. ERC-721 Transfer has the same topic but indexed tokenId)
+        """
+        topics = log["topics"]
+        data = log["data"]
+        if len(topics) != self.topics or len(data) < self.data_size or topics[0] != self.topic:
+            return None
+        return [topics[position][2:] if in_topics else data[position:position + WORD]
+                for in_topics, position, _ in self._fields]
+
+    def decode(self, log: Dict[str, Any]) -> Optional[Tuple]:
+        """
+        Decode arguments of eth_getLogs result entry, None if log doesn't match the event layout
+        """
+        words = self.words(log)
+        if words is None:
+            return None
+        return self.decode_words(words)
+
+    def decode_words(self, words: List[str]) -> Tuple:
+        """
+        Convert argument words returned by words to values
+        """
+        return tuple(convert(word) for word, (_, _, convert) in zip(words, self._fields))
+
+    def decode_dict(self, log: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        values = self.decode(log)
+        if values is None:
+            return None
+        return dict(zip(self.names, values))
+
+    def __str__(self):
+        return f"<EventDecoder {self.name}({','.join(self.types)})>"
+
+    def __repr__(self):
+        return self.__str__()
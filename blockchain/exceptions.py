@@ -12,3 +12,7 @@ class NoBalanceException(BlockchainException):
 
 class NotFoundException(BlockchainException):
     pass
+
+
+class TransactionFailedException(BlockchainException):
+    pass
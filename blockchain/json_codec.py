@@ -0,0 +1,157 @@
+"""
+Pluggable JSON codec for RPC requests and responses
+
+orjson is used by default when installed, otherwise stdlib json. simplejson decodes RPC responses slower than
+stdlib json (see benchmark.py json) but can be selected with BLOCKCHAIN_JSON_CODEC environment variable.
+
+orjson decodes integers over 64 bits as floats, JSON-RPC quantities are hex strings so this doesn't affect
+standard eth_* responses.
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional, Union
+
+from hexbytes import HexBytes
+from web3._utils.encoding import Web3JsonEncoder
+from web3.datastructures import AttributeDict
+from web3.types import RPCEndpoint, RPCResponse
+
+from blockchain import configuration
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj):
+    if isinstance(obj, AttributeDict):
+        return dict(obj)
+    if isinstance(obj, HexBytes):
+        return obj.hex()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JSONCodec(object):
+    """
+    Standard library json
+    """
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, cls=Web3JsonEncoder, separators=(",", ":")).encode()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """
+        Raises json.JSONDecodeError on invalid data with all backends
+        """
+        return json.loads(data)
+
+    def __str__(self):
+        return f"<JSONCodec {self.name}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class SimpleJSONCodec(JSONCodec):
+    """
+    simplejson for decoding, simplejson would encode HexBytes as text so encoding uses stdlib json
+    """
+    name = "simplejson"
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        try:
+            return simplejson.loads(data)
+        except simplejson.JSONDecodeError as exc:
+            raise json.JSONDecodeError(exc.msg, exc.doc, exc.pos)
+
+
+class OrjsonCodec(JSONCodec):
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, default=_default)
+        except TypeError:
+            # Integers over 64 bits
+            return super().dumps(obj)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        # orjson.JSONDecodeError is subclass of json.JSONDecodeError
+        return orjson.loads(data)
+
+
+CODECS = {
+    JSONCodec.name: JSONCodec,
+}
+if simplejson is not None:
+    CODECS[SimpleJSONCodec.name] = SimpleJSONCodec
+if orjson is not None:
+    CODECS[OrjsonCodec.name] = OrjsonCodec
+
+# Default backends, fastest first
+PREFERRED_CODECS = [OrjsonCodec.name, JSONCodec.name]
+
+_default_codec: Optional[JSONCodec] = None
+
+
+def get_codec(name: str = None) -> JSONCodec:
+    """
+    Get codec by name, default is BLOCKCHAIN_JSON_CODEC or fastest installed backend
+    """
+    if name is None:
+        name = configuration.get_variable("json_codec", None)
+    if name is None:
+        name = next(x for x in PREFERRED_CODECS if x in CODECS)
+    if name not in CODECS:
+        raise ValueError(f"JSON codec {name} is not available, available codecs: {', '.join(CODECS)}")
+    return CODECS[name]()
+
+
+def default_codec() -> JSONCodec:
+    global _default_codec
+    if _default_codec is None:
+        _default_codec = get_codec()
+        logger.debug(f"Using JSON codec {_default_codec.name}")
+    return _default_codec
+
+
+class JSONCodecMixin(object):
+    """
+    Encode and decode provider JSON-RPC messages with JSON codec
+    """
+    _json_codec: Optional[JSONCodec] = None
+
+    @property
+    def json_codec(self) -> JSONCodec:
+        if self._json_codec is None:
+            return default_codec()
+        return self._json_codec
+
+    @json_codec.setter
+    def json_codec(self, codec: JSONCodec):
+        self._json_codec = codec
+
+    def rpc_request(self, method: RPCEndpoint, params: Any) -> Dict[str, Any]:
+        return {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params or [],
+            "id": next(self.request_counter),
+        }
+
+    def encode_rpc_request(self, method: RPCEndpoint, params: Any) -> bytes:
+        return self.json_codec.dumps(self.rpc_request(method, params))
+
+    def decode_rpc_response(self, raw_response: bytes) -> RPCResponse:
+        return self.json_codec.loads(raw_response)
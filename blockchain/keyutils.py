@@ -1,8 +1,11 @@
+import concurrent.futures
 import getpass
+import itertools
 import json
 import web3
 import web3.eth
 import os
+from typing import List, Optional, Tuple
 
 from blockchain import configuration
 
@@ -21,6 +24,16 @@ def read_keyfile(keyfile, password):
     return account.key, account.address
 
 
+def read_keyfiles(keyfiles: List[str], password: str, max_workers: Optional[int] = None) -> List[Tuple[bytes, str]]:
+    """
+    Decrypt keyfiles in worker processes, scrypt key derivation is CPU bound
+    """
+    if len(keyfiles) == 1:
+        return [read_keyfile(keyfiles[0], password)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(read_keyfile, keyfiles, itertools.repeat(password)))
+
+
 def save_keyfile(private_key, keyfile, password):
     with open(keyfile, 'w') as f:
         w3 = web3.Web3()
@@ -48,3 +61,23 @@ def get_keyfile(keyfile):
             password = getpass.getpass(prompt="Private key password: ")
             return read_keyfile(keyfile, password=password)
         raise
+
+
+def get_keyfiles(keyfiles: List[str]) -> List[Tuple[bytes, str]]:
+    """
+    Read many keyfiles encrypted with same password
+    """
+    for keyfile in keyfiles:
+        if not os.path.isfile(keyfile):
+            raise RuntimeError("File {} does not exists".format(keyfile))
+    password = configuration.get_variable("password", None)
+    if not password:
+        password = getpass.getpass(prompt="Private key password: ")
+    try:
+        return read_keyfiles(keyfiles, password=password)
+    except ValueError as exc:
+        if "MAC mismatch" in str(exc):
+            print("Invalid password provided via environment variable")
+            password = getpass.getpass(prompt="Private key password: ")
+            return read_keyfiles(keyfiles, password=password)
+        raise
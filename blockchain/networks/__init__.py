@@ -15,6 +15,7 @@ class Network(object):
             wrapped_native_token,
             explorer_tx_url,
             native_token_decimals,
+            broadcast_providers=None,
     ):
         self.provider = provider
         self.chain_id = chain_id
@@ -23,6 +24,8 @@ class Network(object):
         self.wrapped_native_token = wrapped_native_token
         self.explorer_tx_url = explorer_tx_url
         self.native_token_decimals = native_token_decimals
+        # Extra endpoints where signed transactions are broadcast in addition to provider
+        self.broadcast_providers = broadcast_providers or []
 
 
 KARDIACHAIN = "kardiachain"
@@ -43,6 +46,10 @@ NETWORKS = {
         wrapped_native_token=value.WRAPPED_NATIVE_TOKEN,
         explorer_tx_url=value.EXPLORER_TX_URL,
         native_token_decimals=value.NATIVE_TOKEN_DECIMALS,
+        broadcast_providers=[
+            x.strip() for x in configuration.get_variable("{}_broadcast_providers".format(key), "").split(",")
+            if x.strip()
+        ],
     ) for key, value in _NETWORKS.items()
 }
 
@@ -0,0 +1,168 @@
+"""
+Local database of factory LP pairs
+
+Pairs are written by blockchain.async_web3.pair_indexer.PairIndexer and read by router clients, so pair lookups
+and path finding don't need getPair queries.
+"""
+
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pairs (
+    factory TEXT NOT NULL,
+    pair_index INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    token0 TEXT NOT NULL,
+    token1 TEXT NOT NULL,
+    PRIMARY KEY (factory, pair_index)
+);
+CREATE INDEX IF NOT EXISTS pairs_tokens ON pairs (factory, token0, token1);
+CREATE TABLE IF NOT EXISTS factories (
+    factory TEXT PRIMARY KEY,
+    pairs_length INTEGER NOT NULL,
+    last_block INTEGER NOT NULL
+);
+"""
+
+
+class PairDatabase(object):
+    """
+    SQLite backed pair storage, addresses are stored checksummed
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.executescript(SCHEMA)
+            self._connection.commit()
+
+    def add_pairs(self, factory: str, pairs: Iterable[Tuple[int, str, str, str]]):
+        """
+        Store (pair_index, address, token0, token1) tuples
+        """
+        pairs = list(pairs)
+        with self._lock:
+            # Replace pairs added without allPairs index
+            self._connection.executemany(
+                "DELETE FROM pairs WHERE factory = ? AND address = ? AND pair_index < 0",
+                [(factory, x[1]) for x in pairs]
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO pairs (factory, pair_index, address, token0, token1) VALUES (?, ?, ?, ?, ?)",
+                [(factory, index, address, token0, token1) for index, address, token0, token1 in pairs]
+            )
+            self._connection.commit()
+
+    def add_pair(self, factory: str, address: str, token_a: str, token_b: str):
+        """
+        Store pair found with getPair, e.g. created after last indexed block
+
+        allPairs index is not known, pair gets negative index until indexer stores it.
+        """
+        token0, token1 = sorted([token_a, token_b], key=lambda x: int(x, 16))
+        with self._lock:
+            if self._connection.execute(
+                    "SELECT 1 FROM pairs WHERE factory = ? AND address = ?", (factory, address)).fetchone():
+                return
+            self._connection.execute(
+                "INSERT INTO pairs (factory, pair_index, address, token0, token1) "
+                "SELECT ?, MIN(0, COALESCE(MIN(pair_index), 0)) - 1, ?, ?, ? FROM pairs WHERE factory = ?",
+                (factory, address, token0, token1, factory)
+            )
+            self._connection.commit()
+
+    def set_factory_state(self, factory: str, pairs_length: int, last_block: int):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO factories (factory, pairs_length, last_block) VALUES (?, ?, ?)",
+                (factory, pairs_length, last_block)
+            )
+            self._connection.commit()
+
+    def get_factory_state(self, factory: str) -> Optional[Tuple[int, int]]:
+        """
+        Return (pairs_length, last_block) of indexed factory or None
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT pairs_length, last_block FROM factories WHERE factory = ?", (factory,)
+            ).fetchone()
+        return row
+
+    def is_complete(self, factory: str) -> bool:
+        """
+        Factory has been fully enumerated, pairs created later are looked up with getPair
+        """
+        return self.get_factory_state(factory) is not None
+
+    def indexed_pairs(self, factory: str) -> Set[int]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT pair_index FROM pairs WHERE factory = ? AND pair_index >= 0", (factory,)
+            ).fetchall()
+        return {x[0] for x in rows}
+
+    def get_pair(self, factory: str, token_a: str, token_b: str) -> Optional[str]:
+        """
+        Return LP address of token pair in any order
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT address FROM pairs WHERE factory = ? AND "
+                "((token0 = ? AND token1 = ?) OR (token0 = ? AND token1 = ?))",
+                (factory, token_a, token_b, token_b, token_a)
+            ).fetchone()
+        if row:
+            return row[0]
+        return None
+
+    def get_pair_tokens(self, factory: str, address: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT token0, token1 FROM pairs WHERE factory = ? AND address = ?", (factory, address)
+            ).fetchone()
+        return row
+
+    def pair_graph(self, factory: str) -> Dict[str, Set[str]]:
+        """
+        Return token -> tokens it has a pair with
+        """
+        graph = defaultdict(set)
+        with self._lock:
+            rows = self._connection.execute("SELECT token0, token1 FROM pairs WHERE factory = ?", (factory,))
+            for token0, token1 in rows:
+                graph[token0].add(token1)
+                graph[token1].add(token0)
+        return graph
+
+    def find_paths(self, factory: str, token_from: str, token_to: str, max_hops: int = 3,
+                   graph: Dict[str, Set[str]] = None) -> List[List[str]]:
+        """
+        Return all swap paths from token_from to token_to with at most max_hops pairs, shortest first
+        """
+        if graph is None:
+            graph = self.pair_graph(factory)
+        paths = []
+        current = [[token_from]]
+        for _ in range(max_hops):
+            next_paths = []
+            for path in current:
+                for token in graph.get(path[-1], ()):
+                    if token in path:
+                        continue
+                    if token == token_to:
+                        paths.append(path + [token])
+                    else:
+                        next_paths.append(path + [token])
+            current = next_paths
+        return paths
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,179 @@
+"""
+Shared memory price table
+
+Fixed size table of latest reserves and prices in multiprocessing.shared_memory. Every row has single writer
+process, any number of processes read rows directly from shared memory without copying or IPC.
+
+Table is removed when creator closes it, segment is left in /dev/shm if creator is killed.
+
+Rows are protected with sequence lock: writer makes sequence odd while writing, readers retry until they read
+same even sequence before and after row. Sequence of writer killed while writing stays odd, restarted writer
+makes it even again when attaching to its rows.
+"""
+
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterable, List, NamedTuple, Optional
+
+from eth_utils import to_canonical_address, to_checksum_address
+
+# Magic, version, number of rows
+HEADER = struct.Struct("<8sII")
+MAGIC = b"PRICETBL"
+VERSION = 1
+
+# Network name, router, token0, token1, written once when table is created
+KEY = struct.Struct("<16s20s20s20s")
+
+# Sequence, block, reserve0, reserve1 (uint112 fits in 16 bytes), price, update unix time
+ROW = struct.Struct("<QQ16s16sdd")
+
+
+class PriceKey(NamedTuple):
+    network: str
+    router: str
+    token0: str
+    token1: str
+
+
+class PriceRow(NamedTuple):
+    block: int
+    reserve0: int
+    reserve1: int
+    price: float
+    timestamp: float
+
+
+def _untrack(memory: shared_memory.SharedMemory):
+    # Python < 3.13 resource tracker unlinks segments when tracking process exits, also when process only
+    # attached to segment. Table lifetime is managed by creator instead.
+    resource_tracker.unregister(memory._name, "shared_memory")
+
+
+class PriceTable(object):
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner: bool = False):
+        self._memory = memory
+        self._owner = owner
+        self._buffer = memory.buf
+        magic, version, rows = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Shared memory {memory.name} is not price table")
+        self.rows = rows
+        self._keys_offset = HEADER.size
+        self._rows_offset = HEADER.size + KEY.size * rows
+
+    @classmethod
+    def create(cls, keys: List[PriceKey], name: Optional[str] = None) -> "PriceTable":
+        size = HEADER.size + (KEY.size + ROW.size) * len(keys)
+        memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _untrack(memory)
+        HEADER.pack_into(memory.buf, 0, MAGIC, VERSION, len(keys))
+        for index, key in enumerate(keys):
+            KEY.pack_into(
+                memory.buf,
+                HEADER.size + KEY.size * index,
+                key.network.encode(),
+                to_canonical_address(key.router),
+                to_canonical_address(key.token0),
+                to_canonical_address(key.token1),
+            )
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, rows: Iterable[int] = ()) -> "PriceTable":
+        """
+        :param rows: rows written by this process, left locked if previous writer was killed while writing
+        """
+        memory = shared_memory.SharedMemory(name=name)
+        _untrack(memory)
+        table = cls(memory)
+        for index in rows:
+            table._unlock(index)
+        return table
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    def key(self, index: int) -> PriceKey:
+        network, router, token0, token1 = KEY.unpack_from(self._buffer, self._keys_offset + KEY.size * index)
+        return PriceKey(
+            network=network.rstrip(b"\0").decode(),
+            router=to_checksum_address(router),
+            token0=to_checksum_address(token0),
+            token1=to_checksum_address(token1),
+        )
+
+    def keys(self) -> List[PriceKey]:
+        return [self.key(x) for x in range(self.rows)]
+
+    def _unlock(self, index: int):
+        offset = self._rows_offset + ROW.size * index
+        sequence = struct.unpack_from("<Q", self._buffer, offset)[0]
+        if sequence % 2 == 1:
+            # Row may be torn until next write, but it's no worse than stale
+            struct.pack_into("<Q", self._buffer, offset, sequence + 1)
+
+    def write(self, index: int, block: int, reserve0: int, reserve1: int, price: float):
+        """
+        Write row, only one process may write each row
+        """
+        offset = self._rows_offset + ROW.size * index
+        sequence = struct.unpack_from("<Q", self._buffer, offset)[0]
+        struct.pack_into("<Q", self._buffer, offset, sequence + 1)
+        ROW.pack_into(
+            self._buffer,
+            offset,
+            sequence + 1,
+            block,
+            reserve0.to_bytes(16, "little"),
+            reserve1.to_bytes(16, "little"),
+            price,
+            time.time(),
+        )
+        struct.pack_into("<Q", self._buffer, offset, sequence + 2)
+
+    def read(self, index: int, timeout: float = 1) -> Optional[PriceRow]:
+        """
+        Latest row, None if row is not written yet
+
+        :raises TimeoutError: row stays locked for timeout seconds, writer was killed while writing
+        """
+        offset = self._rows_offset + ROW.size * index
+        deadline = None
+        while True:
+            sequence, block, reserve0, reserve1, price, timestamp = ROW.unpack_from(self._buffer, offset)
+            if sequence % 2 == 0 and struct.unpack_from("<Q", self._buffer, offset)[0] == sequence:
+                break
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise TimeoutError(f"Row {index} of price table {self.name} is locked")
+        if sequence == 0:
+            return None
+        return PriceRow(
+            block=block,
+            reserve0=int.from_bytes(reserve0, "little"),
+            reserve1=int.from_bytes(reserve1, "little"),
+            price=price,
+            timestamp=timestamp,
+        )
+
+    def read_all(self) -> List[Optional[PriceRow]]:
+        return [self.read(x) for x in range(self.rows)]
+
+    def close(self):
+        self._buffer = None
+        self._memory.close()
+        if self._owner:
+            # unlink() unregisters segment from resource tracker
+            resource_tracker.register(self._memory._name, "shared_memory")
+            self._memory.unlink()
+
+    def __str__(self):
+        return f"<PriceTable {self.name} rows={self.rows}>"
+
+    def __repr__(self):
+        return self.__str__()
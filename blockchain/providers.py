@@ -0,0 +1,34 @@
+"""
+Sync web3 providers using pluggable JSON codec, see blockchain.json_codec
+"""
+
+import asyncio
+
+from web3 import HTTPProvider, IPCProvider, WebsocketProvider
+from web3.types import RPCResponse
+
+from blockchain.json_codec import JSONCodecMixin
+
+
+class CodecHTTPProvider(JSONCodecMixin, HTTPProvider):
+    pass
+
+
+class CodecIPCProvider(JSONCodecMixin, IPCProvider):
+    pass
+
+
+class CodecWebsocketProvider(JSONCodecMixin, WebsocketProvider):
+
+    async def coro_make_request(self, request_data: bytes) -> RPCResponse:
+        async with self.conn as conn:
+            await asyncio.wait_for(
+                conn.send(request_data),
+                timeout=self.websocket_timeout
+            )
+            return self.decode_rpc_response(
+                await asyncio.wait_for(
+                    conn.recv(),
+                    timeout=self.websocket_timeout
+                )
+            )
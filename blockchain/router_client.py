@@ -1,28 +1,41 @@
-import time
+import asyncio
 from decimal import Decimal
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 
-from .contract import get_abi, Contract, LPContract
+from . import utils
+from .amount import Amount, price
+from .cassette import current_time
+from .contract import get_abi, get_contract_factory, Contract, LPContract
 from .client import Client
 from .contract import Token
+from .pair_index import PairDatabase
 from .exceptions import NotFoundException, BlockchainException, ContractLogicError
 
 import web3.exceptions
 
 
 class FactoryContract(Contract):
-    def __init__(self, client: Client, contract_address: str, abi: Dict):
+    def __init__(self, client: Client, contract_address: str, abi: Dict, pair_database: PairDatabase = None):
         super().__init__(w3=client.w3, address=contract_address, abi=abi)
         self.client = client
         self.lp_abi = None
         self.lp_factory = None
+        self.pair_database = pair_database
 
     def get_lp(self, token0: Token, token1: Token):
         if not self.lp_abi:
             self.lp_abi = get_abi("PancakeLP")
         if not self.lp_factory:
-            self.lp_factory = self.w3.eth.contract(abi=self.lp_abi)
-        address = self.contract.functions.getPair(token0.address, token1.address).call()
+            self.lp_factory = get_contract_factory(self.w3, self.lp_abi)
+        address = None
+        indexed = self.pair_database is not None and self.pair_database.is_complete(self.address)
+        if indexed:
+            address = self.pair_database.get_pair(self.address, token0.address, token1.address)
+        if not address:
+            # Pairs created after last indexed block are not in database yet
+            address = self.call_function(self.function("getPair", token0.address, token1.address))
+            if indexed and address and address != '0x0000000000000000000000000000000000000000':
+                self.pair_database.add_pair(self.address, address, token0.address, token1.address)
         if not address or address == '0x0000000000000000000000000000000000000000':
             raise NotFoundException(f"Pair not found for tokens {token0} {token1}")
         return LPContract(w3=self.w3, address=address, contract_factory=self.lp_factory)
@@ -39,28 +52,86 @@ class RouterClient(Contract):
     Add Router Swap functions
     """
 
-    def __init__(self, client: Client, contract_address: str, abi: Dict):
+    def __init__(
+            self,
+            client: Client,
+            contract_address: str,
+            abi: Dict,
+            max_cache_size: int = 512,
+            pair_database: PairDatabase = None,
+    ):
         super().__init__(w3=client.w3, address=contract_address, abi=abi)
         self.client = client
+        self.pair_database = pair_database
         self._factory: Optional[FactoryContract] = None
-        self._lp_cache = {}
+        if max_cache_size > 0:
+            self._lp_cache = utils.Cache(max_size=max_cache_size)
+        else:
+            self._lp_cache = None
+        self.max_cache_size = max_cache_size
+        self._async_router = None
+
+    async def get_async_router(self):
+        """
+        AsyncRouterClient for same router, call inside client async engine
+        """
+        if self._async_router is None:
+            # async_web3.router_client imports this module
+            from .async_web3.router_client import AsyncRouterClient
+            self._async_router = AsyncRouterClient(
+                client=await self.client.get_async_client(),
+                contract_address=self.address,
+                abi=self.abi,
+                max_cache_size=self.max_cache_size,
+                pair_database=self.pair_database,
+            )
+        return self._async_router
+
+    async def _async_tokens(self, token0: Token, token1: Token):
+        async_client = await self.client.get_async_client()
+        return await asyncio.gather(async_client.get_token(token0.address), async_client.get_token(token1.address))
+
+    async def _async_amount_out(self, token0: Token, token1: Token, amount_in: int) -> int:
+        router = await self.get_async_router()
+        async_token0, async_token1 = await self._async_tokens(token0, token1)
+        return await router.get_amount_out(async_token0, async_token1, amount_in)
+
+    async def _async_reserves(self, token0: Token, token1: Token):
+        router = await self.get_async_router()
+        async_token0, async_token1 = await self._async_tokens(token0, token1)
+        return await router.get_reserves(async_token0, async_token1)
 
     def get_factory(self) -> FactoryContract:
         if not self._factory:
-            address = self.contract.functions.factory().call()
+            address = self.call_function(self.function("factory"))
             self._factory = FactoryContract(
                 client=self.client,
                 contract_address=address,
-                abi=get_abi("PancakeV2Factory")  # TODO: Get correct ABI
+                abi=get_abi("PancakeV2Factory"),  # TODO: Get correct ABI
+                pair_database=self.pair_database,
             )
         return self._factory
 
     def get_lp(self, token0: Token, token1: Token) -> LPContract:
-        if (token0.address, token1.address) not in self._lp_cache:
-            self._lp_cache[(token0.address, token1.address)] = self.get_factory().get_lp(token0=token0, token1=token1)
-        return self._lp_cache[(token0.address, token1.address)]
+        if self._lp_cache is None:
+            return self.get_factory().get_lp(token0=token0, token1=token1)
+        return self._lp_cache.get_or_load(
+            (token0.address, token1.address),
+            lambda: self.get_factory().get_lp(token0=token0, token1=token1),
+        )
+
+    def find_paths(self, token_from: Token, token_to: Token, max_hops: int = 3) -> List[List[str]]:
+        """
+        Find swap paths as token address lists from pair database
+        """
+        if not self.pair_database:
+            raise BlockchainException("Path finding requires pair database")
+        return self.pair_database.find_paths(self.get_factory().address, token_from.address, token_to.address,
+                                             max_hops=max_hops)
 
     def get_amount_out(self, token0: Token, token1: Token, amount_in: int) -> int:
+        if self.client.engine is not None:
+            return self.client.run_async(self._async_amount_out(token0, token1, amount_in))
         lp = self.get_lp(token0, token1)
         reserves = lp.get_reserves()
         lp_token0 = lp.token0()
@@ -75,11 +146,13 @@ class RouterClient(Contract):
             raise RuntimeError(f"Got LP token {lp.address} which don't match pair {token0} {token1}")
 
         try:
-            return self.contract.functions.getAmountOut(amount_in, reserve_in, reserve_out).call()
+            return self.call_function(self.function("getAmountOut", amount_in, reserve_in, reserve_out))
         except web3.exceptions.ContractLogicError:
             raise ContractLogicError("ContractLogicError")
 
     def get_reserves(self, token0: Token, token1: Token):
+        if self.client.engine is not None:
+            return self.client.run_async(self._async_reserves(token0, token1))
         lp = self.get_lp(token0, token1)
         reserves = lp.get_reserves()
 
@@ -88,14 +161,37 @@ class RouterClient(Contract):
         else:
             return reserves[1], reserves[0], reserves[2]
 
-    def get_price(self, token0: Token, token1: Token, reference_token: Token, amount_in: int) -> Decimal:
+    def get_amounts_out(self, quotes: List[Tuple[Token, Token, int]]) -> List[int]:
+        """
+        Quote many (token0, token1, amount_in) swaps concurrently
+        """
+        if self.client.engine is not None:
+            return self.client.engine.map(lambda x: self._async_amount_out(*x), quotes)
+        return list(self.client._get_pool().map(lambda x: self.get_amount_out(*x), quotes))
+
+    def get_reserves_many(self, pairs: List[Tuple[Token, Token]]) -> List[Tuple[int, int, int]]:
+        """
+        Reserves of many (token0, token1) pairs concurrently
+        """
+        if self.client.engine is not None:
+            return self.client.engine.map(lambda x: self._async_reserves(*x), pairs)
+        return list(self.client._get_pool().map(lambda x: self.get_reserves(*x), pairs))
+
+    def get_price_amount(self, token0: Token, token1: Token, reference_token: Token, amount_in: int) -> Amount:
+        """
+        Price in reference_token as fixed-point Amount, use this for comparisons
+        """
+        if reference_token != token0 and reference_token != token1:
+            raise ValueError("reference_token is neither token0 nor token1")
         amount_out = self.get_amount_out(token0=token0, token1=token1, amount_in=amount_in)
         if reference_token == token0:
-            return token0.toDecimals(amount_in) / token1.toDecimals(amount_out)
-        elif reference_token == token1:
-            return token1.toDecimals(amount_out) / token0.toDecimals(amount_in)
-        else:
-            raise ValueError("reference_token is neither token0 nor token1")
+            return price(token1.amount(amount_out), token0.amount(amount_in))
+        return price(token0.amount(amount_in), token1.amount(amount_out))
+
+    def get_price(self, token0: Token, token1: Token, reference_token: Token, amount_in: int) -> Decimal:
+        return self.get_price_amount(
+            token0=token0, token1=token1, reference_token=reference_token, amount_in=amount_in
+        ).to_decimal()
 
     def __str__(self):
         return f"<RouterContract {self.name} {self.address}>"
@@ -123,7 +219,7 @@ class RouterClient(Contract):
             if len(token_pair) == 2:
                 lp = self.get_lp(token_pair[0], token_pair[1])
                 lp_pairs.append(lp)
-        deadline = int(time.time() + timeout)
+        deadline = int(current_time(self.client.w3) + timeout)
         tx = self.contract.functions.swapExactTokensForTokensSupportingFeeOnTransferTokens(
             amount_in,
             amount_out_min,
@@ -155,9 +251,10 @@ class RouterClient(Contract):
         return sent_tx
 
 
-def get_router(client, contract_address, abi_file):
+def get_router(client, contract_address, abi_file, pair_database: PairDatabase = None):
     return RouterClient(
         client=client,
         contract_address=contract_address,
         abi=get_abi(abi_file),
+        pair_database=pair_database,
     )
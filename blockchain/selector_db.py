@@ -0,0 +1,223 @@
+"""
+Function selector database and bulk calldata decoding
+
+SelectorDatabase indexes functions of every ABI in blockchain/contracts and given directories by 4-byte selector.
+Large inputs are decoded in worker processes, each worker builds its own database once when it starts.
+"""
+
+import concurrent.futures
+import glob
+import json
+import logging
+import os
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import eth_abi
+from eth_abi.exceptions import DecodingError
+from eth_utils import function_abi_to_4byte_selector, to_checksum_address
+
+from blockchain.contract import package_path, read_abi_file
+
+
+logger = logging.getLogger(__name__)
+
+CONTRACTS_DIRECTORY = os.path.join(package_path, "contracts")
+
+
+@lru_cache(maxsize=16384)
+def _to_address(value: str) -> str:
+    return to_checksum_address(value)
+
+
+def _abi_type(abi_input: Dict) -> str:
+    """
+    Canonical type of ABI input, tuples are expanded to (type,...) form
+    """
+    abi_type = abi_input["type"]
+    if abi_type.startswith("tuple"):
+        return "(" + ",".join(_abi_type(x) for x in abi_input["components"]) + ")" + abi_type[len("tuple"):]
+    return abi_type
+
+
+def _to_json(value, abi_type: str):
+    if isinstance(value, (list, tuple)):
+        if abi_type.endswith("]"):
+            item_type = abi_type[:abi_type.rindex("[")]
+            return [_to_json(x, item_type) for x in value]
+        # Tuple, split component types
+        return [_to_json(x, t) for x, t in zip(value, _split_tuple_types(abi_type))]
+    if abi_type == "address":
+        return _to_address(value)
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    return value
+
+
+def _split_tuple_types(abi_type: str) -> List[str]:
+    types = []
+    depth = 0
+    start = 1
+    for i, c in enumerate(abi_type[1:-1], start=1):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            types.append(abi_type[start:i])
+            start = i + 1
+    types.append(abi_type[start:len(abi_type) - 1])
+    return types
+
+
+class FunctionSignature(object):
+
+    def __init__(self, selector: str, name: str, inputs: List[Dict], source: str):
+        self.selector = selector
+        self.name = name
+        self.input_names = [x.get("name", "") for x in inputs]
+        self.input_types = [_abi_type(x) for x in inputs]
+        self.signature = f"{name}({','.join(self.input_types)})"
+        self.source = source
+
+    def decode(self, data: bytes) -> Dict:
+        """
+        Decode call arguments without selector
+        """
+        values = eth_abi.decode_abi(self.input_types, data)
+        arguments = {}
+        for i, (name, abi_type, value) in enumerate(zip(self.input_names, self.input_types, values)):
+            arguments[name or str(i)] = _to_json(value, abi_type)
+        return arguments
+
+    def __str__(self):
+        return f"<FunctionSignature {self.selector} {self.signature}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class SelectorDatabase(object):
+
+    def __init__(self, directories: Iterable[str] = None):
+        """
+        :param directories: additional ABI directories, blockchain/contracts is always included
+        """
+        self.directories = [CONTRACTS_DIRECTORY] + list(directories or [])
+        self._selectors: Dict[str, FunctionSignature] = {}
+        for directory in self.directories:
+            for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+                self.add_abi_file(path)
+
+    def add_abi_file(self, path: str):
+        try:
+            abi = read_abi_file(path)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Failed to read ABI {path}: {exc}")
+            return
+        if isinstance(abi, dict):
+            # Compiler artifacts have ABI under abi key
+            abi = abi.get("abi", [])
+        self.add_abi(abi, source=path)
+
+    def add_abi(self, abi: List[Dict], source: str = None):
+        for function in abi:
+            if function.get("type", "function") != "function":
+                continue
+            selector = "0x" + function_abi_to_4byte_selector(function).hex()
+            if selector in self._selectors:
+                # First one wins, blockchain/contracts before user directories
+                continue
+            self._selectors[selector] = FunctionSignature(
+                selector, name=function["name"], inputs=function.get("inputs", []), source=source
+            )
+
+    def get(self, selector: str) -> Optional[FunctionSignature]:
+        return self._selectors.get(selector.lower())
+
+    def __len__(self):
+        return len(self._selectors)
+
+    def __contains__(self, selector: str):
+        return selector.lower() in self._selectors
+
+    def decode(self, data: str) -> Dict:
+        """
+        Decode hex calldata, result has error instead of arguments if selector is unknown or data is invalid
+        """
+        selector = data[:10].lower()
+        function = self._selectors.get(selector)
+        if function is None:
+            return {"selector": selector, "error": "unknown selector"}
+        try:
+            arguments = function.decode(bytes.fromhex(data[10:]))
+        except (DecodingError, ValueError) as exc:
+            return {"selector": selector, "function": function.signature, "error": str(exc)}
+        return {"selector": selector, "function": function.signature, "arguments": arguments}
+
+    def decode_line(self, line: str) -> str:
+        """
+        Decode single input line to NDJSON line
+
+        Line is hex calldata or JSON object with input or data field, other fields of the object are kept.
+        """
+        line = line.strip()
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                return json.dumps({"error": f"invalid JSON: {exc}"})
+            data = record.get("input") or record.get("data") or ""
+            record.update(self.decode(data))
+        else:
+            record = self.decode(line)
+        return json.dumps(record)
+
+
+# Selector database of the worker process, set by _init_worker
+_worker_database: Optional[SelectorDatabase] = None
+
+
+def _init_worker(directories):
+    global _worker_database
+    _worker_database = SelectorDatabase(directories)
+
+
+def _decode_batch(lines: List[str]) -> List[str]:
+    return [_worker_database.decode_line(line) for line in lines]
+
+
+def decode_lines(
+        lines: Iterable[str],
+        directories: Iterable[str] = None,
+        max_workers: Optional[int] = None,
+        chunk_size: int = 1000,
+) -> Iterator[str]:
+    """
+    Decode lines in worker processes, yield NDJSON lines in input order
+
+    Only limited number of chunks is in flight at a time, so input of any size can be streamed.
+    """
+    directories = list(directories or [])
+    max_in_flight = 2 * (max_workers or os.cpu_count() or 1)
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(directories,),
+    ) as executor:
+        futures = deque()
+        chunk = []
+        for line in lines:
+            if not line.strip():
+                continue
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                futures.append(executor.submit(_decode_batch, chunk))
+                chunk = []
+                if len(futures) >= max_in_flight:
+                    yield from futures.popleft().result()
+        if chunk:
+            futures.append(executor.submit(_decode_batch, chunk))
+        while futures:
+            yield from futures.popleft().result()
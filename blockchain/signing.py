@@ -0,0 +1,88 @@
+"""
+Transaction signing in process pool
+
+secp256k1 signing, keccak and RLP encoding are CPU bound, large batches are split into chunks and signed in
+worker processes. Private key is sent to each worker only once when the worker starts.
+"""
+
+import asyncio
+import concurrent.futures
+from typing import Dict, Iterable, List, Optional
+
+from eth_account import Account
+from eth_account.datastructures import SignedTransaction
+
+
+# Private key of the worker process, set by _init_worker
+_worker_private_key = None
+
+
+def _init_worker(private_key):
+    global _worker_private_key
+    _worker_private_key = private_key
+
+
+def _sign_batch(transactions: List[Dict]) -> List[SignedTransaction]:
+    return [Account.sign_transaction(tx, _worker_private_key) for tx in transactions]
+
+
+def _chunks(transactions: Iterable[Dict], chunk_size: int) -> Iterable[List[Dict]]:
+    chunk = []
+    for tx in transactions:
+        chunk.append(tx)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class SigningExecutor(object):
+    """
+    Sign batches of transaction dicts in process pool, results are returned in same order as transactions
+    """
+
+    def __init__(self, private_key, max_workers: Optional[int] = None, chunk_size: int = 64):
+        if chunk_size <= 0:
+            raise ValueError("Invalid chunk size")
+        self.chunk_size = chunk_size
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(private_key,),
+        )
+
+    def sign_transactions(self, transactions: Iterable[Dict]) -> List[SignedTransaction]:
+        futures = [
+            self._executor.submit(_sign_batch, chunk) for chunk in _chunks(transactions, self.chunk_size)
+        ]
+        signed = []
+        for future in futures:
+            signed.extend(future.result())
+        return signed
+
+    async def async_sign_transactions(self, transactions: Iterable[Dict]) -> List[SignedTransaction]:
+        loop = asyncio.get_event_loop()
+        results = await asyncio.gather(*[
+            loop.run_in_executor(self._executor, _sign_batch, chunk)
+            for chunk in _chunks(transactions, self.chunk_size)
+        ])
+        signed = []
+        for chunk in results:
+            signed.extend(chunk)
+        return signed
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def close(self):
+        """
+        Stop worker processes
+        """
+        self.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
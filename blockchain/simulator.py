@@ -0,0 +1,1126 @@
+"""
+In-process AMM chain simulator
+
+SimulatedChain is a small state machine that understands ERC-20, wrapped native token, PancakeSwap V2 factory,
+pair and router calls of ABIs in blockchain/contracts. It answers JSON-RPC requests in-process
+(SimulatorProvider) or over HTTP (blockchain.async_web3.simulator.SimulatorNode), so AsyncClient, CLIs and
+batching or caching layers can be load tested end to end without real chain.
+
+Only latest state is kept, eth_call with older block number is answered with latest state. Transactions are
+mined by mine(), on timer by SimulatorNode or right away with automine.
+"""
+
+import itertools
+import json
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import rlp
+from eth_abi import decode_abi, encode_abi, encode_single
+from eth_account import Account
+from eth_account._utils.legacy_transactions import Transaction
+from eth_account._utils.typed_transactions import TypedTransaction
+from eth_utils import (
+    event_abi_to_log_topic,
+    function_abi_to_4byte_selector,
+    keccak,
+    to_normalized_address,
+)
+from web3.providers import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from blockchain import amm
+from blockchain.contract import get_abi
+from blockchain.exceptions import BlockchainException, ContractLogicError
+from blockchain.networks import Network
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+ZERO_HASH = "0x" + "00" * 32
+EMPTY_BLOOM = "0x" + "00" * 256
+
+# PancakeSwap V2 fee, see blockchain.amm
+DEFAULT_FEE = 997500
+MINIMUM_LIQUIDITY = 1000
+
+# Gas used by simulated transactions
+GAS_TRANSFER = 21000
+GAS_CALL = 50000
+GAS_SWAP_HOP = 80000
+BLOCK_GAS_LIMIT = 140000000
+
+# Same limits as common public nodes
+MAX_LOGS_BLOCK_RANGE = 5000
+MAX_LOGS = 10000
+
+# Contract kinds
+TOKEN = "token"
+PAIR = "pair"
+FACTORY = "factory"
+ROUTER = "router"
+
+# Address prefixes of created contracts, same as in tests
+ADDRESS_PREFIXES = {
+    TOKEN: 0x0,
+    FACTORY: 0x1,
+    PAIR: 0x2,
+    ROUTER: 0x3,
+}
+
+# eth_call results cached between blocks
+MAX_CALL_CACHE_SIZE = 100000
+
+ERROR_SELECTOR = bytes.fromhex("08c379a0")
+
+_MISSING = object()
+
+
+class RPCError(BlockchainException):
+
+    def __init__(self, message: str, code: int = -32000, data: str = None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class ContractABI(object):
+    """
+    Function selectors and event topics of ABI
+    """
+
+    def __init__(self, abi: List[Dict]):
+        # Selector -> (name, input types, output types)
+        self.functions: Dict[bytes, Tuple[str, List[str], List[str]]] = {}
+        # Name -> (topic, indexed types, data types)
+        self.events: Dict[str, Tuple[bytes, List[str], List[str]]] = {}
+        for item in abi:
+            if item["type"] == "function":
+                self.functions[function_abi_to_4byte_selector(item)] = (
+                    item["name"],
+                    [x["type"] for x in item["inputs"]],
+                    [x["type"] for x in item.get("outputs", [])],
+                )
+            elif item["type"] == "event":
+                self.events[item["name"]] = (
+                    event_abi_to_log_topic(item),
+                    [x["type"] for x in item["inputs"] if x["indexed"]],
+                    [x["type"] for x in item["inputs"] if not x["indexed"]],
+                )
+
+
+class TokenInfo(NamedTuple):
+    name: str
+    symbol: str
+    decimals: int
+    wrapped: bool = False
+
+
+class PairInfo(NamedTuple):
+    factory: str
+    token0: str
+    token1: str
+
+
+class FactoryInfo(NamedTuple):
+    # (token0, token1) -> pair, both orders
+    pairs: Dict[Tuple[str, str], str]
+    all_pairs: List[str]
+    fee: int
+
+
+class RouterInfo(NamedTuple):
+    factory: str
+    wrapped_token: str
+    fee: int
+
+
+class Message(NamedTuple):
+    sender: str
+    to: str
+    value: int
+    # Transaction sender
+    origin: str
+
+
+class SimulatedChain(object):
+    """
+    Chain state, blocks and JSON-RPC request handling, thread safe
+    """
+
+    def __init__(self, chain_id: int = 1337, block_time: float = 1, automine: bool = False,
+                 max_logs_block_range: int = MAX_LOGS_BLOCK_RANGE, max_logs: int = MAX_LOGS):
+        """
+        :param block_time: seconds between block timestamps when mining without explicit timestamp
+        :param automine: mine new block for every sent transaction
+        """
+        self.chain_id = chain_id
+        self.block_time = block_time
+        self.automine = automine
+        self.max_logs_block_range = max_logs_block_range
+        self.max_logs = max_logs
+        self.gas_price = 5 * 10**9
+        self.abis = {
+            TOKEN: ContractABI(get_abi("token")),
+            PAIR: ContractABI(get_abi("PancakeLP")),
+            FACTORY: ContractABI(get_abi("PancakeV2Factory")),
+            ROUTER: ContractABI(get_abi("PancakeRouterV2")),
+        }
+        self.handlers: Dict[str, Dict[str, Callable]] = {
+            TOKEN: self._token_handlers(),
+            PAIR: dict(self._token_handlers(), **self._pair_handlers()),
+            FACTORY: self._factory_handlers(),
+            ROUTER: self._router_handlers(),
+        }
+        # Address -> (kind, info)
+        self.contracts: Dict[str, Tuple[str, Any]] = {}
+        self._address_counters = {x: itertools.count(1) for x in ADDRESS_PREFIXES}
+        # State
+        self.native: Dict[str, int] = {}
+        self.nonces: Dict[str, int] = {}
+        self.balances: Dict[Tuple[str, str], int] = {}
+        self.allowances: Dict[Tuple[str, str, str], int] = {}
+        self.total_supply: Dict[str, int] = {}
+        # Pair -> (reserve0, reserve1, block timestamp)
+        self.reserves: Dict[str, Tuple[int, int, int]] = {}
+        self._journal: Optional[List[Tuple[Dict, Any, Any]]] = None
+        self._logs: List[Tuple[str, List[bytes], bytes]] = []
+        # Blocks
+        self.blocks: List[Dict[str, Any]] = []
+        self.block_logs: List[List[Dict[str, Any]]] = []
+        self.transactions: Dict[str, Dict[str, Any]] = {}
+        self.receipts: Dict[str, Dict[str, Any]] = {}
+        self.pending: List[Dict[str, Any]] = []
+        self._pending_filters: Dict[str, List[str]] = {}
+        self._filter_ids = itertools.count(1)
+        # (to, data, sender, value) -> result, cleared when state changes
+        self._call_cache: Dict[Tuple, Any] = {}
+        self._lock = threading.RLock()
+        self.methods: Dict[str, Callable] = {
+            "web3_clientVersion": lambda: "SimulatedChain/v1",
+            "net_version": lambda: str(self.chain_id),
+            "net_listening": lambda: True,
+            "eth_chainId": lambda: hex(self.chain_id),
+            "eth_syncing": lambda: False,
+            "eth_gasPrice": lambda: hex(self.gas_price),
+            "eth_maxPriorityFeePerGas": lambda: hex(0),
+            "eth_blockNumber": lambda: hex(self.block_number),
+            "eth_getBalance": self._rpc_get_balance,
+            "eth_getTransactionCount": self._rpc_get_transaction_count,
+            "eth_getCode": self._rpc_get_code,
+            "eth_getStorageAt": lambda *args: ZERO_HASH,
+            "eth_call": self._rpc_call,
+            "eth_estimateGas": self._rpc_estimate_gas,
+            "eth_sendRawTransaction": self._rpc_send_raw_transaction,
+            "eth_getTransactionByHash": self._rpc_get_transaction,
+            "eth_getTransactionReceipt": self._rpc_get_transaction_receipt,
+            "eth_getBlockByNumber": self._rpc_get_block_by_number,
+            "eth_getBlockByHash": self._rpc_get_block_by_hash,
+            "eth_getLogs": self._rpc_get_logs,
+            "eth_newPendingTransactionFilter": self._rpc_new_pending_transaction_filter,
+            "eth_getFilterChanges": self._rpc_get_filter_changes,
+            "eth_uninstallFilter": self._rpc_uninstall_filter,
+        }
+        self._append_block([], int(time.time()))
+
+    # Genesis
+
+    def _new_address(self, kind: str) -> str:
+        return "0x%x%039x" % (ADDRESS_PREFIXES[kind], next(self._address_counters[kind]))
+
+    def add_token(self, symbol: str, name: str = None, decimals: int = 18, address: str = None,
+                  wrapped: bool = False) -> str:
+        address = to_normalized_address(address) if address else self._new_address(TOKEN)
+        self.contracts[address] = (TOKEN, TokenInfo(name or symbol, symbol, decimals, wrapped))
+        self.total_supply[address] = 0
+        return address
+
+    def add_router(self, wrapped_token: str, address: str = None, fee: int = DEFAULT_FEE) -> str:
+        """
+        Add router and its factory, fee is amount_in multiplier in parts per million
+        """
+        factory = self._new_address(FACTORY)
+        self.contracts[factory] = (FACTORY, FactoryInfo(pairs={}, all_pairs=[], fee=fee))
+        address = to_normalized_address(address) if address else self._new_address(ROUTER)
+        self.contracts[address] = (ROUTER, RouterInfo(factory, to_normalized_address(wrapped_token), fee))
+        return address
+
+    def add_pair(self, router: str, token0: str, token1: str, reserve0: int, reserve1: int) -> str:
+        """
+        Create pair of router factory with initial reserves, token order is sorted like in factory
+        """
+        token0, token1 = to_normalized_address(token0), to_normalized_address(token1)
+        if token0 > token1:
+            token0, token1, reserve0, reserve1 = token1, token0, reserve1, reserve0
+        factory = self.get_info(to_normalized_address(router), ROUTER).factory
+        factory_info = self.get_info(factory, FACTORY)
+        if (token0, token1) in factory_info.pairs:
+            raise BlockchainException(f"Pair {token0} {token1} already exists")
+        address = self._new_address(PAIR)
+        self.contracts[address] = (PAIR, PairInfo(factory, token0, token1))
+        factory_info.pairs[(token0, token1)] = address
+        factory_info.pairs[(token1, token0)] = address
+        factory_info.all_pairs.append(address)
+        self.total_supply[address] = 0
+        self.mint(token0, address, reserve0)
+        self.mint(token1, address, reserve1)
+        self._mint(address, ZERO_ADDRESS, math.isqrt(reserve0 * reserve1))
+        self.reserves[address] = (reserve0, reserve1, self.blocks[-1]["timestamp"])
+        # Pair is created in latest block without transaction
+        self._logs = []
+        self._emit(factory, FACTORY, "PairCreated", token0, token1, address, len(factory_info.all_pairs))
+        for log_address, topics, data in self._logs:
+            self._append_log(self.blocks[-1], log_address, topics, data, ZERO_HASH, 0)
+        self._logs = []
+        return address
+
+    def mint(self, token: str, address: str, amount: int):
+        """
+        Create tokens, wrapped native token is backed by new native tokens
+        """
+        token, address = to_normalized_address(token), to_normalized_address(address)
+        self._mint(token, address, amount)
+        contract = self.contracts.get(token)
+        if contract is not None and contract[0] == TOKEN and contract[1].wrapped:
+            self.native[token] = self.native.get(token, 0) + amount
+        self._call_cache.clear()
+
+    def set_balance(self, address: str, amount: int):
+        self.native[to_normalized_address(address)] = amount
+        self._call_cache.clear()
+
+    def _mint(self, token: str, address: str, amount: int):
+        self._set(self.balances, (token, address), self.balances.get((token, address), 0) + amount)
+        self._set(self.total_supply, token, self.total_supply.get(token, 0) + amount)
+
+    def get_info(self, address: str, kind: str = None):
+        contract = self.contracts.get(address)
+        if contract is None or (kind is not None and contract[0] != kind):
+            raise ContractLogicError(f"{address} is not {kind or 'contract'}")
+        return contract[1]
+
+    def get_pair(self, router: str, token0: str, token1: str) -> str:
+        factory = self.get_info(to_normalized_address(router), ROUTER).factory
+        return self.get_info(factory, FACTORY).pairs[(to_normalized_address(token0), to_normalized_address(token1))]
+
+    # State changes are journaled so that reverted calls and transactions can be undone
+
+    def _set(self, mapping: Dict, key: Any, value: Any):
+        if self._journal is not None:
+            self._journal.append((mapping, key, mapping.get(key, _MISSING)))
+        mapping[key] = value
+
+    def _execute(self, message: Message, data: bytes, commit: bool) -> Tuple[bytes, List]:
+        """
+        Run call, returns result and emitted logs. State is reverted on failure or if commit is False
+        """
+        journal = self._journal = []
+        self._logs = []
+        try:
+            result = self._dispatch(message, data)
+            if not commit:
+                self._undo(journal)
+            return result, self._logs
+        except Exception:
+            self._undo(journal)
+            raise
+        finally:
+            self._journal = None
+            self._logs = []
+
+    def _undo(self, journal: List[Tuple[Dict, Any, Any]]):
+        for mapping, key, value in reversed(journal):
+            if value is _MISSING:
+                mapping.pop(key, None)
+            else:
+                mapping[key] = value
+
+    def _emit(self, address: str, kind: str, event: str, *args):
+        topic, indexed_types, data_types = self.abis[kind].events[event]
+        indexed = args[:len(indexed_types)]
+        topics = [topic] + [encode_single(t, v) for t, v in zip(indexed_types, indexed)]
+        self._logs.append((address, topics, encode_abi(data_types, args[len(indexed_types):])))
+
+    def _transfer_native(self, sender: str, to: str, amount: int):
+        if amount == 0:
+            return
+        balance = self.native.get(sender, 0)
+        if balance < amount:
+            raise ContractLogicError("insufficient balance for transfer")
+        self._set(self.native, sender, balance - amount)
+        self._set(self.native, to, self.native.get(to, 0) + amount)
+
+    def _dispatch(self, message: Message, data: bytes) -> bytes:
+        self._transfer_native(message.sender, message.to, message.value)
+        contract = self.contracts.get(message.to)
+        if contract is None:
+            return b""
+        kind, info = contract
+        if len(data) < 4:
+            if kind == TOKEN and info.wrapped:
+                return self._token_deposit(message, info)
+            raise ContractLogicError("execution reverted")
+        function = self.abis[kind].functions.get(data[:4])
+        if function is None or function[0] not in self.handlers[kind]:
+            raise ContractLogicError("execution reverted")
+        name, input_types, output_types = function
+        try:
+            args = decode_abi(input_types, data[4:])
+        except Exception:
+            raise ContractLogicError("execution reverted")
+        result = self.handlers[kind][name](message, info, *args)
+        if not output_types:
+            return b""
+        if len(output_types) == 1:
+            result = (result,)
+        return encode_abi(output_types, result)
+
+    # ERC-20 and wrapped native token
+
+    def _token_handlers(self) -> Dict[str, Callable]:
+        return {
+            "name": lambda message, info: info.name,
+            "symbol": lambda message, info: info.symbol,
+            "decimals": lambda message, info: info.decimals,
+            "totalSupply": lambda message, info: self.total_supply.get(message.to, 0),
+            "balanceOf": lambda message, info, owner: self.balances.get((message.to, owner), 0),
+            "allowance": lambda message, info, owner, spender: self.allowances.get((message.to, owner, spender), 0),
+            "approve": self._token_approve,
+            "transfer": self._token_transfer,
+            "transferFrom": self._token_transfer_from,
+            "deposit": self._token_deposit,
+            "withdraw": self._token_withdraw,
+        }
+
+    def _kind(self, address: str) -> str:
+        return self.contracts[address][0]
+
+    def token_transfer(self, token: str, sender: str, to: str, amount: int):
+        balance = self.balances.get((token, sender), 0)
+        if balance < amount:
+            raise ContractLogicError("execution reverted: BEP20: transfer amount exceeds balance")
+        self._set(self.balances, (token, sender), balance - amount)
+        self._set(self.balances, (token, to), self.balances.get((token, to), 0) + amount)
+        self._emit(token, self._kind(token), "Transfer", sender, to, amount)
+
+    def _token_approve(self, message: Message, info: TokenInfo, spender: str, amount: int) -> bool:
+        self._set(self.allowances, (message.to, message.sender, spender), amount)
+        self._emit(message.to, self._kind(message.to), "Approval", message.sender, spender, amount)
+        return True
+
+    def _token_transfer(self, message: Message, info: TokenInfo, to: str, amount: int) -> bool:
+        self.token_transfer(message.to, message.sender, to, amount)
+        return True
+
+    def _spend_allowance(self, token: str, owner: str, spender: str, amount: int):
+        allowance = self.allowances.get((token, owner, spender), 0)
+        if allowance < amount:
+            raise ContractLogicError("execution reverted: BEP20: transfer amount exceeds allowance")
+        if allowance != 2**256 - 1:
+            self._set(self.allowances, (token, owner, spender), allowance - amount)
+
+    def _token_transfer_from(self, message: Message, info: TokenInfo, owner: str, to: str, amount: int) -> bool:
+        self._spend_allowance(message.to, owner, message.sender, amount)
+        self.token_transfer(message.to, owner, to, amount)
+        return True
+
+    def _token_deposit(self, message: Message, info: TokenInfo):
+        if not info.wrapped:
+            raise ContractLogicError("execution reverted")
+        self._mint(message.to, message.sender, message.value)
+        self._emit(message.to, TOKEN, "Deposit", message.sender, message.value)
+
+    def _token_withdraw(self, message: Message, info: TokenInfo, amount: int):
+        if not info.wrapped:
+            raise ContractLogicError("execution reverted")
+        balance = self.balances.get((message.to, message.sender), 0)
+        if balance < amount:
+            raise ContractLogicError("execution reverted")
+        self._set(self.balances, (message.to, message.sender), balance - amount)
+        self._set(self.total_supply, message.to, self.total_supply[message.to] - amount)
+        self._transfer_native(message.to, message.sender, amount)
+        self._emit(message.to, TOKEN, "Withdrawal", message.sender, amount)
+
+    # Pair and factory
+
+    def _pair_handlers(self) -> Dict[str, Callable]:
+        return {
+            "name": lambda message, info: "Pancake LPs",
+            "symbol": lambda message, info: "Cake-LP",
+            "decimals": lambda message, info: 18,
+            "factory": lambda message, info: info.factory,
+            "token0": lambda message, info: info.token0,
+            "token1": lambda message, info: info.token1,
+            "getReserves": lambda message, info: self.reserves[message.to],
+            "MINIMUM_LIQUIDITY": lambda message, info: MINIMUM_LIQUIDITY,
+            "kLast": lambda message, info: 0,
+            "price0CumulativeLast": lambda message, info: 0,
+            "price1CumulativeLast": lambda message, info: 0,
+            "swap": self._pair_swap,
+            "sync": self._pair_sync,
+        }
+
+    def _pair_sync(self, message: Message, info: PairInfo):
+        self._update_reserves(message.to, info)
+
+    def _update_reserves(self, pair: str, info: PairInfo):
+        reserve0 = self.balances.get((info.token0, pair), 0)
+        reserve1 = self.balances.get((info.token1, pair), 0)
+        self._set(self.reserves, pair, (reserve0, reserve1, self.blocks[-1]["timestamp"] % 2**32))
+        self._emit(pair, PAIR, "Sync", reserve0, reserve1)
+
+    def _pair_swap(self, message: Message, info: PairInfo, amount0_out: int, amount1_out: int, to: str,
+                   data: bytes = b""):
+        pair = message.to
+        reserve0, reserve1, _ = self.reserves[pair]
+        if amount0_out == 0 and amount1_out == 0:
+            raise ContractLogicError("execution reverted: Pancake: INSUFFICIENT_OUTPUT_AMOUNT")
+        if amount0_out >= reserve0 or amount1_out >= reserve1:
+            raise ContractLogicError("execution reverted: Pancake: INSUFFICIENT_LIQUIDITY")
+        if amount0_out:
+            self.token_transfer(info.token0, pair, to, amount0_out)
+        if amount1_out:
+            self.token_transfer(info.token1, pair, to, amount1_out)
+        balance0 = self.balances.get((info.token0, pair), 0)
+        balance1 = self.balances.get((info.token1, pair), 0)
+        amount0_in = max(balance0 - (reserve0 - amount0_out), 0)
+        amount1_in = max(balance1 - (reserve1 - amount1_out), 0)
+        if amount0_in == 0 and amount1_in == 0:
+            raise ContractLogicError("execution reverted: Pancake: INSUFFICIENT_INPUT_AMOUNT")
+        # Constant product check with factory fee
+        fee = amm.FEE_DENOMINATOR - self.contracts[info.factory][1].fee
+        adjusted0 = balance0 * amm.FEE_DENOMINATOR - amount0_in * fee
+        adjusted1 = balance1 * amm.FEE_DENOMINATOR - amount1_in * fee
+        if adjusted0 * adjusted1 < reserve0 * reserve1 * amm.FEE_DENOMINATOR**2:
+            raise ContractLogicError("execution reverted: Pancake: K")
+        self._update_reserves(pair, info)
+        self._emit(pair, PAIR, "Swap", message.sender, to, amount0_in, amount1_in, amount0_out, amount1_out)
+
+    def _factory_handlers(self) -> Dict[str, Callable]:
+        return {
+            "getPair": lambda message, info, token0, token1: info.pairs.get((token0, token1), ZERO_ADDRESS),
+            "allPairs": self._factory_all_pairs,
+            "allPairsLength": lambda message, info: len(info.all_pairs),
+            "feeTo": lambda message, info: ZERO_ADDRESS,
+            "feeToSetter": lambda message, info: ZERO_ADDRESS,
+        }
+
+    def _factory_all_pairs(self, message: Message, info: FactoryInfo, index: int) -> str:
+        if index >= len(info.all_pairs):
+            raise ContractLogicError("execution reverted")
+        return info.all_pairs[index]
+
+    # Router
+
+    def _router_handlers(self) -> Dict[str, Callable]:
+        return {
+            "factory": lambda message, info: info.factory,
+            "WETH": lambda message, info: info.wrapped_token,
+            "quote": self._router_quote,
+            "getAmountOut": self._router_get_amount_out,
+            "getAmountIn": self._router_get_amount_in,
+            "getAmountsOut": lambda message, info, amount_in, path: self._amounts_out(info, amount_in, path),
+            "getAmountsIn": lambda message, info, amount_out, path: self._amounts_in(info, amount_out, path),
+            "swapExactTokensForTokens": self._router_swap_exact_tokens_for_tokens,
+            "swapExactTokensForTokensSupportingFeeOnTransferTokens": self._router_swap_exact_tokens_for_tokens,
+            "swapTokensForExactTokens": self._router_swap_tokens_for_exact_tokens,
+            "swapExactETHForTokens": self._router_swap_exact_eth_for_tokens,
+            "swapExactETHForTokensSupportingFeeOnTransferTokens": self._router_swap_exact_eth_for_tokens,
+            "swapETHForExactTokens": self._router_swap_eth_for_exact_tokens,
+            "swapExactTokensForETH": self._router_swap_exact_tokens_for_eth,
+            "swapExactTokensForETHSupportingFeeOnTransferTokens": self._router_swap_exact_tokens_for_eth,
+            "swapTokensForExactETH": self._router_swap_tokens_for_exact_eth,
+        }
+
+    @staticmethod
+    def _amm(function: Callable, *args) -> int:
+        try:
+            return function(*args)
+        except ValueError as exc:
+            raise ContractLogicError(f"execution reverted: PancakeLibrary: {str(exc).upper().replace(' ', '_')}")
+
+    def _router_quote(self, message: Message, info: RouterInfo, amount: int, reserve0: int, reserve1: int) -> int:
+        if amount <= 0 or reserve0 <= 0 or reserve1 <= 0:
+            raise ContractLogicError("execution reverted: PancakeLibrary: INSUFFICIENT_AMOUNT")
+        return amount * reserve1 // reserve0
+
+    def _router_get_amount_out(self, message: Message, info: RouterInfo, amount_in: int, reserve_in: int,
+                               reserve_out: int) -> int:
+        return self._amm(amm.get_amount_out, amount_in, reserve_in, reserve_out, info.fee)
+
+    def _router_get_amount_in(self, message: Message, info: RouterInfo, amount_out: int, reserve_in: int,
+                              reserve_out: int) -> int:
+        return self._amm(amm.get_amount_in, amount_out, reserve_in, reserve_out, info.fee)
+
+    def _pair_reserves(self, info: RouterInfo, token_in: str, token_out: str) -> Tuple[str, int, int]:
+        pair = self.get_info(info.factory, FACTORY).pairs.get((token_in, token_out))
+        if pair is None:
+            raise ContractLogicError("execution reverted")
+        reserve0, reserve1, _ = self.reserves[pair]
+        if self.contracts[pair][1].token0 == token_in:
+            return pair, reserve0, reserve1
+        return pair, reserve1, reserve0
+
+    def _amounts_out(self, info: RouterInfo, amount_in: int, path: List[str]) -> List[int]:
+        if len(path) < 2:
+            raise ContractLogicError("execution reverted: PancakeLibrary: INVALID_PATH")
+        amounts = [amount_in]
+        for token_in, token_out in zip(path, path[1:]):
+            _, reserve_in, reserve_out = self._pair_reserves(info, token_in, token_out)
+            amounts.append(self._amm(amm.get_amount_out, amounts[-1], reserve_in, reserve_out, info.fee))
+        return amounts
+
+    def _amounts_in(self, info: RouterInfo, amount_out: int, path: List[str]) -> List[int]:
+        if len(path) < 2:
+            raise ContractLogicError("execution reverted: PancakeLibrary: INVALID_PATH")
+        amounts = [amount_out]
+        for token_in, token_out in reversed(list(zip(path, path[1:]))):
+            _, reserve_in, reserve_out = self._pair_reserves(info, token_in, token_out)
+            amounts.insert(0, self._amm(amm.get_amount_in, amounts[0], reserve_in, reserve_out, info.fee))
+        return amounts
+
+    def _check_deadline(self, deadline: int):
+        if deadline < self.blocks[-1]["timestamp"]:
+            raise ContractLogicError("execution reverted: PancakeRouter: EXPIRED")
+
+    def _swap(self, router: str, info: RouterInfo, amounts: List[int], path: List[str], to: str):
+        for index, (token_in, token_out) in enumerate(zip(path, path[1:])):
+            pair, _, _ = self._pair_reserves(info, token_in, token_out)
+            pair_info = self.contracts[pair][1]
+            amount_out = amounts[index + 1]
+            if index < len(path) - 2:
+                recipient, _, _ = self._pair_reserves(info, token_out, path[index + 2])
+            else:
+                recipient = to
+            amount0_out, amount1_out = (0, amount_out) if token_in == pair_info.token0 else (amount_out, 0)
+            self._pair_swap(Message(router, pair, 0, router), pair_info, amount0_out, amount1_out, recipient)
+
+    def _pay_first_pair(self, message: Message, info: RouterInfo, path: List[str], amount: int):
+        pair, _, _ = self._pair_reserves(info, path[0], path[1])
+        if path[0] == info.wrapped_token and message.value:
+            self._transfer_native(message.to, info.wrapped_token, amount)
+            self._mint(info.wrapped_token, message.to, amount)
+            self._emit(info.wrapped_token, TOKEN, "Deposit", message.to, amount)
+            self.token_transfer(path[0], message.to, pair, amount)
+        else:
+            self._spend_allowance(path[0], message.sender, message.to, amount)
+            self.token_transfer(path[0], message.sender, pair, amount)
+
+    def _unwrap_to(self, router: str, info: RouterInfo, to: str, amount: int):
+        self._token_withdraw(Message(router, info.wrapped_token, 0, router), self.contracts[info.wrapped_token][1],
+                             amount)
+        self._transfer_native(router, to, amount)
+
+    def _router_swap_exact_tokens_for_tokens(self, message: Message, info: RouterInfo, amount_in: int,
+                                             amount_out_min: int, path: List[str], to: str, deadline: int):
+        self._check_deadline(deadline)
+        amounts = self._amounts_out(info, amount_in, path)
+        if amounts[-1] < amount_out_min:
+            raise ContractLogicError("execution reverted: PancakeRouter: INSUFFICIENT_OUTPUT_AMOUNT")
+        self._pay_first_pair(message, info, path, amounts[0])
+        self._swap(message.to, info, amounts, path, to)
+        return amounts
+
+    def _router_swap_tokens_for_exact_tokens(self, message: Message, info: RouterInfo, amount_out: int,
+                                             amount_in_max: int, path: List[str], to: str, deadline: int):
+        self._check_deadline(deadline)
+        amounts = self._amounts_in(info, amount_out, path)
+        if amounts[0] > amount_in_max:
+            raise ContractLogicError("execution reverted: PancakeRouter: EXCESSIVE_INPUT_AMOUNT")
+        self._pay_first_pair(message, info, path, amounts[0])
+        self._swap(message.to, info, amounts, path, to)
+        return amounts
+
+    def _router_swap_exact_eth_for_tokens(self, message: Message, info: RouterInfo, amount_out_min: int,
+                                          path: List[str], to: str, deadline: int):
+        self._check_deadline(deadline)
+        if path[0] != info.wrapped_token:
+            raise ContractLogicError("execution reverted: PancakeRouter: INVALID_PATH")
+        amounts = self._amounts_out(info, message.value, path)
+        if amounts[-1] < amount_out_min:
+            raise ContractLogicError("execution reverted: PancakeRouter: INSUFFICIENT_OUTPUT_AMOUNT")
+        self._pay_first_pair(message, info, path, amounts[0])
+        self._swap(message.to, info, amounts, path, to)
+        return amounts
+
+    def _router_swap_eth_for_exact_tokens(self, message: Message, info: RouterInfo, amount_out: int,
+                                          path: List[str], to: str, deadline: int):
+        self._check_deadline(deadline)
+        if path[0] != info.wrapped_token:
+            raise ContractLogicError("execution reverted: PancakeRouter: INVALID_PATH")
+        amounts = self._amounts_in(info, amount_out, path)
+        if amounts[0] > message.value:
+            raise ContractLogicError("execution reverted: PancakeRouter: EXCESSIVE_INPUT_AMOUNT")
+        self._pay_first_pair(message, info, path, amounts[0])
+        self._swap(message.to, info, amounts, path, to)
+        # Refund dust
+        self._transfer_native(message.to, message.sender, message.value - amounts[0])
+        return amounts
+
+    def _router_swap_exact_tokens_for_eth(self, message: Message, info: RouterInfo, amount_in: int,
+                                          amount_out_min: int, path: List[str], to: str, deadline: int):
+        self._check_deadline(deadline)
+        if path[-1] != info.wrapped_token:
+            raise ContractLogicError("execution reverted: PancakeRouter: INVALID_PATH")
+        amounts = self._amounts_out(info, amount_in, path)
+        if amounts[-1] < amount_out_min:
+            raise ContractLogicError("execution reverted: PancakeRouter: INSUFFICIENT_OUTPUT_AMOUNT")
+        self._pay_first_pair(message, info, path, amounts[0])
+        self._swap(message.to, info, amounts, path, message.to)
+        self._unwrap_to(message.to, info, to, amounts[-1])
+        return amounts
+
+    def _router_swap_tokens_for_exact_eth(self, message: Message, info: RouterInfo, amount_out: int,
+                                          amount_in_max: int, path: List[str], to: str, deadline: int):
+        self._check_deadline(deadline)
+        if path[-1] != info.wrapped_token:
+            raise ContractLogicError("execution reverted: PancakeRouter: INVALID_PATH")
+        amounts = self._amounts_in(info, amount_out, path)
+        if amounts[0] > amount_in_max:
+            raise ContractLogicError("execution reverted: PancakeRouter: EXCESSIVE_INPUT_AMOUNT")
+        self._pay_first_pair(message, info, path, amounts[0])
+        self._swap(message.to, info, amounts, path, message.to)
+        self._unwrap_to(message.to, info, to, amounts[-1])
+        return amounts
+
+    # Transactions and blocks
+
+    @property
+    def block_number(self) -> int:
+        return len(self.blocks) - 1
+
+    def _gas_used(self, to: Optional[str], data: bytes) -> int:
+        contract = self.contracts.get(to)
+        if contract is None:
+            return GAS_TRANSFER
+        function = self.abis[contract[0]].functions.get(data[:4])
+        if contract[0] == ROUTER and function is not None and function[0].startswith("swap"):
+            try:
+                path = decode_abi(function[1], data[4:])[-3]
+                return GAS_TRANSFER + GAS_SWAP_HOP * max(len(path) - 1, 1)
+            except Exception:
+                pass
+        return GAS_TRANSFER + GAS_CALL
+
+    def _append_block(self, transactions: List[str], timestamp: int, gas_used: int = 0) -> Dict[str, Any]:
+        number = len(self.blocks)
+        parent_hash = self.blocks[-1]["hash"] if self.blocks else ZERO_HASH
+        block = {
+            "number": hex(number),
+            "hash": "0x" + keccak(number.to_bytes(32, "big") + bytes.fromhex(parent_hash[2:])).hex(),
+            "parentHash": parent_hash,
+            "nonce": "0x0000000000000000",
+            "sha3Uncles": ZERO_HASH,
+            "logsBloom": EMPTY_BLOOM,
+            "transactionsRoot": ZERO_HASH,
+            "stateRoot": ZERO_HASH,
+            "receiptsRoot": ZERO_HASH,
+            "miner": ZERO_ADDRESS,
+            "difficulty": "0x2",
+            "totalDifficulty": hex(number * 2 + 1),
+            "extraData": ZERO_HASH,
+            "size": hex(1000),
+            "gasLimit": hex(BLOCK_GAS_LIMIT),
+            "gasUsed": hex(gas_used),
+            "timestamp": timestamp,
+            "transactions": transactions,
+            "uncles": [],
+        }
+        self.blocks.append(block)
+        self.block_logs.append([])
+        return block
+
+    def _pending_nonce(self, address: str) -> int:
+        nonce = self.nonces.get(address, 0)
+        nonces = {x["nonce"] for x in self.pending if x["from"] == address}
+        while nonce in nonces:
+            nonce += 1
+        return nonce
+
+    def send_raw_transaction(self, raw: bytes) -> str:
+        with self._lock:
+            tx_hash = "0x" + keccak(raw).hex()
+            if tx_hash in self.transactions:
+                raise RPCError("already known")
+            tx = self._decode_transaction(raw)
+            tx["hash"] = tx_hash
+            if tx["chainId"] is not None and tx["chainId"] != self.chain_id:
+                raise RPCError(f"invalid chain id {tx['chainId']}, expected {self.chain_id}")
+            if tx["nonce"] < self.nonces.get(tx["from"], 0):
+                raise RPCError("nonce too low")
+            if any(x["from"] == tx["from"] and x["nonce"] == tx["nonce"] for x in self.pending):
+                raise RPCError("replacement transaction underpriced")
+            if self.native.get(tx["from"], 0) < tx["gas"] * tx["gasPrice"] + tx["value"]:
+                raise RPCError("insufficient funds for gas * price + value")
+            self.transactions[tx_hash] = tx
+            self.pending.append(tx)
+            for hashes in self._pending_filters.values():
+                hashes.append(tx_hash)
+            if self.automine:
+                self.mine()
+            return tx_hash
+
+    @staticmethod
+    def _decode_transaction(raw: bytes) -> Dict[str, Any]:
+        try:
+            sender = to_normalized_address(Account.recover_transaction(raw))
+            if raw[0] >= 0xc0:
+                fields = rlp.decode(raw, Transaction).as_dict()
+                v = fields["v"]
+                chain_id = (v - 35) // 2 if v >= 35 else None
+                gas_price = fields["gasPrice"]
+                tx_type = 0
+            else:
+                fields = TypedTransaction.from_bytes(raw).as_dict()
+                chain_id = fields["chainId"]
+                gas_price = fields.get("gasPrice", fields.get("maxFeePerGas"))
+                tx_type = raw[0]
+        except Exception as exc:
+            raise RPCError(f"invalid transaction: {exc}")
+        to = fields["to"]
+        return {
+            "from": sender,
+            "to": to_normalized_address(to) if to else None,
+            "nonce": fields["nonce"],
+            "gas": fields["gas"],
+            "gasPrice": gas_price,
+            "value": fields["value"],
+            "data": bytes(fields["data"]),
+            "chainId": chain_id,
+            "type": tx_type,
+            "v": fields["v"],
+            "r": fields["r"],
+            "s": fields["s"],
+        }
+
+    def mine(self, timestamp: int = None) -> Dict[str, Any]:
+        """
+        Mine pending transactions with next nonces into new block
+        """
+        with self._lock:
+            if timestamp is None:
+                timestamp = max(int(time.time()), self.blocks[-1]["timestamp"] + int(self.block_time))
+            block = self._append_block([], timestamp)
+            included = []
+            gas_used = 0
+            progress = True
+            while progress:
+                progress = False
+                for tx in list(self.pending):
+                    if tx["nonce"] != self.nonces.get(tx["from"], 0):
+                        continue
+                    if gas_used + tx["gas"] > BLOCK_GAS_LIMIT:
+                        break
+                    self.pending.remove(tx)
+                    gas_used += self._apply_transaction(tx, block, len(included))
+                    included.append(tx["hash"])
+                    progress = True
+            block["transactions"] = included
+            block["gasUsed"] = hex(gas_used)
+            self._call_cache.clear()
+            return block
+
+    def _append_log(self, block: Dict[str, Any], address: str, topics: List[bytes], data: bytes, tx_hash: str,
+                    index: int) -> Dict[str, Any]:
+        block_logs = self.block_logs[int(block["number"], 16)]
+        log = {
+            "address": address,
+            "topics": ["0x" + x.hex() for x in topics],
+            "data": "0x" + data.hex(),
+            "blockNumber": block["number"],
+            "blockHash": block["hash"],
+            "transactionHash": tx_hash,
+            "transactionIndex": hex(index),
+            "logIndex": hex(len(block_logs)),
+            "removed": False,
+        }
+        block_logs.append(log)
+        return log
+
+    def _apply_transaction(self, tx: Dict[str, Any], block: Dict[str, Any], index: int) -> int:
+        sender = tx["from"]
+        self.nonces[sender] = tx["nonce"] + 1
+        gas_used = self._gas_used(tx["to"], tx["data"])
+        status = 1
+        logs = []
+        if tx["to"] is None or gas_used > tx["gas"]:
+            # Contract creation is not supported
+            status = 0
+            gas_used = tx["gas"]
+        else:
+            try:
+                _, logs = self._execute(Message(sender, tx["to"], tx["value"], sender), tx["data"], commit=True)
+            except ContractLogicError:
+                status = 0
+        self.native[sender] = self.native.get(sender, 0) - gas_used * tx["gasPrice"]
+        tx["blockHash"] = block["hash"]
+        tx["blockNumber"] = block["number"]
+        tx["transactionIndex"] = hex(index)
+        receipt_logs = [self._append_log(block, address, topics, data, tx["hash"], index)
+                        for address, topics, data in logs]
+        self.receipts[tx["hash"]] = {
+            "transactionHash": tx["hash"],
+            "transactionIndex": hex(index),
+            "blockHash": block["hash"],
+            "blockNumber": block["number"],
+            "from": sender,
+            "to": tx["to"],
+            "cumulativeGasUsed": hex(gas_used),
+            "gasUsed": hex(gas_used),
+            "effectiveGasPrice": hex(tx["gasPrice"]),
+            "contractAddress": None,
+            "logs": receipt_logs,
+            "logsBloom": EMPTY_BLOOM,
+            "status": hex(status),
+            "type": hex(tx["type"]),
+        }
+        return gas_used
+
+    # JSON-RPC
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Handle JSON-RPC request, errors are returned as error responses
+        """
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        method = self.methods.get(request.get("method"))
+        if method is None:
+            response["error"] = {"code": -32601, "message": f"the method {request.get('method')} does not exist"}
+            return response
+        try:
+            with self._lock:
+                response["result"] = method(*request.get("params") or [])
+        except ContractLogicError as exc:
+            reason = str(exc)
+            prefix = "execution reverted: "
+            error = {"code": 3, "message": reason}
+            if reason.startswith(prefix):
+                error["data"] = "0x" + (ERROR_SELECTOR + encode_abi(["string"], [reason[len(prefix):]])).hex()
+            response["error"] = error
+        except RPCError as exc:
+            response["error"] = {"code": exc.code, "message": str(exc)}
+            if exc.data is not None:
+                response["error"]["data"] = exc.data
+        except (BlockchainException, ValueError, TypeError, KeyError) as exc:
+            response["error"] = {"code": -32602, "message": f"invalid argument: {exc}"}
+        return response
+
+    def handle_message(self, message: Any) -> Any:
+        """
+        Handle single request or batch
+        """
+        if isinstance(message, list):
+            return [self.handle(x) for x in message]
+        return self.handle(message)
+
+    def _block_number_param(self, value: Any) -> int:
+        if value in (None, "latest", "pending", "safe", "finalized"):
+            return self.block_number
+        if value == "earliest":
+            return 0
+        if isinstance(value, dict):
+            value = value.get("blockNumber", value.get("blockHash"))
+            if value is not None and len(value) == 66:
+                return self._block_by_hash(value)
+        number = int(value, 16) if isinstance(value, str) else int(value)
+        if number > self.block_number:
+            raise RPCError("header not found")
+        return number
+
+    def _block_by_hash(self, block_hash: str) -> int:
+        for block in reversed(self.blocks):
+            if block["hash"] == block_hash:
+                return int(block["number"], 16)
+        raise RPCError("header not found")
+
+    def _rpc_get_balance(self, address: str, block: Any = None) -> str:
+        self._block_number_param(block)
+        return hex(self.native.get(to_normalized_address(address), 0))
+
+    def _rpc_get_transaction_count(self, address: str, block: Any = None) -> str:
+        address = to_normalized_address(address)
+        if block == "pending":
+            return hex(self._pending_nonce(address))
+        self._block_number_param(block)
+        return hex(self.nonces.get(address, 0))
+
+    def _rpc_get_code(self, address: str, block: Any = None) -> str:
+        return "0x6080604052" if to_normalized_address(address) in self.contracts else "0x"
+
+    @staticmethod
+    def _call_params(call: Dict[str, Any]) -> Tuple[str, str, bytes, int]:
+        sender = to_normalized_address(call["from"]) if call.get("from") else ZERO_ADDRESS
+        to = to_normalized_address(call["to"]) if call.get("to") else None
+        data = call.get("data", call.get("input")) or "0x"
+        value = call.get("value") or 0
+        return sender, to, bytes.fromhex(data[2:]), int(value, 16) if isinstance(value, str) else value
+
+    def _rpc_call(self, call: Dict[str, Any], block: Any = None) -> str:
+        self._block_number_param(block)
+        key = (call.get("to"), call.get("data", call.get("input")), call.get("from"), call.get("value"))
+        result = self._call_cache.get(key)
+        if result is None:
+            sender, to, data, value = self._call_params(call)
+            if to is None:
+                raise ContractLogicError("contract creation is not supported")
+            result = "0x" + self._execute(Message(sender, to, value, sender), data, commit=False)[0].hex()
+            if len(self._call_cache) >= MAX_CALL_CACHE_SIZE:
+                self._call_cache.clear()
+            self._call_cache[key] = result
+        return result
+
+    def _rpc_estimate_gas(self, call: Dict[str, Any], block: Any = None) -> str:
+        sender, to, data, value = self._call_params(call)
+        if to is not None:
+            self._execute(Message(sender, to, value, sender), data, commit=False)
+        return hex(self._gas_used(to, data))
+
+    def _rpc_send_raw_transaction(self, raw: str) -> str:
+        return self.send_raw_transaction(bytes.fromhex(raw[2:] if raw.startswith("0x") else raw))
+
+    def _format_transaction(self, tx: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "hash": tx["hash"],
+            "nonce": hex(tx["nonce"]),
+            "blockHash": tx.get("blockHash"),
+            "blockNumber": tx.get("blockNumber"),
+            "transactionIndex": tx.get("transactionIndex"),
+            "from": tx["from"],
+            "to": tx["to"],
+            "value": hex(tx["value"]),
+            "gas": hex(tx["gas"]),
+            "gasPrice": hex(tx["gasPrice"]),
+            "input": "0x" + tx["data"].hex(),
+            "type": hex(tx["type"]),
+            "chainId": hex(tx["chainId"]) if tx["chainId"] is not None else None,
+            "v": hex(tx["v"]),
+            "r": hex(tx["r"]),
+            "s": hex(tx["s"]),
+        }
+
+    def _rpc_get_transaction(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        tx = self.transactions.get(tx_hash.lower())
+        return self._format_transaction(tx) if tx else None
+
+    def _rpc_get_transaction_receipt(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        return self.receipts.get(tx_hash.lower())
+
+    def _format_block(self, number: int, full: bool) -> Dict[str, Any]:
+        block = dict(self.blocks[number], timestamp=hex(self.blocks[number]["timestamp"]))
+        if full:
+            block["transactions"] = [self._format_transaction(self.transactions[x]) for x in block["transactions"]]
+        return block
+
+    def _rpc_get_block_by_number(self, block: Any, full: bool = False) -> Optional[Dict[str, Any]]:
+        try:
+            return self._format_block(self._block_number_param(block), full)
+        except RPCError:
+            return None
+
+    def _rpc_get_block_by_hash(self, block_hash: str, full: bool = False) -> Optional[Dict[str, Any]]:
+        try:
+            return self._format_block(self._block_by_hash(block_hash), full)
+        except RPCError:
+            return None
+
+    def _rpc_get_logs(self, log_filter: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if log_filter.get("blockHash"):
+            from_block = to_block = self._block_by_hash(log_filter["blockHash"])
+        else:
+            from_block = self._block_number_param(log_filter.get("fromBlock"))
+            to_block = self._block_number_param(log_filter.get("toBlock"))
+        if to_block - from_block + 1 > self.max_logs_block_range:
+            raise RPCError(f"exceed maximum block range: {self.max_logs_block_range}", code=-32005)
+        addresses = log_filter.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {x.lower() for x in addresses} if addresses else None
+        topics = [
+            None if x is None else {y.lower() for y in ([x] if isinstance(x, str) else x)}
+            for x in log_filter.get("topics") or []
+        ]
+        logs = []
+        for number in range(from_block, to_block + 1):
+            for log in self.block_logs[number]:
+                if addresses is not None and log["address"] not in addresses:
+                    continue
+                if len(topics) > len(log["topics"]):
+                    continue
+                if any(x is not None and y not in x for x, y in zip(topics, log["topics"])):
+                    continue
+                logs.append(log)
+                if len(logs) > self.max_logs:
+                    raise RPCError(f"query returned more than {self.max_logs} results", code=-32005)
+        return logs
+
+    def _rpc_new_pending_transaction_filter(self) -> str:
+        filter_id = hex(next(self._filter_ids))
+        self._pending_filters[filter_id] = []
+        return filter_id
+
+    def _rpc_get_filter_changes(self, filter_id: str) -> List[str]:
+        if filter_id not in self._pending_filters:
+            raise RPCError("filter not found")
+        hashes = self._pending_filters[filter_id]
+        self._pending_filters[filter_id] = []
+        return hashes
+
+    def _rpc_uninstall_filter(self, filter_id: str) -> bool:
+        return self._pending_filters.pop(filter_id, None) is not None
+
+    def __str__(self):
+        return f"<SimulatedChain chain_id={self.chain_id} block={self.block_number} contracts={len(self.contracts)}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class SimulatorProvider(JSONBaseProvider):
+    """
+    Sync web3 provider answering requests in-process from SimulatedChain
+    """
+
+    def __init__(self, chain: SimulatedChain):
+        super().__init__()
+        self.chain = chain
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        # Round trip through JSON like real provider, e.g. HexBytes params become hex strings
+        request = json.loads(self.encode_rpc_request(method, params))
+        return self.chain.handle(request)
+
+    def isConnected(self) -> bool:
+        return True
+
+
+def network_chain(
+        network: Network,
+        routers: List[str] = None,
+        reserve: int = 10**24,
+        accounts: List[str] = None,
+        balance: int = 10**22,
+        **kwargs,
+) -> SimulatedChain:
+    """
+    Chain with network tokens and routers at their real addresses, so network configuration works unchanged
+
+    Every router gets pairs of all token combinations. Reserves differ slightly between routers so that prices
+    differ too. Accounts get native and token balance.
+    """
+    chain = SimulatedChain(chain_id=network.chain_id, **kwargs)
+    tokens = []
+    for symbol, address in network.tokens.items():
+        wrapped = to_normalized_address(address) == to_normalized_address(network.wrapped_native_token)
+        tokens.append(chain.add_token(symbol, address=address, wrapped=wrapped,
+                                      decimals=network.native_token_decimals if wrapped else 18))
+    if to_normalized_address(network.wrapped_native_token) not in chain.contracts:
+        tokens.append(chain.add_token("WRAPPED", address=network.wrapped_native_token, wrapped=True))
+    for index, name in enumerate(routers or list(network.routers)[:1]):
+        router = chain.add_router(network.wrapped_native_token, address=network.routers.get(name, name))
+        for token0, token1 in itertools.combinations(tokens, 2):
+            chain.add_pair(router, token0, token1, reserve, reserve * (1000 + 3 * index) // 1000)
+    for account in accounts or []:
+        chain.set_balance(account, balance)
+        for token in tokens:
+            chain.mint(token, account, balance)
+    return chain
@@ -0,0 +1,127 @@
+"""
+Block pinned snapshots
+
+Contract reads inside snapshot context are made at the same block and identical calls are made only once.
+
+    with snapshot(client.w3):
+        router.get_amount_out(...)
+        router.get_reserves(...)
+
+    async with async_snapshot(client.w3):
+        await router.get_amount_out(...)
+
+Snapshot is stored in context variable, asyncio tasks created inside context inherit it, threads don't.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+_current_snapshot = contextvars.ContextVar("snapshot", default=None)
+
+
+def _freeze(value):
+    """
+    Hashable presentation of function arguments
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(x) for x in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def call_key(address, function_name: str, args=(), kwargs=None, tx_kwargs=None) -> Optional[tuple]:
+    """
+    Memoization key for contract call, None if arguments are not hashable
+    """
+    key = (address, function_name, _freeze(args), _freeze(kwargs or {}), _freeze(tx_kwargs or {}))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class Snapshot(object):
+    def __init__(self, block_number: int):
+        self.block_number = block_number
+        self._results: Dict[tuple, Any] = {}
+        self._tasks: Dict[tuple, asyncio.Future] = {}
+        self.calls = 0
+        self.hits = 0
+
+    def call(self, function, **kwargs):
+        """
+        Call web3 ContractFunction at snapshot block
+        """
+        key = call_key(function.address, function.fn_name, function.args, function.kwargs, kwargs)
+        if key is not None and key in self._results:
+            self.hits += 1
+            return self._results[key]
+        self.calls += 1
+        result = function.call(block_identifier=self.block_number, **kwargs)
+        if key is not None:
+            self._results[key] = result
+        return result
+
+    async def async_call(self, key: Optional[tuple], call: Callable[[], Awaitable]):
+        """
+        Await call() once per key, concurrent callers with same key share one request
+        """
+        if key is None:
+            self.calls += 1
+            return await call()
+        task = self._tasks.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            self._tasks[key] = task
+        else:
+            self.hits += 1
+        try:
+            return await task
+        except Exception:
+            # Don't memoize failures
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+            raise
+
+    def __str__(self):
+        return f"<Snapshot block={self.block_number} calls={self.calls} hits={self.hits}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def current_snapshot() -> Optional[Snapshot]:
+    return _current_snapshot.get()
+
+
+@contextlib.contextmanager
+def snapshot(w3=None, block_number: int = None):
+    """
+    Pin sync contract reads to block_number, default is latest block of w3
+    """
+    if block_number is None:
+        block_number = w3.eth.block_number
+    token = _current_snapshot.set(Snapshot(block_number))
+    try:
+        yield _current_snapshot.get()
+    finally:
+        _current_snapshot.reset(token)
+
+
+@contextlib.asynccontextmanager
+async def async_snapshot(w3=None, block_number: int = None):
+    """
+    Pin async contract reads to block_number, default is latest block of async w3
+    """
+    if block_number is None:
+        block_number = await w3.eth.block_number
+    token = _current_snapshot.set(Snapshot(block_number))
+    try:
+        yield _current_snapshot.get()
+    finally:
+        _current_snapshot.reset(token)
@@ -0,0 +1,177 @@
+"""
+Router swap call decoder
+
+Swap functions of the router ABI are compiled once to a selector table of argument word positions, so decoding
+a transaction input is a dict lookup and a few slices instead of searching and ABI decoding with web3.
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from eth_utils import function_abi_to_4byte_selector, to_checksum_address
+
+from blockchain.contract import get_abi
+
+
+WORD = 32
+
+
+@lru_cache(maxsize=16384)
+def _to_address(word: bytes) -> str:
+    return to_checksum_address(word[12:])
+
+
+class SwapIntent(object):
+    """
+    Decoded router swap call
+
+    amount_in is exact input amount or max input amount and amount_out is min output amount or exact output amount
+    depending on exact_input. Native token input amount is the transaction value.
+    """
+
+    def __init__(
+            self,
+            function: str,
+            exact_input: bool,
+            amount_in: int,
+            amount_out: int,
+            path: List[str],
+            to: str,
+            deadline: int,
+            router: str = None,
+            tx_hash: str = None,
+            sender: str = None,
+            gas_price: int = None,
+            nonce: int = None,
+    ):
+        self.function = function
+        self.exact_input = exact_input
+        self.amount_in = amount_in
+        self.amount_out = amount_out
+        self.path = path
+        self.to = to
+        self.deadline = deadline
+        self.router = router
+        self.tx_hash = tx_hash
+        self.sender = sender
+        self.gas_price = gas_price
+        self.nonce = nonce
+
+    @property
+    def token_in(self) -> str:
+        return self.path[0]
+
+    @property
+    def token_out(self) -> str:
+        return self.path[-1]
+
+    def __str__(self):
+        return f"<SwapIntent {self.function} {self.amount_in} {self.token_in} -> {self.amount_out} {self.token_out}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class _SwapLayout(object):
+    """
+    Argument word positions of single swap function
+    """
+
+    def __init__(self, abi: Dict):
+        self.function = abi["name"]
+        names = [x["name"] for x in abi["inputs"]]
+        self.words = len(names)
+        self.native_in = abi.get("stateMutability") == "payable" or abi.get("payable", False)
+        self.exact_input = "amountIn" in names or (self.native_in and "amountOutMin" in names)
+        self.amount_in = names.index("amountIn") if "amountIn" in names else \
+            names.index("amountInMax") if "amountInMax" in names else None
+        self.amount_out = names.index("amountOutMin") if "amountOutMin" in names else names.index("amountOut")
+        self.path = names.index("path")
+        self.to = names.index("to")
+        self.deadline = names.index("deadline")
+
+
+class SwapDecoder(object):
+
+    def __init__(self, abi: List[Dict] = None, routers: Iterable[str] = None):
+        """
+        :param abi: router ABI, defaults to PancakeRouterV2
+        :param routers: only decode transactions to these router addresses, default is to decode all
+        """
+        if abi is None:
+            abi = get_abi("PancakeRouterV2")
+        self.routers = set(routers) if routers is not None else None
+        self._table: Dict[str, _SwapLayout] = {}
+        for function in abi:
+            if function.get("type") != "function" or not function["name"].startswith("swap"):
+                continue
+            selector = "0x" + function_abi_to_4byte_selector(function).hex()
+            self._table[selector] = _SwapLayout(function)
+
+    @property
+    def selectors(self) -> Dict[str, str]:
+        return {selector: layout.function for selector, layout in self._table.items()}
+
+    def decode(self, data: bytes, value: int = 0) -> Optional[SwapIntent]:
+        """
+        Decode swap call input, return None if it is not swap call or is malformed
+        """
+        layout = self._table.get("0x" + data[:4].hex())
+        if layout is None:
+            return None
+        return self._decode(layout, data, value)
+
+    def _decode(self, layout: _SwapLayout, data: bytes, value: int) -> Optional[SwapIntent]:
+        args = data[4:]
+        if len(args) < layout.words * WORD:
+            return None
+        path_offset = int.from_bytes(args[layout.path * WORD:(layout.path + 1) * WORD], 'big')
+        path_length = int.from_bytes(args[path_offset:path_offset + WORD], 'big')
+        path_start = path_offset + WORD
+        if path_length < 2 or len(args) < path_start + path_length * WORD:
+            return None
+        path = [_to_address(args[path_start + i * WORD:path_start + (i + 1) * WORD]) for i in range(path_length)]
+        if layout.amount_in is None:
+            amount_in = value
+        else:
+            amount_in = int.from_bytes(args[layout.amount_in * WORD:(layout.amount_in + 1) * WORD], 'big')
+        return SwapIntent(
+            function=layout.function,
+            exact_input=layout.exact_input,
+            amount_in=amount_in,
+            amount_out=int.from_bytes(args[layout.amount_out * WORD:(layout.amount_out + 1) * WORD], 'big'),
+            path=path,
+            to=_to_address(args[layout.to * WORD:(layout.to + 1) * WORD]),
+            deadline=int.from_bytes(args[layout.deadline * WORD:(layout.deadline + 1) * WORD], 'big'),
+        )
+
+    def decode_transaction(self, tx: Dict) -> Optional[SwapIntent]:
+        """
+        Decode transaction dict as returned by eth_getTransactionByHash
+        """
+        if self.routers is not None and tx.get("to") not in self.routers:
+            return None
+        data = tx.get("input") or tx.get("data")
+        if not data:
+            return None
+        if isinstance(data, str):
+            # Check selector before converting the whole input
+            layout = self._table.get(data[:10])
+            if layout is None:
+                return None
+            data = bytes.fromhex(data[2:])
+        else:
+            data = bytes(data)
+            layout = self._table.get("0x" + data[:4].hex())
+            if layout is None:
+                return None
+        intent = self._decode(layout, data, tx.get("value", 0))
+        if intent is None:
+            return None
+        tx_hash = tx.get("hash")
+        intent.router = tx.get("to")
+        intent.tx_hash = tx_hash.hex() if isinstance(tx_hash, bytes) else tx_hash
+        intent.sender = tx.get("from")
+        intent.gas_price = tx.get("gasPrice")
+        intent.nonce = tx.get("nonce")
+        return intent
@@ -1 +1 @@
-from .lru import LRUDict
+from .cache import Cache, CacheStats
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+_MISSING = object()
+
+
+class CacheStats(object):
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __str__(self):
+        return f"<CacheStats hits={self.hits} misses={self.misses} evictions={self.evictions} " \
+               f"expirations={self.expirations}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class _Flight(object):
+    """
+    Load in progress in some thread
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.exception = None
+
+
+class Cache(object):
+    """
+    LRU cache with optional TTL
+
+    Concurrent misses of the same key are collapsed into one load, both for threads using get_or_load and
+    coroutines using async_get_or_load. Failed loads are not cached.
+    """
+
+    def __init__(self, max_size: int = 100, ttl: Optional[float] = None, timer: Callable[[], float] = time.monotonic):
+        if max_size <= 0:
+            raise ValueError("Invalid cache length")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("Invalid cache ttl")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._timer = timer
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._async_flights: Dict[Hashable, asyncio.Future] = {}
+
+    def _get(self, key):
+        """
+        Return value or _MISSING, caller holds the lock
+        """
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            return _MISSING
+        expires, value = item
+        if expires is not None and expires <= self._timer():
+            del self._data[key]
+            self.stats.expirations += 1
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._get(key)
+            if value is _MISSING:
+                self.stats.misses += 1
+                return default
+            self.stats.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            expires = None
+            if self.ttl is not None:
+                expires = self._timer() + self.ttl
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._get(key) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_or_load(self, key, loader: Callable[[], Any]):
+        """
+        Return cached value or load it, threads missing the same key wait for single load
+        """
+        with self._lock:
+            value = self._get(key)
+            if value is not _MISSING:
+                self.stats.hits += 1
+                return value
+            self.stats.misses += 1
+            flight = self._flights.get(key)
+            owner = flight is None
+            if owner:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not owner:
+            flight.event.wait()
+            if flight.exception is not None:
+                raise flight.exception
+            return flight.value
+
+        try:
+            flight.value = loader()
+            self.set(key, flight.value)
+            return flight.value
+        except BaseException as exc:
+            flight.exception = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+    async def async_get_or_load(self, key, loader: Callable[[], Awaitable[Any]]):
+        """
+        Return cached value or await loader, coroutines missing the same key await single load
+
+        If the coroutine loading the value is cancelled, waiters retry the load instead of being cancelled.
+        """
+        while True:
+            with self._lock:
+                value = self._get(key)
+                if value is not _MISSING:
+                    self.stats.hits += 1
+                    return value
+                self.stats.misses += 1
+                future = self._async_flights.get(key)
+                owner = future is None
+                if owner:
+                    future = asyncio.get_event_loop().create_future()
+                    self._async_flights[key] = future
+
+            if owner:
+                break
+            try:
+                # shield so cancelling one waiter doesn't cancel the load of the others
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    # This waiter was cancelled
+                    raise
+
+        try:
+            value = await loader()
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Exception is re-raised here, mark it retrieved in case nobody else waits
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                del self._async_flights[key]
+
+    def __str__(self):
+        return f"<Cache {len(self)}/{self.max_size} ttl={self.ttl} {self.stats}>"
+
+    def __repr__(self):
+        return self.__str__()
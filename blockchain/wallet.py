@@ -0,0 +1,261 @@
+"""
+Multi-account wallet
+
+Every account has its own nonce lane, transactions of one account are signed and sent in nonce order while
+lanes of different accounts run in parallel. Submitted transactions go to the least loaded account, so one
+account's pending transaction limit doesn't cap throughput.
+"""
+
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from eth_account.datastructures import SignedTransaction
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from . import keyutils
+from .client import Client
+from .exceptions import BlockchainException
+from .networks import Network
+
+
+logger = logging.getLogger(__name__)
+
+# Sign function gets account client and nonce
+SignFunction = Callable[[Client, int], SignedTransaction]
+
+
+class AccountLane(object):
+    """
+    Nonce lane of one account
+    """
+
+    def __init__(self, client: Client, max_in_flight: int):
+        self.client = client
+        self.max_in_flight = max_in_flight
+        # Held while signing and sending so that nonces are sent in order
+        self.lock = threading.Lock()
+        self._next_nonce: Optional[int] = None
+        # Transaction hash -> nonce of sent transactions without receipt
+        self.in_flight: Dict[str, int] = {}
+        # Slots reserved by scheduler but not sent yet
+        self.reserved = 0
+        self.sent = 0
+
+    @property
+    def address(self) -> str:
+        return self.client.public_key
+
+    @property
+    def load(self) -> int:
+        return len(self.in_flight) + self.reserved
+
+    def next_nonce(self) -> int:
+        if self._next_nonce is None:
+            self._next_nonce = self.client.w3.eth.get_transaction_count(self.address, "pending")
+        return self._next_nonce
+
+    def send(self, sign: SignFunction) -> Optional[str]:
+        with self.lock:
+            nonce = self.next_nonce()
+            try:
+                signed = sign(self.client, nonce)
+                tx_hash = self.client.send_transaction(signed)
+            except Exception:
+                # Node might have seen the nonce or not, read it again before next transaction
+                self._next_nonce = None
+                raise
+            self._next_nonce = nonce + 1
+            self.sent += 1
+            if tx_hash:
+                self.in_flight[tx_hash] = nonce
+            return tx_hash
+
+    def __str__(self):
+        return f"<AccountLane {self.address} in_flight={len(self.in_flight)} sent={self.sent}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class Wallet(object):
+    """
+    Many accounts on same network
+    """
+
+    def __init__(
+            self,
+            accounts: List[Tuple[bytes, str]],
+            network: Network = None,
+            w3: Web3 = None,
+            test_mode: bool = True,
+            max_in_flight: int = 16,
+            thread_limit: int = None,
+            **client_kwargs,
+    ):
+        """
+        :param accounts: (private_key, public_key) tuples
+        :param max_in_flight: max sent transactions without receipt per account
+        """
+        if not accounts:
+            raise BlockchainException("Wallet needs at least one account")
+        self.lanes: List[AccountLane] = []
+        for private_key, public_key in accounts:
+            client = Client(
+                public_key=public_key,
+                private_key=private_key,
+                network=network,
+                test_mode=test_mode,
+                w3=w3,
+                **client_kwargs,
+            )
+            # All accounts share first client's provider
+            w3 = client.w3
+            self.lanes.append(AccountLane(client, max_in_flight=max_in_flight))
+        self.w3 = w3
+        self.network = self.lanes[0].client.network
+        self._condition = threading.Condition()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=thread_limit or len(self.lanes) * 2)
+
+    @classmethod
+    def from_keyfiles(cls, keyfiles: List[str], **kwargs) -> "Wallet":
+        """
+        Decrypt keyfiles in parallel, see keyutils.get_keyfiles
+        """
+        return cls(keyutils.get_keyfiles(keyfiles), **kwargs)
+
+    @property
+    def addresses(self) -> List[str]:
+        return [x.address for x in self.lanes]
+
+    def _reserve_lane(self, timeout: float, poll_latency: float) -> AccountLane:
+        """
+        Least loaded account with free slot, waits for receipts when all accounts are full
+        """
+        deadline = time.time() + timeout
+        while True:
+            with self._condition:
+                lane = min(self.lanes, key=lambda x: x.load)
+                if lane.load < lane.max_in_flight:
+                    lane.reserved += 1
+                    return lane
+            if time.time() > deadline:
+                raise BlockchainException(f"All accounts have {lane.max_in_flight} transactions in flight")
+            if not self.poll():
+                time.sleep(poll_latency)
+
+    def _send(self, lane: AccountLane, sign: SignFunction) -> Tuple[str, Optional[str]]:
+        try:
+            tx_hash = lane.send(sign)
+        finally:
+            with self._condition:
+                lane.reserved -= 1
+        return lane.address, tx_hash
+
+    def submit(self, sign: SignFunction, timeout: float = 180, poll_latency: float = 1) -> concurrent.futures.Future:
+        """
+        Sign and send transaction from least loaded account
+
+        Future result is (address, tx hash), tx hash is None in test mode.
+        """
+        lane = self._reserve_lane(timeout=timeout, poll_latency=poll_latency)
+        return self._pool.submit(self._send, lane, sign)
+
+    def submit_native(self, to_address: str, amount: int, gas_price: int = None,
+                      gas_estimate: int = 21000) -> concurrent.futures.Future:
+        """
+        Send native token, gas_price in gwei
+        """
+        def sign(client: Client, nonce: int) -> SignedTransaction:
+            tx = client.raw_transaction(
+                value=amount,
+                gas_estimate=gas_estimate,
+                nonce=nonce,
+                to=Web3.toChecksumAddress(to_address),
+                gas_price=gas_price if gas_price else Web3.fromWei(client.get_gas_price(), "gwei"),
+            )
+            return client.w3.eth.account.sign_transaction(tx, client.private_key)
+        return self.submit(sign)
+
+    def submit_contract(self, build: Callable[[Client], object], gas_estimate: int, gas_price: int = None,
+                        value: int = None) -> concurrent.futures.Future:
+        """
+        Send contract transaction built by build(client), gas_price in gwei
+        """
+        def sign(client: Client, nonce: int) -> SignedTransaction:
+            wei_price = Web3.toWei(gas_price, "gwei") if gas_price else client.get_gas_price()
+            return client._sign_contract_transaction(
+                build(client), gas_estimate=gas_estimate, gas_price=wei_price, nonce=nonce, value=value
+            )
+        return self.submit(sign)
+
+    def _get_receipt(self, tx_hash: str):
+        try:
+            return self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    def poll(self) -> int:
+        """
+        Check receipts of in flight transactions, returns number of transactions mined
+        """
+        in_flight = [(lane, tx_hash) for lane in self.lanes for tx_hash in list(lane.in_flight)]
+        receipts = self._pool.map(self._get_receipt, [x[1] for x in in_flight])
+        mined = 0
+        with self._condition:
+            for (lane, tx_hash), receipt in zip(in_flight, receipts):
+                if receipt is None:
+                    continue
+                if receipt["status"] != 1:
+                    logger.warning(f"Transaction {tx_hash} from {lane.address} failed")
+                lane.in_flight.pop(tx_hash, None)
+                mined += 1
+        return mined
+
+    def wait(self, timeout: float = 180, poll_latency: float = 1):
+        """
+        Wait until all sent transactions are mined
+        """
+        deadline = time.time() + timeout
+        while self.get_in_flight_count():
+            if time.time() > deadline:
+                raise BlockchainException(f"{self.get_in_flight_count()} transactions not mined in {timeout} seconds")
+            if not self.poll():
+                time.sleep(poll_latency)
+
+    def get_in_flight(self) -> Dict[str, List[str]]:
+        """
+        Hashes of transactions without receipt by account
+        """
+        with self._condition:
+            return {x.address: list(x.in_flight) for x in self.lanes}
+
+    def get_in_flight_count(self) -> int:
+        with self._condition:
+            return sum(len(x.in_flight) for x in self.lanes)
+
+    def get_balances(self, token_address: str = None) -> Dict[str, int]:
+        """
+        Raw balance of every account, default is native token
+        """
+        if token_address is None:
+            balances = self._pool.map(self.w3.eth.get_balance, self.addresses)
+        else:
+            token = self.lanes[0].client.get_token(token_address)
+            balances = self._pool.map(token.balanceOf, self.addresses)
+        return dict(zip(self.addresses, balances))
+
+    def get_total_balance(self, token_address: str = None) -> int:
+        return sum(self.get_balances(token_address).values())
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __str__(self):
+        return f"<Wallet accounts={len(self.lanes)} in_flight={self.get_in_flight_count()}>"
+
+    def __repr__(self):
+        return self.__str__()
@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
+import asyncio
 import json
 import logging
+import sys
 
 import web3
 from eth_utils import encode_hex, function_abi_to_4byte_selector
 from web3 import Web3
 
 from blockchain import client, keyutils, networks
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.storage import StorageReader, mapping_slot
 from blockchain.contract import Contract, read_abi_file
+from blockchain.selector_db import SelectorDatabase, decode_lines
 
 import argparse
 
@@ -34,6 +39,29 @@ def find_selector(args):
     print("{}({})".format(function.abi["name"], ','.join([x["type"] for x in function.abi["inputs"]])))
 
 
+def lookup_selector(args):
+    database = SelectorDatabase(args.abi_dir)
+    function = database.get(args.selector)
+    if function is None:
+        print(f"Selector {args.selector} not found from {len(database)} functions")
+        sys.exit(1)
+    print(f"{function.signature} {function.source}")
+
+
+def decode(args):
+    if args.input == "-":
+        lines = sys.stdin
+    else:
+        lines = open(args.input, 'r')
+    try:
+        for line in decode_lines(lines, directories=args.abi_dir, max_workers=args.workers,
+                                 chunk_size=args.chunk_size):
+            sys.stdout.write(line + "\n")
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+
 def map_function_args(f, call_args):
     mapped_args = {}
     list_args = []
@@ -167,6 +195,53 @@ def storage_at(args):
     print(my_client.w3.eth.get_storage_at(my_client.w3.toChecksumAddress(args.address), int(args.at)).hex())
 
 
+def parse_slot_range(value):
+    """
+    Parse START:END (inclusive) slot range, numbers can be decimal or hex
+    """
+    start, _, end = value.partition(":")
+    start = int(start, 0)
+    end = int(end, 0) if end else start
+    if end < start:
+        raise ValueError(f"Invalid slot range {value}")
+    return range(start, end + 1)
+
+
+async def async_storage_dump(args):
+    my_client = AsyncClient(
+        public_key=networks.binance.BURN,
+        private_key="",
+        network=networks.get_network_by_name(args.network),
+    )
+    address = Web3.toChecksumAddress(args.address)
+    block = args.block
+    if block is None:
+        block = await my_client.w3.eth.block_number
+
+    slots = []
+    mapping_keys = {}
+    for value in args.range:
+        slots.extend(parse_slot_range(value))
+    for value in args.mapping:
+        slot, _, key = value.partition(":")
+        key_slot = mapping_slot(int(slot, 0), key)
+        mapping_keys[key_slot] = {"mapping": int(slot, 0), "key": key}
+        slots.append(key_slot)
+
+    reader = StorageReader(my_client, batch_size=args.batch_size, concurrency=args.concurrency)
+    async for slot, value in reader.read_slots(address, slots, block=block):
+        record = {"block": block, "slot": hex(slot), "value": value.hex()}
+        record.update(mapping_keys.get(slot, {}))
+        sys.stdout.write(json.dumps(record) + "\n")
+
+
+def storage_dump(args):
+    if not args.range and not args.mapping:
+        print("Give at least one --range or --mapping")
+        sys.exit(1)
+    asyncio.run(async_storage_dump(args))
+
+
 def deploy(args):
     private_key, public_key = keyutils.get_keyfile(args.keyfile)
     my_client = client.Client(
@@ -216,6 +291,19 @@ def main():
     find_selector_parser.add_argument("function")
     find_selector_parser.set_defaults(func=find_selector)
 
+    lookup_parser = subparsers.add_parser("lookup", help="Find function by selector from all known ABIs")
+    lookup_parser.add_argument("--abi-dir", action="append", default=[], help="Additional ABI directory")
+    lookup_parser.add_argument("selector")
+    lookup_parser.set_defaults(func=lookup_selector)
+
+    decode_parser = subparsers.add_parser("decode", help="Decode calldata lines to NDJSON")
+    decode_parser.add_argument("--abi-dir", action="append", default=[], help="Additional ABI directory")
+    decode_parser.add_argument("--workers", default=None, type=int, help="Worker processes, default is CPU count")
+    decode_parser.add_argument("--chunk-size", default=1000, type=int, help="Lines per worker task")
+    decode_parser.add_argument("input", nargs="?", default="-",
+                               help="File of hex calldata or JSON objects with input field, default is stdin")
+    decode_parser.set_defaults(func=decode)
+
     call_function_parser = subparsers.add_parser("call")
     call_function_parser.add_argument("network", choices=networks.NETWORKS.keys())
     call_function_parser.add_argument("contract_json")
@@ -254,6 +342,17 @@ def main():
     storage_parser.add_argument("at")
     storage_parser.set_defaults(func=storage_at)
 
+    storage_dump_parser = subparsers.add_parser("storage-dump", help="Dump storage slots as NDJSON")
+    storage_dump_parser.add_argument("network", choices=networks.NETWORKS.keys())
+    storage_dump_parser.add_argument("address")
+    storage_dump_parser.add_argument("--range", action="append", default=[], help="Slot range START[:END], inclusive")
+    storage_dump_parser.add_argument("--mapping", action="append", default=[],
+                                     help="Mapping value SLOT:KEY, key is integer or hex (address, bytes32)")
+    storage_dump_parser.add_argument("--block", default=None, type=int, help="Block to read, default is latest")
+    storage_dump_parser.add_argument("--batch-size", default=100, type=int, help="Slots per JSON-RPC batch")
+    storage_dump_parser.add_argument("--concurrency", default=10, type=int, help="Max batches in flight")
+    storage_dump_parser.set_defaults(func=storage_dump)
+
     deploy_parser = subparsers.add_parser("deploy")
     # execute_parser.add_argument("--test-mode", default=False, action="store_true")
     deploy_parser.add_argument("--keyfile", required=True, help="Keyfile path")
@@ -264,8 +363,7 @@ def main():
     deploy_parser.add_argument("args", nargs="*", type=str, help="Optional function arguments")
     deploy_parser.set_defaults(func=deploy)
 
-
-args = parser.parse_args()
+    args = parser.parse_args()
 
     args.func(args)
 
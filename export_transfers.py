@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import sys
+
+from web3 import Web3
+
+from blockchain import networks
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.transfer_export import WRITERS, BlockRangeChunker, TransferExporter
+from blockchain.event_decoder import EventDecoder
+from blockchain.networks import binance
+
+
+async def export(args, f):
+    network = networks.get_network_by_name(args.network)
+    client = AsyncClient(
+        public_key=binance.BURN,
+        private_key="",
+        network=network,
+    )
+    writer = WRITERS[args.format](f, EventDecoder.from_abi("token", args.event))
+    chunker = BlockRangeChunker(size=args.range, max_size=args.max_range, target_logs=args.target_logs)
+    exporter = TransferExporter(client, writer, concurrency=args.concurrency, chunker=chunker, retries=args.retries)
+    try:
+        end_block = args.end
+        if end_block is None:
+            end_block = await client.w3.eth.block_number
+        token = Web3.toChecksumAddress(network.tokens.get(args.token, args.token))
+        count = await exporter.export(token, start_block=args.start, end_block=end_block)
+    finally:
+        await client.close()
+    print(f"{count} {args.event} logs of {token} exported", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser("Export ERC-20 token Transfer or Approval logs")
+    parser.add_argument("--network", required=True, choices=networks.NETWORKS.keys(), help="Network to operate on")
+    parser.add_argument("--output", default="-", help="Output file, default is stdout")
+    parser.add_argument("--format", default="ndjson", choices=WRITERS.keys(), help="Output format")
+    parser.add_argument("--event", default="Transfer", choices=["Transfer", "Approval"], help="Event to export")
+    parser.add_argument("--start", default=0, type=int, help="First block")
+    parser.add_argument("--end", default=None, type=int, help="Last block, default is latest block")
+    parser.add_argument("--range", default=1000, type=int, help="Initial eth_getLogs block range")
+    parser.add_argument("--max-range", default=100000, type=int, help="Max eth_getLogs block range")
+    parser.add_argument("--target-logs", default=2000, type=int, help="Wanted number of logs per eth_getLogs")
+    parser.add_argument("--concurrency", default=8, type=int, help="Max concurrent requests")
+    parser.add_argument("--retries", default=5, type=int, help="Retries per failed request")
+    parser.add_argument("token", help="Token address or name")
+
+    args = parser.parse_args()
+
+    if args.output == "-":
+        asyncio.run(export(args, sys.stdout.buffer))
+    else:
+        with open(args.output, 'wb') as f:
+            asyncio.run(export(args, f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+
+from blockchain import networks
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.mempool import PendingSwapStream
+from blockchain.networks import binance
+from blockchain.swap_decoder import SwapDecoder
+
+
+async def watch(args):
+    client = AsyncClient(
+        public_key=binance.BURN,
+        private_key="",
+        network=networks.get_network_by_name(args.network),
+    )
+    routers = client.network.routers
+    if args.router:
+        routers = {name: routers[name] for name in args.router}
+    stream = PendingSwapStream(
+        client,
+        decoder=SwapDecoder(routers=routers.values()),
+        poll_interval=args.poll_interval,
+        concurrency=args.concurrency,
+    )
+    async for intent in stream.swaps():
+        print(f"{intent.tx_hash} {intent.router} {intent.function} {intent.amount_in} {intent.amount_out} "
+              f"{' -> '.join(intent.path)}")
+
+
+def main():
+    parser = argparse.ArgumentParser("Decode pending router swaps")
+    parser.add_argument("--network", required=True, choices=networks.NETWORKS.keys(), help="Network to operate on")
+    parser.add_argument("--router", action="append", default=None, help="Router name, default is all known routers")
+    parser.add_argument("--poll-interval", default=0.2, type=float, help="Pending filter poll interval in seconds")
+    parser.add_argument("--concurrency", default=100, type=int, help="Max concurrent transaction requests")
+
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(watch(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+
+from web3 import Web3
+
+from blockchain import networks
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.pair_indexer import PairIndexer
+from blockchain.async_web3.router_client import get_async_router
+from blockchain.networks import binance
+from blockchain.pair_index import PairDatabase
+
+
+async def get_routers(client, router_names):
+    routers = client.network.routers
+    if router_names:
+        routers = {name: routers[name] for name in router_names}
+    return await asyncio.gather(*[
+        get_async_router(client=client, contract_address=address, abi_file="PancakeRouterV2")
+        for address in routers.values()
+    ])
+
+
+async def index(args, database):
+    client = AsyncClient(
+        public_key=binance.BURN,
+        private_key="",
+        network=networks.get_network_by_name(args.network),
+    )
+    indexer = PairIndexer(client, database, batch_size=args.batch_size, concurrency=args.concurrency)
+    routers = await get_routers(client, args.router)
+    await indexer.index_routers(routers)
+    if args.follow:
+        await indexer.follow(routers)
+
+
+async def find_path(args, database):
+    client = AsyncClient(
+        public_key=binance.BURN,
+        private_key="",
+        network=networks.get_network_by_name(args.network),
+    )
+    routers = await get_routers(client, args.router)
+    token_from = Web3.toChecksumAddress(args.token_from)
+    token_to = Web3.toChecksumAddress(args.token_to)
+    for router in routers:
+        factory = await router.get_factory()
+        for path in database.find_paths(factory.address, token_from, token_to, max_hops=args.max_hops):
+            print(f"{router.address} {' -> '.join(path)}")
+
+
+def main():
+    parser = argparse.ArgumentParser("Index router factory pairs")
+    parser.add_argument("--network", required=True, choices=networks.NETWORKS.keys(), help="Network to operate on")
+    parser.add_argument("--database", required=True, help="Pair database path")
+    parser.add_argument("--router", action="append", default=None, help="Router name, default is all known routers")
+
+    subparsers = parser.add_subparsers(dest='action')
+    subparsers.required = True
+    index_parser = subparsers.add_parser("index")
+    index_parser.add_argument("--follow", action="store_true", default=False, help="Keep indexing new pairs")
+    index_parser.add_argument("--batch-size", default=500, type=int, help="Pairs stored per batch")
+    index_parser.add_argument("--concurrency", default=50, type=int, help="Max concurrent requests")
+    index_parser.set_defaults(func=index)
+
+    path_parser = subparsers.add_parser("path")
+    path_parser.add_argument("--max-hops", default=3, type=int, help="Max pairs in path")
+    path_parser.add_argument("token_from")
+    path_parser.add_argument("token_to")
+    path_parser.set_defaults(func=find_path)
+
+    args = parser.parse_args()
+
+    database = PairDatabase(args.database)
+    try:
+        asyncio.run(args.func(args, database))
+    finally:
+        database.close()
+
+
+if __name__ == '__main__':
+    main()
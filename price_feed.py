@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import sys
+from decimal import Decimal
+
+from web3 import Web3
+
+from blockchain import networks
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.price_feed import PriceFeedPair, PriceFeedService, subscribe
+
+
+def parse_pair(network, value) -> PriceFeedPair:
+    """
+    Parse ROUTER:TOKEN0:TOKEN1[:AMOUNT], router and tokens can be names of known routers and tokens
+    """
+    parts = value.split(":")
+    if len(parts) not in [3, 4]:
+        print(f"Invalid pair {value}, expected ROUTER:TOKEN0:TOKEN1[:AMOUNT]")
+        sys.exit(1)
+    router = network.routers.get(parts[0], parts[0])
+    token0 = network.tokens.get(parts[1], parts[1])
+    token1 = network.tokens.get(parts[2], parts[2])
+    amount = Decimal(parts[3]) if len(parts) == 4 else Decimal("1")
+    return PriceFeedPair(
+        router=Web3.toChecksumAddress(router),
+        token0=Web3.toChecksumAddress(token0),
+        token1=Web3.toChecksumAddress(token1),
+        amount=amount,
+    )
+
+
+async def serve(args):
+    network = networks.get_network_by_name(args.network)
+    client = AsyncClient(
+        public_key=networks.binance.BURN,
+        private_key="",
+        network=network,
+    )
+    service = PriceFeedService(
+        client,
+        pairs=[parse_pair(network, x) for x in args.pair],
+        socket_path=args.socket,
+        poll_interval=args.poll_interval,
+    )
+    await service.run()
+
+
+async def print_updates(args):
+    async for update in subscribe(args.socket):
+        for router, token0, token1, reference_token, price in update["prices"]:
+            print(f"{update['block']} {router} {token0} {token1} {price} {reference_token}")
+
+
+def main():
+    parser = argparse.ArgumentParser("Local price feed")
+    parser.add_argument("--socket", required=True, help="Unix socket path")
+
+    subparsers = parser.add_subparsers(dest='action')
+    subparsers.required = True
+    serve_parser = subparsers.add_parser("serve")
+    serve_parser.add_argument("--network", required=True, choices=networks.NETWORKS.keys())
+    serve_parser.add_argument("--poll-interval", default=0.5, type=float, help="New block poll interval in seconds")
+    serve_parser.add_argument("pair", nargs="+", help="ROUTER:TOKEN0:TOKEN1[:AMOUNT]")
+    serve_parser.set_defaults(func=serve)
+
+    subscribe_parser = subparsers.add_parser("subscribe")
+    subscribe_parser.set_defaults(func=print_updates)
+
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(args.func(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
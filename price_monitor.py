@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+import sys
+import time
+from collections import defaultdict
+
+from blockchain import networks
+from blockchain.async_web3.price_monitor import PriceMonitor
+from blockchain.price_table import PriceTable
+from price_feed import parse_pair
+
+
+def serve(args):
+    pairs = defaultdict(list)
+    for value in args.pair:
+        network_name, _, pair = value.partition(":")
+        if network_name not in networks.NETWORKS:
+            print(f"Invalid pair {value}, expected NETWORK:ROUTER:TOKEN0:TOKEN1[:AMOUNT]")
+            sys.exit(1)
+        pairs[network_name].append(parse_pair(networks.get_network_by_name(network_name), pair))
+    monitor = PriceMonitor(pairs, shards=args.shards, poll_interval=args.poll_interval, table_name=args.table)
+    table = monitor.start()
+    print(f"Price table {table.name}, {table.rows} rows, {len(monitor.assignments)} workers")
+    monitor.run()
+
+
+def read(args):
+    table = PriceTable.attach(args.table)
+    try:
+        keys = table.keys()
+        while True:
+            for key, row in zip(keys, table.read_all()):
+                if row is None:
+                    continue
+                print(f"{key.network} {row.block} {key.router} {key.token0} {key.token1} {row.price} "
+                      f"{row.reserve0} {row.reserve1}")
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+    finally:
+        table.close()
+
+
+def main():
+    parser = argparse.ArgumentParser("Multi-process price monitor")
+
+    subparsers = parser.add_subparsers(dest='action')
+    subparsers.required = True
+    serve_parser = subparsers.add_parser("serve", help="Run worker processes writing prices to shared memory table")
+    serve_parser.add_argument("--table", default=None, help="Shared memory table name, default is random name")
+    serve_parser.add_argument("--shards", default=1, type=int, help="Worker processes per network")
+    serve_parser.add_argument("--poll-interval", default=0.5, type=float, help="New block poll interval in seconds")
+    serve_parser.add_argument("pair", nargs="+", help="NETWORK:ROUTER:TOKEN0:TOKEN1[:AMOUNT]")
+    serve_parser.set_defaults(func=serve)
+
+    read_parser = subparsers.add_parser("read", help="Print rows of running price table")
+    read_parser.add_argument("--table", required=True, help="Shared memory table name")
+    read_parser.add_argument("--watch", default=None, type=float, help="Print rows again every N seconds")
+    read_parser.set_defaults(func=read)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        args.func(args)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,115 @@
 #!/usr/bin/env python3
+import collections
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
 from decimal import Decimal
+from typing import Dict, Iterable, Tuple
+
+import rlp
+from eth_account._utils.legacy_transactions import Transaction
+from eth_account._utils.typed_transactions import TypedTransaction
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
 
 from blockchain import client, keyutils, networks
+from blockchain.exceptions import NoBalanceException
 import argparse
 
 
+NATIVE_TRANSFER_GAS = 21000
+
+# Signed transaction restored from journal, quacks like eth_account SignedTransaction for Client.send_transaction
+JournalTransaction = collections.namedtuple("JournalTransaction", ["rawTransaction", "hash"])
+
+# Journal entry statuses
+SIGNED = "signed"
+SENT = "sent"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+
+
+def read_recipients(path: str) -> Iterable[Tuple[int, str, Decimal]]:
+    """
+    Stream (row, address, amount) from CSV (to,amount) or NDJSON ({"to": ..., "amount": ...}) file
+    """
+    with open(path, 'r') as f:
+        if path.endswith(".csv"):
+            for row, line in enumerate(csv.reader(f)):
+                if not line or line[0].strip().lower() == "to":
+                    continue
+                yield row, Web3.toChecksumAddress(line[0].strip()), Decimal(line[1].strip())
+        else:
+            for row, line in enumerate(f):
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                yield row, Web3.toChecksumAddress(entry["to"]), Decimal(str(entry["amount"]))
+
+
+class Journal(object):
+    """
+    Append-only batch payout journal, one JSON object per line. Latest entry of each row wins.
+
+    Signed raw transactions are written before they are sent, resumed run re-sends the exact same transaction
+    so recipient can't be paid twice.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[int, Dict] = {}
+        truncated = False
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Last line of crashed run might be partially written
+                        continue
+                    self.entries[entry["row"]] = entry
+                if f.tell() > 0:
+                    f.seek(f.tell() - 1)
+                    truncated = f.read(1) != "\n"
+        self._file = open(path, 'a')
+        if truncated:
+            self._file.write("\n")
+
+    def write(self, entries: Iterable[Dict]):
+        for entry in entries:
+            self.entries[entry["row"]] = entry
+            self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def by_status(self, status: str) -> Iterable[Dict]:
+        return [x for x in self.entries.values() if x["status"] == status]
+
+    def max_nonce(self):
+        nonces = [x["nonce"] for x in self.entries.values() if "nonce" in x]
+        if not nonces:
+            return None
+        return max(nonces)
+
+    def close(self):
+        self._file.close()
+
+
+def _chunks(items: Iterable, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 class Sender(object):
 
     def __init__(self, **kwargs):
@@ -29,6 +134,248 @@ class Sender(object):
         print("TX hash: {}".format(tx_hash))
         self.client.wait_transaction_success(tx_hash=tx_hash)
 
+    def send_batch(
+            self,
+            path: str,
+            journal_path: str,
+            token_address: str = None,
+            gas_price: int = None,
+            in_flight: int = 64,
+            batch_size: int = 256,
+            timeout: int = 600,
+    ):
+        """
+        Pay recipients listed in path, progress is written to journal_path and finished rows are skipped on rerun
+
+        gas_price in gwei
+        """
+        token = None
+        if token_address:
+            token = self.client.get_token(token_address)
+
+        journal = Journal(journal_path)
+        try:
+            # First pass only sums remaining payments, rows are streamed again when sending
+            remaining_count = 0
+            remaining_amount = 0
+            for row, to_address, amount in read_recipients(path):
+                if row in journal.entries:
+                    continue
+                remaining_count += 1
+                remaining_amount += self._to_raw(token, amount)
+
+            if gas_price:
+                gas_price_wei = self.client.w3.toWei(gas_price, 'gwei')
+            else:
+                gas_price_wei = self.client.get_gas_price()
+
+            gas_estimate = NATIVE_TRANSFER_GAS
+            if token and remaining_count:
+                first_row, first_address, first_amount = next(
+                    x for x in read_recipients(path) if x[0] not in journal.entries
+                )
+                transfer = token.contract.functions.transfer(first_address, self._to_raw(token, first_amount))
+                # Recipients might have different storage state, add margin
+                gas_estimate = int(transfer.estimateGas({"from": self.client.public_key}) * 1.2)
+
+            # Transactions signed but maybe not sent by crashed run are paid from the same balance
+            unsent = journal.by_status(SIGNED)
+            unsent_amount = sum(self._to_raw(token, Decimal(x["amount"])) for x in unsent)
+            unsent_gas_cost = sum(self._signed_gas_cost(x["raw"]) for x in unsent)
+            self._check_batch_balance(
+                token,
+                remaining_amount + unsent_amount,
+                remaining_count * gas_estimate * gas_price_wei + unsent_gas_cost,
+            )
+
+            print(f"Sending {remaining_count} transfers, {len(journal.entries)} rows found from journal")
+
+            pool = ThreadPoolExecutor(max_workers=in_flight)
+            try:
+                if self.client.test_mode:
+                    for entry in unsent:
+                        print(f"Test mode, not re-sending {entry['amount']} to {entry['to']} nonce {entry['nonce']}")
+                else:
+                    # Re-send transactions signed but maybe not sent by crashed run
+                    self._submit_signed(pool, journal, unsent, in_flight)
+
+                nonce = self.client.get_nonce('pending')
+                journal_nonce = journal.max_nonce()
+                if journal_nonce is not None and journal_nonce >= nonce:
+                    nonce = journal_nonce + 1
+
+                new_rows = (x for x in read_recipients(path) if x[0] not in journal.entries)
+                for chunk in _chunks(new_rows, batch_size):
+                    transactions = []
+                    for row, to_address, amount in chunk:
+                        transactions.append(self._build_transfer(
+                            token, to_address, self._to_raw(token, amount), nonce, gas_estimate, gas_price_wei
+                        ))
+                        nonce += 1
+                    signed = self.client.sign_transactions(transactions)
+
+                    entries = []
+                    for (row, to_address, amount), tx, signed_tx in zip(chunk, transactions, signed):
+                        entries.append({
+                            "row": row,
+                            "status": SIGNED,
+                            "to": to_address,
+                            "amount": str(amount),
+                            "nonce": tx["nonce"],
+                            "hash": signed_tx.hash.hex(),
+                            "raw": signed_tx.rawTransaction.hex(),
+                        })
+                    if self.client.test_mode:
+                        for entry in entries:
+                            print(f"Test mode, not sending {entry['amount']} to {entry['to']} nonce {entry['nonce']}")
+                        continue
+                    journal.write(entries)
+                    self._submit_signed(pool, journal, entries, in_flight)
+
+                if self.client.test_mode:
+                    return
+
+                self._confirm(pool, journal, timeout=timeout)
+            finally:
+                pool.shutdown(wait=True)
+
+            failed = journal.by_status(FAILED)
+            print(f"{len(journal.by_status(CONFIRMED))} transfers confirmed, {len(failed)} failed")
+            for entry in failed:
+                print(f"FAILED row {entry['row']} {entry['amount']} to {entry['to']} tx {entry['hash']}")
+        finally:
+            journal.close()
+
+    def _to_raw(self, token, amount: Decimal) -> int:
+        if token:
+            return token.fromDecimals(amount)
+        return self.client.w3.toWei(amount, 'ether')
+
+    def _check_batch_balance(self, token, amount: int, gas_cost: int):
+        native_balance = self.client.w3.eth.get_balance(self.client.public_key)
+        if token:
+            balance = token.balanceOf(self.client.public_key)
+            if balance < amount:
+                raise NoBalanceException(
+                    f"Account balance ({token.toDecimals(balance):.5f}) less than amount " +
+                    f"({token.toDecimals(amount):.5f})"
+                )
+            amount = 0
+        if native_balance < amount + gas_cost:
+            balance_decimal = self.client.w3.fromWei(native_balance, 'ether')
+            amount_decimal = self.client.w3.fromWei(amount + gas_cost, 'ether')
+            raise NoBalanceException(
+                f"Account balance ({balance_decimal:.5f}) less than amount and gas ({amount_decimal:.5f})"
+            )
+
+    def _build_transfer(self, token, to_address: str, amount: int, nonce: int, gas_estimate: int, gas_price: int):
+        gas_price_gwei = self.client.w3.fromWei(gas_price, 'gwei')
+        if token:
+            data = token.contract.encodeABI(fn_name="transfer", args=[to_address, amount])
+            return self.client.raw_transaction(
+                value=0, gas_estimate=gas_estimate, nonce=nonce, data=data, to=token.address, gas_price=gas_price_gwei
+            )
+        return self.client.raw_transaction(
+            value=amount, gas_estimate=gas_estimate, nonce=nonce, to=to_address, gas_price=gas_price_gwei
+        )
+
+    @staticmethod
+    def _signed_gas_cost(raw: str) -> int:
+        raw = HexBytes(raw)
+        if raw[0] > 0x7f:
+            fields = rlp.decode(raw, Transaction).as_dict()
+            return fields["gas"] * fields["gasPrice"]
+        fields = TypedTransaction.from_bytes(raw).as_dict()
+        return fields["gas"] * fields.get("gasPrice", fields.get("maxFeePerGas", 0))
+
+    def _is_known_transaction(self, tx_hash: str) -> bool:
+        try:
+            self.client.w3.eth.get_transaction(tx_hash)
+            return True
+        except TransactionNotFound:
+            return False
+
+    def _send_raw(self, entry: Dict) -> Dict:
+        sent = dict(entry, status=SENT)
+        del sent["raw"]
+        try:
+            self.client.send_transaction(JournalTransaction(HexBytes(entry["raw"]), HexBytes(entry["hash"])))
+        except ValueError as exc:
+            # Re-sent transaction of resumed run might be already in mempool or mined
+            if client.is_already_known_error(exc):
+                return sent
+            if "nonce too low" not in str(exc).lower():
+                raise
+            if self._is_known_transaction(entry["hash"]):
+                return sent
+            # Nonce was used by some other transaction, this one can never be mined
+            print(f"ERROR row {entry['row']} nonce {entry['nonce']} used by other transaction, "
+                  f"{entry['amount']} to {entry['to']} not sent")
+            return dict(sent, status=FAILED, error="nonce used by other transaction")
+        return sent
+
+    def _submit_signed(self, pool: ThreadPoolExecutor, journal: Journal, entries: Iterable[Dict], in_flight: int):
+        futures = collections.deque()
+        for entry in sorted(entries, key=lambda x: x["nonce"]):
+            if len(futures) >= in_flight:
+                journal.write([futures.popleft().result()])
+            futures.append(pool.submit(self._send_raw, entry))
+        journal.write([future.result() for future in futures])
+
+    def _get_receipt(self, tx_hash: str):
+        try:
+            return self.client.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    def _confirm(self, pool: ThreadPoolExecutor, journal: Journal, timeout: int, poll_latency: int = 3):
+        pending = journal.by_status(SENT)
+        print(f"Waiting {len(pending)} receipts")
+        deadline = time.time() + timeout
+        while pending:
+            receipts = pool.map(self._get_receipt, [x["hash"] for x in pending])
+            done = []
+            still_pending = []
+            for entry, receipt in zip(pending, receipts):
+                if receipt is None:
+                    still_pending.append(entry)
+                elif receipt["status"] == 1:
+                    done.append(dict(entry, status=CONFIRMED, block=receipt["blockNumber"]))
+                else:
+                    done.append(dict(entry, status=FAILED, block=receipt["blockNumber"]))
+            journal.write(done)
+            pending = still_pending
+            if not pending:
+                break
+            if time.time() > deadline:
+                print(f"ERROR {len(pending)} transactions not confirmed in {timeout} seconds, rerun to continue")
+                sys.exit(1)
+            time.sleep(poll_latency)
+
+
+def run(sender, args):
+    if args.batch:
+        sender.send_batch(
+            path=args.batch,
+            journal_path=args.journal or args.batch + ".journal",
+            token_address=args.token,
+            gas_price=args.gas_price,
+            in_flight=args.in_flight,
+        )
+    elif args.token:
+        sender.send_token(
+            token_address=args.token,
+            amount=args.amount,
+            to_address=args.to,
+            gas_price=args.gas_price
+        )
+    else:
+        sender.send_native(
+            amount=args.amount,
+            to_address=args.to,
+            gas_price=args.gas_price
+        )
+
 
 def main():
     parser = argparse.ArgumentParser()
@@ -42,33 +389,37 @@ def main():
     )
     parser.add_argument("--gas-price", default=None, type=int, help="Gas price in gwei")
     parser.add_argument("--token", default=None, help="ERC-20 token address, default is network native token")
-    parser.add_argument("to", help="Target address")
-    parser.add_argument("amount", type=Decimal, help="Amount to send")
+    parser.add_argument(
+        "--batch",
+        default=None,
+        help="CSV (to,amount) or NDJSON ({\"to\": ..., \"amount\": ...}) file of recipients to pay"
+    )
+    parser.add_argument("--journal", default=None, help="Batch journal path, default is batch file + .journal")
+    parser.add_argument("--in-flight", default=64, type=int, help="Max batch transactions sent concurrently")
+    parser.add_argument("--async-engine", action="store_true", default=False,
+                        help="Run client requests on background asyncio client, HTTP providers only")
+    parser.add_argument("to", nargs="?", help="Target address")
+    parser.add_argument("amount", nargs="?", type=Decimal, help="Amount to send")
 
     args = parser.parse_args()
 
+    if not args.batch and (args.to is None or args.amount is None):
+        parser.error("to and amount are required without --batch")
+
     privkey, pubkey = keyutils.get_keyfile(args.keyfile)
 
     sender = Sender(
         private_key=privkey,
         public_key=pubkey,
         test_mode=args.test_mode,
-        network=networks.get_network_by_name(args.network)
+        network=networks.get_network_by_name(args.network),
+        async_engine=args.async_engine,
     )
 
-    if args.token:
-        sender.send_token(
-            token_address=args.token,
-            amount=args.amount,
-            to_address=args.to,
-            gas_price=args.gas_price
-        )
-    else:
-        sender.send_native(
-            amount=args.amount,
-            to_address=args.to,
-            gas_price=args.gas_price
-        )
+    try:
+        run(sender, args)
+    finally:
+        sender.client.close()
 
 
 if __name__ == '__main__':
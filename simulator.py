@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+
+from web3 import Web3
+
+from blockchain import networks
+from blockchain.async_web3.simulator import SimulatorNode
+from blockchain.simulator import network_chain
+
+
+def main():
+    parser = argparse.ArgumentParser("Local AMM chain simulator node")
+    parser.add_argument("--network", default=networks.BINANCE, choices=networks.NETWORKS.keys(),
+                        help="Network whose tokens and routers are created")
+    parser.add_argument("--router", action="append", default=None,
+                        help="Router name or address, can be given many times, default is first network router")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", default=8545, type=int)
+    parser.add_argument("--block-time", default=1, type=float, help="Seconds between blocks, 0 mines every transaction")
+    parser.add_argument("--reserve", default=10**6, type=int, help="Initial reserve of every pair token in tokens")
+    parser.add_argument("--fund", action="append", default=[],
+                        help="Address which gets native and token balance, can be given many times")
+    args = parser.parse_args()
+
+    network = networks.get_network_by_name(args.network)
+    chain = network_chain(
+        network,
+        routers=args.router,
+        reserve=args.reserve * 10**18,
+        accounts=[Web3.toChecksumAddress(x) for x in args.fund],
+        block_time=args.block_time or 1,
+        automine=args.block_time == 0,
+    )
+    node = SimulatorNode(chain, host=args.host, port=args.port, block_time=args.block_time)
+    print(f"export BLOCKCHAIN_{args.network.upper()}_PROVIDER={node.url}")
+    try:
+        asyncio.run(node.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
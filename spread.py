@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import sys
+from decimal import Decimal
+
+from web3 import Web3
+
+from blockchain import networks
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.router_client import get_async_router
+from blockchain.async_web3.spread_scanner import SpreadScanner
+from blockchain.networks import binance
+from blockchain.pair_index import PairDatabase
+
+
+async def parse_pair(client, value):
+    """
+    Parse TOKEN0:TOKEN1[:AMOUNT], tokens can be names of known tokens, amount is in token0
+    """
+    parts = value.split(":")
+    if len(parts) not in [2, 3]:
+        print(f"Invalid pair {value}, expected TOKEN0:TOKEN1[:AMOUNT]")
+        sys.exit(1)
+    token0 = await client.get_token(Web3.toChecksumAddress(client.network.tokens.get(parts[0], parts[0])))
+    token1 = await client.get_token(Web3.toChecksumAddress(client.network.tokens.get(parts[1], parts[1])))
+    amount = Decimal(parts[2]) if len(parts) == 3 else Decimal("1")
+    return token0.address, token1.address, await token0.fromDecimals(amount)
+
+
+async def scan(args, database):
+    client = AsyncClient(
+        public_key=binance.BURN,
+        private_key="",
+        network=networks.get_network_by_name(args.network),
+    )
+    router_addresses = client.network.routers
+    if args.router:
+        router_addresses = {name: router_addresses[name] for name in args.router}
+    routers = {}
+    for name, address in router_addresses.items():
+        routers[name] = await get_async_router(
+            client=client, contract_address=address, abi_file="PancakeRouterV2", pair_database=database
+        )
+    pairs = await asyncio.gather(*[parse_pair(client, x) for x in args.pair])
+    scanner = SpreadScanner(
+        client,
+        routers=routers,
+        pairs=pairs,
+        threshold=args.threshold,
+        poll_interval=args.poll_interval,
+    )
+    async for opportunity in scanner.run():
+        print(opportunity)
+
+
+def main():
+    parser = argparse.ArgumentParser("Scan price spreads across routers on every block")
+    parser.add_argument("--network", required=True, choices=networks.NETWORKS.keys(), help="Network to operate on")
+    parser.add_argument("--router", action="append", default=None, help="Router name, default is all known routers")
+    parser.add_argument("--database", default=None, help="Pair database path, see pairs.py")
+    parser.add_argument("--threshold", default=Decimal("0.5"), type=Decimal,
+                        help="Minimum round trip profit in percent")
+    parser.add_argument("--poll-interval", default=0.5, type=float, help="New block poll interval in seconds")
+    parser.add_argument("pair", nargs="+", help="TOKEN0:TOKEN1[:AMOUNT]")
+
+    args = parser.parse_args()
+
+    database = PairDatabase(args.database) if args.database else None
+    try:
+        asyncio.run(scan(args, database))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if database:
+            database.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,23 @@
 #!/usr/bin/env python3
+import asyncio
 import sys
 from concurrent.futures.thread import ThreadPoolExecutor
 from decimal import Decimal
+from typing import Dict
 
 from web3 import Web3
 
 from blockchain import client, keyutils, networks, router_client
 import argparse
 
+from blockchain.async_web3 import client as async_client
+from blockchain.async_web3 import router_client as async_router_client
+from blockchain.async_web3.contract import AsyncToken
+from blockchain.async_web3.router_client import AsyncRouterClient
 from blockchain.networks import binance
 from blockchain.contract import Token
 from blockchain.router_client import RouterClient
+from blockchain.snapshot import async_snapshot, snapshot
 import blockchain.exceptions
 
 
@@ -46,11 +53,11 @@ class Swapper(object):
 
     def _get_details(self, router: RouterClient, token0: Token, token1: Token, amount_in: int):
 
-        # Balance
-        price, reference_token = self._get_price(router=router, token0=token0, token1=token1, amount=amount_in)
+        # Price and reserves from same block
+        with snapshot(self.client.w3):
+            price, reference_token = self._get_price(router=router, token0=token0, token1=token1, amount=amount_in)
 
-        # Reserves
-        token0_reserves, token1_reserves = self._get_reserves(router=router, token0=token0, token1=token1)
+            token0_reserves, token1_reserves = self._get_reserves(router=router, token0=token0, token1=token1)
 
         percentage = amount_in * 100 / token0_reserves
 
@@ -83,8 +90,12 @@ class Swapper(object):
             token_to: str,
             amount_in: Decimal,
             slippage: int,
-            gas_price: int
+            gas_price: int,
+            pipeline: bool = False,
     ):
+        """
+        pipeline sends approval and swap back to back instead of waiting approval to be mined first
+        """
         token0 = self.client.get_token(token_from)
         token1 = self.client.get_token(token_to)
 
@@ -118,8 +129,17 @@ class Swapper(object):
         print(f"{token0_reserves_decimal:.5f} {token0.symbol}")
         print(f"{token1_reserves_decimal:.5f} {token1.symbol}")
 
-        balance = token0.balanceOfDecimal(self.client.public_key)
-        if balance < amount_in:
+        # Balance, allowance, eth_call, gas and nonce in one go
+        swap_tx = router.swap_tx(path=[token0, token1], amount_in=amount_in_raw, amount_out_min=amount_out_min_raw)
+        preflight = self.client.preflight(
+            swap_tx,
+            gas_price=gas_price,
+            token=token0,
+            spender=router,
+            amount=amount_in_raw,
+        )
+        if not preflight.has_balance:
+            balance = token0.toDecimals(preflight.balance)
             print(f"ERROR account balance {balance:.5f} {token0.symbol} less than {amount_in:.5f} {token0.symbol}")
             return
 
@@ -129,25 +149,38 @@ class Swapper(object):
         elif amount_in * Decimal("100") > token0_reserves:
             print(f"Warning about to swap {percentage:.2f}% of reserves")
 
-        # We need to approve first
-        tx_hash = self.client.approve(
-            token=token0,
-            spender=router,
-            amount=amount_in_raw,
-            approve_amount=amount_in_raw * 2,
-            gas_price=gas_price
-        )
-        if tx_hash:
-            self.client.wait_transaction_success(tx_hash)
-
-        # Swap
-
-        sent_tx = router.swap(
-            path=[token0, token1],
-            amount_in=amount_in_raw,
-            amount_out_min=amount_out_min_raw,
-            gas_price=gas_price
-        )
+        if preflight.needs_approval and pipeline:
+            approve_tx, sent_tx = self.client.send_with_approval(
+                preflight,
+                token=token0,
+                spender=router,
+                approve_amount=amount_in_raw * 2,
+            )
+            print(f"Explorer URL for approval: {self.client.network.explorer_tx_url.format(approve_tx)}")
+            print(f"Explorer URL for transaction: {self.client.network.explorer_tx_url.format(sent_tx)}")
+            self.client.wait_with_approval(approve_tx, sent_tx)
+            return
+        elif preflight.needs_approval:
+            # We need to approve first
+            tx_hash = self.client.approve(
+                token=token0,
+                spender=router,
+                amount=amount_in_raw,
+                approve_amount=amount_in_raw * 2,
+                gas_price=gas_price
+            )
+            if tx_hash:
+                self.client.wait_transaction_success(tx_hash)
+
+            # Swap
+            sent_tx = router.swap(
+                path=[token0, token1],
+                amount_in=amount_in_raw,
+                amount_out_min=amount_out_min_raw,
+                gas_price=gas_price
+            )
+        else:
+            sent_tx = self.client.send_transaction(self.client.sign_preflight(preflight))
 
         url = self.client.network.explorer_tx_url.format(sent_tx)
         print(f"Explorer URL for transaction: {url}")
@@ -194,6 +227,217 @@ class Swapper(object):
         self.client.wait_transaction_success(sent_tx)
 
 
+class AsyncSwapper(object):
+    """
+    Swapper running on single event loop using AsyncClient
+
+    TODO: Support for swaps from native token
+    """
+
+    def __init__(self, **kwargs):
+        self.client = async_client.AsyncClient(**kwargs)
+
+    async def _get_price(
+            self,
+            router: AsyncRouterClient,
+            token0: AsyncToken,
+            token1: AsyncToken,
+            amount: int
+    ) -> (Decimal, AsyncToken):
+        reference_token = token0
+        if token1.address in router.client.network.tokens.values():
+            reference_token = token1
+        price = await router.get_price(token0=token0, token1=token1, reference_token=reference_token, amount_in=amount)
+        return price, reference_token
+
+    async def _get_reserves(self, router: AsyncRouterClient, token0: AsyncToken, token1: AsyncToken) -> (int, int):
+        token0, token1, timestamp = await router.get_reserves(token0=token0, token1=token1)
+        return token0, token1
+
+    async def _get_details(self, router: AsyncRouterClient, token0: AsyncToken, token1: AsyncToken, amount_in: int):
+        async with async_snapshot(self.client.w3):
+            (price, reference_token), (token0_reserves, token1_reserves) = await asyncio.gather(
+                self._get_price(router=router, token0=token0, token1=token1, amount=amount_in),
+                self._get_reserves(router=router, token0=token0, token1=token1),
+            )
+
+        percentage = amount_in * 100 / token0_reserves
+
+        return price, reference_token, token0_reserves, token1_reserves, percentage
+
+    async def _get_tokens(self, token_from: str, token_to: str) -> (AsyncToken, AsyncToken):
+        token0, token1 = await asyncio.gather(
+            self.client.get_token(token_from),
+            self.client.get_token(token_to),
+        )
+        # Warm up metadata used in calculations and output
+        await asyncio.gather(token0.decimals(), token0.symbol(), token1.decimals(), token1.symbol())
+        return token0, token1
+
+    async def get_details(
+            self,
+            router: AsyncRouterClient,
+            token_from: str,
+            token_to: str,
+            amount_in: Decimal
+    ):
+        token0, token1 = await self._get_tokens(token_from, token_to)
+        raw_amount = await token0.fromDecimals(amount_in)
+        price, reference_token, token0_reserves, token1_reserves, percentage = await self._get_details(
+            router=router, token0=token0, token1=token1, amount_in=raw_amount)
+        token0_reserves_decimal, token1_reserves_decimal = await asyncio.gather(
+            token0.toDecimals(token0_reserves),
+            token1.toDecimals(token1_reserves),
+        )
+        return price, reference_token, token0_reserves_decimal, token1_reserves_decimal, percentage
+
+    async def get_balance(self, token_address):
+        token = await self.client.get_token(token_address)
+        return await token.balanceOfDecimal(self.client.public_key)
+
+    async def swap_tokens(
+            self,
+            router: AsyncRouterClient,
+            token_from: str,
+            token_to: str,
+            amount_in: Decimal,
+            slippage: int,
+            gas_price: int
+    ):
+        token0, token1 = await self._get_tokens(token_from, token_to)
+
+        amount_in_raw = await token0.fromDecimals(amount_in)
+
+        price, reference_token, token0_reserves, token1_reserves, percentage = await self._get_details(
+            router=router,
+            token0=token0,
+            token1=token1,
+            amount_in=amount_in_raw
+        )
+
+        token0_reserves_decimal = await token0.toDecimals(token0_reserves)
+        token1_reserves_decimal = await token1.toDecimals(token1_reserves)
+        token0_symbol = await token0.symbol()
+        token1_symbol = await token1.symbol()
+
+        router_name = router.address
+        if router_name in self.client.network.routers.values():
+            for name, address in self.client.network.routers.items():
+                if address == router_name:
+                    router_name = name
+                    break
+        print(f"Swapping {amount_in} {token0_symbol} to {token1_symbol} in {router_name}")
+
+        amount_out_min = amount_in * price * ((Decimal("100") - Decimal(slippage)) / 100)
+        amount_out_min_raw = await token1.fromDecimals(amount_out_min)
+
+        print(f"Current price {price:.18f} {await reference_token.symbol()} * {amount_in} - slippage = " +
+              f"{amount_out_min:.18f} {token1_symbol}")
+
+        print("Reserves: ")
+        print(f"{token0_reserves_decimal:.5f} {token0_symbol}")
+        print(f"{token1_reserves_decimal:.5f} {token1_symbol}")
+
+        # Balance, allowance, eth_call, gas and nonce in one go
+        swap_tx = await router.swap_tx(
+            path=[token0, token1],
+            amount_in=amount_in_raw,
+            amount_out_min=amount_out_min_raw
+        )
+        preflight = await self.client.preflight(
+            swap_tx,
+            gas_price=gas_price,
+            token=token0,
+            spender=router,
+            amount=amount_in_raw,
+        )
+        if not preflight.has_balance:
+            balance = await token0.toDecimals(preflight.balance)
+            print(f"ERROR account balance {balance:.5f} {token0_symbol} less than {amount_in:.5f} {token0_symbol}")
+            return
+
+        if amount_in > token0_reserves:
+            print(f"ERROR about to swap {percentage:.2f}% of reserves")
+            return
+        elif amount_in * Decimal("100") > token0_reserves:
+            print(f"Warning about to swap {percentage:.2f}% of reserves")
+
+        if preflight.needs_approval:
+            # We need to approve first
+            tx_hash = await self.client.approve(
+                token=token0,
+                spender=router,
+                amount=amount_in_raw,
+                approve_amount=amount_in_raw * 2,
+                gas_price=gas_price
+            )
+            if tx_hash:
+                await self.client.wait_transaction_success(tx_hash)
+
+            # Swap
+            sent_tx = await router.swap(
+                path=[token0, token1],
+                amount_in=amount_in_raw,
+                amount_out_min=amount_out_min_raw,
+                gas_price=gas_price
+            )
+        else:
+            sent_tx = await self.client.send_transaction(await self.client.sign_preflight(preflight))
+
+        url = self.client.network.explorer_tx_url.format(sent_tx)
+        print(f"Explorer URL for transaction: {url}")
+
+        await self.client.wait_transaction_success(sent_tx)
+
+    async def wrap(self, amount: Decimal, gas_price: int = None):
+        amount_raw = int(amount * 10 ** self.client.network.native_token_decimals)
+
+        wrapped_token, native_balance = await asyncio.gather(
+            self.client.get_wrapped_native_token(),
+            self.client.w3.eth.get_balance(self.client.public_key),
+        )
+        if native_balance < amount_raw:
+            print(f"ERROR account balance {native_balance:.5f} less than {amount_raw:.5f} " +
+                  f"{await wrapped_token.symbol()}")
+            return
+
+        tx = wrapped_token.contract.functions.deposit()
+        preflight = await self.client.preflight(tx, gas_price=gas_price, gas_estimate=50000, value=amount_raw)
+        signed_tx = await self.client.sign_preflight(preflight, value=amount_raw)
+        sent_tx = await self.client.send_transaction(signed_tx)
+
+        url = self.client.network.explorer_tx_url.format(sent_tx)
+        print(f"Explorer URL for transaction: {url}")
+
+        await self.client.wait_transaction_success(sent_tx)
+
+    async def unwrap(self, amount: Decimal, gas_price: int = None):
+        amount_raw = int(amount * 10 ** self.client.network.native_token_decimals)
+        wrapped_token = await self.client.get_wrapped_native_token()
+
+        tx = wrapped_token.contract.functions.withdraw(amount_raw)
+        # BSC gas estimation is broken, let's use static big enough gas estimate
+        preflight = await self.client.preflight(
+            tx,
+            gas_price=gas_price,
+            gas_estimate=50000,
+            token=wrapped_token,
+            amount=amount_raw,
+        )
+
+        if not preflight.has_balance:
+            print(f"ERROR account balance {preflight.balance:.5f} {await wrapped_token.symbol()} less than " +
+                  f"{amount_raw:.5f}")
+            return
+
+        signed_tx = await self.client.sign_preflight(preflight)
+        sent_tx = await self.client.send_transaction(signed_tx)
+        url = self.client.network.explorer_tx_url.format(sent_tx)
+        print(f"Explorer URL for transaction: {url}")
+
+        await self.client.wait_transaction_success(sent_tx)
+
+
 def get_router_price(router_name, router_address, swapper, token_from, token_to, amount_in):
     try:
         router = router_client.get_router(
@@ -213,36 +457,76 @@ def get_router_price(router_name, router_address, swapper, token_from, token_to,
         print(f"No LP pair in {router_name}")
 
 
-def select_router(router_name, token_from, token_to, amount_in, swapper) -> RouterClient:
-    router_address = None
-    all_routers = False
+def is_sell(network, token_from, token_to) -> bool:
+    sell = False
+    if token_to in network.tokens.values() and token_from not in network.tokens.values():
+        sell = True
+    elif token_to in network.tokens.values() and token_from in network.tokens.values():
+        print("WARNING: best and worst prices might be upside down, be extra careful...")
+        token_to_index = list(network.tokens.values()).index(token_to)
+        token_from_index = list(network.tokens.values()).index(token_from)
+        if token_to_index < token_from_index:
+            sell = True
+    return sell
+
+
+def print_router_prices(values, sell: bool, reference_symbols: Dict[str, str]):
+    """
+    Print price table and return best router with enough reserves
+    """
     selected_router = None
+    values = sorted(values, key=lambda x: x[2], reverse=sell)
+
+    print("router               price                              price symbol token0 reserves                " +
+          "    token1 reserves                        % of reserves")
+    selected_price = None
+    for router, router_name, price, reference_token, token0_reserves, token1_reserves, percentage in values:
+        if sell:
+            if not selected_price or selected_price < price:
+                selected_price = price
+            diff = price - selected_price
+        else:
+            if not selected_price or selected_price > price:
+                selected_price = price
+            diff = price - selected_price
+        diff_p = diff * Decimal("100") / selected_price
+        if not selected_router and percentage < Decimal("100"):
+            selected_router = router
+        symbol = reference_symbols[reference_token.address]
+        print(f"{router_name:20s} {price:>10.18f} ({diff_p:>+10.5f}%) {symbol:10s} " +
+              f"{token0_reserves:>35.18f} {token1_reserves:>35.18f} {percentage:>15.5f}")
+
+    if not selected_router:
+        print("failed to find suitable router")
+        sys.exit(1)
+    print(f"Selected router is {selected_router.address}")
+    return selected_router
+
+
+def parse_router_name(router_name):
+    """
+    Return router address or None if all routers should be checked
+    """
     if router_name.startswith("0x"):
-        router_address = Web3.toChecksumAddress(router_name)
+        return Web3.toChecksumAddress(router_name)
     elif router_name in ["all", "any"]:
-        all_routers = True
-    else:
-        router_address = binance.ROUTERS.get(router_name, None)
-        if not router_address:
-            print(f"No such router {router_name}")
-            sys.exit(1)
+        return None
+    router_address = binance.ROUTERS.get(router_name, None)
+    if not router_address:
+        print(f"No such router {router_name}")
+        sys.exit(1)
+    return router_address
+
 
-    if all_routers:
+def select_router(router_name, token_from, token_to, amount_in, swapper) -> RouterClient:
+    router_address = parse_router_name(router_name)
+
+    if router_address is None:
         print("Checking prices from known routers")
         tasks = []
         values = []
 
-        sell = False
-        if token_to in swapper.client.network.tokens.values() and \
-                token_from not in swapper.client.network.tokens.values():
-            sell = True
-        elif token_to in swapper.client.network.tokens.values() and \
-                token_from in swapper.client.network.tokens.values():
-            print("WARNING: best and worst prices might be upside down, be extra careful...")
-            token_to_index = list(swapper.client.network.tokens.values()).index(token_to)
-            token_from_index = list(swapper.client.network.tokens.values()).index(token_from)
-            if token_to_index < token_from_index:
-                sell = True
+        sell = is_sell(swapper.client.network, token_from, token_to)
 
         with ThreadPoolExecutor(max_workers=10) as executor:
             for router_name, router_address in swapper.client.network.routers.items():
@@ -263,30 +547,8 @@ def select_router(router_name, token_from, token_to, amount_in, swapper) -> Rout
                 if result:
                     values.append(result)
 
-        values = sorted(values, key=lambda x: x[2], reverse=sell)
-
-        print("router               price                              price symbol token0 reserves                " +
-              "    token1 reserves                        % of reserves")
-        selected_price = None
-        for router, router_name, price, reference_token, token0_reserves, token1_reserves, percentage in values:
-            if sell:
-                if not selected_price or selected_price < price:
-                    selected_price = price
-                diff = price - selected_price
-            else:
-                if not selected_price or selected_price > price:
-                    selected_price = price
-                diff = price - selected_price
-            diff_p = diff * Decimal("100") / selected_price
-            if not selected_router and percentage < Decimal("100"):
-                selected_router = router
-            print(f"{router_name:20s} {price:>10.18f} ({diff_p:>+10.5f}%) {reference_token.symbol:10s} " +
-                  f"{token0_reserves:>35.18f} {token1_reserves:>35.18f} {percentage:>15.5f}")
-
-        if not selected_router:
-            print("failed to find suitable router")
-            sys.exit(1)
-        print(f"Selected router is {selected_router.address}")
+        reference_symbols = {x[3].address: x[3].symbol for x in values}
+        selected_router = print_router_prices(values, sell=sell, reference_symbols=reference_symbols)
 
     else:
         selected_router = router_client.get_router(
@@ -298,8 +560,55 @@ def select_router(router_name, token_from, token_to, amount_in, swapper) -> Rout
     return selected_router
 
 
-def swap(swapper, args):
+async def async_get_router_price(router_name, router_address, swapper, token_from, token_to, amount_in):
+    try:
+        router = await async_router_client.get_async_router(
+            client=swapper.client,
+            contract_address=router_address,
+            abi_file="PancakeRouterV2"
+        )
+        price, reference_token, token0_reserves, token1_reserves, percentage = await swapper.get_details(
+            router=router,
+            token_from=token_from,
+            token_to=token_to,
+            amount_in=amount_in,
+        )
+        return (router, router_name, price, reference_token, token0_reserves, token1_reserves, percentage)
 
+    except blockchain.exceptions.BlockchainException:
+        print(f"No LP pair in {router_name}")
+
+
+async def async_select_router(router_name, token_from, token_to, amount_in, swapper) -> AsyncRouterClient:
+    router_address = parse_router_name(router_name)
+
+    if router_address is not None:
+        return await async_router_client.get_async_router(
+            client=swapper.client,
+            contract_address=router_address,
+            abi_file="PancakeRouterV2"
+        )
+
+    print("Checking prices from known routers")
+    sell = is_sell(swapper.client.network, token_from, token_to)
+    results = await asyncio.gather(*[
+        async_get_router_price(
+            router_name=router_name,
+            router_address=router_address,
+            swapper=swapper,
+            token_from=token_from,
+            token_to=token_to,
+            amount_in=amount_in,
+        ) for router_name, router_address in swapper.client.network.routers.items()
+    ])
+    values = [x for x in results if x]
+    reference_symbols = {}
+    for value in values:
+        reference_symbols[value[3].address] = await value[3].symbol()
+    return print_router_prices(values, sell=sell, reference_symbols=reference_symbols)
+
+
+def parse_tokens(args):
     token_from = None
     token_to = None
     if args.token_from in binance.TOKENS.keys():
@@ -315,22 +624,32 @@ def swap(swapper, args):
     if token_to == token_from:
         print("token_from must be different from token_to")
         sys.exit(1)
+    return token_from, token_to
+
+
+def parse_amount(amount):
+    try:
+        return Decimal(amount)
+    except ArithmeticError:
+        print(f"Invalid amount value {amount}")
+        sys.exit(1)
+
+
+def swap(swapper, args):
+
+    token_from, token_to = parse_tokens(args)
 
     amount_in = None
     if args.amount == "all":
         amount_in = swapper.get_balance(token_address=token_from)
         print(f"Calculated amount is {amount_in}")
     elif args.amount.endswith("%"):
-        amount_percent = Decimal(args.amount[:-1])
+        amount_percent = parse_amount(args.amount[:-1])
         banance = swapper.get_balance(token_address=token_from)
         amount_in = banance * (amount_percent / Decimal("100"))
         print(f"Calculated amount is {amount_in} of {banance}")
     else:
-        try:
-            amount_in = Decimal(args.amount)
-        except ValueError:
-            print(f"Invalid amount value {args.amount}")
-            sys.exit(1)
+        amount_in = parse_amount(args.amount)
 
     selected_router = select_router(args.router, token_from, token_to, amount_in, swapper)
 
@@ -341,9 +660,46 @@ def swap(swapper, args):
         amount_in=amount_in,
         gas_price=args.gas_price,
         slippage=args.slippage,
+        pipeline=args.pipeline,
+    )
+
+
+async def async_swap(swapper: AsyncSwapper, args):
+
+    token_from, token_to = parse_tokens(args)
+
+    amount_in = None
+    if args.amount == "all":
+        amount_in = await swapper.get_balance(token_address=token_from)
+        print(f"Calculated amount is {amount_in}")
+    elif args.amount.endswith("%"):
+        amount_percent = parse_amount(args.amount[:-1])
+        balance = await swapper.get_balance(token_address=token_from)
+        amount_in = balance * (amount_percent / Decimal("100"))
+        print(f"Calculated amount is {amount_in} of {balance}")
+    else:
+        amount_in = parse_amount(args.amount)
+
+    selected_router = await async_select_router(args.router, token_from, token_to, amount_in, swapper)
+
+    await swapper.swap_tokens(
+        router=selected_router,
+        token_from=token_from,
+        token_to=token_to,
+        amount_in=amount_in,
+        gas_price=args.gas_price,
+        slippage=args.slippage,
     )
 
 
+async def async_unwrap(swapper: AsyncSwapper, args):
+    await swapper.unwrap(parse_amount(args.amount), gas_price=args.gas_price)
+
+
+async def async_wrap(swapper: AsyncSwapper, args):
+    await swapper.wrap(parse_amount(args.amount), gas_price=args.gas_price)
+
+
 def unwrap(swapper: Swapper, args):
     try:
         amount = Decimal(args.amount)
@@ -362,6 +718,22 @@ def wrap(swapper, args):
     swapper.wrap(amount, gas_price=args.gas_price)
 
 
+async def run_async(args, private_key, public_key):
+    # AsyncClient needs to be created inside running event loop
+    swapper = AsyncSwapper(
+        private_key=private_key,
+        public_key=public_key,
+        test_mode=args.test_mode,
+        network=networks.get_network_by_name(args.network),
+    )
+    try:
+        # Open connections before first requests so swap doesn't pay TLS handshakes
+        await swapper.client.warm_up()
+        await args.async_func(swapper, args)
+    finally:
+        await swapper.client.close()
+
+
 def main():
     parser = argparse.ArgumentParser("Swap tokens")
     parser.add_argument(
@@ -387,6 +759,19 @@ def main():
         type=int,
         help="Gas price in gwei"
     )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        default=False,
+        help="Use asyncio client, all routers are queried and transactions sent on one event loop"
+    )
+    parser.add_argument(
+        "--async-engine",
+        action="store_true",
+        default=False,
+        help="Run sync client requests on background asyncio client, HTTP providers only"
+    )
 
     subparsers = parser.add_subparsers()
     swap_parser = subparsers.add_parser("swap")
@@ -402,6 +787,12 @@ def main():
         type=int,
         help="slippage percent"
     )
+    swap_parser.add_argument(
+        "--pipeline",
+        default=False,
+        action="store_true",
+        help="Send approval and swap back to back without waiting approval to be mined, not supported with --async",
+    )
     swap_parser.add_argument(
         "token_from",
         help="ERC-20 token address"
@@ -415,7 +806,7 @@ def main():
         type=str,
         help="Amount token_from to swap, all means whole address balance, 10% is 10% of current balance"
     )
-    swap_parser.set_defaults(func=swap)
+    swap_parser.set_defaults(func=swap, async_func=async_swap)
 
     wrap_parser = subparsers.add_parser("wrap")
     wrap_parser.add_argument(
@@ -423,7 +814,7 @@ def main():
         type=str,
         help="Amount to wrap"
     )
-    wrap_parser.set_defaults(func=wrap)
+    wrap_parser.set_defaults(func=wrap, async_func=async_wrap)
 
     unwrap_parser = subparsers.add_parser("unwrap")
     unwrap_parser.add_argument(
@@ -431,21 +822,31 @@ def main():
         type=str,
         help="Amount to unwrap"
     )
-    unwrap_parser.set_defaults(func=unwrap)
+    unwrap_parser.set_defaults(func=unwrap, async_func=async_unwrap)
 
     args = parser.parse_args()
 
+    if args.use_async and getattr(args, "pipeline", False):
+        parser.error("--pipeline is not supported with --async")
+
     privkey, pubkey = keyutils.get_keyfile(args.keyfile)
 
+    if args.use_async:
+        asyncio.run(run_async(args, private_key=privkey, public_key=pubkey))
+        return
+
     swapper = Swapper(
         private_key=privkey,
         public_key=pubkey,
         test_mode=args.test_mode,
         network=networks.get_network_by_name(args.network),
-
+        async_engine=args.async_engine,
     )
 
-    args.func(swapper, args)
+    try:
+        args.func(swapper, args)
+    finally:
+        swapper.client.close()
 
 
 if __name__ == '__main__':
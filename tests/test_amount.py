@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import unittest
+from decimal import Decimal
+
+from blockchain import amount
+from blockchain.amount import Amount
+
+
+class AmountTest(unittest.TestCase):
+
+    def test_conversion(self):
+        self.assertEqual(amount.to_decimal(1500000, 6), Decimal("1.5"))
+        self.assertEqual(amount.from_decimal(Decimal("1.5"), 18), 15 * 10**17)
+        self.assertEqual(amount.from_decimal("0.000001", 6), 1)
+        self.assertEqual(amount.to_decimals([1, 10, 10**18], 18), [Decimal("1E-18"), Decimal("1E-17"), Decimal(1)])
+        self.assertEqual(amount.from_decimals([Decimal("1"), "0.5"], 2), [100, 50])
+        self.assertEqual(Amount.from_decimal("2.25", 8).to_decimal(), Decimal("2.25"))
+
+    def test_compare(self):
+        self.assertEqual(Amount(10**18, 18), Amount(10**6, 6))
+        self.assertLess(Amount(10**18, 18), Amount(10**6 + 1, 6))
+        self.assertGreater(Amount(2, 0), Amount(10**18, 18))
+        self.assertEqual(sorted([Amount(3, 1), Amount(1, 0), Amount(2, 2)]), [Amount(2, 2), Amount(3, 1), Amount(1, 0)])
+        self.assertEqual(hash(Amount(10**18, 18)), hash(Amount(1, 0)))
+
+    def test_arithmetic(self):
+        self.assertEqual(Amount(150, 2) + Amount(5, 1), Amount(200, 2))
+        self.assertEqual((Amount(150, 2) - Amount(1, 0)).raw, 50)
+        self.assertEqual((Amount(150, 2) * 3).raw, 450)
+        self.assertEqual(Amount(10**18 + 5, 18).rescale(6).raw, 10**6)
+
+    def test_price(self):
+        # 1 token with 18 decimals for 300 tokens with 6 decimals
+        self.assertEqual(amount.price(Amount(10**18, 18), Amount(300 * 10**6, 6)).to_decimal(), Decimal(300))
+        self.assertEqual(amount.price(Amount(300 * 10**6, 6), Amount(10**18, 18), decimals=18).raw, 10**18 // 300)
+        self.assertEqual(amount.price(Amount(300 * 10**6, 6), Amount(10**18, 18)).to_decimal(),
+                         Decimal(1) / Decimal(300))
+        with self.assertRaises(ZeroDivisionError):
+            amount.price(Amount(0, 18), Amount(1, 18))
+
+    def test_price_precision(self):
+        # Tiny price keeps the significant digits of Decimal division
+        tiny = amount.price(Amount(10**24, 18), Amount(123456, 18)).to_decimal()
+        self.assertEqual(tiny, Decimal(123456) / Decimal(10**24))
+        self.assertEqual(amount.price(Amount(3 * 10**30, 18), Amount(10**6, 18)).to_decimal(),
+                         Decimal(10**6) / Decimal(3 * 10**30))
+        huge = amount.price(Amount(1, 18), Amount(12345 * 10**40, 18))
+        self.assertEqual(huge.to_decimal(), Decimal(12345 * 10**40))
+        self.assertGreater(amount.price(Amount(10**24, 18), Amount(123457, 18)),
+                           amount.price(Amount(10**24, 18), Amount(123456, 18)))
+
+
+if __name__ == '__main__':
+    unittest.main()
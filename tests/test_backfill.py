@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+import aiohttp
+from web3.exceptions import BadFunctionCallOutput
+
+from blockchain.async_web3.backfill import ReserveBackfill, ReserveColumns, read_columns
+
+
+TEST_LP = "0x2000000000000000000000000000000000000001"
+DEPLOY_BLOCK = 10
+
+
+class FakeLP(object):
+    """
+    Reserves derived from block, not deployed before DEPLOY_BLOCK, requests of failing blocks fail
+    """
+
+    def __init__(self, failures):
+        self.address = TEST_LP
+        # block -> number of times the request fails
+        self.failures = dict(failures)
+        self.requests = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def get_reserves(self, block_id):
+        self.requests += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0)
+            if block_id < DEPLOY_BLOCK:
+                raise BadFunctionCallOutput("Could not decode contract function call")
+            if self.failures.get(block_id, 0) > 0:
+                self.failures[block_id] -= 1
+                raise aiohttp.ClientError("connection reset")
+            return block_id * 2, block_id * 3, 1631377645 + block_id
+        finally:
+            self.running -= 1
+
+
+class FakeClient(object):
+
+    def __init__(self, lp: FakeLP):
+        self.lp = lp
+
+    async def get_lp_contract(self, address):
+        return self.lp
+
+
+class ReserveColumnsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "0x2000000000000000000000000000000000000001")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_append_and_read(self):
+        columns = ReserveColumns(self.path)
+        self.assertIsNone(columns.last_block())
+        columns.append([(100, 2**111, 5, 1631377645), (110, 7, 2**100, 1631377650)])
+        self.assertEqual(columns.last_block(), 110)
+
+        data = read_columns(self.path)
+        self.assertEqual(list(data["block"]), [100, 110])
+        self.assertEqual(list(data["timestamp"]), [1631377645, 1631377650])
+        self.assertEqual(data["reserve0"], [2**111, 7])
+        self.assertEqual(data["reserve1"], [5, 2**100])
+
+    def test_repair_partial_row(self):
+        columns = ReserveColumns(self.path)
+        columns.append([(100, 1, 2, 3), (110, 4, 5, 6)])
+        # Crash after writing only part of the row
+        with open(os.path.join(self.path, "block"), 'ab') as f:
+            f.write((120).to_bytes(8, 'little'))
+        with open(os.path.join(self.path, "reserve0"), 'ab') as f:
+            f.write(b"\x01\x02")
+
+        columns = ReserveColumns(self.path)
+        self.assertEqual(columns.rows, 2)
+        self.assertEqual(columns.last_block(), 110)
+        self.assertEqual(list(read_columns(self.path)["block"]), [100, 110])
+
+
+class ReserveBackfillTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _backfill(self, lp: FakeLP, start_block: int, end_block: int, step: int = 1):
+        backfill = ReserveBackfill(FakeClient(lp), self.directory.name, concurrency=4, retries=2, retry_delay=0,
+                                   chunk_size=8)
+        return asyncio.run(backfill.backfill([TEST_LP], start_block=start_block, end_block=end_block, step=step))
+
+    def _assert_rows(self, blocks):
+        data = read_columns(os.path.join(self.directory.name, TEST_LP))
+        self.assertEqual(list(data["block"]), blocks)
+        self.assertEqual(data["reserve0"], [x * 2 for x in blocks])
+        self.assertEqual(data["reserve1"], [x * 3 for x in blocks])
+        self.assertEqual(list(data["timestamp"]), [1631377645 + x for x in blocks])
+
+    def test_retry(self):
+        lp = FakeLP({12: 2, 30: 1})
+        self.assertEqual(self._backfill(lp, 0, 40), [31])
+        # Blocks before deployment are skipped without retries
+        self._assert_rows(list(range(DEPLOY_BLOCK, 41)))
+        self.assertEqual(lp.requests, 41 + 3)
+        self.assertLessEqual(lp.max_running, 4)
+
+    def test_resume(self):
+        # Block 26 fails more than retries, chunks before its chunk are stored
+        lp = FakeLP({26: 3})
+        with self.assertRaises(aiohttp.ClientError):
+            self._backfill(lp, 0, 40, step=2)
+        self._assert_rows(list(range(DEPLOY_BLOCK, 16, 2)))
+
+        lp = FakeLP({})
+        self.assertEqual(self._backfill(lp, 0, 40, step=2), [16])
+        self._assert_rows(list(range(DEPLOY_BLOCK, 41, 2)))
+        # Stored blocks are not requested again
+        self.assertEqual(lp.requests, len(range(16, 41, 2)))
+
+        # Complete range, nothing to do
+        self.assertEqual(self._backfill(FakeLP({}), 0, 40, step=2), [16])
+        self._assert_rows(list(range(DEPLOY_BLOCK, 41, 2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import asyncio
+import threading
+import time
+import unittest
+
+from blockchain.utils import Cache
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class CacheTest(unittest.TestCase):
+
+    def test_max_size(self):
+        cache = Cache(max_size=2)
+        cache["a"] = 1
+        cache["b"] = 2
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache["a"], 1)
+        cache["c"] = 3
+        # b is least recently used
+        self.assertNotIn("b", cache)
+        self.assertIn("a", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_missing_key(self):
+        cache = Cache(max_size=2)
+        with self.assertRaises(KeyError):
+            cache["missing"]
+        self.assertIsNone(cache.get("missing"))
+        self.assertEqual(cache.stats.misses, 2)
+
+    def test_ttl(self):
+        timer = FakeTimer()
+        cache = Cache(max_size=2, ttl=10, timer=timer)
+        cache["a"] = 1
+        timer.now = 9
+        self.assertEqual(cache.get("a"), 1)
+        timer.now = 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats.expirations, 1)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            Cache(max_size=0)
+        with self.assertRaises(ValueError):
+            Cache(ttl=0)
+
+    def test_get_or_load_single_flight(self):
+        cache = Cache()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get_or_load("k", loader), "value")
+        self.assertEqual(len(calls), 1)
+
+    def test_get_or_load_failure_not_cached(self):
+        cache = Cache()
+
+        def loader():
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            cache.get_or_load("k", loader)
+        self.assertEqual(cache.get_or_load("k", lambda: 1), 1)
+
+    def test_async_get_or_load_single_flight(self):
+        cache = Cache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def run():
+            return await asyncio.gather(*[cache.async_get_or_load("k", loader) for _ in range(5)])
+
+        self.assertEqual(asyncio.run(run()), ["value"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats.misses, 5)
+
+    def test_async_get_or_load_failure(self):
+        cache = Cache()
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise ValueError("failed")
+
+        async def run():
+            return await asyncio.gather(*[cache.async_get_or_load("k", loader) for _ in range(3)],
+                                        return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(x, ValueError) for x in results))
+        self.assertNotIn("k", cache)
+
+    def test_async_get_or_load_owner_cancelled(self):
+        cache = Cache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def run():
+            owner = asyncio.ensure_future(cache.async_get_or_load("k", loader))
+            await asyncio.sleep(0)
+            waiters = [asyncio.ensure_future(cache.async_get_or_load("k", loader)) for _ in range(3)]
+            await asyncio.sleep(0)
+            owner.cancel()
+            results = await asyncio.gather(*waiters)
+            with self.assertRaises(asyncio.CancelledError):
+                await owner
+            return results
+
+        self.assertEqual(asyncio.run(run()), ["value"] * 3)
+        # Load is retried once by one of the waiters
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache["k"], "value")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from eth_account import Account
+from web3 import Web3
+from web3.providers import BaseProvider
+from web3.providers.async_base import AsyncBaseProvider
+
+import swap
+from blockchain import networks
+from blockchain.async_web3.cassette import AsyncCassetteProvider
+from blockchain.cassette import Cassette, CassetteProvider, RECORD, REPLAY
+from blockchain.exceptions import NotFoundException
+from blockchain.networks import binance
+from blockchain.simulator import SimulatorProvider, network_chain
+
+
+class FakeProvider(BaseProvider):
+
+    def __init__(self):
+        self.block = 100
+        self.requests = []
+
+    def make_request(self, method, params):
+        self.requests.append(method)
+        if method == "eth_blockNumber":
+            self.block += 1
+            return {"jsonrpc": "2.0", "id": 1, "result": hex(self.block)}
+        return {"jsonrpc": "2.0", "id": 1, "result": hex(len(params[0]))}
+
+
+class FakeAsyncProvider(AsyncBaseProvider):
+
+    def __init__(self):
+        self.sync_provider = FakeProvider()
+
+    async def make_request(self, method, params):
+        return self.sync_provider.make_request(method, params)
+
+    async def make_batch_request(self, requests):
+        return [self.sync_provider.make_request(method, params) for method, params in requests]
+
+
+class CassetteTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "test.cassette")
+
+    def test_record_and_replay(self):
+        recorder = Cassette(self.path, mode=RECORD)
+        w3 = Web3(CassetteProvider(recorder, FakeProvider()))
+        self.assertEqual(w3.eth.block_number, 101)
+        self.assertEqual(w3.eth.block_number, 102)
+        self.assertEqual(w3.eth.get_transaction_count("0x0000000000000000000000000000000000000001"), 42)
+        recorder.save()
+
+        player = Cassette(self.path, mode=REPLAY)
+        self.assertEqual(len(player), 3)
+        w3 = Web3(CassetteProvider(player))
+        self.assertEqual(w3.eth.get_transaction_count("0x0000000000000000000000000000000000000001"), 42)
+        self.assertEqual(w3.eth.block_number, 101)
+        self.assertEqual(w3.eth.block_number, 102)
+        # Last response is repeated
+        self.assertEqual(w3.eth.block_number, 102)
+        player.rewind()
+        self.assertEqual(w3.eth.block_number, 101)
+        with self.assertRaises(NotFoundException):
+            w3.eth.get_transaction_count("0x0000000000000000000000000000000000000002")
+
+    def test_latency(self):
+        recorder = Cassette(self.path, mode=RECORD)
+        recorder.record("eth_blockNumber", [], {"jsonrpc": "2.0", "id": 1, "result": "0x1"}, 0.05)
+        recorder.save()
+        provider = CassetteProvider(Cassette(self.path), latency=0.01, latency_scale=1)
+        start = time.perf_counter()
+        provider.make_request("eth_blockNumber", [])
+        self.assertGreaterEqual(time.perf_counter() - start, 0.06)
+
+    def test_async_batch(self):
+        requests = [("eth_getStorageAt", ["0x01", "0x0", "latest"]), ("eth_blockNumber", [])]
+
+        async def run(provider):
+            return await provider.make_batch_request(requests), await provider.make_request("eth_blockNumber", [])
+
+        recorder = Cassette(self.path, mode=RECORD)
+        recorded = asyncio.run(run(AsyncCassetteProvider(recorder, FakeAsyncProvider())))
+        recorder.save()
+        replayed = asyncio.run(run(AsyncCassetteProvider(Cassette(self.path))))
+        self.assertEqual(replayed, recorded)
+
+    def test_record_needs_provider(self):
+        with self.assertRaises(ValueError):
+            CassetteProvider(Cassette(self.path, mode=RECORD))
+
+    def test_record_and_replay_swap(self):
+        account = Account.create()
+        chain = network_chain(networks.get_network_by_name(networks.BINANCE), routers=["PancakeRouterV2"],
+                              accounts=[account.address], balance=10000 * 10**18, automine=True)
+        network = networks.Network(
+            provider="http://127.0.0.1:1/",
+            chain_id=binance.CHAIN_ID,
+            routers={"PancakeRouterV2": binance.ROUTERS["PancakeRouterV2"]},
+            tokens=binance.TOKENS,
+            wrapped_native_token=binance.WRAPPED_NATIVE_TOKEN,
+            explorer_tx_url=binance.EXPLORER_TX_URL,
+            native_token_decimals=binance.NATIVE_TOKEN_DECIMALS,
+        )
+        args = argparse.Namespace(token_from="BUSD", token_to="USDT", amount="10", router="PancakeRouterV2",
+                                  gas_price=5, slippage=3, pipeline=False, test_mode=False,
+                                  network=networks.BINANCE)
+
+        def run(provider):
+            swapper = swap.Swapper(public_key=account.address, private_key=account.key, network=network,
+                                   w3=Web3(provider), test_mode=False)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                swap.swap(swapper, args)
+            return output.getvalue()
+
+        recorder = Cassette(self.path, mode=RECORD)
+        recorded = run(CassetteProvider(recorder, SimulatorProvider(chain)))
+        recorder.save()
+        self.assertEqual(chain.nonces[account.address.lower()], 2)
+
+        # Swap deadline comes from cassette, not from the clock of replay
+        with mock.patch("time.time", return_value=time.time() + 3600):
+            replayed = run(CassetteProvider(Cassette(self.path)))
+        self.assertEqual(replayed, recorded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+
+from eth_account import Account
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+from blockchain import networks
+from blockchain.async_web3.client import AsyncClient
+from blockchain.exceptions import BlockchainException, TransactionFailedException
+from test_router_client import FakeClient
+
+
+class FakeTx(object):
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def call(self, params):
+        if self.fail:
+            raise ValueError("execution reverted: TransferHelper: TRANSFER_FROM_FAILED")
+        return True
+
+    def estimateGas(self, params):
+        if self.fail:
+            raise ValueError("execution reverted: TransferHelper: TRANSFER_FROM_FAILED")
+        return 21000
+
+
+class FakeToken(object):
+    def __init__(self, balance, allowance):
+        self.balance = balance
+        self._allowance = allowance
+
+    def balanceOf(self, address):
+        return self.balance
+
+    def allowance(self, owner, spender):
+        return self._allowance
+
+
+class FakeApproveToken(FakeToken):
+    def approve(self, spender, amount):
+        self.approved = amount
+        return FakeTx()
+
+
+class FakeSpender(object):
+    address = "0x3000000000000000000000000000000000000001"
+
+
+class PreflightClient(FakeClient):
+
+    def get_nonce(self, tag=None):
+        return 7
+
+    def get_gas_price(self):
+        return 5 * 10**9
+
+
+class FakeSignedTransaction(object):
+    rawTransaction = b"raw"
+    hash = HexBytes("0x1234")
+
+
+class FakeBroadcastETH(object):
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def send_raw_transaction(self, raw_transaction):
+        self.sent.append(raw_transaction)
+        if self.error:
+            raise ValueError(self.error)
+        return HexBytes("0x1234")
+
+
+class FakeBroadcastWeb3(object):
+    def __init__(self, error=None):
+        self.eth = FakeBroadcastETH(error=error)
+
+
+class FakePipelineETH(object):
+    def __init__(self, receipts):
+        self.receipts = receipts
+        self.sent = []
+
+    def wait_for_transaction_receipt(self, tx_hash, timeout):
+        if tx_hash not in self.receipts:
+            raise TimeExhausted()
+        return self.receipts[tx_hash]
+
+    def get_transaction_receipt(self, tx_hash):
+        if tx_hash not in self.receipts:
+            raise TransactionNotFound()
+        return self.receipts[tx_hash]
+
+    def get_transaction(self, tx_hash):
+        return {"nonce": 8, "gasPrice": 4}
+
+    def send_raw_transaction(self, raw_transaction):
+        self.sent.append(raw_transaction)
+        self.receipts["0xcancel"] = {"status": 1}
+        return HexBytes("0xcancel")
+
+
+class FakePipelineWeb3(object):
+    def __init__(self, receipts):
+        self.eth = FakePipelineETH(receipts)
+        self.eth.account = Account
+
+    def toWei(self, *args):
+        return Web3.toWei(*args)
+
+
+class PipelineClient(PreflightClient):
+    def __init__(self):
+        super().__init__()
+        self.signed = []
+
+    def _sign_contract_transaction(self, tx, gas_estimate, gas_price, nonce, value=None):
+        self.signed.append((gas_estimate, gas_price, nonce))
+        return nonce
+
+    def send_transaction(self, tx):
+        return f"0x{tx}"
+
+
+class PreflightTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = PreflightClient()
+
+    def test_preflight(self):
+        preflight = self.client.preflight(
+            FakeTx(), token=FakeToken(balance=100, allowance=100), spender=FakeSpender(), amount=50
+        )
+        self.assertEqual(preflight.gas_estimate, 21000)
+        self.assertEqual(preflight.gas_price, 5 * 10**9)
+        self.assertEqual(preflight.nonce, 7)
+        self.assertTrue(preflight.has_balance)
+        self.assertFalse(preflight.needs_approval)
+
+    def test_preflight_no_balance(self):
+        # Swap reverts because of the missing balance, caller reports the balance instead
+        preflight = self.client.preflight(
+            FakeTx(fail=True), token=FakeToken(balance=10, allowance=100), spender=FakeSpender(), amount=50
+        )
+        self.assertFalse(preflight.has_balance)
+        self.assertFalse(preflight.needs_approval)
+        self.assertIsNone(preflight.gas_estimate)
+
+    def test_preflight_needs_approval(self):
+        preflight = self.client.preflight(
+            FakeTx(fail=True), token=FakeToken(balance=100, allowance=0), spender=FakeSpender(), amount=50
+        )
+        self.assertTrue(preflight.needs_approval)
+        self.assertIsNone(preflight.gas_estimate)
+
+    def test_preflight_call_fails(self):
+        with self.assertRaises(ValueError):
+            self.client.preflight(
+                FakeTx(fail=True), token=FakeToken(balance=100, allowance=100), spender=FakeSpender(), amount=50
+            )
+
+
+class FakeAsyncTx(FakeTx):
+    async def estimateGas(self, params):
+        return super().estimateGas(params)
+
+
+class AsyncPreflightClient(AsyncClient):
+
+    def __init__(self):
+        account = Account.create()
+        super().__init__(public_key=account.address, private_key=account.key, network=networks.Network(
+            provider="http://127.0.0.1:1/",
+            chain_id=123,
+            routers={},
+            tokens={},
+            wrapped_native_token=None,
+            explorer_tx_url="{}",
+            native_token_decimals=18,
+        ))
+
+    async def test_transaction(self, tx, value=None):
+        return tx.call({})
+
+    async def get_nonce(self, tag=None):
+        return 7
+
+    async def get_gas_price(self):
+        return 5 * 10**9
+
+
+class FakeAsyncToken(FakeToken):
+    async def balanceOf(self, address):
+        return self.balance
+
+    async def allowance(self, owner, spender):
+        return self._allowance
+
+
+class AsyncPreflightTest(unittest.TestCase):
+
+    def _preflight(self, *args, **kwargs):
+        async def run():
+            client = AsyncPreflightClient()
+            try:
+                return await client.preflight(*args, **kwargs)
+            finally:
+                await client.close()
+        return asyncio.run(run())
+
+    def test_explicit_nonce_zero(self):
+        preflight = self._preflight(FakeAsyncTx(), nonce=0)
+        self.assertEqual(preflight.nonce, 0)
+        self.assertTrue(preflight.fixed_nonce)
+
+    def test_preflight_no_balance(self):
+        preflight = self._preflight(
+            FakeAsyncTx(fail=True), token=FakeAsyncToken(balance=10, allowance=100), spender=FakeSpender(), amount=50
+        )
+        self.assertFalse(preflight.has_balance)
+        self.assertIsNone(preflight.gas_estimate)
+
+    def test_preflight_call_fails(self):
+        with self.assertRaises(ValueError):
+            self._preflight(
+                FakeAsyncTx(fail=True), token=FakeAsyncToken(balance=100, allowance=100), spender=FakeSpender(),
+                amount=50,
+            )
+
+    def test_sign_preflight_gas_price(self):
+        preflight = self._preflight(FakeAsyncTx(), gas_price=20000, nonce=1)
+
+        async def run():
+            client = AsyncPreflightClient()
+            try:
+                return await client.sign_preflight(preflight)
+            finally:
+                await client.close()
+
+        with self.assertRaises(BlockchainException):
+            asyncio.run(run())
+
+
+class PipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = PipelineClient()
+
+    def test_send_with_approval(self):
+        token = FakeApproveToken(balance=100, allowance=0)
+        preflight = self.client.preflight(FakeTx(fail=True), token=token, spender=FakeSpender(), amount=50)
+        hashes = self.client.send_with_approval(preflight, token=token, spender=FakeSpender(), approve_amount=100)
+        self.assertEqual(hashes, ("0x7", "0x8"))
+        self.assertEqual(token.approved, 100)
+        self.assertEqual(self.client.signed, [(21000, 5 * 10**9, 7), (400000, 5 * 10**9, 8)])
+
+    def test_wait_with_approval(self):
+        self.client.w3 = FakePipelineWeb3({"0x7": {"status": 1}, "0x8": {"status": 1}})
+        self.assertEqual(self.client.wait_with_approval("0x7", "0x8"), {"status": 1})
+
+    def test_approval_fails(self):
+        self.client.w3 = FakePipelineWeb3({"0x7": {"status": 0}})
+        with self.assertRaises(TransactionFailedException):
+            self.client.wait_with_approval("0x7", "0x8")
+        # Pending swap replaced with higher gas price
+        self.assertEqual(len(self.client.w3.eth.sent), 1)
+
+
+class BroadcastTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.client.w3 = FakeBroadcastWeb3(error="connection refused")
+        self.client.broadcast_providers = ["http://a", "http://b"]
+        self.client._broadcast_w3 = [
+            ("http://a", FakeBroadcastWeb3(error="{'code': -32000, 'message': 'already known'}")),
+            ("http://b", FakeBroadcastWeb3()),
+        ]
+
+    def test_broadcast(self):
+        tx_hash = self.client.send_transaction(FakeSignedTransaction())
+        self.assertEqual(tx_hash, HexBytes("0x1234").hex())
+        self.client._get_pool().shutdown(wait=True)
+        for endpoint, w3 in self.client._broadcast_w3:
+            self.assertEqual(w3.eth.sent, [b"raw"])
+
+    def test_broadcast_all_fail(self):
+        self.client._broadcast_w3 = [("http://a", FakeBroadcastWeb3(error="nonce too low"))]
+        with self.assertRaises(ValueError):
+            self.client.send_transaction(FakeSignedTransaction())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from web3 import Web3
+
+from blockchain.async_web3.contract import AsyncLPContract, AsyncToken
+from blockchain.contract import LPContract, Token, get_abi, get_contract_factory
+
+
+TEST_TOKEN = "0x0000000000000000000000000000000000000001"
+TEST_LP = "0x2000000000000000000000000000000000000001"
+TEST_SPENDER = "0x3000000000000000000000000000000000000001"
+
+
+class ContractHandleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.w3 = Web3()
+
+    def test_address(self):
+        token = Token(self.w3, TEST_LP.lower())
+        self.assertEqual(token.address, Web3.toChecksumAddress(TEST_LP))
+        self.assertEqual(token.contract.address, Web3.toChecksumAddress(TEST_LP))
+
+    def test_shared_factory(self):
+        token1 = Token(self.w3, TEST_TOKEN)
+        token2 = Token(self.w3, TEST_LP)
+        self.assertIs(token1._contract_factory, token2._contract_factory)
+        self.assertIs(token1._contract_factory, get_contract_factory(self.w3, get_abi("token")))
+        self.assertIsNot(token1._contract_factory, get_contract_factory(Web3(), get_abi("token")))
+        # Contract is created only when needed
+        self.assertIsNone(token1._contract)
+
+    def test_function(self):
+        token = Token(self.w3, TEST_LP)
+        expected = self.w3.eth.contract(address=TEST_LP, abi=get_abi("token")).functions.approve(TEST_SPENDER, 10)
+        tx_params = {"gas": 100000, "gasPrice": 1, "chainId": 56, "nonce": 0, "from": TEST_SPENDER}
+        self.assertEqual(token.approve(TEST_SPENDER, 10).buildTransaction(tx_params),
+                         expected.buildTransaction(tx_params))
+        self.assertIsNone(token._contract)
+
+    def test_slots(self):
+        self.assertFalse(hasattr(Token(self.w3, TEST_TOKEN), "__dict__"))
+        self.assertFalse(hasattr(LPContract(self.w3, TEST_LP), "__dict__"))
+
+    def test_async_handles(self):
+        abi = get_abi("token")
+        token = AsyncToken(self.w3, TEST_TOKEN, abi=abi)
+        self.assertFalse(hasattr(token, "__dict__"))
+        self.assertFalse(hasattr(AsyncLPContract(self.w3, TEST_LP, abi=get_abi("PancakeLP")), "__dict__"))
+        self.assertIs(token._contract_factory, AsyncToken(self.w3, TEST_LP, abi=abi)._contract_factory)
+        self.assertEqual(token.function("balanceOf", TEST_SPENDER).address, TEST_TOKEN)
+
+
+if __name__ == '__main__':
+    unittest.main()
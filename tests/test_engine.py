@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import asyncio
+import threading
+import unittest
+
+from eth_account import Account
+from web3 import Web3
+
+from blockchain import networks
+from blockchain.async_web3.simulator import SimulatorNode
+from blockchain.client import Client
+from blockchain.contract import get_abi
+from blockchain.engine import AsyncEngine
+from blockchain.router_client import RouterClient
+from blockchain.simulator import SimulatedChain
+from blockchain.snapshot import current_snapshot, snapshot
+from test_router_client import FakeClient, TEST_ROUTER, TEST_TOKEN1, TEST_TOKEN2
+
+
+class FakeAsyncToken(object):
+    def __init__(self, client, address):
+        self.client = client
+        self.address = address
+
+    async def balanceOf(self, address):
+        self.client.running += 1
+        self.client.max_running = max(self.client.max_running, self.client.running)
+        await asyncio.sleep(0.01)
+        self.client.running -= 1
+        return int(self.address, 16)
+
+
+class FakeAsyncClient(object):
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.closed = False
+
+    async def get_token(self, address):
+        return FakeAsyncToken(self, address)
+
+    async def close(self):
+        self.closed = True
+
+
+class EngineClient(FakeClient):
+    def __init__(self):
+        super().__init__()
+        self._engine = AsyncEngine()
+        self._async_client = FakeAsyncClient()
+
+
+class AsyncEngineTest(unittest.TestCase):
+
+    def test_run_and_map(self):
+        with AsyncEngine() as engine:
+            async def thread_name(x):
+                await asyncio.sleep(0.001 * (5 - x))
+                return x, threading.current_thread().name
+
+            results = engine.map(thread_name, range(5), concurrency=2)
+            self.assertEqual([x[0] for x in results], list(range(5)))
+            self.assertTrue(all(x[1] == engine.name for x in results))
+
+            async def wait_self():
+                return engine.run(asyncio.sleep(0))
+
+            with self.assertRaises(RuntimeError):
+                engine.run(wait_self())
+        self.assertFalse(engine.running)
+
+    def test_context(self):
+        async def block_number():
+            return current_snapshot().block_number
+
+        with AsyncEngine() as engine:
+            with snapshot(block_number=123):
+                self.assertEqual(engine.run(block_number()), 123)
+
+
+class EngineClientTest(unittest.TestCase):
+
+    def test_get_balances(self):
+        client = EngineClient()
+        addresses = [f"0x{x:040x}" for x in range(1, 11)]
+        try:
+            self.assertEqual(client.get_balances(addresses), list(range(1, 11)))
+            self.assertGreater(client._async_client.max_running, 1)
+        finally:
+            async_client = client._async_client
+            client.close()
+        self.assertTrue(async_client.closed)
+        self.assertFalse(client.engine.running)
+
+    def test_get_amounts_out_without_engine(self):
+        client = FakeClient()
+        router = RouterClient(client=client, contract_address=TEST_ROUTER, abi=get_abi("PancakeRouterV2"))
+        token1 = client.get_token(TEST_TOKEN1)
+        token2 = client.get_token(TEST_TOKEN2)
+        self.assertEqual(router.get_amounts_out([(token1, token2, 100000000)] * 3), [10, 10, 10])
+        self.assertEqual(router.get_reserves_many([(token2, token1)]), [router.get_reserves(token2, token1)])
+
+    def test_send_transaction(self):
+        chain = SimulatedChain(chain_id=56, automine=True)
+        account = Account.create()
+        chain.set_balance(account.address, 10**18)
+        node = SimulatorNode(chain, port=0, block_time=0)
+        with AsyncEngine("simulator") as node_engine:
+            url = node_engine.run(node.start())
+            network = networks.Network(provider=url, chain_id=chain.chain_id, routers={}, tokens={},
+                                       wrapped_native_token=None, explorer_tx_url="{}", native_token_decimals=18)
+            # Sync provider is unreachable, requests must go through engine
+            client = Client(public_key=account.address, private_key=account.key, network=network, test_mode=False,
+                            w3=Web3(Web3.HTTPProvider("http://127.0.0.1:1/")), async_engine=True)
+            try:
+                gas_price = client.get_gas_price()
+                # No gas price strategy, default gas price
+                self.assertEqual(gas_price, Web3.toWei(client.default_gas, "gwei"))
+                self.assertEqual(client.get_nonce("pending"), 0)
+                signed = Account.sign_transaction({
+                    "to": "0x0000000000000000000000000000000000000001", "value": 1, "gas": 21000,
+                    "gasPrice": gas_price, "nonce": 0, "chainId": chain.chain_id,
+                }, account.key)
+                self.assertEqual(client.send_transaction(signed), signed.hash.hex())
+                self.assertEqual(client.get_nonce("pending"), 1)
+                self.assertIn(signed.hash.hex(), chain.receipts)
+            finally:
+                client.close()
+                node_engine.run(node.stop())
+
+
+if __name__ == '__main__':
+    unittest.main()
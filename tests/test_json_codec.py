@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import unittest
+
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+from blockchain import json_codec
+from blockchain.async_web3.rpc import PooledAsyncHTTPProvider
+
+
+class JSONCodecTest(unittest.TestCase):
+
+    def test_codecs(self):
+        value = {"params": [AttributeDict({"to": "0x01", "data": HexBytes("0x1234")}), 10 ** 30], "id": 1}
+        expected = {"params": [{"to": "0x01", "data": "0x1234"}, 10 ** 30], "id": 1}
+        for name in json_codec.CODECS:
+            codec = json_codec.get_codec(name)
+            encoded = codec.dumps(value)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(json.loads(encoded), expected, name)
+            self.assertEqual(codec.loads(b'{"result": ["0x1", null, true]}'), {"result": ["0x1", None, True]})
+            with self.assertRaises(json.JSONDecodeError):
+                codec.loads(b'{"result": ')
+
+    def test_get_codec(self):
+        with self.assertRaises(ValueError):
+            json_codec.get_codec("unknown")
+        self.assertIn(json_codec.get_codec().name, json_codec.PREFERRED_CODECS)
+
+    def test_provider(self):
+        async def create():
+            # Connector needs running event loop
+            return PooledAsyncHTTPProvider("http://127.0.0.1:1/", json_codec=json_codec.JSONCodec())
+
+        provider = asyncio.run(create())
+        request = json.loads(provider.encode_rpc_request("eth_call", [{"data": HexBytes("0x12")}, "latest"]))
+        self.assertEqual(request["method"], "eth_call")
+        self.assertEqual(request["params"], [{"data": "0x12"}, "latest"])
+        self.assertEqual(provider.decode_rpc_response(b'{"id": 1, "result": "0x0"}'), {"id": 1, "result": "0x0"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+from eth_account import Account
+from web3 import Web3
+
+from blockchain import networks
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.pair_indexer import PairIndexer
+from blockchain.async_web3.router_client import get_async_router
+from blockchain.async_web3.simulator import SimulatorNode
+from blockchain.client import Client
+from blockchain.exceptions import NotFoundException
+from blockchain.pair_index import PairDatabase
+from blockchain.router_client import get_router
+from blockchain.simulator import SimulatedChain, SimulatorProvider
+
+
+FACTORY = "0x1000000000000000000000000000000000000001"
+TOKEN1 = "0x0000000000000000000000000000000000000001"
+TOKEN2 = "0x0000000000000000000000000000000000000002"
+TOKEN3 = "0x0000000000000000000000000000000000000003"
+TOKEN4 = "0x0000000000000000000000000000000000000004"
+LP1 = "0x2000000000000000000000000000000000000001"
+LP2 = "0x2000000000000000000000000000000000000002"
+LP3 = "0x2000000000000000000000000000000000000003"
+LP4 = "0x2000000000000000000000000000000000000004"
+
+
+class PairDatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.database = PairDatabase(":memory:")
+        self.database.add_pairs(FACTORY, [
+            (0, LP1, TOKEN1, TOKEN2),
+            (1, LP2, TOKEN2, TOKEN3),
+            (2, LP3, TOKEN3, TOKEN1),
+        ])
+
+    def tearDown(self):
+        self.database.close()
+
+    def test_get_pair(self):
+        self.assertEqual(self.database.get_pair(FACTORY, TOKEN1, TOKEN2), LP1)
+        self.assertEqual(self.database.get_pair(FACTORY, TOKEN2, TOKEN1), LP1)
+        self.assertIsNone(self.database.get_pair(FACTORY, TOKEN1, TOKEN4))
+        self.assertEqual(self.database.get_pair_tokens(FACTORY, LP2), (TOKEN2, TOKEN3))
+
+    def test_factory_state(self):
+        self.assertFalse(self.database.is_complete(FACTORY))
+        self.database.set_factory_state(FACTORY, pairs_length=3, last_block=100)
+        self.assertTrue(self.database.is_complete(FACTORY))
+        self.assertEqual(self.database.get_factory_state(FACTORY), (3, 100))
+        self.assertEqual(self.database.indexed_pairs(FACTORY), {0, 1, 2})
+
+    def test_find_paths(self):
+        paths = self.database.find_paths(FACTORY, TOKEN1, TOKEN3)
+        self.assertEqual(paths, [[TOKEN1, TOKEN3], [TOKEN1, TOKEN2, TOKEN3]])
+        self.assertEqual(self.database.find_paths(FACTORY, TOKEN1, TOKEN3, max_hops=1), [[TOKEN1, TOKEN3]])
+        self.assertEqual(self.database.find_paths(FACTORY, TOKEN1, TOKEN4), [])
+
+    def test_add_pair(self):
+        # getPair order, stored sorted like factory does
+        self.database.add_pair(FACTORY, LP4, TOKEN4, TOKEN1)
+        self.assertEqual(self.database.get_pair_tokens(FACTORY, LP4), (TOKEN1, TOKEN4))
+        self.database.add_pair(FACTORY, LP4, TOKEN4, TOKEN1)
+        self.assertEqual(self.database.indexed_pairs(FACTORY), {0, 1, 2})
+        # Indexer replaces pair with its allPairs index
+        self.database.add_pairs(FACTORY, [(3, LP4, TOKEN1, TOKEN4)])
+        self.assertEqual(self.database.indexed_pairs(FACTORY), {0, 1, 2, 3})
+        self.assertEqual(len(self.database.find_paths(FACTORY, TOKEN4, TOKEN1, max_hops=1)), 1)
+
+
+def make_network(chain: SimulatedChain, provider: str = "http://127.0.0.1:1/") -> networks.Network:
+    return networks.Network(
+        provider=provider,
+        chain_id=chain.chain_id,
+        routers={},
+        tokens={},
+        wrapped_native_token=None,
+        explorer_tx_url="{}",
+        native_token_decimals=18,
+    )
+
+
+class FactoryContractTest(unittest.TestCase):
+
+    def test_get_lp_after_index(self):
+        chain = SimulatedChain(chain_id=56)
+        tokens = [chain.add_token(f"T{x}") for x in range(3)]
+        router = Web3.toChecksumAddress(chain.add_router(tokens[0]))
+        chain.add_pair(router, tokens[0], tokens[1], 10**18, 10**18)
+        account = Account.create()
+        client = Client(public_key=account.address, private_key=account.key, network=make_network(chain),
+                        w3=Web3(SimulatorProvider(chain)))
+        database = PairDatabase(":memory:")
+        self.addCleanup(database.close)
+        factory = get_router(client, router, "PancakeRouterV2", pair_database=database).get_factory()
+        token0, token1, token2 = [client.get_token(Web3.toChecksumAddress(x)) for x in tokens]
+        database.add_pairs(factory.address, [(0, factory.get_lp(token0, token1).address, token0.address,
+                                              token1.address)])
+        database.set_factory_state(factory.address, pairs_length=1, last_block=chain.block_number)
+
+        # Created after last indexed block
+        lp = Web3.toChecksumAddress(chain.add_pair(router, tokens[2], tokens[0], 10**18, 10**18))
+        self.assertEqual(factory.get_lp(token2, token0).address, lp)
+        self.assertEqual(database.get_pair(factory.address, token0.address, token2.address), lp)
+        with self.assertRaises(NotFoundException):
+            factory.get_lp(token1, token2)
+
+
+class PairIndexerTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "pairs.db")
+        self.chain = SimulatedChain(chain_id=56)
+        self.tokens = [self.chain.add_token(f"T{x}") for x in range(5)]
+        self.router = Web3.toChecksumAddress(self.chain.add_router(self.tokens[0]))
+        self.pairs = []
+        for token in self.tokens[1:4]:
+            self._add_pair(self.tokens[0], token)
+
+    def _add_pair(self, token0: str, token1: str):
+        # Pair is created in latest block, new block so earlier indexed blocks don't change
+        self.chain.mine()
+        address = self.chain.add_pair(self.router, token0, token1, 10**18, 10**18)
+        self.pairs.append((len(self.pairs), Web3.toChecksumAddress(address)))
+
+    def _run(self, func):
+        """
+        Run func(indexer, factory) with indexer writing to database file
+        """
+        async def run():
+            async with SimulatorNode(self.chain, port=0, block_time=0) as node:
+                account = Account.create()
+                client = AsyncClient(public_key=account.address, private_key=account.key,
+                                     network=make_network(self.chain, node.url))
+                database = PairDatabase(self.path)
+                try:
+                    router = await get_async_router(client, self.router, "PancakeRouterV2", pair_database=database)
+                    factory = await router.get_factory()
+                    indexer = PairIndexer(client, database, batch_size=2, log_block_range=2)
+                    return await func(indexer, factory), database.get_factory_state(factory.address), \
+                        sorted((x, database.get_pair_tokens(factory.address, y)[0]) for x, y in self.pairs
+                               if database.get_pair_tokens(factory.address, y))
+                finally:
+                    database.close()
+                    await client.close()
+
+        return asyncio.run(run())
+
+    def test_index_and_update(self):
+        _, state, indexed = self._run(lambda indexer, factory: indexer.index_factory(factory))
+        self.assertEqual(state, (3, self.chain.block_number))
+        self.assertEqual([x[0] for x in indexed], [0, 1, 2])
+        self.assertTrue(all(x[1] == Web3.toChecksumAddress(self.tokens[0]) for x in indexed))
+
+        # Incremental update reads PairCreated events of new blocks only
+        self._add_pair(self.tokens[1], self.tokens[2])
+        self._add_pair(self.tokens[3], self.tokens[4])
+        new_pairs, state, indexed = self._run(lambda indexer, factory: indexer.update_factory(factory))
+        self.assertEqual(new_pairs, 2)
+        self.assertEqual(state, (5, self.chain.block_number))
+        self.assertEqual([x[0] for x in indexed], [0, 1, 2, 3, 4])
+
+        # Resumes from stored last block, nothing new
+        new_pairs, state, _ = self._run(lambda indexer, factory: indexer.update_factory(factory))
+        self.assertEqual((new_pairs, state), (0, (5, self.chain.block_number)))
+
+    def test_resume_index(self):
+        # Earlier run stored one pair before being interrupted
+        database = PairDatabase(self.path)
+        database.add_pairs(Web3.toChecksumAddress(self.chain.get_info(self.router.lower()).factory),
+                           [(1, self.pairs[1][1], Web3.toChecksumAddress(self.tokens[0]),
+                             Web3.toChecksumAddress(self.tokens[2]))])
+        database.close()
+        requests = []
+
+        async def index(indexer, factory):
+            get_pair = indexer._get_pair
+
+            async def counting_get_pair(factory, index):
+                requests.append(index)
+                return await get_pair(factory, index)
+
+            indexer._get_pair = counting_get_pair
+            await indexer.index_factory(factory)
+
+        _, state, indexed = self._run(index)
+        self.assertEqual(sorted(requests), [0, 2])
+        self.assertEqual(state, (3, self.chain.block_number))
+        self.assertEqual([x[0] for x in indexed], [0, 1, 2])
+
+    def test_update_not_indexed(self):
+        with self.assertRaises(RuntimeError):
+            self._run(lambda indexer, factory: indexer.update_factory(factory))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import os
+import tempfile
+import types
+import unittest
+
+import aiohttp
+
+from blockchain.async_web3.price_feed import PriceFeedPair, PriceFeedService, subscribe
+from blockchain.exceptions import BlockchainException
+from blockchain.snapshot import current_snapshot
+
+
+TEST_ROUTER = "0x3000000000000000000000000000000000000001"
+TEST_TOKEN1 = "0x0000000000000000000000000000000000000001"
+TEST_TOKEN2 = "0x0000000000000000000000000000000000000002"
+
+
+class FakePriceFeedService(PriceFeedService):
+    async def _get_price(self, pair):
+        return [pair.router, pair.token0, pair.token1, pair.token1, "0.1"]
+
+
+class FailingPriceFeedService(PriceFeedService):
+    """
+    Router of TEST_ROUTER pairs fails with given error, others quote snapshot block as price
+    """
+
+    def __init__(self, *args, error: Exception, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.error = error
+
+    async def _get_price(self, pair):
+        if pair.router != TEST_ROUTER:
+            return [pair.router, pair.token0, pair.token1, pair.token1, str(current_snapshot().block_number)]
+        return await super()._get_price(pair)
+
+    async def _get_router(self, address):
+        raise self.error
+
+
+class FakeEth(object):
+    """
+    block_number fails with node errors before returning blocks
+    """
+
+    def __init__(self, results):
+        self.results = list(results)
+
+    @property
+    async def block_number(self):
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class PriceFeedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, "prices.sock")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_publish(self):
+        service = FakePriceFeedService(
+            client=None,
+            pairs=[PriceFeedPair(router=TEST_ROUTER, token0=TEST_TOKEN1, token1=TEST_TOKEN2)],
+            socket_path=self.socket_path,
+        )
+
+        async def read(count):
+            updates = []
+            async for update in subscribe(self.socket_path):
+                updates.append(update)
+                if len(updates) == count:
+                    return updates
+
+        async def run():
+            await service.start()
+            await service.update(100)
+            # Late subscribers get latest update first
+            subscribers = [asyncio.ensure_future(read(2)) for _ in range(3)]
+            while len(service._subscribers) < 3:
+                await asyncio.sleep(0.01)
+            await service.update(101)
+            results = await asyncio.gather(*subscribers)
+            service._server.close()
+            await service._server.wait_closed()
+            return results
+
+        for updates in asyncio.run(run()):
+            self.assertEqual([x["block"] for x in updates], [100, 101])
+            self.assertEqual(updates[0]["prices"], [[TEST_ROUTER, TEST_TOKEN1, TEST_TOKEN2, TEST_TOKEN2, "0.1"]])
+
+    def test_pair_errors(self):
+        other_router = "0x3000000000000000000000000000000000000002"
+        pairs = [
+            PriceFeedPair(router=TEST_ROUTER, token0=TEST_TOKEN1, token1=TEST_TOKEN2),
+            PriceFeedPair(router=other_router, token0=TEST_TOKEN1, token1=TEST_TOKEN2),
+        ]
+        for error in [ZeroDivisionError(), aiohttp.ClientError(), asyncio.TimeoutError()]:
+            service = FailingPriceFeedService(client=None, pairs=pairs, socket_path=self.socket_path, error=error)
+            update = json.loads(asyncio.run(service.update(100)))
+            self.assertEqual(update["prices"], [
+                [TEST_ROUTER, TEST_TOKEN1, TEST_TOKEN2, None, None],
+                [other_router, TEST_TOKEN1, TEST_TOKEN2, TEST_TOKEN2, "100"],
+            ])
+
+    def test_run_node_errors(self):
+        eth = FakeEth([ValueError({"code": -32000, "message": "header not found"}),
+                       BlockchainException("failed"), RuntimeError("unexpected"), 100])
+        service = FakePriceFeedService(
+            client=types.SimpleNamespace(w3=types.SimpleNamespace(eth=eth)),
+            pairs=[PriceFeedPair(router=TEST_ROUTER, token0=TEST_TOKEN1, token1=TEST_TOKEN2)],
+            socket_path=self.socket_path,
+            poll_interval=0.01,
+        )
+
+        async def run():
+            task = asyncio.ensure_future(service.run())
+            while service._last_update is None and not task.done():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertIn(b'"block":100', service._last_update)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
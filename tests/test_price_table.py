@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+import struct
+import unittest
+
+from blockchain.async_web3.price_feed import PriceFeedPair
+from blockchain.async_web3.price_monitor import PriceMonitor
+from blockchain.price_table import PriceKey, PriceTable
+
+
+TEST_ROUTER = "0x3000000000000000000000000000000000000001"
+TEST_TOKEN1 = "0x0000000000000000000000000000000000000001"
+TEST_TOKEN2 = "0x0000000000000000000000000000000000000002"
+
+
+def write_row(name, index):
+    table = PriceTable.attach(name)
+    try:
+        table.write(index, block=100, reserve0=2 ** 112 - 1, reserve1=5, price=1.5)
+    finally:
+        table.close()
+
+
+class PriceTableTest(unittest.TestCase):
+
+    def test_table(self):
+        keys = [
+            PriceKey("binance", TEST_ROUTER, TEST_TOKEN1, TEST_TOKEN2),
+            PriceKey("kardiachain", TEST_ROUTER, TEST_TOKEN2, TEST_TOKEN1),
+        ]
+        table = PriceTable.create(keys)
+        try:
+            self.assertEqual(table.keys(), keys)
+            self.assertEqual(table.read_all(), [None, None])
+
+            # Writer in other process
+            process = multiprocessing.get_context("spawn").Process(target=write_row, args=(table.name, 1))
+            process.start()
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+            reader = PriceTable.attach(table.name)
+            row = reader.read(1)
+            self.assertEqual((row.block, row.reserve0, row.reserve1, row.price), (100, 2 ** 112 - 1, 5, 1.5))
+            self.assertIsNone(reader.read(0))
+            table.write(1, block=101, reserve0=1, reserve1=2, price=2.0)
+            self.assertEqual(reader.read(1).block, 101)
+            reader.close()
+        finally:
+            table.close()
+
+    def test_killed_writer(self):
+        keys = [PriceKey("binance", TEST_ROUTER, TEST_TOKEN1, TEST_TOKEN2)]
+        table = PriceTable.create(keys)
+        try:
+            table.write(0, block=100, reserve0=1, reserve1=2, price=2.0)
+            # Writer killed after making sequence odd
+            offset = table._rows_offset
+            struct.pack_into("<Q", table._buffer, offset, 3)
+            with self.assertRaises(TimeoutError):
+                table.read(0, timeout=0.01)
+
+            # Restarted writer unlocks its rows
+            writer = PriceTable.attach(table.name, rows=[0])
+            self.assertEqual(table.read(0).block, 100)
+            writer.write(0, block=101, reserve0=1, reserve1=2, price=2.0)
+            self.assertEqual(struct.unpack_from("<Q", table._buffer, offset)[0], 6)
+            self.assertEqual(table.read(0).block, 101)
+            writer.close()
+        finally:
+            table.close()
+
+    def test_shards(self):
+        pairs = {
+            "binance": [PriceFeedPair(TEST_ROUTER, TEST_TOKEN1, TEST_TOKEN2) for _ in range(5)],
+            "kardiachain": [PriceFeedPair(TEST_ROUTER, TEST_TOKEN2, TEST_TOKEN1)],
+        }
+        monitor = PriceMonitor(pairs, shards=2)
+        self.assertEqual([x[0] for x in monitor.assignments], ["binance", "binance", "kardiachain"])
+        self.assertEqual([[r[0] for r in x[1]] for x in monitor.assignments], [[0, 2, 4], [1, 3], [5]])
+        self.assertEqual(monitor.keys[5].network, "kardiachain")
+
+
+if __name__ == '__main__':
+    unittest.main()
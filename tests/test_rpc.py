@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+
+from aiohttp import web
+
+from blockchain.async_web3.rpc import PooledAsyncHTTPProvider
+
+
+class PooledProviderTest(unittest.TestCase):
+
+    def test_warm_up_and_reuse(self):
+        peers = []
+
+        async def handler(request):
+            peers.append(request.transport.get_extra_info("peername")[1])
+            body = await request.json()
+            # Keep requests in flight at the same time
+            await asyncio.sleep(0.05)
+            return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": "test"})
+
+        async def run():
+            app = web.Application()
+            app.router.add_post("/", handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            try:
+                provider = PooledAsyncHTTPProvider(f"http://127.0.0.1:{port}/")
+                try:
+                    opened = await provider.warm_up(3)
+                    session = provider.get_session()
+                    for _ in range(3):
+                        await provider.make_request("web3_clientVersion", [])
+                    self.assertIs(provider.get_session(), session)
+                    return opened
+                finally:
+                    await provider.close()
+            finally:
+                await runner.cleanup()
+
+        opened = asyncio.run(run())
+        self.assertEqual(opened, 3)
+        self.assertEqual(len(set(peers[:3])), 3)
+        # Later requests use warmed up connections
+        self.assertTrue(set(peers[3:]) <= set(peers[:3]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+import unittest
+
+from web3 import Web3
+
+from blockchain.contract import get_abi
+from blockchain.selector_db import SelectorDatabase, decode_lines
+
+
+TEST_ROUTER = "0x10ED43C718714eb63d5aA57B78B54704E256024E"
+TEST_TOKEN1 = "0xbb4CdB9CBd36B01bD1cBaEBF2De08d9173bc095c"
+TEST_TOKEN2 = "0xe9e7CEA3DedcA5984780Bafc599bD69ADd087D56"
+TEST_TO = "0x1000000000000000000000000000000000000001"
+
+TEST_ABI = [{
+    "type": "function",
+    "name": "submit",
+    "inputs": [
+        {"name": "order", "type": "tuple", "components": [
+            {"name": "maker", "type": "address"},
+            {"name": "amounts", "type": "uint256[]"},
+        ]},
+        {"name": "", "type": "bytes"},
+    ],
+    "outputs": [],
+}]
+
+
+class SelectorDatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.directory.name, "Orders.json"), "w") as f:
+            json.dump({"abi": TEST_ABI}, f)
+        with open(os.path.join(self.directory.name, "broken.json"), "w") as f:
+            f.write("{")
+        self.database = SelectorDatabase([self.directory.name])
+        self.router = Web3().eth.contract(address=TEST_ROUTER, abi=get_abi("PancakeRouterV2"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lookup(self):
+        self.assertEqual(
+            self.database.get("0x38ED1739").signature,
+            "swapExactTokensForTokens(uint256,uint256,address[],address,uint256)",
+        )
+        self.assertIn("0xa9059cbb", self.database)
+        self.assertIsNone(self.database.get("0xdeadbeef"))
+
+    def test_decode(self):
+        data = self.router.encodeABI("swapExactTokensForTokens", args=[1000, 900, [TEST_TOKEN1, TEST_TOKEN2],
+                                                                        TEST_TO, 1])
+        result = self.database.decode(data)
+        self.assertEqual(result["arguments"], {
+            "amountIn": 1000, "amountOutMin": 900, "path": [TEST_TOKEN1, TEST_TOKEN2], "to": TEST_TO, "deadline": 1,
+        })
+        self.assertEqual(self.database.decode("0xdeadbeef")["error"], "unknown selector")
+        self.assertIn("error", self.database.decode(data[:50]))
+
+    def test_decode_tuple(self):
+        contract = Web3().eth.contract(address=TEST_ROUTER, abi=TEST_ABI)
+        data = contract.encodeABI("submit", args=[(TEST_TO, [1, 2]), b"\x01\x02"])
+        result = self.database.decode(data)
+        self.assertEqual(result["function"], "submit((address,uint256[]),bytes)")
+        self.assertEqual(result["arguments"], {"order": [TEST_TO, [1, 2]], "1": "0x0102"})
+
+    def test_decode_lines(self):
+        data = self.router.encodeABI("swapExactETHForTokens", args=[900, [TEST_TOKEN1, TEST_TOKEN2], TEST_TO, 1])
+        lines = [data, "", json.dumps({"hash": "0x01", "input": data}), "0xdeadbeef"] * 5
+        results = [json.loads(x) for x in decode_lines(lines, max_workers=2, chunk_size=2)]
+        self.assertEqual(len(results), 15)
+        self.assertEqual(results[0]["arguments"]["amountOutMin"], 900)
+        self.assertEqual(results[1]["hash"], "0x01")
+        self.assertEqual(results[1]["arguments"]["path"], [TEST_TOKEN1, TEST_TOKEN2])
+        self.assertEqual(results[2]["error"], "unknown selector")
+        self.assertEqual(results[-1]["error"], "unknown selector")
+
+
+if __name__ == '__main__':
+    unittest.main()
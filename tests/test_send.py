@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+import unittest
+
+from eth_account import Account
+from web3 import Web3
+
+import send
+from blockchain import networks
+from blockchain.exceptions import NoBalanceException
+from blockchain.simulator import SimulatedChain, SimulatorProvider
+
+GAS_PRICE = 10**9
+TRANSFER_COST = send.NATIVE_TRANSFER_GAS * GAS_PRICE
+
+
+def make_network(chain: SimulatedChain) -> networks.Network:
+    return networks.Network(
+        provider="http://127.0.0.1:1/",
+        chain_id=chain.chain_id,
+        routers={},
+        tokens={},
+        wrapped_native_token=None,
+        explorer_tx_url="{}",
+        native_token_decimals=18,
+    )
+
+
+class SendBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "payout.csv")
+        self.journal_path = self.path + ".journal"
+        self.recipients = [Web3.toChecksumAddress(f"0x{x + 1:040x}") for x in range(3)]
+        with open(self.path, 'w') as f:
+            f.write("to,amount\n")
+            for x, address in enumerate(self.recipients):
+                f.write(f"{address},{x + 1}\n")
+        self.account = Account.create()
+        self.chain = SimulatedChain(chain_id=56, automine=True)
+        self.chain.set_balance(self.account.address, 10 * 10**18)
+        self.sender = self._sender(test_mode=False)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _sender(self, test_mode: bool) -> send.Sender:
+        return send.Sender(public_key=self.account.address, private_key=self.account.key,
+                           network=make_network(self.chain), w3=Web3(SimulatorProvider(self.chain)),
+                           test_mode=test_mode)
+
+    def _send_batch(self, sender=None):
+        (sender or self.sender).send_batch(self.path, self.journal_path, gas_price=1)
+
+    def _signed_entry(self, row: int, nonce: int, status=send.SIGNED, amount: int = None) -> dict:
+        amount = row + 1 if amount is None else amount
+        signed = Account.sign_transaction({
+            "to": self.recipients[row], "value": amount * 10**18, "gas": send.NATIVE_TRANSFER_GAS,
+            "gasPrice": GAS_PRICE, "nonce": nonce, "chainId": self.chain.chain_id,
+        }, self.account.key)
+        entry = {"row": row + 1, "status": status, "to": self.recipients[row], "amount": str(amount),
+                 "nonce": nonce, "hash": signed.hash.hex()}
+        if status == send.SIGNED:
+            entry["raw"] = signed.rawTransaction.hex()
+        return entry, signed
+
+    def _write_journal(self, entries):
+        with open(self.journal_path, 'w') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+
+    def _journal(self):
+        journal = send.Journal(self.journal_path)
+        journal.close()
+        return journal.entries
+
+    def _balances(self):
+        return [self.chain.native.get(x.lower(), 0) // 10**18 for x in self.recipients]
+
+    def _nonce(self):
+        return self.chain.nonces.get(self.account.address.lower(), 0)
+
+    def test_send_batch(self):
+        self._send_batch()
+        self.assertEqual(self._balances(), [1, 2, 3])
+        self.assertEqual({x["status"] for x in self._journal().values()}, {send.CONFIRMED})
+        # Rerun skips rows found from journal
+        self._send_batch()
+        self.assertEqual(self._balances(), [1, 2, 3])
+        self.assertEqual(self._nonce(), 3)
+
+    def test_resume_signed(self):
+        entry, _ = self._signed_entry(0, nonce=0)
+        self._write_journal([entry])
+        self._send_batch()
+        self.assertEqual(self._balances(), [1, 2, 3])
+        self.assertEqual(self._nonce(), 3)
+        self.assertEqual(self._journal()[1]["hash"], entry["hash"])
+
+    def test_resume_signed_already_mined(self):
+        # Crashed after sending but before writing SENT, node answers already known
+        entry, signed = self._signed_entry(0, nonce=0)
+        self.chain.send_raw_transaction(signed.rawTransaction)
+        self._write_journal([entry])
+        self._send_batch()
+        self.assertEqual(self._balances(), [1, 2, 3])
+        self.assertEqual(self._nonce(), 3)
+        self.assertEqual(self._journal()[1]["status"], send.CONFIRMED)
+
+    def test_resume_sent(self):
+        entry, signed = self._signed_entry(0, nonce=0, status=send.SENT)
+        self.chain.send_raw_transaction(signed.rawTransaction)
+        self._write_journal([entry])
+        self._send_batch()
+        self.assertEqual(self._balances(), [1, 2, 3])
+        self.assertEqual(self._nonce(), 3)
+        self.assertEqual(self._journal()[1]["status"], send.CONFIRMED)
+
+    def test_nonce_too_low_own_transaction(self):
+        # Node doesn't know the raw transaction anymore but has it mined
+        entry, signed = self._signed_entry(0, nonce=0)
+        self.chain.send_raw_transaction(signed.rawTransaction)
+
+        def send_transaction(tx):
+            raise ValueError({"code": -32000, "message": "nonce too low"})
+
+        self.sender.client.send_transaction = send_transaction
+        self.assertEqual(self.sender._send_raw(entry)["status"], send.SENT)
+
+    def test_nonce_used_by_other_transaction(self):
+        entry, _ = self._signed_entry(0, nonce=0)
+        _, other = self._signed_entry(0, nonce=0, amount=5)
+        self.chain.send_raw_transaction(other.rawTransaction)
+        self._write_journal([entry])
+        self.chain.set_balance(self.account.address, 10 * 10**18)
+        self._send_batch()
+        entries = self._journal()
+        self.assertEqual(entries[1]["status"], send.FAILED)
+        self.assertEqual([entries[x]["status"] for x in [2, 3]], [send.CONFIRMED, send.CONFIRMED])
+        # Only the other transaction paid row 1
+        self.assertEqual(self._balances(), [5, 2, 3])
+
+    def test_balance_includes_signed(self):
+        entry, _ = self._signed_entry(0, nonce=0)
+        self._write_journal([entry])
+        # Enough for rows 2 and 3 but not for resent row 1
+        self.chain.native[self.account.address.lower()] = 5 * 10**18 + 3 * TRANSFER_COST
+        with self.assertRaises(NoBalanceException):
+            self._send_batch()
+        self.assertEqual(self._nonce(), 0)
+        self.chain.native[self.account.address.lower()] = 6 * 10**18 + 3 * TRANSFER_COST
+        self._send_batch()
+        self.assertEqual(self._balances(), [1, 2, 3])
+
+    def test_test_mode_resume(self):
+        entry, _ = self._signed_entry(0, nonce=0)
+        self._write_journal([entry])
+        self._send_batch(self._sender(test_mode=True))
+        self.assertEqual(self._nonce(), 0)
+        self.assertEqual(self._balances(), [0, 0, 0])
+        self.assertEqual(self._journal(), {1: entry})
+
+
+if __name__ == '__main__':
+    unittest.main()
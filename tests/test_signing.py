@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+
+from eth_account import Account
+from web3 import Web3
+
+from blockchain.client import Client
+from blockchain.signing import SigningExecutor
+
+
+def make_transactions(count):
+    return [
+        {
+            'gas': 21000,
+            'gasPrice': 10**9,
+            'nonce': nonce,
+            'value': 1,
+            'to': "0x0000000000000000000000000000000000000001",
+            'chainId': 56,
+        } for nonce in range(count)
+    ]
+
+
+class SigningExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.account = Account.create()
+        self.executor = SigningExecutor(self.account.key, max_workers=2, chunk_size=3)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_sign_transactions(self):
+        transactions = make_transactions(7)
+        signed = self.executor.sign_transactions(transactions)
+        expected = [Account.sign_transaction(tx, self.account.key) for tx in transactions]
+        self.assertEqual([x.rawTransaction for x in signed], [x.rawTransaction for x in expected])
+
+    def test_async_sign_transactions(self):
+        transactions = make_transactions(5)
+        signed = asyncio.run(self.executor.async_sign_transactions(transactions))
+        self.assertEqual([x.hash for x in signed], [Account.sign_transaction(tx, self.account.key).hash
+                                                    for tx in transactions])
+
+    def test_close(self):
+        with SigningExecutor(self.account.key, max_workers=2) as executor:
+            executor.sign_transactions(make_transactions(2))
+            processes = list(executor._executor._processes.values())
+        self.assertTrue(processes)
+        self.assertFalse(any(x.is_alive() for x in processes))
+
+    def test_client_close(self):
+        client = Client(public_key=self.account.address, private_key=self.account.key, w3=Web3(), signing_processes=1)
+        client.sign_transactions(make_transactions(2))
+        processes = list(client.get_signing_executor()._executor._processes.values())
+        self.assertTrue(processes)
+        client.close()
+        self.assertFalse(any(x.is_alive() for x in processes))
+        self.assertIsNone(client._signing_executor)
+
+
+if __name__ == '__main__':
+    unittest.main()
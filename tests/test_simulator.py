@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+
+from eth_account import Account
+from web3 import Web3
+
+from blockchain import amm, networks
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.router_client import get_async_router
+from blockchain.async_web3.simulator import SimulatorNode
+from blockchain.client import Client
+from blockchain.exceptions import ContractLogicError
+from blockchain.router_client import get_router
+from blockchain.simulator import DEFAULT_FEE, SimulatedChain, SimulatorProvider, network_chain
+
+ROUTER = "0x3000000000000000000000000000000000000001"
+
+
+def make_chain(accounts, **kwargs) -> SimulatedChain:
+    chain = SimulatedChain(chain_id=56, **kwargs)
+    wrapped = chain.add_token("WBNB", wrapped=True)
+    busd = chain.add_token("BUSD")
+    router = chain.add_router(wrapped)
+    chain.add_pair(router, wrapped, busd, 1000 * 10**18, 300000 * 10**18)
+    for account in accounts:
+        chain.set_balance(account, 100 * 10**18)
+        chain.mint(busd, account, 1000 * 10**18)
+    return chain
+
+
+def make_network(chain: SimulatedChain, provider: str = "http://127.0.0.1:1/") -> networks.Network:
+    tokens = {info.symbol: Web3.toChecksumAddress(address) for address, (kind, info) in chain.contracts.items()
+              if kind == "token"}
+    return networks.Network(
+        provider=provider,
+        chain_id=chain.chain_id,
+        routers={"Router": ROUTER},
+        tokens=tokens,
+        wrapped_native_token=tokens["WBNB"],
+        explorer_tx_url="{}",
+        native_token_decimals=18,
+    )
+
+
+class SimulatedChainTest(unittest.TestCase):
+
+    def setUp(self):
+        self.account = Account.create()
+        self.chain = make_chain([self.account.address], automine=True)
+        self.network = make_network(self.chain)
+        self.w3 = Web3(SimulatorProvider(self.chain))
+        self.client = Client(public_key=self.account.address, private_key=self.account.key, network=self.network,
+                             w3=self.w3, test_mode=False)
+        self.router = get_router(self.client, ROUTER, "PancakeRouterV2")
+        self.wbnb = self.client.get_token(self.network.tokens["WBNB"])
+        self.busd = self.client.get_token(self.network.tokens["BUSD"])
+
+    def test_quotes(self):
+        self.assertEqual(self.busd.symbol, "BUSD")
+        self.assertEqual(self.router.get_reserves(self.wbnb, self.busd)[:2], [1000 * 10**18, 300000 * 10**18])
+        self.assertEqual(self.router.get_amount_out(self.wbnb, self.busd, 10**18),
+                         amm.get_amount_out(10**18, 1000 * 10**18, 300000 * 10**18, DEFAULT_FEE))
+        with self.assertRaises(ContractLogicError):
+            self.router.get_amount_out(self.wbnb, self.busd, 0)
+
+    def test_swap(self):
+        self.client.approve(self.busd, self.router, 300 * 10**18, gas_price=5)
+        tx_hash = self.router.swap([self.busd, self.wbnb], 300 * 10**18, 0, gas_price=5)
+        receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        self.assertEqual(receipt["status"], 1)
+        amount_out = amm.get_amount_out(300 * 10**18, 300000 * 10**18, 1000 * 10**18, DEFAULT_FEE)
+        self.assertEqual(self.busd.balanceOf(self.account.address), 700 * 10**18)
+        self.assertEqual(self.wbnb.balanceOf(self.account.address), amount_out)
+        self.assertEqual(list(self.router.get_reserves(self.busd, self.wbnb)[:2]),
+                         [300300 * 10**18, 1000 * 10**18 - amount_out])
+        # Transfer, Transfer, Sync and Swap
+        self.assertEqual(len(receipt["logs"]), 4)
+        lp = self.router.get_lp(self.busd, self.wbnb)
+        sync_topic = Web3.keccak(text="Sync(uint112,uint112)").hex()
+        logs = self.w3.eth.get_logs({"fromBlock": 0, "toBlock": "latest", "address": lp.address,
+                                     "topics": [sync_topic]})
+        self.assertEqual(len(logs), 1)
+        self.assertEqual(logs[0]["transactionHash"].hex(), tx_hash)
+
+    def test_pending_transactions(self):
+        self.chain.automine = False
+        other = Account.create().address
+        tx_hash = self.client.send_transaction(self.client.send_native_token(10**18, other, gas_price=5))
+        self.assertEqual(self.w3.eth.get_transaction_count(self.account.address, "pending"), 1)
+        self.assertEqual(self.w3.eth.get_transaction_count(self.account.address), 0)
+        self.assertIsNone(self.w3.eth.get_transaction(tx_hash)["blockNumber"])
+        block = self.chain.mine()
+        self.assertEqual(block["transactions"], [tx_hash])
+        self.assertEqual(self.w3.eth.get_balance(other), 10**18)
+        self.assertEqual(self.w3.eth.get_transaction_receipt(tx_hash)["blockNumber"], 1)
+
+    def test_logs_block_range(self):
+        self.chain.max_logs_block_range = 2
+        for _ in range(3):
+            self.chain.mine()
+        with self.assertRaises(ValueError):
+            self.w3.eth.get_logs({"fromBlock": 0, "toBlock": 3})
+        self.assertEqual(self.w3.eth.get_logs({"fromBlock": 2, "toBlock": 3}), [])
+
+    def test_network_chain(self):
+        network = networks.get_network_by_name(networks.BINANCE)
+        chain = network_chain(network, routers=["PancakeRouterV2", "ApeRouter"])
+        # 4 tokens, 6 pairs per router
+        self.assertEqual(len(chain.contracts), 4 + 2 * (2 + 6))
+        client = Client(public_key=self.account.address, private_key=self.account.key, network=network,
+                        w3=Web3(SimulatorProvider(chain)))
+        wbnb = client.get_token(network.tokens["WBNB"])
+        busd = client.get_token(network.tokens["BUSD"])
+        amounts = [get_router(client, network.routers[x], "PancakeRouterV2").get_amount_out(wbnb, busd, 10**18)
+                   for x in ["PancakeRouterV2", "ApeRouter"]]
+        self.assertLess(amounts[0], amounts[1])
+
+
+class SimulatorNodeTest(unittest.TestCase):
+
+    def test_async_client(self):
+        account = Account.create()
+        chain = make_chain([account.address])
+
+        async def run():
+            async with SimulatorNode(chain, port=0, block_time=0.05) as node:
+                client = AsyncClient(public_key=account.address, private_key=account.key,
+                                     network=make_network(chain, node.url), test_mode=False)
+                try:
+                    router = await get_async_router(client, ROUTER, "PancakeRouterV2")
+                    wbnb = await client.get_token(client.network.tokens["WBNB"])
+                    busd = await client.get_token(client.network.tokens["BUSD"])
+                    reserves = await router.get_reserves(wbnb, busd)
+                    signed = await client.sign_transaction(busd.contract.functions.transfer(ROUTER, 10**18),
+                                                           gas_price=5)
+                    tx_hash = await client.send_transaction(signed)
+                    receipt = await client.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=5)
+                    return reserves, receipt, await busd.balanceOf(ROUTER), node.requests
+                finally:
+                    await client.close()
+
+        reserves, receipt, balance, requests = asyncio.run(run())
+        self.assertEqual(reserves[:2], [1000 * 10**18, 300000 * 10**18])
+        self.assertEqual(receipt["status"], 1)
+        self.assertEqual(balance, 10**18)
+        self.assertGreater(requests, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+
+from web3 import Web3
+
+from blockchain.async_web3.contract import AsyncToken
+from blockchain.contract import Token, get_abi
+from blockchain.snapshot import async_snapshot, current_snapshot, snapshot
+
+
+TEST_TOKEN = "0x0000000000000000000000000000000000000001"
+TEST_ADDRESS = "0x1000000000000000000000000000000000000001"
+
+
+class FakeFunction(object):
+    def __init__(self, calls, fn_name, *args):
+        self.calls = calls
+        self.address = TEST_TOKEN
+        self.fn_name = fn_name
+        self.args = args
+        self.kwargs = {}
+
+    def call(self, block_identifier="latest", **kwargs):
+        self.calls.append((self.fn_name, self.args, block_identifier))
+        return len(self.calls)
+
+
+class FakeAsyncToken(AsyncToken):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    async def _call_function(self, function, tx_kwargs=None, block_id=None):
+        self.calls.append((function.fn_name, function.args, block_id))
+        await asyncio.sleep(0)
+        return len(self.calls)
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def test_sync(self):
+        token = Token(Web3(), TEST_TOKEN)
+        calls = []
+        self.assertEqual(token.call_function(FakeFunction(calls, "balanceOf", TEST_ADDRESS)), 1)
+        with snapshot(block_number=100) as s:
+            self.assertIs(current_snapshot(), s)
+            self.assertEqual(token.call_function(FakeFunction(calls, "balanceOf", TEST_ADDRESS)), 2)
+            self.assertEqual(token.call_function(FakeFunction(calls, "balanceOf", TEST_ADDRESS)), 2)
+            self.assertEqual(token.call_function(FakeFunction(calls, "balanceOf", [TEST_ADDRESS])), 3)
+            # Explicit block is not pinned
+            token.call_function(FakeFunction(calls, "balanceOf", TEST_ADDRESS), block_identifier=5)
+        self.assertIsNone(current_snapshot())
+        self.assertEqual([x[2] for x in calls], ["latest", 100, 100, 5])
+        self.assertEqual((s.calls, s.hits), (2, 1))
+
+    def test_async(self):
+        token = FakeAsyncToken(Web3(), TEST_TOKEN, abi=get_abi("token"))
+
+        async def run():
+            async with async_snapshot(block_number=200) as s:
+                results = await asyncio.gather(
+                    token.balanceOf(TEST_ADDRESS),
+                    token.balanceOf(TEST_ADDRESS),
+                    token.allowance(TEST_ADDRESS, TEST_TOKEN),
+                )
+            latest = await token.balanceOf(TEST_ADDRESS)
+            return s, results, latest
+
+        s, results, latest = asyncio.run(run())
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(latest, 3)
+        self.assertEqual([x[2] for x in token.calls], [200, 200, None])
+        self.assertEqual((s.calls, s.hits), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+from decimal import Decimal
+
+from blockchain import amm
+from blockchain.async_web3.spread_scanner import ReserveCache, SpreadScanner
+
+
+TEST_TOKEN1 = "0x0000000000000000000000000000000000000001"
+TEST_TOKEN2 = "0x0000000000000000000000000000000000000002"
+TEST_LP1 = "0x2000000000000000000000000000000000000001"
+TEST_LP2 = "0x2000000000000000000000000000000000000002"
+
+
+def pancake_amount_out(amount_in, reserve_in, reserve_out):
+    amount_in_with_fee = amount_in * 9975
+    return (amount_in_with_fee * reserve_out) // (reserve_in * 10000 + amount_in_with_fee)
+
+
+class FakeEth(object):
+    def __init__(self, logs):
+        self.logs = logs
+        self.requests = []
+
+    async def get_logs(self, params):
+        self.requests.append(params)
+        return self.logs
+
+
+class FakeW3(object):
+    def __init__(self, logs):
+        self.eth = FakeEth(logs)
+
+
+class FakeClient(object):
+    def __init__(self, logs=None):
+        self.w3 = FakeW3(logs or [])
+
+
+class AMMTest(unittest.TestCase):
+
+    def test_get_amount_out(self):
+        fee = amm.fee_from_calibration(pancake_amount_out(
+            amm.CALIBRATION_AMOUNT_IN, amm.CALIBRATION_RESERVE, amm.CALIBRATION_RESERVE
+        ))
+        self.assertEqual(fee, 997500)
+        for amount_in, reserve_in, reserve_out in [(10**18, 10**21, 3 * 10**23), (12345, 10**9, 10**6)]:
+            self.assertEqual(
+                amm.get_amount_out(amount_in, reserve_in, reserve_out, fee),
+                pancake_amount_out(amount_in, reserve_in, reserve_out),
+            )
+
+    def test_get_amount_in(self):
+        amount_in = amm.get_amount_in(10**18, 10**21, 3 * 10**23, 997500)
+        self.assertGreaterEqual(amm.get_amount_out(amount_in, 10**21, 3 * 10**23, 997500), 10**18)
+        self.assertLess(amm.get_amount_out(amount_in - 1, 10**21, 3 * 10**23, 997500), 10**18)
+
+    def test_invalid_amounts(self):
+        self.assertRaises(ValueError, amm.get_amount_out, 0, 10, 10, 997500)
+        self.assertRaises(ValueError, amm.get_amount_out, 1, 0, 10, 997500)
+        self.assertRaises(ValueError, amm.get_amount_in, 10, 10, 10, 997500)
+
+
+class SpreadScannerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scanner = SpreadScanner(
+            FakeClient(),
+            routers={},
+            pairs=[(TEST_TOKEN1, TEST_TOKEN2, 10**18)],
+            threshold=Decimal("1"),
+        )
+        self.scanner.fees = {"a": 997500, "b": 998000}
+        self.scanner.pools = {(TEST_TOKEN1, TEST_TOKEN2): [("a", TEST_LP1), ("b", TEST_LP2)]}
+        self.scanner.reserve_cache.token0 = {TEST_LP1: TEST_TOKEN1, TEST_LP2: TEST_TOKEN2}
+        self.scanner.reserve_cache.block = 100
+
+    def test_no_spread(self):
+        self.scanner.reserve_cache.reserves = {
+            TEST_LP1: (10**22, 3 * 10**24),
+            TEST_LP2: (3 * 10**24, 10**22),
+        }
+        self.assertEqual(self.scanner.scan(100), [])
+
+    def test_spread(self):
+        # Token2 is 5% cheaper in router a
+        self.scanner.reserve_cache.reserves = {
+            TEST_LP1: (10**22, 315 * 10**22),
+            TEST_LP2: (3 * 10**24, 10**22),
+        }
+        opportunities = self.scanner.scan(100)
+        self.assertEqual(len(opportunities), 1)
+        opportunity = opportunities[0]
+        self.assertEqual(opportunity.buy_router, "a")
+        self.assertEqual(opportunity.sell_router, "b")
+        bought = pancake_amount_out(10**18, 10**22, 315 * 10**22)
+        self.assertEqual(opportunity.amount_out, amm.get_amount_out(bought, 3 * 10**24, 10**22, 998000))
+        self.assertGreater(opportunity.spread, Decimal("4"))
+
+    def test_sync_update(self):
+        data = (123).to_bytes(32, 'big') + (456).to_bytes(32, 'big')
+        unknown_lp = "0x2000000000000000000000000000000000000003"
+        reserve_cache = ReserveCache(FakeClient(logs=[
+            {"address": TEST_LP1, "data": "0x" + data.hex()},
+            {"address": unknown_lp, "data": "0x" + data.hex()},
+        ]))
+        reserve_cache.reserves = {TEST_LP1: (1, 2), TEST_LP2: (3, 4)}
+        reserve_cache.token0 = {TEST_LP1: TEST_TOKEN1, TEST_LP2: TEST_TOKEN1}
+        reserve_cache.block = 100
+        asyncio.run(reserve_cache.update([], 101))
+        self.assertEqual(reserve_cache.block, 101)
+        self.assertEqual(reserve_cache.get_reserves(TEST_LP1, TEST_TOKEN1), (123, 456))
+        self.assertEqual(reserve_cache.get_reserves(TEST_LP1, TEST_TOKEN2), (456, 123))
+        self.assertEqual(reserve_cache.get_reserves(TEST_LP2, TEST_TOKEN1), (3, 4))
+        self.assertNotIn(unknown_lp, reserve_cache.reserves)
+
+    def test_sync_update_no_lps(self):
+        client = FakeClient(logs=[{"address": TEST_LP1, "data": "0x" + bytes(64).hex()}])
+        reserve_cache = ReserveCache(client)
+        reserve_cache.block = 100
+        asyncio.run(reserve_cache.update([], 101))
+        self.assertEqual(reserve_cache.block, 101)
+        self.assertEqual(client.w3.eth.requests, [])
+        self.assertEqual(reserve_cache.reserves, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import unittest
+
+from aiohttp import web
+from web3 import Web3
+
+from blockchain.async_web3.rpc import PooledAsyncHTTPProvider
+from blockchain.async_web3.storage import StorageReader, mapping_slot
+
+
+TEST_CONTRACT = "0x2000000000000000000000000000000000000001"
+TEST_ADDRESS = "0x1000000000000000000000000000000000000001"
+
+
+class FakeBatchProvider(object):
+    def __init__(self):
+        self.batches = []
+
+    async def make_batch_request(self, requests):
+        self.batches.append(requests)
+        return [{"id": i, "result": hex(int(params[1], 16) * 2)} for i, (method, params) in enumerate(requests)]
+
+
+class FakeW3(object):
+    def __init__(self, provider):
+        self.provider = provider
+
+
+class FakeClient(object):
+    def __init__(self, provider):
+        self.w3 = FakeW3(provider)
+
+
+class StorageTest(unittest.TestCase):
+
+    def test_mapping_slot(self):
+        self.assertEqual(
+            mapping_slot(3, TEST_ADDRESS),
+            int.from_bytes(Web3.solidityKeccak(["uint256", "uint256"], [int(TEST_ADDRESS, 16), 3]), 'big'),
+        )
+        self.assertEqual(
+            mapping_slot(1, "42"),
+            int.from_bytes(Web3.solidityKeccak(["uint256", "uint256"], [42, 1]), 'big'),
+        )
+
+    def test_read_slots(self):
+        provider = FakeBatchProvider()
+        reader = StorageReader(FakeClient(provider), batch_size=3, concurrency=2)
+
+        async def read():
+            return [x async for x in reader.read_slots(TEST_CONTRACT, range(10), block=100)]
+
+        values = asyncio.run(read())
+        self.assertEqual([x[0] for x in values], list(range(10)))
+        self.assertEqual([int(x[1].hex(), 16) for x in values], [x * 2 for x in range(10)])
+        self.assertEqual([len(x) for x in provider.batches], [3, 3, 3, 1])
+        self.assertTrue(all(params[2] == hex(100) for batch in provider.batches for method, params in batch))
+
+    def test_make_batch_request(self):
+        async def handler(request):
+            batch = await request.json()
+            # Responses can be in any order
+            return web.json_response([
+                {"jsonrpc": "2.0", "id": x["id"], "result": x["params"][0]} for x in reversed(batch)
+            ])
+
+        async def run():
+            app = web.Application()
+            app.router.add_post("/", handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            try:
+                provider = PooledAsyncHTTPProvider(f"http://127.0.0.1:{port}/")
+                try:
+                    return await provider.make_batch_request([("eth_test", [x]) for x in range(5)])
+                finally:
+                    await provider.close()
+            finally:
+                await runner.cleanup()
+
+        responses = asyncio.run(run())
+        self.assertEqual([x["result"] for x in responses], list(range(5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
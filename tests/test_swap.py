@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import contextlib
+import io
+import unittest
+from unittest import mock
+
+from eth_account import Account
+from web3 import Web3
+
+import swap
+from blockchain import networks
+from blockchain.async_web3.simulator import SimulatorNode
+from blockchain.networks import binance
+from blockchain.router_client import get_router
+from blockchain.simulator import SimulatorProvider, network_chain
+
+ROUTERS = ["PancakeRouterV2", "ApeRouter"]
+BALANCE = 10000 * 10**18
+
+
+def make_network(provider: str) -> networks.Network:
+    return networks.Network(
+        provider=provider,
+        chain_id=binance.CHAIN_ID,
+        routers={x: binance.ROUTERS[x] for x in ROUTERS},
+        tokens=binance.TOKENS,
+        wrapped_native_token=binance.WRAPPED_NATIVE_TOKEN,
+        explorer_tx_url=binance.EXPLORER_TX_URL,
+        native_token_decimals=binance.NATIVE_TOKEN_DECIMALS,
+    )
+
+
+def swap_args(amount: str, router: str = "PancakeRouterV2", pipeline: bool = False) -> argparse.Namespace:
+    return argparse.Namespace(token_from="BUSD", token_to="USDT", amount=amount, router=router, gas_price=5,
+                              slippage=3, pipeline=pipeline, test_mode=False, network=networks.BINANCE)
+
+
+class SwapTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.account = Account.create()
+        self.chain = network_chain(networks.get_network_by_name(networks.BINANCE), routers=ROUTERS,
+                                   accounts=[self.account.address], balance=BALANCE, automine=True)
+        self.w3 = Web3(SimulatorProvider(self.chain))
+        self.swapper = swap.Swapper(public_key=self.account.address, private_key=self.account.key,
+                                    network=make_network("http://127.0.0.1:1/"), w3=self.w3, test_mode=False)
+
+    def _balance(self, token: str) -> int:
+        return self.swapper.client.get_token(token).balanceOf(self.account.address)
+
+    def _quote(self, router: str, amount: int) -> int:
+        router = get_router(self.swapper.client, binance.ROUTERS[router], "PancakeRouterV2")
+        return router.get_amount_out(self.swapper.client.get_token(binance.BUSD),
+                                     self.swapper.client.get_token(binance.USDT), amount)
+
+    def _nonce(self) -> int:
+        return self.w3.eth.get_transaction_count(self.account.address)
+
+    def _assert_swapped(self, amount_out: int):
+        self.assertEqual(self._balance(binance.BUSD), BALANCE - 10 * 10**18)
+        self.assertEqual(self._balance(binance.USDT), BALANCE + amount_out)
+        # Approval and swap
+        self.assertEqual(self._nonce(), 2)
+
+
+class SwapperTest(SwapTestCase):
+
+    def _swap(self, args):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            swap.swap(self.swapper, args)
+        return output.getvalue()
+
+    def test_swap(self):
+        amount_out = self._quote("PancakeRouterV2", 10 * 10**18)
+        self._swap(swap_args("10"))
+        self._assert_swapped(amount_out)
+
+    def test_swap_pipeline(self):
+        amount_out = self._quote("PancakeRouterV2", 10 * 10**18)
+        self._swap(swap_args("10", pipeline=True))
+        self._assert_swapped(amount_out)
+
+    def test_swap_no_balance(self):
+        output = self._swap(swap_args("20000"))
+        self.assertIn("ERROR account balance", output)
+        self.assertEqual(self._nonce(), 0)
+
+    def test_select_router(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            router = swap.select_router("any", binance.BUSD, binance.USDT, 10, self.swapper)
+        self.assertIn(router.address, [binance.ROUTERS[x] for x in ROUTERS])
+
+
+class AsyncSwapperTest(SwapTestCase):
+
+    def _run(self, func, args):
+        """
+        Run func(swapper, args) with AsyncSwapper connected to simulator node
+        """
+        async def run():
+            async with SimulatorNode(self.chain, port=0, block_time=0) as node:
+                swapper = swap.AsyncSwapper(public_key=self.account.address, private_key=self.account.key,
+                                            network=make_network(node.url), test_mode=False)
+                try:
+                    return await func(swapper, args)
+                finally:
+                    await swapper.client.close()
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = asyncio.run(run())
+        return result, output.getvalue()
+
+    def test_swap(self):
+        amount_out = self._quote("PancakeRouterV2", 10 * 10**18)
+        self._run(swap.async_swap, swap_args("10"))
+        self._assert_swapped(amount_out)
+
+    def test_swap_no_balance(self):
+        _, output = self._run(swap.async_swap, swap_args("20000"))
+        self.assertIn("ERROR account balance", output)
+        self.assertEqual(self._nonce(), 0)
+
+    def test_select_router(self):
+        async def select(swapper, args):
+            return await swap.async_select_router("any", binance.BUSD, binance.USDT, 10, swapper)
+
+        router, _ = self._run(select, None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = swap.select_router("any", binance.BUSD, binance.USDT, 10, self.swapper)
+        self.assertEqual(router.address, expected.address)
+
+    def test_run_async(self):
+        amount_out = self._quote("ApeRouter", 10 * 10**18)
+        args = swap_args("10", router="ApeRouter")
+        args.async_func = swap.async_swap
+
+        async def run():
+            async with SimulatorNode(self.chain, port=0, block_time=0) as node:
+                with mock.patch.dict(networks.NETWORKS, {networks.BINANCE: make_network(node.url)}):
+                    await swap.run_async(args, private_key=self.account.key, public_key=self.account.address)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(run())
+        self._assert_swapped(amount_out)
+
+    def test_pipeline_not_supported(self):
+        argv = ["swap.py", "--keyfile", "missing", "--network", networks.BINANCE, "--async",
+                "swap", "--pipeline", "BUSD", "USDT", "10"]
+        with mock.patch("sys.argv", argv), contextlib.redirect_stderr(io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit):
+                swap.main()
+        self.assertIn("--pipeline is not supported with --async", stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
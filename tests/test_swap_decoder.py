@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+
+from web3 import Web3
+
+from blockchain.async_web3.mempool import PendingSwapStream
+from blockchain.contract import get_abi
+from blockchain.swap_decoder import SwapDecoder
+
+
+TEST_ROUTER = "0x10ED43C718714eb63d5aA57B78B54704E256024E"
+TEST_TOKEN1 = "0xbb4CdB9CBd36B01bD1cBaEBF2De08d9173bc095c"
+TEST_TOKEN2 = "0xe9e7CEA3DedcA5984780Bafc599bD69ADd087D56"
+TEST_TOKEN3 = "0x55d398326f99059fF775485246999027B3197955"
+TEST_TO = "0x1000000000000000000000000000000000000001"
+
+
+class SwapDecoderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.router = Web3().eth.contract(address=TEST_ROUTER, abi=get_abi("PancakeRouterV2"))
+        self.decoder = SwapDecoder(routers=[TEST_ROUTER])
+
+    def _tx(self, data, value=0, to=TEST_ROUTER):
+        return {"hash": "0x01", "from": TEST_TO, "to": to, "input": data, "value": value, "gasPrice": 5, "nonce": 1}
+
+    def test_exact_input(self):
+        data = self.router.encodeABI("swapExactTokensForTokens", args=[
+            1000, 900, [TEST_TOKEN1, TEST_TOKEN2, TEST_TOKEN3], TEST_TO, 1234
+        ])
+        intent = self.decoder.decode_transaction(self._tx(data))
+        self.assertEqual(intent.function, "swapExactTokensForTokens")
+        self.assertTrue(intent.exact_input)
+        self.assertEqual(intent.amount_in, 1000)
+        self.assertEqual(intent.amount_out, 900)
+        self.assertEqual(intent.path, [TEST_TOKEN1, TEST_TOKEN2, TEST_TOKEN3])
+        self.assertEqual(intent.to, TEST_TO)
+        self.assertEqual(intent.deadline, 1234)
+        self.assertEqual(intent.router, TEST_ROUTER)
+        self.assertEqual(intent.tx_hash, "0x01")
+
+    def test_exact_output(self):
+        data = self.router.encodeABI("swapTokensForExactETH", args=[500, 700, [TEST_TOKEN2, TEST_TOKEN1], TEST_TO, 1])
+        intent = self.decoder.decode_transaction(self._tx(data))
+        self.assertFalse(intent.exact_input)
+        self.assertEqual(intent.amount_in, 700)
+        self.assertEqual(intent.amount_out, 500)
+
+    def test_native_input(self):
+        data = self.router.encodeABI("swapExactETHForTokens", args=[900, [TEST_TOKEN1, TEST_TOKEN2], TEST_TO, 1])
+        intent = self.decoder.decode_transaction(self._tx(data, value=10**18))
+        self.assertTrue(intent.exact_input)
+        self.assertEqual(intent.amount_in, 10**18)
+        self.assertEqual(intent.amount_out, 900)
+
+        data = self.router.encodeABI("swapETHForExactTokens", args=[900, [TEST_TOKEN1, TEST_TOKEN2], TEST_TO, 1])
+        intent = self.decoder.decode_transaction(self._tx(data, value=10**18))
+        self.assertFalse(intent.exact_input)
+        self.assertEqual(intent.amount_in, 10**18)
+
+    def test_all_swap_functions(self):
+        for function, name in self.decoder.selectors.items():
+            args = self.router.get_function_by_name(name).abi["inputs"]
+            values = {
+                "path": [TEST_TOKEN1, TEST_TOKEN2],
+                "to": TEST_TO,
+            }
+            data = self.router.encodeABI(name, args=[values.get(x["name"], 7) for x in args])
+            decoded = self.router.decode_function_input(data)[1]
+            intent = self.decoder.decode(bytes.fromhex(data[2:]), value=3)
+            self.assertEqual(intent.function, name)
+            self.assertEqual(intent.path, decoded["path"])
+            self.assertEqual(intent.deadline, decoded["deadline"])
+
+    def test_not_swap(self):
+        data = self.router.encodeABI("addLiquidityETH", args=[TEST_TOKEN1, 1, 1, 1, TEST_TO, 1])
+        self.assertIsNone(self.decoder.decode_transaction(self._tx(data)))
+        data = self.router.encodeABI("swapExactTokensForTokens", args=[1, 1, [TEST_TOKEN1, TEST_TOKEN2], TEST_TO, 1])
+        self.assertIsNone(self.decoder.decode_transaction(self._tx(data, to=TEST_TO)))
+        self.assertIsNone(self.decoder.decode_transaction(self._tx(data[:-64])))
+        self.assertIsNone(self.decoder.decode_transaction(self._tx("0x")))
+
+    def test_stream(self):
+        data = self.router.encodeABI("swapExactTokensForTokens", args=[1, 1, [TEST_TOKEN1, TEST_TOKEN2], TEST_TO, 1])
+
+        async def batches():
+            yield [self._tx(data), self._tx("0x")]
+            yield [self._tx(data)]
+
+        async def collect():
+            stream = PendingSwapStream(client=None, decoder=self.decoder)
+            return [x async for x in stream.swaps(batches())]
+
+        self.assertEqual(len(asyncio.run(collect())), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import asyncio
+import io
+import json
+import unittest
+
+from eth_account import Account
+from web3 import Web3
+
+from blockchain import networks
+from blockchain.async_web3.client import AsyncClient
+from blockchain.async_web3.simulator import SimulatorNode
+from blockchain.async_web3.transfer_export import (
+    BinaryWriter, BlockRangeChunker, LogWriter, NDJSONWriter, TransferExporter, is_log_limit_error, read_binary
+)
+from blockchain.contract import get_abi
+from blockchain.event_decoder import EventDecoder
+from blockchain.simulator import SimulatedChain
+
+BLOCKS = 40
+TEST_ADDRESS = "0x0000000000000000000000000000000000000001"
+
+
+def make_transfers(chain: SimulatedChain, account, token: str):
+    """
+    Mine BLOCKS blocks with 0-6 transfers each, return [(block, to, amount)]
+    """
+    contract = Web3().eth.contract(address=token, abi=get_abi("token"))
+    transfers = []
+    nonce = 0
+    for block in range(1, BLOCKS + 1):
+        for x in range(block % 7):
+            to = Web3.toChecksumAddress(f"0x{block * 10 + x:040x}")
+            amount = block * 10**18 + x
+            tx = contract.functions.transfer(to, amount).buildTransaction({
+                "chainId": chain.chain_id, "gas": 100000, "gasPrice": 5, "nonce": nonce,
+            })
+            chain.send_raw_transaction(Account.sign_transaction(tx, account.key).rawTransaction)
+            transfers.append((block, to, amount))
+            nonce += 1
+        # Approval has different topic and is not exported
+        tx = contract.functions.approve(token, block).buildTransaction({
+            "chainId": chain.chain_id, "gas": 100000, "gasPrice": 5, "nonce": nonce,
+        })
+        chain.send_raw_transaction(Account.sign_transaction(tx, account.key).rawTransaction)
+        nonce += 1
+        chain.mine()
+    return transfers
+
+
+def make_network(chain: SimulatedChain, token: str, provider: str) -> networks.Network:
+    return networks.Network(
+        provider=provider,
+        chain_id=chain.chain_id,
+        routers={},
+        tokens={"BUSD": token},
+        wrapped_native_token=None,
+        explorer_tx_url="{}",
+        native_token_decimals=18,
+    )
+
+
+class EventDecoderTest(unittest.TestCase):
+
+    def test_decode(self):
+        decoder = EventDecoder.from_abi("token", "Transfer")
+        self.assertEqual(decoder.topic, Web3.keccak(text="Transfer(address,address,uint256)").hex())
+        sender = "0x1000000000000000000000000000000000000001"
+        to = "0x2000000000000000000000000000000000000002"
+        log = {
+            "topics": [decoder.topic, "0x" + sender[2:].rjust(64, "0"), "0x" + to[2:].rjust(64, "0")],
+            "data": "0x" + f"{2**255:064x}",
+        }
+        self.assertEqual(decoder.decode_dict(log), {"from": sender, "to": to, "value": 2**255})
+        # ERC-721 Transfer has the same topic and indexed tokenId
+        self.assertIsNone(decoder.decode(dict(log, topics=log["topics"] + [log["data"]], data="0x")))
+
+
+class BlockRangeChunkerTest(unittest.TestCase):
+
+    def test_adapt(self):
+        chunker = BlockRangeChunker(size=100, target_logs=1000)
+        chunker.success(100, 0)
+        self.assertEqual(chunker.size, 200)
+        chunker.success(200, 4000)
+        self.assertEqual(chunker.size, 50)
+        # Older smaller range doesn't grow the size
+        chunker.success(10, 0)
+        self.assertEqual(chunker.size, 50)
+        chunker.exceeded(50, "exceed maximum block range: 20")
+        self.assertEqual((chunker.size, chunker.max_size), (20, 20))
+        chunker.success(20, 0)
+        self.assertEqual(chunker.size, 20)
+        chunker.exceeded(20, "query returned more than 100 results")
+        self.assertEqual((chunker.size, chunker.target_logs), (10, 50))
+
+    def test_log_limit_error(self):
+        self.assertTrue(is_log_limit_error({"code": -32005, "message": "limit exceeded"}))
+        self.assertTrue(is_log_limit_error({"code": -32602, "message": "query returned more than 10000 results"}))
+        self.assertFalse(is_log_limit_error({"code": -32000, "message": "header not found"}))
+
+
+class CountingWriter(LogWriter):
+
+    def __init__(self):
+        super().__init__(io.BytesIO(), EventDecoder.from_abi("token", "Transfer"))
+        self.ranges = 0
+
+    def write(self, logs):
+        self.ranges += 1
+        return len(logs)
+
+
+class FakeExporter(TransferExporter):
+    """
+    Counts ranges started but not written yet
+    """
+
+    def __init__(self, writer: CountingWriter, concurrency: int):
+        super().__init__(None, writer, concurrency=concurrency, chunker=BlockRangeChunker(size=1, max_size=1))
+        self.started = 0
+        self.max_pending = 0
+
+    async def _get_logs(self, address, from_block, to_block):
+        self.started += 1
+        self.max_pending = max(self.max_pending, self.started - self.writer.ranges)
+        # Later ranges finish first, so they wait in memory for earlier ones
+        await asyncio.sleep(0.001 * (10 - from_block % 10))
+        return []
+
+
+class TransferExporterTest(unittest.TestCase):
+
+    def test_abstract_writer(self):
+        with self.assertRaises(TypeError):
+            LogWriter(io.BytesIO(), EventDecoder.from_abi("token", "Transfer"))
+
+    def test_ranges_in_memory(self):
+        exporter = FakeExporter(CountingWriter(), concurrency=3)
+        self.assertEqual(asyncio.run(exporter.export(TEST_ADDRESS, 0, 49)), 0)
+        self.assertEqual(exporter.writer.ranges, 50)
+        self.assertEqual(exporter.max_pending, 3)
+
+    def test_export(self):
+        account = Account.create()
+        chain = SimulatedChain(chain_id=56, max_logs_block_range=10, max_logs=8)
+        token = Web3.toChecksumAddress(chain.add_token("BUSD"))
+        chain.set_balance(account.address, 10**18)
+        chain.mint(token, account.address, 10**30)
+        transfers = make_transfers(chain, account, token)
+        decoder = EventDecoder.from_abi("token", "Transfer")
+
+        async def run(writer):
+            async with SimulatorNode(chain, port=0, block_time=0) as node:
+                client = AsyncClient(public_key=account.address, private_key=account.key,
+                                     network=make_network(chain, token, node.url))
+                try:
+                    exporter = TransferExporter(client, writer, concurrency=4, chunker=BlockRangeChunker(size=50))
+                    return await exporter.export(token, 0, BLOCKS), exporter.chunker
+                finally:
+                    await client.close()
+
+        output = io.BytesIO()
+        count, chunker = asyncio.run(run(NDJSONWriter(output, decoder)))
+        self.assertEqual(count, len(transfers))
+        self.assertEqual(chunker.max_size, 10)
+        records = [json.loads(x) for x in output.getvalue().splitlines()]
+        self.assertEqual([(x["block"], x["to"], int(x["value"])) for x in records], transfers)
+        self.assertTrue(all(x["from"] == account.address for x in records))
+
+        output = io.BytesIO()
+        count, _ = asyncio.run(run(BinaryWriter(output, decoder)))
+        self.assertEqual(count, len(transfers))
+        output.seek(0)
+        rows = list(read_binary(output, decoder))
+        self.assertEqual([(x[0], x[4], x[5]) for x in rows], transfers)
+        self.assertEqual([(x[1], x[2], x[3]) for x in rows],
+                         [(x["log_index"], x["transaction"], x["from"]) for x in records])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+import unittest
+
+from eth_account import Account
+from hexbytes import HexBytes
+
+from blockchain import keyutils, networks
+from blockchain.exceptions import BlockchainException
+from blockchain.wallet import Wallet
+
+
+class FakeSigned(object):
+    def __init__(self, address, nonce):
+        self.rawTransaction = f"{address}:{nonce}".encode()
+
+
+class FakeEth(object):
+    def __init__(self):
+        self.transaction_counts = {}
+        self.sent = []
+        self.receipts = {}
+
+    def get_transaction_count(self, address, tag):
+        return self.transaction_counts.get(address, 5)
+
+    def send_raw_transaction(self, raw):
+        self.sent.append(raw.decode())
+        return HexBytes(raw)
+
+    def get_transaction_receipt(self, tx_hash):
+        return self.receipts.get(tx_hash)
+
+    def get_balance(self, address):
+        return 10
+
+
+class FakeW3(object):
+    def __init__(self):
+        self.eth = FakeEth()
+
+
+NETWORK = networks.Network(
+    provider="/fake/socket",
+    chain_id=123,
+    routers=[],
+    tokens=[],
+    wrapped_native_token="0x0000000000000000000000000000000000000001",
+    explorer_tx_url="https://exlorer.fake/tx",
+    native_token_decimals=18,
+)
+
+
+def sign(client, nonce):
+    return FakeSigned(client.public_key, nonce)
+
+
+class WalletTest(unittest.TestCase):
+
+    def setUp(self):
+        self.w3 = FakeW3()
+        accounts = [keyutils.create_account() for _ in range(2)]
+        self.wallet = Wallet(
+            [(x.key, x.address) for x in accounts],
+            network=NETWORK,
+            w3=self.w3,
+            test_mode=False,
+            max_in_flight=2,
+            broadcast_providers=[],
+        )
+
+    def tearDown(self):
+        self.wallet.close()
+
+    def test_nonce_lanes(self):
+        results = [self.wallet.submit(sign).result() for _ in range(4)]
+        by_address = {}
+        for address, tx_hash in results:
+            by_address.setdefault(address, []).append(int(bytes(HexBytes(tx_hash)).decode().split(":")[1]))
+        self.assertEqual(sorted(by_address), sorted(self.wallet.addresses))
+        self.assertTrue(all(x == [5, 6] for x in by_address.values()))
+        self.assertEqual(self.wallet.get_in_flight_count(), 4)
+
+        # All accounts are full
+        with self.assertRaises(BlockchainException):
+            self.wallet.submit(sign, timeout=0, poll_latency=0)
+
+        for address, tx_hash in results[:2]:
+            self.w3.eth.receipts[tx_hash] = {"status": 1, "blockNumber": 1}
+        self.assertEqual(self.wallet.poll(), 2)
+        self.assertEqual(sum(len(x) for x in self.wallet.get_in_flight().values()), 2)
+        self.wallet.submit(sign).result()
+
+    def test_failed_send(self):
+        def failing_sign(client, nonce):
+            raise ValueError("nonce too low")
+
+        with self.assertRaises(ValueError):
+            self.wallet.submit(failing_sign).result()
+        lane = min(self.wallet.lanes, key=lambda x: x.load)
+        self.w3.eth.transaction_counts[lane.address] = 9
+        address, tx_hash = self.wallet.submit(sign).result()
+        self.assertEqual(address, lane.address)
+        self.assertTrue(bytes(HexBytes(tx_hash)).decode().endswith(":9"))
+        self.assertEqual(self.wallet.get_in_flight_count(), 1)
+
+    def test_balances(self):
+        self.assertEqual(self.wallet.get_balances(), {x: 10 for x in self.wallet.addresses})
+        self.assertEqual(self.wallet.get_total_balance(), 20)
+
+
+class ReadKeyfilesTest(unittest.TestCase):
+
+    def test_read_keyfiles(self):
+        accounts = [keyutils.create_account() for _ in range(3)]
+        with tempfile.TemporaryDirectory() as directory:
+            keyfiles = []
+            for i, account in enumerate(accounts):
+                keyfile = os.path.join(directory, f"key{i}.json")
+                with open(keyfile, "w") as f:
+                    f.write(json.dumps(Account.encrypt(account.key, "test", iterations=2)))
+                keyfiles.append(keyfile)
+            keys = keyutils.read_keyfiles(keyfiles, "test", max_workers=2)
+        self.assertEqual([x[1] for x in keys], [x.address for x in accounts])
+        self.assertEqual([x[0] for x in keys], [x.key for x in accounts])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+import argparse
+
+from blockchain import networks
+from blockchain.wallet import Wallet
+
+
+def balances(wallet: Wallet, args):
+    if args.token:
+        token = wallet.lanes[0].client.get_token(args.token)
+        symbol = token.symbol
+        to_decimal = token.toDecimals
+    else:
+        symbol = "native"
+
+        def to_decimal(x):
+            return wallet.w3.fromWei(x, "ether")
+    account_balances = wallet.get_balances(args.token)
+    for address, balance in account_balances.items():
+        print(f"{address} {to_decimal(balance):.5f} {symbol}")
+    print(f"Total {to_decimal(sum(account_balances.values())):.5f} {symbol}")
+
+
+def main():
+    parser = argparse.ArgumentParser("Multi-account wallet")
+    parser.add_argument("--network", required=True, choices=networks.NETWORKS.keys(), help="Network to operate on")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    balances_parser = subparsers.add_parser("balances", help="Balance of every account and total")
+    balances_parser.add_argument("--token", default=None, help="ERC-20 token address, default is native token")
+    balances_parser.add_argument("keyfile", nargs="+", help="Keyfile paths, all encrypted with same password")
+    balances_parser.set_defaults(func=balances)
+
+    args = parser.parse_args()
+
+    wallet = Wallet.from_keyfiles(args.keyfile, network=networks.get_network_by_name(args.network))
+    try:
+        args.func(wallet, args)
+    finally:
+        wallet.close()
+
+
+if __name__ == '__main__':
+    main()